@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Carga las variables de entorno desde un archivo .env si existe
@@ -8,6 +9,31 @@ load_dotenv()
 MONGODB_URI = os.getenv("MONGODB_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME")
 
+# Pool de conexiones del cliente de MongoDB (ver app/database.py). Cada worker de
+# uvicorn tiene su propio pool: el máximo de conexiones al servidor es workers × MAX.
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+# Tiempo máximo que una operación espera una conexión libre del pool (0 = sin límite).
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "10000"))
+# Límite de espera de cada respuesta del servidor (0 = sin límite). Los scripts de
+# mantenimiento (reconstrucciones largas) lo desactivan.
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "60000"))
+# Compresión del protocolo, en orden de preferencia; el servidor elige la primera que
+# soporte. zstd y snappy requieren los extras de pymongo (requirements.txt); zlib siempre está.
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+# Conexiones que se abren al iniciar, para que las primeras solicitudes no paguen el
+# handshake TLS/autenticación (por defecto, MONGO_MIN_POOL_SIZE).
+MONGO_WARMUP_CONNECTIONS = int(os.getenv("MONGO_WARMUP_CONNECTIONS", str(MONGO_MIN_POOL_SIZE)))
+
+# Instrumentación (ver app/services/metrics_service.py): solicitudes más lentas que
+# SLOW_REQUEST_MS (0 = no registrar) se registran con los SLOW_REQUEST_BREAKDOWN pares
+# (comando, colección) de MongoDB que más tiempo tomaron.
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_REQUEST_BREAKDOWN = int(os.getenv("SLOW_REQUEST_BREAKDOWN", "10"))
+
 # --- Configuración dinámica de CORS ---
 # Lee la variable de entorno y la convierte en una lista de orígenes.
 # Si la variable no está, usa una lista de valores por defecto para desarrollo.
@@ -28,6 +54,74 @@ else:
 # --- Configuración de la Aplicación ---
 API_PREFIX = "/api/v1"
 
+# Modo de cálculo del total en los listados paginados: "exact", "estimated" o "cached".
+# Ver app/services/pagination_service.py.
+PAGINATION_TOTAL_MODE = os.getenv("PAGINATION_TOTAL_MODE", "exact")
+
+# Reconciliación de índices al iniciar: "apply" (crea los que faltan), "dry_run" (solo informa) u "off".
+INDEX_RECONCILE_MODE = os.getenv("INDEX_RECONCILE_MODE", "apply")
+# Elimina índices existentes que no estén declarados en ningún modelo (solo en modo "apply").
+INDEX_DROP_UNDECLARED = os.getenv("INDEX_DROP_UNDECLARED", "false").lower() == "true"
+
+# Checkpoints de saldos por SKU (ver app/services/checkpoint_service.py): periodo
+# ("DAY" o "MONTH") y cada cuántos segundos los actualiza el job de fondo (0 = desactivado).
+STOCK_CHECKPOINT_PERIOD = os.getenv("STOCK_CHECKPOINT_PERIOD", "DAY")
+STOCK_CHECKPOINT_INTERVAL = int(os.getenv("STOCK_CHECKPOINT_INTERVAL", "3600"))
+
+# Caché de lecturas del catálogo (ver app/services/cache_service.py):
+# "memory" (LRU+TTL en el proceso), "redis" (compartida, usa CACHE_URL), "local" u "off".
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_URL = os.getenv("CACHE_URL", "redis://localhost:6379/0")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "30"))  # segundos
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+
+# Numeración de documentos (ver app/services/document_number_service.py): números que
+# reserva cada proceso por bloque y series fiscales que se numeran sin huecos.
+DOCUMENT_NUMBER_BLOCK_SIZE = int(os.getenv("DOCUMENT_NUMBER_BLOCK_SIZE", "100"))
+DOCUMENT_NUMBER_GAPLESS_SERIES = {
+    s.strip() for s in os.getenv("DOCUMENT_NUMBER_GAPLESS_SERIES", "sales_invoice,credit_note,debit_note").split(",") if s.strip()
+}
+
+# Importación masiva de productos (ver app/services/import_service.py): filas por lote
+# y máximo de errores por fila que se guardan en el job.
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "500"))
+IMPORT_MAX_STORED_ERRORS = int(os.getenv("IMPORT_MAX_STORED_ERRORS", "1000"))
+
+# Motor de reposición (ver app/services/replenishment_service.py): días de historia de
+# salidas, plazo de entrega y periodo de revisión (días) y nivel de servicio objetivo.
+REPLENISHMENT_HISTORY_DAYS = int(os.getenv("REPLENISHMENT_HISTORY_DAYS", "365"))
+REPLENISHMENT_LEAD_TIME_DAYS = float(os.getenv("REPLENISHMENT_LEAD_TIME_DAYS", "7"))
+REPLENISHMENT_REVIEW_DAYS = float(os.getenv("REPLENISHMENT_REVIEW_DAYS", "7"))
+REPLENISHMENT_SERVICE_LEVEL = float(os.getenv("REPLENISHMENT_SERVICE_LEVEL", "0.95"))
+
+# Feed de cambios por SSE (ver app/services/change_feed_service.py): eventos por tópico
+# que se guardan para reanudar, cola máxima por cliente, máximo de clientes por proceso
+# y cada cuántos segundos se envía un heartbeat.
+CHANGE_FEED_BUFFER = int(os.getenv("CHANGE_FEED_BUFFER", "1000"))
+CHANGE_FEED_QUEUE_SIZE = int(os.getenv("CHANGE_FEED_QUEUE_SIZE", "500"))
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", "500"))
+CHANGE_FEED_HEARTBEAT = int(os.getenv("CHANGE_FEED_HEARTBEAT", "15"))
+
+# Claves de idempotencia (ver app/services/idempotency_service.py): cuánto se guarda la
+# respuesta de una clave, cuánto dura el reclamo de una solicitud en curso y cuánto
+# espera un duplicado al original (segundos).
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", "60"))
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "30"))
+
+# Jobs en segundo plano (ver app/services/job_service.py): workers asyncio y procesos
+# para cálculo por proceso de la API (0 workers = este proceso no ejecuta jobs), cada
+# cuántos segundos se revisa la cola, duración del reclamo de un job en curso, espera
+# base entre reintentos, días que se conservan los jobs terminados y carpeta de los
+# archivos que generan (exportaciones).
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_PROCESS_WORKERS = int(os.getenv("JOB_PROCESS_WORKERS", "1"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+JOB_RETRY_BACKOFF = int(os.getenv("JOB_RETRY_BACKOFF", "30"))
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR", os.path.join(tempfile.gettempdir(), "erp_jobs"))
+
 print("="*50)
 print("CONFIGURACIÓN DE ORÍGENES PERMITIDOS (CORS):")
 if allowed_origins_str:
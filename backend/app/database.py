@@ -1,34 +1,259 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
 
-import motor.motor_asyncio
+from pymongo import AsyncMongoClient, monitoring
 from beanie import init_beanie
-from app.config import MONGODB_URI, MONGO_DB_NAME
+from app.config import (
+    MONGODB_URI, MONGO_DB_NAME, INDEX_RECONCILE_MODE, INDEX_DROP_UNDECLARED,
+    MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS, MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS,
+    MONGO_COMPRESSORS, MONGO_WARMUP_CONNECTIONS,
+)
 
-async def init_db():
+client: AsyncMongoClient = None
+_supports_transactions = None
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
     """
-    Inicializa la conexión a la base de datos y los modelos de Beanie.
+    Uso del pool de conexiones por servidor, a partir de los eventos del driver:
+    conexiones abiertas y en uso (actual y máximo desde el inicio), tiempo de espera
+    para obtener una conexión y fallos (p. ej. MONGO_WAIT_QUEUE_TIMEOUT_MS agotado).
+    Si `max_in_use` llega a `max_pool_size` o hay esperas largas, el pool es chico
+    para la carga del worker.
     """
-    print(f"Conectando al servidor de MongoDB en: {MONGODB_URI}")
-    client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
-    database = client[MONGO_DB_NAME]
-    print(f"Usando la base de datos: {MONGO_DB_NAME}")
 
+    def __init__(self):
+        self.pools: Dict[str, Dict[str, Any]] = {}
+
+    def _pool(self, address) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}"
+        pool = self.pools.get(key)
+        if pool is None:
+            pool = self.pools[key] = {
+                "open": 0, "in_use": 0, "max_in_use": 0, "created": 0, "closed": 0, "cleared": 0,
+                "checkouts": 0, "checkout_failures": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0,
+            }
+        return pool
+
+    def _wait(self, pool: Dict[str, Any], duration: Optional[float]) -> None:
+        if duration is not None:
+            wait_ms = duration * 1000
+            pool["wait_total_ms"] += wait_ms
+            pool["wait_max_ms"] = max(pool["wait_max_ms"], wait_ms)
+
+    def pool_created(self, event):
+        self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._pool(event.address)["cleared"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool = self._pool(event.address)
+        pool["open"] += 1
+        pool["created"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool = self._pool(event.address)
+        pool["open"] -= 1
+        pool["closed"] += 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        pool = self._pool(event.address)
+        pool["checkout_failures"] += 1
+        self._wait(pool, event.duration)
+
+    def connection_checked_out(self, event):
+        pool = self._pool(event.address)
+        pool["in_use"] += 1
+        pool["max_in_use"] = max(pool["max_in_use"], pool["in_use"])
+        pool["checkouts"] += 1
+        self._wait(pool, event.duration)
+
+    def connection_checked_in(self, event):
+        self._pool(event.address)["in_use"] -= 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        result = {}
+        for address, pool in self.pools.items():
+            checkouts = pool["checkouts"] + pool["checkout_failures"]
+            result[address] = {
+                **{k: v for k, v in pool.items() if k != "wait_total_ms"},
+                "available": pool["open"] - pool["in_use"],
+                "wait_avg_ms": round(pool["wait_total_ms"] / checkouts, 3) if checkouts else 0.0,
+                "wait_max_ms": round(pool["wait_max_ms"], 3),
+            }
+        return result
+
+
+pool_monitor = PoolMonitor()
+
+
+def client_options(**overrides: Any) -> Dict[str, Any]:
+    """Opciones del cliente desde la configuración (MONGO_*); `overrides` las reemplaza."""
+    options: Dict[str, Any] = {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS or None,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+        "compressors": MONGO_COMPRESSORS,
+        "appname": "erp-backend",
+    }
+    options.update(overrides)
+    return options
+
+
+def create_client(event_listeners: Optional[List[Any]] = None, **overrides: Any) -> AsyncMongoClient:
+    """
+    Cliente de MongoDB con el pool, los timeouts y la compresión configurados. Lo usan
+    `init_db` y los scripts que solo necesitan un cliente (test_connection.py, ...).
+    Los compresores no disponibles en el entorno se ignoran con una advertencia del driver.
+    """
+    return AsyncMongoClient(
+        MONGODB_URI,
+        event_listeners=[pool_monitor] + list(event_listeners or []),
+        **client_options(**overrides),
+    )
+
+def get_document_models():
+    """
+    Lista de modelos de Beanie registrados en la aplicación.
+    """
     # --- Modelos de Inventario ---
-    from app.models.inventory import Product, Category, Warehouse, StockMovement, ProductHistory
-    
+    from app.models.inventory import Product, Category, Warehouse, StockMovement, ProductHistory, WarehouseStock, CostLedgerEntry, StockCheckpoint, ImportJob
+
     # --- Modelos de Compras ---
-    from app.models.purchasing import Supplier, Order, Invoice, DebitNote
-    
+    from app.models.purchasing import Supplier, Order, Invoice, DebitNote, DailyPurchaseRollup, ReplenishmentRun, ReplenishmentItem
+
     # --- Modelos de Ventas ---
-    from app.models.sales import Customer, SalesOrder, SalesInvoice, CreditNote
+    from app.models.sales import (
+        Customer, SalesOrder, SalesInvoice, CreditNote, DailySalesRollup, SalesQuote, BackorderLine, BackorderAllocation,
+    )
+
+    # --- Secuencias de numeración ---
+    from app.services.document_number_service import DocumentSequence
+
+    # --- Claves de idempotencia ---
+    from app.services.idempotency_service import IdempotencyRecord
+
+    # --- Jobs en segundo plano ---
+    from app.models.jobs import Job
 
-    document_models = [
+    return [
         # Inventario
-        Product, Category, Warehouse, StockMovement, ProductHistory,
+        Product, Category, Warehouse, StockMovement, ProductHistory, WarehouseStock, CostLedgerEntry, StockCheckpoint, ImportJob,
         # Compras
-        Supplier, Order, Invoice, DebitNote, # DebitNote was missing
+        Supplier, Order, Invoice, DebitNote, DailyPurchaseRollup, ReplenishmentRun, ReplenishmentItem, # DebitNote was missing
         # Ventas
-        Customer, SalesOrder, SalesInvoice, CreditNote, # CreditNote was missing
+        Customer, SalesOrder, SalesInvoice, CreditNote, DailySalesRollup, SalesQuote, BackorderLine, BackorderAllocation, # CreditNote was missing
+        # Numeración
+        DocumentSequence,
+        # Idempotencia
+        IdempotencyRecord,
+        # Jobs
+        Job,
     ]
 
-    await init_beanie(database=database, document_models=document_models)
+async def init_db(**client_overrides: Any):
+    """
+    Inicializa la conexión a la base de datos y los modelos de Beanie.
+    `client_overrides` reemplaza opciones del cliente (p. ej. `socketTimeoutMS=None`
+    en los scripts de mantenimiento).
+    """
+    print(f"Conectando al servidor de MongoDB en: {MONGODB_URI}")
+    # Beanie 2.x trabaja sobre el cliente asíncrono nativo de PyMongo (no Motor);
+    # con Motor las agregaciones (`Model.aggregate`) no funcionan.
+    global client
+    # Los comandos se cuentan por solicitud para las métricas (ver metrics_service).
+    from app.services.metrics_service import command_monitor
+    client = create_client(event_listeners=[command_monitor], **client_overrides)
+    database = client[MONGO_DB_NAME]
+    print(f"Usando la base de datos: {MONGO_DB_NAME}")
+
+    document_models = get_document_models()
+
+    # Los índices no los crea Beanie: se reconcilian abajo contra el registro
+    # declarado en cada `Settings.indexes` (ver app/services/index_service.py).
+    await init_beanie(database=database, document_models=document_models, skip_indexes=True)
     print("Conexión a la base de datos y Beanie inicializados con éxito.")
+
+    if INDEX_RECONCILE_MODE != "off":
+        from app.services.index_service import reconcile_indexes, format_report
+        dry_run = INDEX_RECONCILE_MODE == "dry_run"
+        try:
+            reports = await reconcile_indexes(
+                document_models, dry_run=dry_run, drop_undeclared=INDEX_DROP_UNDECLARED and not dry_run
+            )
+            print(format_report(reports, dry_run))
+        except Exception as e:
+            # Un índice que no se puede crear no debe impedir que la API arranque.
+            print(f"!!! ADVERTENCIA: No se pudieron reconciliar los índices: {e}")
+            logging.warning("No se pudieron reconciliar los índices", exc_info=True)
+
+async def warm_up_pool(connections: int = MONGO_WARMUP_CONNECTIONS) -> int:
+    """
+    Abre `connections` conexiones con pings simultáneos (cada uno toma una conexión del
+    pool), así las primeras solicitudes no pagan el handshake TLS y la autenticación.
+    Devuelve cuántos pings respondieron.
+    """
+    if connections <= 0:
+        return 0
+    results = await asyncio.gather(
+        *(get_client().admin.command("ping") for _ in range(connections)), return_exceptions=True
+    )
+    return sum(1 for r in results if not isinstance(r, Exception))
+
+
+async def close_db() -> None:
+    """Cierra el cliente y sus conexiones (apagado de la aplicación o fin de un script)."""
+    global client, _supports_transactions
+    if client is not None:
+        await client.close()
+        client = None
+        _supports_transactions = None
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Configuración del pool y su uso por servidor (ver PoolMonitor)."""
+    options = client_options()
+    return {
+        "max_pool_size": options["maxPoolSize"],
+        "min_pool_size": options["minPoolSize"],
+        "wait_queue_timeout_ms": options["waitQueueTimeoutMS"],
+        # Preferencia configurada; cada conexión usa la primera que soporten ambos lados.
+        "compressors": options["compressors"],
+        "servers": pool_monitor.stats(),
+    }
+
+
+def get_client() -> AsyncMongoClient:
+    if client is None:
+        raise RuntimeError("La base de datos no está inicializada (init_db).")
+    return client
+
+async def supports_transactions() -> bool:
+    """
+    Las transacciones multi-documento solo existen en replica sets o clusters
+    sharded (Atlas lo es); un mongod standalone de desarrollo no las soporta.
+    """
+    global _supports_transactions
+    if _supports_transactions is None:
+        hello = await get_client().admin.command("hello")
+        _supports_transactions = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+    return _supports_transactions
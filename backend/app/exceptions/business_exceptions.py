@@ -18,6 +18,14 @@ class InsufficientStockException(BusinessException):
         self.required = required
         super().__init__(f"Insufficient stock for SKU {product_sku}. Required: {required}, Available: {available}")
 
+class StockConflictException(ValidationException):
+    """Raised when a product's stock changed between reading it and a conditional update."""
+    def __init__(self, product_sku: str, expected: int, current: int):
+        self.product_sku = product_sku
+        self.expected = expected
+        self.current = current
+        super().__init__(f"Stock for SKU {product_sku} changed concurrently. Expected: {expected}, Current: {current}")
+
 class DuplicateException(BusinessException):
     """Raised when trying to create an entity that already exists (e.g., duplicate RUC)."""
     pass
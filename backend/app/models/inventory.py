@@ -1,8 +1,10 @@
 from typing import Optional, Dict, List
 from datetime import datetime
 from enum import Enum
-from beanie import Document, Indexed
+from beanie import Document, Indexed, before_event, Insert, Replace, Save
 from pydantic import BaseModel, field_validator, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from app.services.search_service import build_search_tokens
 
 class Warehouse(Document):
     name: str
@@ -42,6 +44,9 @@ class ProductHistory(Document):
 
     class Settings:
         name = "product_history"
+        indexes = [
+            IndexModel([("product_id", ASCENDING), ("timestamp", DESCENDING)]),
+        ]
 
 class Product(Document):
     sku: Indexed(str, unique=True)
@@ -55,14 +60,28 @@ class Product(Document):
     measurements: Optional[List[Dict]] = None
     stock_current: int = 0
     created_at: datetime = Field(default_factory=datetime.now)
+    search_tokens: List[str] = []
 
     @field_validator('price', 'cost')
     @classmethod
     def round_amounts(cls, v):
         return round(v, 3) if v is not None else v
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(words=[self.name, self.brand], codes=[self.sku])
+
     class Settings:
         name = "products"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("category_id", ASCENDING)]),
+            IndexModel([
+                ("measurements.label", ASCENDING),
+                ("measurements.unit", ASCENDING),
+                ("measurements.value", ASCENDING),
+            ]),
+        ]
 
 class StockMovement(Document):
     product_sku: str
@@ -75,6 +94,9 @@ class StockMovement(Document):
     created_at: datetime = Field(default_factory=datetime.now)
     notes: Optional[str] = None
     responsible: Optional[str] = None
+    # Variación del stock total aplicada por el motor de stock (con signo). En
+    # movimientos anteriores a este campo se deduce del tipo (ver checkpoint_service).
+    stock_change: Optional[int] = None
 
     @field_validator('unit_cost')
     @classmethod
@@ -83,6 +105,126 @@ class StockMovement(Document):
 
     class Settings:
         name = "stock_movements"
+        # Índices para la paginación por cursor (created_at, _id), global y por producto.
+        indexes = [
+            IndexModel([("product_sku", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
+
+class WarehouseStock(Document):
+    """Saldo de un producto en un almacén. `Product.stock_current` es la suma de todos los almacenes."""
+    sku: str
+    warehouse_id: str
+    quantity: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "warehouse_stock"
+        indexes = [
+            IndexModel([("sku", ASCENDING), ("warehouse_id", ASCENDING)], unique=True),
+            IndexModel([("warehouse_id", ASCENDING), ("sku", ASCENDING)]),
+        ]
+
+class CheckpointPeriod(str, Enum):
+    DAY = "DAY"
+    MONTH = "MONTH"
+
+class StockCheckpoint(Document):
+    """
+    Saldo de un SKU al cierre de un periodo cerrado (día o mes) con movimientos:
+    apertura, ingresos, salidas y cierre. Lo genera `checkpoint_service` a partir de
+    `StockMovement`; un saldo a una fecha lee el último checkpoint y los movimientos
+    posteriores.
+    """
+    sku: str
+    period: CheckpointPeriod
+    period_start: datetime
+    period_end: datetime
+    opening_quantity: int
+    quantity_in: int
+    quantity_out: int
+    closing_quantity: int
+    movements_count: int
+    built_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "stock_checkpoints"
+        indexes = [
+            IndexModel([("sku", ASCENDING), ("period", ASCENDING), ("period_start", DESCENDING)], unique=True),
+            IndexModel([("period", ASCENDING), ("period_end", DESCENDING)]),
+        ]
+
+class CostEntryType(str, Enum):
+    OPENING = "OPENING"
+    MOVEMENT = "MOVEMENT"
+    REVALUATION = "REVALUATION"
+
+class CostLedgerEntry(Document):
+    """
+    Estado de costo de un SKU después de cada cambio de stock o de costo: cantidad,
+    costo promedio ponderado y valor acumulados. La valorización a una fecha es la
+    última entrada de cada SKU anterior a esa fecha (sin recorrer los movimientos).
+    """
+    sku: str
+    entry_type: CostEntryType = CostEntryType.MOVEMENT
+    reference_document: Optional[str] = None
+    quantity_change: int = 0
+    value_change: float = 0.0
+    running_quantity: int
+    average_cost: float
+    running_value: float
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "cost_ledger"
+        indexes = [
+            IndexModel([("sku", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]
+
+class ImportOperation(str, Enum):
+    INSERT = "INSERT"
+    UPDATE = "UPDATE"
+    DELETE = "DELETE"
+
+class ImportJobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+
+class ImportRowError(BaseModel):
+    row: int  # número de fila en el archivo (la cabecera es la fila 1)
+    sku: Optional[str] = None
+    message: str
+
+class ImportSummary(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    errors: int = 0
+
+class ImportJob(Document):
+    """
+    Importación masiva de productos desde CSV/XLSX. El job se actualiza después de cada
+    lote procesado, así el cliente puede consultar el avance mientras corre.
+    """
+    filename: str
+    file_format: str
+    status: ImportJobStatus = ImportJobStatus.PENDING
+    processed_rows: int = 0
+    summary: ImportSummary = Field(default_factory=ImportSummary)
+    # Detalle de errores por fila (limitado a IMPORT_MAX_STORED_ERRORS; `summary.errors` cuenta todos).
+    errors: List[ImportRowError] = []
+    message: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "import_jobs"
+        indexes = [
+            IndexModel([("created_at", DESCENDING)]),
+        ]
 
 class GuideType(str, Enum):
     RECEPTION = "RECEPTION"
@@ -0,0 +1,51 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+from enum import Enum
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from app.config import JOB_RETENTION_DAYS
+
+class JobStatus(str, Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    COMPLETED = "COMPLETED"
+    FAILED = "FAILED"
+    CANCELLED = "CANCELLED"
+
+class Job(Document):
+    """
+    Trabajo en segundo plano en la cola de MongoDB (ver app/services/job_service.py).
+    Lo toma el primer worker libre de cualquier proceso, por prioridad y antigüedad.
+    """
+    kind: str
+    params: Dict[str, Any] = {}
+    status: JobStatus = JobStatus.PENDING
+    # Mayor prioridad se ejecuta primero.
+    priority: int = 0
+    attempts: int = 0
+    max_attempts: int = 1
+    progress: float = 0.0  # 0..1
+    progress_message: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    # No se ejecuta antes de esta fecha (reintentos con espera).
+    run_after: datetime = Field(default_factory=datetime.now)
+    # Worker que lo ejecuta y hasta cuándo vale su reclamo (se renueva mientras corre).
+    locked_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Settings:
+        name = "jobs"
+        indexes = [
+            # Orden en que los workers toman los pendientes.
+            IndexModel([("status", ASCENDING), ("priority", DESCENDING), ("run_after", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("created_at", DESCENDING)]),
+            IndexModel([("kind", ASCENDING), ("created_at", DESCENDING)]),
+            # Los jobs terminados se borran solos tras JOB_RETENTION_DAYS.
+            IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=JOB_RETENTION_DAYS * 86400),
+        ]
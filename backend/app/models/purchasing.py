@@ -1,8 +1,10 @@
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
-from beanie import Document, Indexed
-from pydantic import BaseModel, field_validator, Field
+from beanie import Document, Indexed, before_event, after_event, Insert, Replace, Save, Update, Delete
+from pydantic import BaseModel, PrivateAttr, field_validator, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from app.services.search_service import build_search_tokens
 
 class Supplier(Document):
     name: Indexed(str, unique=True)
@@ -10,11 +12,20 @@ class Supplier(Document):
     phone: Optional[str] = None
     address: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.now)
+    search_tokens: List[str] = []
+
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(words=[self.name])
 
     class Settings:
         name = "suppliers"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+        ]
 
 class OrderStatus(str, Enum):
+    DRAFT = "DRAFT"  # propuesta del motor de reposición, aún no enviada al proveedor
     PENDING = "PENDING"
     RECEIVED = "RECEIVED"
     INVOICED = "INVOICED"
@@ -42,14 +53,25 @@ class Order(Document):
     items: List[OrderDetail]
     status: OrderStatus = OrderStatus.PENDING
     total_amount: float = 0.0
+    search_tokens: List[str] = []
 
     @field_validator('total_amount')
     @classmethod
     def round_total(cls, v):
         return round(v, 3) if v is not None else v
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.order_number], exact=[self.supplier_id])
+
     class Settings:
         name = "purchase_orders"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("date", DESCENDING)]),
+            IndexModel([("status", ASCENDING), ("date", DESCENDING)]),
+            IndexModel([("supplier_id", ASCENDING), ("date", DESCENDING)]),
+        ]
 
 class Payment(BaseModel):
     amount: float
@@ -75,14 +97,62 @@ class Invoice(Document):
     guide_id: Optional[str] = None
     debit_note_ids: List[str] = []
     debit_applied: float = 0.0
+    search_tokens: List[str] = []
+    # Aporte a los resúmenes diarios antes de un replace/update (ver rollup_service).
+    _rollup_snapshot: Optional[dict] = PrivateAttr(default=None)
 
     @field_validator('total_amount', 'amount_paid', 'debit_applied')
     @classmethod
     def round_amounts(cls, v):
         return round(v, 3) if v is not None else v
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.invoice_number], exact=[self.supplier_id, self.order_id])
+
+    @after_event(Insert)
+    async def add_to_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self)
+
+    @before_event(Delete)
+    async def remove_from_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self, sign=-1)
+
+    @before_event(Replace, Update)
+    async def snapshot_rollups(self):
+        from app.services.rollup_service import snapshot_document
+        await snapshot_document(self)
+
+    @after_event(Replace, Update)
+    async def update_rollups(self):
+        from app.services.rollup_service import record_change
+        await record_change(self)
+
     class Settings:
         name = "purchase_invoices"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("invoice_date", DESCENDING)]),
+            IndexModel([("supplier_id", ASCENDING), ("invoice_date", DESCENDING)]),
+            IndexModel([("payment_status", ASCENDING), ("invoice_date", DESCENDING)]),
+            IndexModel([("order_id", ASCENDING)]),
+            # Antigüedad de cuentas por pagar: solo facturas con saldo (ver aging_service).
+            # Un índice por estado: `$in` en partialFilterExpression requiere MongoDB 6.0+, y
+            # antes de 5.0 dos índices no pueden tener la misma clave aunque difiera el
+            # filtro, por eso el de PARTIAL agrega `_id` al final.
+            IndexModel(
+                [("supplier_id", ASCENDING), ("invoice_date", ASCENDING)],
+                name="open_invoices_by_supplier_pending",
+                partialFilterExpression={"payment_status": "PENDING"},
+            ),
+            IndexModel(
+                [("supplier_id", ASCENDING), ("invoice_date", ASCENDING), ("_id", ASCENDING)],
+                name="open_invoices_by_supplier_partial",
+                partialFilterExpression={"payment_status": "PARTIAL"},
+            ),
+        ]
 
 # --- New Models for Debit Notes ---
 
@@ -117,11 +187,115 @@ class DebitNote(Document):
     items: List[DebitNoteItem]
     total_amount: float
     notes: Optional[str] = None
+    search_tokens: List[str] = []
+    # Aporte a los resúmenes diarios antes de un replace/update (ver rollup_service).
+    _rollup_snapshot: Optional[dict] = PrivateAttr(default=None)
 
     @field_validator('total_amount')
     @classmethod
     def round_total(cls, v):
         return round(v, 3)
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.debit_note_number], exact=[self.purchase_invoice_id, self.supplier_id])
+
+    @after_event(Insert)
+    async def add_to_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self)
+
+    @before_event(Delete)
+    async def remove_from_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self, sign=-1)
+
+    @before_event(Replace, Update)
+    async def snapshot_rollups(self):
+        from app.services.rollup_service import snapshot_document
+        await snapshot_document(self)
+
+    @after_event(Replace, Update)
+    async def update_rollups(self):
+        from app.services.rollup_service import record_change
+        await record_change(self)
+
     class Settings:
         name = "purchase_debit_notes"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("date", DESCENDING)]),
+            IndexModel([("purchase_invoice_id", ASCENDING)]),
+        ]
+
+class DailyPurchaseRollup(Document):
+    """
+    Hechos diarios de compras por (día, SKU, proveedor): cantidades y montos de
+    las facturas y de las notas de débito del día. Los mantiene `rollup_service`
+    (incremental al registrar documentos; reconstruible con manage_rollups.py).
+    """
+    day: datetime
+    sku: str
+    supplier_id: str
+    quantity: int = 0
+    amount: float = 0.0
+    returned_quantity: int = 0
+    returned_amount: float = 0.0
+    lines: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "purchase_daily_rollups"
+        indexes = [
+            IndexModel([("day", ASCENDING), ("sku", ASCENDING), ("supplier_id", ASCENDING)], unique=True),
+            IndexModel([("sku", ASCENDING), ("day", ASCENDING)]),
+            IndexModel([("supplier_id", ASCENDING), ("day", ASCENDING)]),
+        ]
+
+class ReplenishmentRun(Document):
+    """
+    Ejecución del motor de reposición (`replenishment_service`): parámetros, totales y
+    órdenes de compra borrador que propuso. La última ejecución es la vigente.
+    """
+    history_days: int
+    lead_time_days: float
+    review_days: float
+    service_level: float
+    skus_analyzed: int = 0
+    skus_with_demand: int = 0
+    skus_to_reorder: int = 0
+    skus_without_supplier: int = 0
+    draft_order_ids: List[str] = []
+    duration_ms: float = 0.0
+    computed_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "replenishment_runs"
+        indexes = [
+            IndexModel([("computed_at", DESCENDING)]),
+        ]
+
+class ReplenishmentItem(Document):
+    """Demanda, stock de seguridad, punto de reorden y cantidad sugerida de un SKU en una ejecución."""
+    run_id: str
+    sku: str
+    supplier_id: Optional[str] = None
+    avg_daily_demand: float
+    demand_std: float
+    safety_stock: float
+    reorder_point: float
+    order_up_to: float
+    stock_current: int
+    on_order: int = 0
+    days_of_cover: float
+    needs_reorder: bool
+    suggested_quantity: int = 0
+    unit_cost: float = 0.0
+
+    class Settings:
+        name = "replenishment_items"
+        indexes = [
+            IndexModel([("run_id", ASCENDING), ("needs_reorder", ASCENDING), ("days_of_cover", ASCENDING)]),
+            IndexModel([("run_id", ASCENDING), ("sku", ASCENDING)], unique=True),
+            IndexModel([("run_id", ASCENDING), ("supplier_id", ASCENDING)]),
+        ]
@@ -1,8 +1,10 @@
 from typing import List, Optional
 from datetime import datetime
 from enum import Enum
-from beanie import Document, Indexed
-from pydantic import BaseModel, field_validator, Field
+from beanie import Document, Indexed, before_event, after_event, Insert, Replace, Save, Update, Delete
+from pydantic import BaseModel, PrivateAttr, field_validator, Field
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from app.services.search_service import build_search_tokens
 
 class CustomerBranch(BaseModel):
     branch_name: str
@@ -20,9 +22,18 @@ class Customer(Document):
     email: Optional[str] = None
     branches: List[CustomerBranch] = []
     created_at: datetime = Field(default_factory=datetime.now)
+    search_tokens: List[str] = []
+
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(words=[self.name], codes=[self.ruc])
 
     class Settings:
         name = "customers"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("name", ASCENDING)]),
+        ]
 
 class OrderStatus(str, Enum):
     PENDING = "PENDING"
@@ -53,14 +64,24 @@ class SalesOrder(Document):
     total_amount: float = 0.0
     delivery_branch_name: Optional[str] = None
     delivery_address: str
+    search_tokens: List[str] = []
 
     @field_validator('total_amount')
     @classmethod
     def round_total(cls, v):
         return round(v, 3) if v is not None else v
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.order_number], exact=[self.customer_id])
+
     class Settings:
         name = "sales_orders"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("date", DESCENDING)]),
+            IndexModel([("customer_id", ASCENDING), ("date", DESCENDING)]),
+        ]
 
 class SalesPayment(BaseModel):
     amount: float
@@ -88,14 +109,62 @@ class SalesInvoice(Document):
     guide_id: Optional[str] = None
     credit_note_ids: List[str] = []
     credit_applied: float = 0.0
+    search_tokens: List[str] = []
+    # Aporte a los resúmenes diarios antes de un replace/update (ver rollup_service).
+    _rollup_snapshot: Optional[dict] = PrivateAttr(default=None)
 
     @field_validator('total_amount', 'amount_paid', 'credit_applied')
     @classmethod
     def round_amounts(cls, v):
         return round(v, 3) if v is not None else v
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.invoice_number], exact=[self.order_id, self.customer_id])
+
+    @after_event(Insert)
+    async def add_to_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self)
+
+    @before_event(Delete)
+    async def remove_from_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self, sign=-1)
+
+    @before_event(Replace, Update)
+    async def snapshot_rollups(self):
+        from app.services.rollup_service import snapshot_document
+        await snapshot_document(self)
+
+    @after_event(Replace, Update)
+    async def update_rollups(self):
+        from app.services.rollup_service import record_change
+        await record_change(self)
+
     class Settings:
         name = "sales_invoices"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("invoice_date", DESCENDING)]),
+            IndexModel([("customer_id", ASCENDING), ("invoice_date", DESCENDING)]),
+            IndexModel([("payment_status", ASCENDING), ("invoice_date", DESCENDING)]),
+            IndexModel([("order_id", ASCENDING)]),
+            # Antigüedad de cuentas por cobrar: solo facturas con saldo (ver aging_service).
+            # Un índice por estado: `$in` en partialFilterExpression requiere MongoDB 6.0+, y
+            # antes de 5.0 dos índices no pueden tener la misma clave aunque difiera el
+            # filtro, por eso el de PARTIAL agrega `_id` al final.
+            IndexModel(
+                [("customer_id", ASCENDING), ("invoice_date", ASCENDING)],
+                name="open_invoices_by_customer_pending",
+                partialFilterExpression={"payment_status": "PENDING"},
+            ),
+            IndexModel(
+                [("customer_id", ASCENDING), ("invoice_date", ASCENDING), ("_id", ASCENDING)],
+                name="open_invoices_by_customer_partial",
+                partialFilterExpression={"payment_status": "PARTIAL"},
+            ),
+        ]
 
 # --- New Models for Credit Notes ---
 
@@ -131,11 +200,155 @@ class CreditNote(Document):
     items: List[CreditNoteItem]
     total_amount: float
     notes: Optional[str] = None
+    search_tokens: List[str] = []
+    # Aporte a los resúmenes diarios antes de un replace/update (ver rollup_service).
+    _rollup_snapshot: Optional[dict] = PrivateAttr(default=None)
 
     @field_validator('total_amount')
     @classmethod
     def round_total(cls, v):
         return round(v, 3)
 
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.credit_note_number], exact=[self.sales_invoice_id, self.customer_id])
+
+    @after_event(Insert)
+    async def add_to_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self)
+
+    @before_event(Delete)
+    async def remove_from_rollups(self):
+        from app.services.rollup_service import record_document
+        await record_document(self, sign=-1)
+
+    @before_event(Replace, Update)
+    async def snapshot_rollups(self):
+        from app.services.rollup_service import snapshot_document
+        await snapshot_document(self)
+
+    @after_event(Replace, Update)
+    async def update_rollups(self):
+        from app.services.rollup_service import record_change
+        await record_change(self)
+
     class Settings:
         name = "sales_credit_notes"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("date", DESCENDING)]),
+            IndexModel([("sales_invoice_id", ASCENDING)]),
+        ]
+
+class DailySalesRollup(Document):
+    """
+    Hechos diarios de ventas por (día, SKU, cliente): cantidades y montos de
+    las facturas y de las notas de crédito del día. Los mantiene `rollup_service`
+    (incremental al registrar documentos; reconstruible con manage_rollups.py).
+    """
+    day: datetime
+    sku: str
+    customer_id: str
+    quantity: int = 0
+    amount: float = 0.0
+    returned_quantity: int = 0
+    returned_amount: float = 0.0
+    lines: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "sales_daily_rollups"
+        indexes = [
+            IndexModel([("day", ASCENDING), ("sku", ASCENDING), ("customer_id", ASCENDING)], unique=True),
+            IndexModel([("sku", ASCENDING), ("day", ASCENDING)]),
+            IndexModel([("customer_id", ASCENDING), ("day", ASCENDING)]),
+        ]
+
+# --- Cotizaciones de venta y backorders (ver BACKORDER_PLAN.md y backorder_service) ---
+
+class QuoteStatus(str, Enum):
+    DRAFT = "DRAFT"
+    SENT = "SENT"
+    PARTIALLY_FILLED = "PARTIALLY_FILLED"
+    COMPLETED = "COMPLETED"
+    CANCELLED = "CANCELLED"
+
+class SalesQuoteItem(BaseModel):
+    product_sku: str
+    quantity_requested: int
+    # Cantidad asignada desde los ingresos de stock (ver backorder_service).
+    quantity_filled: int = 0
+    unit_price: float
+
+    @field_validator('unit_price')
+    @classmethod
+    def round_price(cls, v):
+        return round(v, 3) if v is not None else v
+
+class SalesQuote(Document):
+    quote_number: Indexed(str, unique=True)
+    customer_id: str
+    date: datetime = Field(default_factory=datetime.now)
+    items: List[SalesQuoteItem]
+    status: QuoteStatus = QuoteStatus.DRAFT
+    # Mayor prioridad se surte primero; a igual prioridad, la cotización más antigua.
+    priority: int = 0
+    total_amount: float = 0.0
+    notes: Optional[str] = None
+    search_tokens: List[str] = []
+
+    @field_validator('total_amount')
+    @classmethod
+    def round_total(cls, v):
+        return round(v, 3) if v is not None else v
+
+    @before_event(Insert, Replace, Save)
+    def refresh_search_tokens(self):
+        self.search_tokens = build_search_tokens(codes=[self.quote_number], exact=[self.customer_id])
+
+    class Settings:
+        name = "sales_quotes"
+        indexes = [
+            IndexModel([("search_tokens", ASCENDING)]),
+            IndexModel([("date", DESCENDING)]),
+            IndexModel([("customer_id", ASCENDING), ("date", DESCENDING)]),
+        ]
+
+class BackorderLine(Document):
+    """
+    Línea de cotización con cantidad pendiente, en la cola de su SKU. Solo existen las
+    líneas abiertas: al surtirse por completo (o anularse la cotización) se eliminan.
+    """
+    sku: str
+    quote_id: str
+    quote_number: str
+    line: int  # posición del ítem en `SalesQuote.items`
+    priority: int = 0
+    quote_date: datetime
+    quantity_pending: int
+
+    class Settings:
+        name = "backorder_lines"
+        indexes = [
+            # Orden de atención de la cola de un SKU: prioridad y luego FIFO.
+            IndexModel([("sku", ASCENDING), ("priority", DESCENDING), ("quote_date", ASCENDING), ("_id", ASCENDING)]),
+            IndexModel([("quote_id", ASCENDING)]),
+        ]
+
+class BackorderAllocation(Document):
+    """Asignación de un ingreso de stock a una línea de cotización."""
+    quote_id: str
+    quote_number: str
+    line: int
+    sku: str
+    quantity: int
+    reference_document: str
+    created_at: datetime = Field(default_factory=datetime.now)
+
+    class Settings:
+        name = "backorder_allocations"
+        indexes = [
+            IndexModel([("quote_id", ASCENDING), ("created_at", ASCENDING)]),
+            IndexModel([("reference_document", ASCENDING)]),
+        ]
@@ -0,0 +1,28 @@
+"""
+Respuestas JSON de un solo paso para resultados ya validados.
+
+Con `response_model`, FastAPI vuelve a validar lo que devuelve la ruta contra el modelo
+(`validate_python(..., from_attributes=True)`, que reconstruye la página si la clase no
+coincide) antes de serializarlo. Los listados paginados ya validan cada documento al
+leerlo de MongoDB (`parse_obj` / `item_model`), así que esa segunda pasada sobra: con
+`json_response` el modelo se serializa una sola vez a bytes JSON en pydantic-core y
+FastAPI entrega la `Response` tal cual.
+
+Las rutas conservan `response_model` para la documentación OpenAPI; las opciones de
+serialización (`exclude`, alias) se pasan aquí porque FastAPI ya no las aplica.
+"""
+from typing import Any
+
+from fastapi import Response
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def json_response(content: BaseModel, status_code: int = 200, **dump_options: Any) -> Response:
+    """
+    Serializa `content` directamente a JSON (por alias, como FastAPI) sin validarlo de
+    nuevo. `dump_options` se pasan a `model_dump_json` (p. ej. `exclude`).
+    """
+    body = content.model_dump_json(by_alias=True, **dump_options)
+    return Response(content=body, status_code=status_code, media_type=JSON_MEDIA_TYPE)
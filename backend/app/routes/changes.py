@@ -0,0 +1,67 @@
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+
+from app.config import CHANGE_FEED_HEARTBEAT
+from app.services.change_feed_service import feed, TOPICS, ChangeFeedUnavailable
+
+router = APIRouter(tags=["Changes"])
+
+# Espera sugerida al navegador antes de reconectar (milisegundos).
+RECONNECT_MS = 3000
+
+
+@router.get("/stream")
+async def stream_changes(
+    request: Request,
+    topics: Optional[str] = Query(None, description=f"Tópicos separados por coma: {', '.join(TOPICS)} (por defecto, todos)"),
+    last_event_id: Optional[str] = Query(None, description="Último id recibido, si no se envía la cabecera Last-Event-ID"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Feed de cambios por Server-Sent Events. Cada evento `change` es un delta de un
+    documento (`op`: insert/update/replace/delete); un evento `reset` indica que el
+    cliente debe recargar ese tópico. Al reconectar con `Last-Event-ID` se reenvían
+    los eventos perdidos.
+    """
+    selected = [t.strip() for t in topics.split(",") if t.strip()] if topics else list(TOPICS)
+    unknown = [t for t in selected if t not in TOPICS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Tópicos desconocidos: {', '.join(unknown)}")
+
+    try:
+        subscription = await feed.subscribe(selected, last_event_id_header or last_event_id)
+    except ChangeFeedUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    async def events():
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), CHANGE_FEED_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentario SSE: mantiene viva la conexión a través de proxies.
+                    yield ": ping\n\n"
+                    continue
+                if event is None:
+                    break
+                yield event.encode()
+        finally:
+            feed.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stats")
+async def change_feed_stats():
+    """Suscriptores, eventos entregados y estado del change stream de cada tópico en este worker."""
+    return feed.stats()
@@ -1,20 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
-from fastapi.encoders import jsonable_encoder
+from fastapi import APIRouter, HTTPException, Depends, Query, UploadFile, File
+from typing import List, Optional, Dict
 from datetime import datetime
 
 # Importa los modelos y servicios necesarios
-from app.models.inventory import Product, Category, Warehouse, StockMovement
-from app.schemas.inventory_schemas import ProductCreate, PaginatedProducts, PaginatedStockMovements
+from app.models.inventory import Product, Category, Warehouse, StockMovement, CostLedgerEntry, ImportJob
+from app.schemas.inventory_schemas import ProductCreate, PaginatedProducts, PaginatedStockMovements, TransferRequest, ReceptionRequest, ReceptionResult, InventoryValuation, StockBalance, Kardex
 from app.schemas.common import PaginatedResponse
-from app.services import inventory_service
-from app.exceptions.business_exceptions import NotFoundException, DuplicateException
+from app.services import inventory_service, cost_ledger_service, checkpoint_service, export_service, import_service
+from app.services.projection_service import FIELDS_DESCRIPTION, VIEW_DESCRIPTION
+from app.responses import json_response
+from app.exceptions.business_exceptions import NotFoundException, DuplicateException, ValidationException, InsufficientStockException
 
 router = APIRouter(tags=["Inventory"])
 
+CURSOR_DESCRIPTION = "Modo cursor: enviar vacío para la primera página y luego `next_cursor`."
+
 # --- Rutas para Productos (Products) ---
 
-@router.post("/products/", response_model=Product)
+@router.post("/products/", response_model=Product, response_model_exclude={"search_tokens"})
 async def create_product_route(product_data: ProductCreate):
     try:
         return await inventory_service.create_product(
@@ -33,31 +36,74 @@ async def list_products_route(
     search: Optional[str] = None,
     category: Optional[str] = None,
     sort_by: Optional[str] = Query("sku", alias="sort_by"), # CORREGIDO
-    sort_order: Optional[str] = Query("asc", alias="sort_order") # CORREGIDO
+    sort_order: Optional[str] = Query("asc", alias="sort_order"), # CORREGIDO
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     """
     Endpoint para listar productos de forma paginada, con búsqueda y ordenación.
     """
     skip = (page - 1) * limit
     # CORREGIDO: Pasar los parámetros de ordenación al servicio
-    paginated_result = await inventory_service.get_products(
-        skip=skip, 
-        limit=limit, 
-        search=search, 
-        category=category, 
-        sort_by=sort_by, 
-        sort_order=sort_order
-    )
-    return paginated_result
-
-@router.get("/products/{sku}", response_model=Product)
+    try:
+        paginated_result = await inventory_service.get_products(
+            skip=skip, 
+            limit=limit, 
+            search=search, 
+            category=category, 
+            sort_by=sort_by, 
+            sort_order=sort_order,
+            fields=fields,
+            view=view,
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(paginated_result, exclude={"items": {"__all__": {"search_tokens"}}})
+
+@router.get("/products/export")
+async def export_products_route(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    mode: str = Query("current", description="current: productos actuales; empty: plantilla para importar"),
+    search: Optional[str] = None,
+    category: Optional[str] = None,
+):
+    """
+    Exporta el catálogo completo (o filtrado) en un solo archivo generado en streaming.
+    """
+    try:
+        query = export_service.build_query(search, category_id=category)
+        return export_service.export_response("products", query, file_format, template=mode == "empty")
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/products/import", response_model=ImportJob, status_code=202)
+async def import_products_route(file: UploadFile = File(..., description="CSV o XLSX con columnas operation, sku, ...")):
+    """
+    Inicia la importación masiva de productos en segundo plano y devuelve el job;
+    el avance y los errores por fila se consultan en `/products/import/{job_id}`.
+    """
+    try:
+        return await import_service.start_import(file)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+@router.get("/products/import/{job_id}", response_model=ImportJob)
+async def get_import_job_route(job_id: str):
+    try:
+        return await import_service.get_import_job(job_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/products/{sku}", response_model=Product, response_model_exclude={"search_tokens"})
 async def get_product_route(sku: str):
     try:
         return await inventory_service.get_product_by_sku(sku)
     except NotFoundException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
-@router.put("/products/{sku}", response_model=Product)
+@router.put("/products/{sku}", response_model=Product, response_model_exclude={"search_tokens"})
 async def update_product_route(sku: str, product_data: Product):
     try:
         return await inventory_service.update_product(sku, product_data)
@@ -76,42 +122,173 @@ async def delete_product_route(sku: str):
     except NotFoundException as e:
         raise HTTPException(status_code=404, detail=str(e))
 
+@router.get("/products/{sku}/stock", response_model=Dict[str, int])
+async def get_product_stock_by_warehouse(sku: str):
+    """
+    Saldo del producto por almacén: {código de almacén: cantidad}.
+    """
+    try:
+        return await inventory_service.get_stock_by_warehouse(sku)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/products/{sku}/cost-ledger", response_model=PaginatedResponse[CostLedgerEntry])
+async def get_product_cost_ledger(sku: str, skip: int = 0, limit: int = 50):
+    """
+    Kardex valorizado del producto: cantidad, costo promedio y valor tras cada cambio.
+    """
+    return await cost_ledger_service.get_cost_ledger(sku, skip=skip, limit=limit)
+
+# --- Valorización de Inventario ---
+@router.get("/valuation", response_model=InventoryValuation)
+async def get_inventory_valuation(
+    as_of: Optional[datetime] = Query(None, description="Fecha de corte; por defecto, ahora."),
+    skip: int = 0,
+    limit: int = 50,
+    include_zero: bool = False,
+):
+    """
+    Valorización del inventario a una fecha, desde el libro de costos.
+    """
+    return await cost_ledger_service.get_valuation(as_of, skip=skip, limit=limit, include_zero=include_zero)
+
 # --- Rutas para Almacenes (Warehouses) ---
 @router.get("/warehouses/", response_model=List[Warehouse])
 async def list_warehouses():
-    return await Warehouse.find_all().to_list()
+    return await inventory_service.get_all_warehouses()
+
+# --- Rutas para Categorías (Categories) ---
+@router.get("/categories/", response_model=List[Category])
+async def list_categories():
+    return await inventory_service.get_categories()
+
+@router.post("/categories/", response_model=Category)
+async def create_category(category: Category):
+    try:
+        return await inventory_service.create_category(category)
+    except DuplicateException as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 # --- Rutas para Movimientos de Stock (StockMovements) ---
 
+@router.post("/stock-movements/transfer")
+async def create_transfer(transfer: TransferRequest):
+    """
+    Transferencia masiva entre almacenes: todas las líneas se validan y se aplican juntas.
+    """
+    try:
+        return await inventory_service.register_transfer(
+            transfer.source_warehouse_id,
+            transfer.target_warehouse_id,
+            [item.model_dump() for item in transfer.items],
+            transfer.notes,
+        )
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except InsufficientStockException as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/stock-movements/reception", response_model=ReceptionResult)
+async def create_reception(reception: ReceptionRequest):
+    """
+    Recepción de mercadería (ingreso con costo): actualiza stock y costo promedio y
+    asigna lo recibido a las cotizaciones de venta con backorder.
+    """
+    try:
+        return await inventory_service.register_reception(
+            [item.model_dump() for item in reception.items],
+            reception.reference_document,
+            reception.warehouse_id,
+            reception.notes,
+        )
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stock-movements/export")
+async def export_stock_movements(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    product_sku: Optional[str] = None,
+    movement_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    try:
+        query = export_service.build_query(
+            product_sku=product_sku,
+            movement_type=movement_type,
+            created_at=export_service.date_range(start, end),
+        )
+        return export_service.export_response("stock_movements", query, file_format)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/stock-movements/", response_model=PaginatedStockMovements)
 async def list_stock_movements(
     product_sku: Optional[str] = None,
-    page: int = 1,
-    limit: int = 10
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     query = {}
     if product_sku:
         query["product_sku"] = {"$regex": product_sku, "$options": "i"}
-
-    skip = (page - 1) * limit
-    movements_cursor = StockMovement.find(query).sort(-StockMovement.created_at).skip(skip).limit(limit)
-    movements = await movements_cursor.to_list()
-    
-    total = await StockMovement.find(query).count()
-    
-    return {"items": jsonable_encoder(movements), "total": total}
+    return await _stock_movements_page(query, page, limit, cursor, fields, view)
 
 @router.get("/stock-movements/product/{product_sku}/history", response_model=PaginatedStockMovements)
 async def get_stock_movements_for_product(
     product_sku: str,
-    page: int = 1,
-    limit: int = 5,
+    page: int = Query(1, ge=1),
+    limit: int = Query(5, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description=CURSOR_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     query = {"product_sku": product_sku}
-    skip = (page - 1) * limit
-    movements_cursor = StockMovement.find(query).sort(-StockMovement.created_at).skip(skip).limit(limit)
-    movements = await movements_cursor.to_list()
-    total = await StockMovement.find(query).count()
-    return {"items": jsonable_encoder(movements), "total": total}
+    return await _stock_movements_page(query, page, limit, cursor, fields, view)
+
+@router.get("/stock-movements/product/{product_sku}/kardex", response_model=Kardex)
+async def get_product_kardex(
+    product_sku: str,
+    start: datetime,
+    end: Optional[datetime] = None,
+    period: Optional[str] = Query(None, description="DAY o MONTH; por defecto STOCK_CHECKPOINT_PERIOD."),
+):
+    """
+    Kardex del producto por periodo (saldo inicial, ingresos, salidas y saldo final),
+    desde los checkpoints de saldos más los movimientos no materializados.
+    """
+    try:
+        return await checkpoint_service.get_kardex(product_sku, start, end or datetime.now(), period)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/stock-movements/product/{product_sku}/balance", response_model=StockBalance)
+async def get_product_balance_at(product_sku: str, at: Optional[datetime] = None):
+    """
+    Saldo del producto a una fecha (todos los movimientos hasta `at`, inclusive).
+    """
+    try:
+        return await checkpoint_service.get_balance_at(product_sku, at or datetime.now())
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def _stock_movements_page(query: dict, page: int, limit: int, cursor: Optional[str], fields: Optional[str], view: Optional[str]):
+    """
+    Página de movimientos. En modo cursor (created_at, _id) cada página cuesta lo mismo
+    sin importar su profundidad y no se calcula `total` para no recorrer toda la colección.
+    """
+    try:
+        movements = await inventory_service.get_stock_movements(
+            query, skip=(page - 1) * limit, limit=limit, cursor=cursor, fields=fields, view=view
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(movements)
 
 # ... (otras rutas de categorías, almacenes, etc. se mantienen igual)
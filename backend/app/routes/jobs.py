@@ -0,0 +1,79 @@
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.config import JOB_FILES_DIR
+from app.exceptions.business_exceptions import NotFoundException, ValidationException
+from app.models.jobs import Job, JobStatus
+from app.schemas.common import PaginatedResponse, JobCreate, JobKindInfo
+from app.services import job_service
+
+router = APIRouter(tags=["Jobs"])
+
+
+@router.get("/kinds", response_model=List[JobKindInfo])
+async def get_job_kinds_route():
+    """Job types that can be enqueued, with their default retry budget."""
+    return [
+        JobKindInfo(name=kind.name, max_attempts=kind.max_attempts, description=kind.description)
+        for kind in job_service.list_kinds()
+    ]
+
+
+@router.post("/", response_model=Job, status_code=202)
+async def create_job_route(job_data: JobCreate):
+    """
+    Enqueues a background job and returns it immediately; poll `/jobs/{job_id}` for
+    status, progress and result.
+    """
+    try:
+        return await job_service.enqueue(job_data.kind, job_data.params, job_data.priority, job_data.max_attempts)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/", response_model=PaginatedResponse[Job])
+async def get_jobs_route(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    status: Optional[JobStatus] = None,
+    kind: Optional[str] = None,
+):
+    return await job_service.get_jobs(skip=skip, limit=limit, status=status, kind=kind)
+
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job_route(job_id: str):
+    try:
+        return await job_service.get_job(job_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.post("/{job_id}/cancel", response_model=Job)
+async def cancel_job_route(job_id: str):
+    """Cancels a pending job at once; a running job stops at its next lease renewal."""
+    try:
+        return await job_service.cancel_job(job_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/{job_id}/file")
+async def download_job_file_route(job_id: str):
+    """Downloads the file produced by a completed job (e.g. an `export` job)."""
+    try:
+        job = await job_service.get_job(job_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    path = (job.result or {}).get("path")
+    if job.status != JobStatus.COMPLETED or not path:
+        raise HTTPException(status_code=404, detail=f"El job {job_id} no generó un archivo.")
+    # Solo se sirven archivos de la carpeta de jobs.
+    if os.path.dirname(os.path.realpath(path)) != os.path.realpath(JOB_FILES_DIR) or not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="El archivo ya no está disponible en este servidor.")
+    return FileResponse(path, media_type=job.result.get("media_type"), filename=job.result.get("filename"))
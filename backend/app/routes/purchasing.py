@@ -1,14 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from beanie import PydanticObjectId
-from datetime import date
+from datetime import date, datetime, timedelta
 
-from app.services import purchasing_service
+from app.services import purchasing_service, export_service, aging_service, rollup_service, replenishment_service, job_service
 from app.schemas.purchasing_schemas import (
     DebitNoteCreate, DebitNoteResponse, PurchaseOrder, PurchaseInvoice, Supplier
 )
-from app.schemas.common import PaginatedResponse
+from app.schemas.common import PaginatedResponse, AgingReport, RollupReport
+from app.models.jobs import Job
+from app.models.purchasing import ReplenishmentItem, ReplenishmentRun
 from app.exceptions.business_exceptions import NotFoundException, ValidationException
+from app.responses import json_response
+from app.services.projection_service import FIELDS_DESCRIPTION, VIEW_DESCRIPTION
 
 router = APIRouter(tags=["Purchasing"])
 
@@ -19,6 +23,8 @@ async def list_suppliers(
     page: int = 1,
     limit: int = 10,
     search: Optional[str] = Query(None, description="Search by supplier name"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     """
     Retrieves a paginated list of suppliers.
@@ -26,9 +32,11 @@ async def list_suppliers(
     try:
         skip = (page - 1) * limit
         paginated_result = await purchasing_service.get_suppliers(
-            skip=skip, limit=limit, search=search
+            skip=skip, limit=limit, search=search, fields=fields, view=view
         )
-        return paginated_result
+        return json_response(paginated_result)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
@@ -41,7 +49,8 @@ async def list_purchase_orders(
     date_to: Optional[date] = Query(None),
     search: Optional[str] = Query(None, description="Search by order number or supplier name"),
     page: int = 1,
-    limit: int = 10,
+    limit: int = 10,    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     """
     Retrieves a paginated list of purchase orders.
@@ -55,8 +64,12 @@ async def list_purchase_orders(
             date_from=date_from,
             date_to=date_to,
             search=search,
+            fields=fields,
+            view=view,
         )
-        return paginated_result
+        return json_response(paginated_result)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
@@ -70,7 +83,8 @@ async def list_purchase_invoices(
     date_to: Optional[date] = Query(None),
     search: Optional[str] = Query(None, description="Search by invoice number or supplier name"),
     page: int = 1,
-    limit: int = 10,
+    limit: int = 10,    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     """
     Retrieves a paginated list of purchase invoices.
@@ -84,12 +98,161 @@ async def list_purchase_invoices(
             date_from=date_from,
             date_to=date_to,
             search=search,
+            fields=fields,
+            view=view,
         )
-        return paginated_result
+        return json_response(paginated_result)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 
+@router.get("/invoices/export")
+async def export_purchase_invoices(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    status: Optional[str] = Query(None, description="Payment status"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    search: Optional[str] = Query(None),
+    supplier_id: Optional[str] = None,
+):
+    """
+    Exports purchase invoices as a streamed CSV/XLSX file.
+    """
+    try:
+        query = export_service.build_query(
+            search,
+            supplier_id=supplier_id,
+            payment_status=status,
+            invoice_date=_date_range(date_from, date_to),
+        )
+        return export_service.export_response("purchase_invoices", query, file_format)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _date_range(date_from: Optional[date], date_to: Optional[date]):
+    return export_service.date_range(
+        datetime.combine(date_from, datetime.min.time()) if date_from else None,
+        datetime.combine(date_to, datetime.max.time()) if date_to else None,
+    )
+
+
+# --- Rutas para Cuentas por Pagar (Accounts Payable) ---
+
+@router.get("/payables/aging", response_model=AgingReport)
+async def payables_aging(
+    as_of: Optional[datetime] = Query(None, description=aging_service.AS_OF_DESCRIPTION),
+    supplier_id: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """
+    Retrieves open payables per supplier by age bucket (0-30, 31-60, 61-90, 90+ days).
+    """
+    try:
+        return await aging_service.get_aging("payables", as_of, supplier_id, skip=skip, limit=limit)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/payables/aging/export")
+async def export_payables_aging(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    as_of: Optional[datetime] = Query(None, description=aging_service.AS_OF_DESCRIPTION),
+):
+    """
+    Exports the payables aging report as a streamed CSV/XLSX file.
+    """
+    try:
+        return export_service.rows_response(
+            "antiguedad_cxp", aging_service.EXPORT_HEADERS,
+            aging_service.aging_batches("payables", as_of), file_format,
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# --- Rutas para Resúmenes de Compras (Purchase Rollups) ---
+
+@router.get("/rollups", response_model=RollupReport)
+async def purchase_rollups(
+    start: Optional[date] = Query(None, description="First day (default: 30 days ago)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: today)"),
+    group_by: str = Query("day", description="day, sku or supplier"),
+    sku: Optional[str] = None,
+    supplier_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """
+    Retrieves purchase totals by day, SKU or supplier from the daily rollups.
+    """
+    try:
+        end = end or date.today()
+        return await rollup_service.get_rollup(
+            "purchases", start or end - timedelta(days=30), end,
+            group_by="counterparty" if group_by == "supplier" else group_by,
+            sku=sku, counterparty_id=supplier_id, limit=limit,
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# --- Rutas para Reposición (Replenishment) ---
+
+@router.post("/replenishment/run", response_model=Job, status_code=202)
+async def run_replenishment(
+    history_days: Optional[int] = Query(None, description="Days of OUT movements to analyze"),
+    lead_time_days: Optional[float] = Query(None, description="Supplier lead time in days"),
+    review_days: Optional[float] = Query(None, description="Days until the next replenishment review"),
+    service_level: Optional[float] = Query(None, description="Target service level, e.g. 0.95"),
+    create_orders: bool = Query(True, description="Propose DRAFT purchase orders grouped by supplier"),
+):
+    """
+    Enqueues a `replenishment` job that computes reorder points for the whole catalog
+    from the movement history and replaces the previous results (and its unconfirmed
+    draft orders). Poll `/jobs/{job_id}`; the run is then at GET /replenishment/run.
+    """
+    try:
+        replenishment_service.resolve_parameters(history_days, lead_time_days, review_days, service_level)
+        return await job_service.enqueue("replenishment", {
+            "history_days": history_days, "lead_time_days": lead_time_days, "review_days": review_days,
+            "service_level": service_level, "create_orders": create_orders,
+        })
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/replenishment/run", response_model=ReplenishmentRun)
+async def get_replenishment_run():
+    """
+    Retrieves the latest replenishment run (parameters, totals and draft orders).
+    """
+    run = await replenishment_service.get_latest_run()
+    if not run:
+        raise HTTPException(status_code=404, detail="Replenishment has not been run yet")
+    return run
+
+@router.get("/replenishment/", response_model=PaginatedResponse[ReplenishmentItem])
+async def list_replenishment(
+    page: int = Query(1, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    needs_reorder: Optional[bool] = Query(True, description="Only SKUs at or below their reorder point"),
+    supplier_id: Optional[str] = None,
+    sku: Optional[str] = None,
+):
+    """
+    Retrieves the latest replenishment results, lowest days of cover first.
+    """
+    try:
+        result = await replenishment_service.get_replenishment(
+            skip=(page - 1) * limit, limit=limit, needs_reorder=needs_reorder, supplier_id=supplier_id, sku=sku
+        )
+        return json_response(result)
+    except NotFoundException:
+        raise HTTPException(status_code=404, detail="Replenishment has not been run yet")
+
+
 # --- Rutas para Notas de Débito (Debit Notes) ---
 
 @router.post("/invoices/{invoice_id}/debit-notes/", response_model=DebitNoteResponse)
@@ -102,7 +265,7 @@ async def create_debit_note_for_invoice(
     """
     try:
         debit_note = await purchasing_service.create_debit_note(invoice_id, debit_note_in)
-        response = DebitNoteResponse.parse_obj(debit_note.dict())
+        response = DebitNoteResponse.model_validate(debit_note.model_dump(by_alias=True))
         return response
     except NotFoundException as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -115,14 +278,36 @@ async def create_debit_note_for_invoice(
 async def list_debit_notes(
     page: int = 1,
     limit: int = 10,
-    search: Optional[str] = Query(None, description="Search by debit note number")
+    search: Optional[str] = Query(None, description="Search by debit note number"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
     """
     Retrieves a paginated list of debit notes.
     """
     try:
         skip = (page - 1) * limit
-        paginated_result = await purchasing_service.get_debit_notes(skip=skip, limit=limit, search=search)
-        return paginated_result
+        paginated_result = await purchasing_service.get_debit_notes(
+            skip=skip, limit=limit, search=search, fields=fields, view=view
+        )
+        return json_response(paginated_result)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+@router.get("/debit-notes/export")
+async def export_debit_notes(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    search: Optional[str] = Query(None),
+):
+    """
+    Exports debit notes as a streamed CSV/XLSX file.
+    """
+    try:
+        query = export_service.build_query(search, date=_date_range(date_from, date_to))
+        return export_service.export_response("debit_notes", query, file_format)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
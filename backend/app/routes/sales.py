@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Query, HTTPException
 from typing import List, Optional
+from datetime import datetime, date, timedelta
 from beanie import PydanticObjectId
 from app.services.sales_service import (
     get_sales_orders, 
@@ -11,8 +12,16 @@ from app.services.sales_service import (
     delete_customer,
     get_credit_notes
 )
-from app.schemas.sales_schemas import SalesOrderRead, SalesInvoiceRead, CustomerCreate, CustomerUpdate, CustomerRead, CreditNoteRead
-from app.schemas.common import PaginatedResponse
+from app.schemas.sales_schemas import (
+    SalesOrderRead, SalesInvoiceRead, CustomerCreate, CustomerUpdate, CustomerRead, CreditNoteRead,
+    SalesQuoteCreate, SalesQuoteRead, QuoteFillState,
+)
+from app.models.sales import QuoteStatus
+from app.schemas.common import PaginatedResponse, AgingReport, RollupReport
+from app.services import export_service, aging_service, rollup_service, backorder_service
+from app.exceptions.business_exceptions import ValidationException, NotFoundException
+from app.responses import json_response
+from app.services.projection_service import FIELDS_DESCRIPTION, VIEW_DESCRIPTION
 
 router = APIRouter()
 
@@ -28,9 +37,14 @@ async def add_customer(customer_data: CustomerCreate):
 async def list_customers(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
-    return await get_customers(skip=skip, limit=limit, search=search)
+    try:
+        return json_response(await get_customers(skip=skip, limit=limit, search=search, fields=fields, view=view))
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/customers/{customer_id}", response_model=CustomerRead)
 async def retrieve_customer(customer_id: str):
@@ -46,6 +60,55 @@ async def remove_customer(customer_id: str):
         raise HTTPException(status_code=404, detail="Customer not found")
     return {}
 
+# ================================================
+# ================ SALES QUOTES ==================
+# ================================================
+
+@router.post("/quotes/", response_model=SalesQuoteRead, status_code=201)
+async def add_sales_quote(quote_data: SalesQuoteCreate):
+    """Create a sales quote; its items wait as backorders for incoming stock."""
+    try:
+        return await backorder_service.create_quote(quote_data)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/quotes/", response_model=PaginatedResponse[SalesQuoteRead])
+async def list_sales_quotes(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    search: Optional[str] = Query(None),
+    status: Optional[QuoteStatus] = Query(None),
+):
+    """List sales quotes with pagination, search and an optional status filter."""
+    return json_response(await backorder_service.get_quotes(skip=skip, limit=limit, search=search, status=status))
+
+@router.get("/quotes/{quote_id}", response_model=SalesQuoteRead)
+async def retrieve_sales_quote(quote_id: str):
+    try:
+        return await backorder_service.get_quote(quote_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/quotes/{quote_id}/fill", response_model=QuoteFillState)
+async def retrieve_sales_quote_fill(quote_id: str):
+    """Fill state of a quote: filled and pending quantity per item, queue position and allocations."""
+    try:
+        return await backorder_service.get_quote_fill(quote_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/quotes/{quote_id}/cancel", response_model=SalesQuoteRead)
+async def cancel_sales_quote(quote_id: str):
+    """Cancel a quote and release its pending backorder lines."""
+    try:
+        return await backorder_service.cancel_quote(quote_id)
+    except NotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # ================================================
 # ================ SALES ORDERS ==================
 # ================================================
@@ -54,11 +117,16 @@ async def remove_customer(customer_id: str):
 async def list_sales_orders(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
-    """List sales orders with pagination and search."""
-    orders_response = await get_sales_orders(skip=skip, limit=limit, search=search)
-    return orders_response
+    """List sales orders with pagination and search (optionally only some `fields` or a `view`)."""
+    try:
+        orders_response = await get_sales_orders(skip=skip, limit=limit, search=search, fields=fields, view=view)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(orders_response)
 
 # ================================================
 # ================ SALES INVOICES ================
@@ -68,11 +136,92 @@ async def list_sales_orders(
 async def list_sales_invoices(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
 ):
-    """List sales invoices with pagination and search."""
-    invoices_response = await get_sales_invoices(skip=skip, limit=limit, search=search)
-    return invoices_response
+    """List sales invoices with pagination and search (optionally only some `fields` or a `view`)."""
+    try:
+        invoices_response = await get_sales_invoices(skip=skip, limit=limit, search=search, fields=fields, view=view)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(invoices_response)
+
+@router.get("/invoices/export")
+async def export_sales_invoices(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    search: Optional[str] = Query(None),
+    customer_id: Optional[str] = None,
+    payment_status: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    """Export sales invoices as a streamed CSV/XLSX file."""
+    try:
+        query = export_service.build_query(
+            search,
+            customer_id=customer_id,
+            payment_status=payment_status,
+            invoice_date=export_service.date_range(start, end),
+        )
+        return export_service.export_response("sales_invoices", query, file_format)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ================================================
+# ============ ACCOUNTS RECEIVABLE ===============
+# ================================================
+
+@router.get("/receivables/aging", response_model=AgingReport)
+async def receivables_aging(
+    as_of: Optional[datetime] = Query(None, description=aging_service.AS_OF_DESCRIPTION),
+    customer_id: Optional[str] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Open receivables per customer by age bucket (0-30, 31-60, 61-90, 90+ days)."""
+    try:
+        return await aging_service.get_aging("receivables", as_of, customer_id, skip=skip, limit=limit)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/receivables/aging/export")
+async def export_receivables_aging(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    as_of: Optional[datetime] = Query(None, description=aging_service.AS_OF_DESCRIPTION),
+):
+    """Export the receivables aging report as a streamed CSV/XLSX file."""
+    try:
+        return export_service.rows_response(
+            "antiguedad_cxc", aging_service.EXPORT_HEADERS,
+            aging_service.aging_batches("receivables", as_of), file_format,
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# ================================================
+# =============== SALES ROLLUPS ==================
+# ================================================
+
+@router.get("/rollups", response_model=RollupReport)
+async def sales_rollups(
+    start: Optional[date] = Query(None, description="First day (default: 30 days ago)"),
+    end: Optional[date] = Query(None, description="Last day, inclusive (default: today)"),
+    group_by: str = Query("day", description="day, sku or customer"),
+    sku: Optional[str] = None,
+    customer_id: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+):
+    """Sales totals by day, SKU or customer, read from the daily rollups."""
+    try:
+        end = end or date.today()
+        return await rollup_service.get_rollup(
+            "sales", start or end - timedelta(days=30), end,
+            group_by="counterparty" if group_by == "customer" else group_by,
+            sku=sku, counterparty_id=customer_id, limit=limit,
+        )
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 # ================================================
 # ================= CREDIT NOTES =================
@@ -82,8 +231,27 @@ async def list_sales_invoices(
 async def list_credit_notes(
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    search: Optional[str] = Query(None)
+    search: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
+):
+    """List credit notes with pagination and search (optionally only some `fields` or a `view`)."""
+    try:
+        credit_notes_response = await get_credit_notes(skip=skip, limit=limit, search=search, fields=fields, view=view)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response(credit_notes_response)
+
+@router.get("/credit-notes/export")
+async def export_credit_notes(
+    file_format: str = Query("csv", alias="format", description="csv o xlsx"),
+    search: Optional[str] = Query(None),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
 ):
-    """List credit notes with pagination and search."""
-    credit_notes_response = await get_credit_notes(skip=skip, limit=limit, search=search)
-    return credit_notes_response
+    """Export credit notes as a streamed CSV/XLSX file."""
+    try:
+        query = export_service.build_query(search, date=export_service.date_range(start, end))
+        return export_service.export_response("credit_notes", query, file_format)
+    except ValidationException as e:
+        raise HTTPException(status_code=400, detail=str(e))
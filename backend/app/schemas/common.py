@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Generic, TypeVar, Any
+from typing import List, Dict, Generic, TypeVar, Any, Optional
+from datetime import datetime
 
 T = TypeVar("T")
 
@@ -9,3 +10,54 @@ class PaginatedResponse(BaseModel, Generic[T]):
     page: int
     pages: int
     size: int
+
+class AgingBuckets(BaseModel):
+    """Saldos abiertos por antigüedad (días desde la fecha de la factura)."""
+    current: float = 0.0      # 0-30
+    days_31_60: float = 0.0
+    days_61_90: float = 0.0
+    over_90: float = 0.0
+    total: float = 0.0
+    invoices: int = 0
+
+class AgingRow(AgingBuckets):
+    counterparty_id: str
+    counterparty_name: Optional[str] = None
+    oldest_invoice_date: Optional[datetime] = None
+
+class AgingReport(BaseModel):
+    kind: str  # receivables | payables
+    as_of: datetime
+    counterparties: int
+    totals: AgingBuckets
+    items: List[AgingRow]
+
+class RollupRow(BaseModel):
+    key: str  # día (YYYY-MM-DD), SKU o id de la contraparte, según la agrupación
+    name: Optional[str] = None  # nombre de la contraparte al agrupar por ella
+    quantity: int = 0
+    amount: float = 0.0
+    returned_quantity: int = 0
+    returned_amount: float = 0.0
+    net_quantity: int = 0
+    net_amount: float = 0.0
+    lines: int = 0
+
+class RollupReport(BaseModel):
+    kind: str  # sales | purchases
+    group_by: str
+    start: datetime
+    end: datetime
+    totals: RollupRow
+    items: List[RollupRow]
+
+class JobCreate(BaseModel):
+    kind: str  # ver GET /api/v1/jobs/kinds
+    params: Dict[str, Any] = {}
+    priority: int = 0  # mayor se ejecuta primero
+    max_attempts: Optional[int] = None  # por defecto, el del tipo de job
+
+class JobKindInfo(BaseModel):
+    name: str
+    max_attempts: int
+    description: str = ""
@@ -1,6 +1,7 @@
 
 from pydantic import BaseModel, validator
-from typing import List, Optional
+from typing import Dict, List, Optional
+from datetime import datetime
 from app.models.inventory import Product, StockMovement
 
 class MeasurementFilter(BaseModel):
@@ -20,10 +21,28 @@ class TransferItem(BaseModel):
     quantity: int
 
 class TransferRequest(BaseModel):
+    source_warehouse_id: str = "SL01"
     target_warehouse_id: str
     items: List[TransferItem]
     notes: Optional[str] = None
 
+class ReceptionItem(BaseModel):
+    sku: str
+    quantity: int
+    unit_cost: Optional[float] = None
+
+class ReceptionRequest(BaseModel):
+    reference_document: str
+    warehouse_id: Optional[str] = None
+    items: List[ReceptionItem]
+    notes: Optional[str] = None
+
+class ReceptionResult(BaseModel):
+    reference_document: str
+    items_count: int
+    # Unidades asignadas a cotizaciones con backorder, por SKU (ver backorder_service).
+    allocated: Dict[str, int] = {}
+
 class PaginatedProducts(BaseModel):
     items: List[Product]
     total: int
@@ -39,4 +58,48 @@ class ProductCreate(Product):
 
 class PaginatedStockMovements(BaseModel):
     items: List[StockMovement]
-    total: int
+    # En modo cursor no se calcula el total; se devuelve `next_cursor` en su lugar.
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class ValuationItem(BaseModel):
+    sku: str
+    quantity: int
+    average_cost: float
+    value: float
+    last_entry_at: datetime
+
+class InventoryValuation(BaseModel):
+    as_of: datetime
+    skus: int
+    total_quantity: int
+    total_value: float
+    items: List[ValuationItem]
+
+class StockBalance(BaseModel):
+    sku: str
+    at: datetime
+    quantity: int
+    # Fin del checkpoint usado como base y movimientos sumados después de él.
+    checkpoint_end: Optional[datetime] = None
+    tail_movements: int
+
+class KardexRow(BaseModel):
+    period_start: datetime
+    opening_quantity: int
+    quantity_in: int
+    quantity_out: int
+    closing_quantity: int
+    movements_count: int
+    source: str
+
+class Kardex(BaseModel):
+    sku: str
+    period: str
+    start: datetime
+    end: datetime
+    opening_quantity: int
+    total_in: int
+    total_out: int
+    closing_quantity: int
+    rows: List[KardexRow]
@@ -41,6 +41,8 @@ class PurchaseOrder(BaseModel):
     items: List[OrderDetailSchema]
     status: OrderStatus
     total_amount: float
+    # Extended details for frontend
+    supplier_name: Optional[str] = None
 
     class Config:
         orm_mode = True
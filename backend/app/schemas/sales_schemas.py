@@ -2,7 +2,10 @@ from pydantic import BaseModel, Field
 from typing import List, Optional
 from datetime import datetime
 from beanie import PydanticObjectId
-from app.models.sales import CreditNoteReason, OrderStatus, PaymentStatus, CustomerBranch, CreditNoteItem as CreditNoteItemModel
+from app.models.sales import (
+    CreditNoteReason, OrderStatus, PaymentStatus, CustomerBranch, CreditNoteItem as CreditNoteItemModel,
+    QuoteStatus, SalesQuoteItem as SalesQuoteItemModel,
+)
 
 # ===============================================
 # ============= CUSTOMER SCHEMAS ================
@@ -57,6 +60,8 @@ class SalesOrderBase(BaseModel):
 class SalesOrderRead(SalesOrderBase):
     id: PydanticObjectId = Field(..., alias="_id")
     order_number: str
+    # Resolved from customer_id when listing
+    customer_name: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -80,6 +85,9 @@ class SalesInvoiceBase(BaseModel):
 class SalesInvoiceRead(SalesInvoiceBase):
     id: PydanticObjectId = Field(..., alias="_id")
     invoice_number: str
+    # Resolved from customer_id / order_id when listing
+    customer_name: Optional[str] = None
+    order_number: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -118,3 +126,63 @@ class CreditNoteRead(BaseModel):
         from_attributes = True
         populate_by_name = True
         json_encoders = {PydanticObjectId: str}
+
+# ===============================================
+# ============ SALES QUOTE SCHEMAS ==============
+# ===============================================
+
+class SalesQuoteItemCreate(BaseModel):
+    product_sku: str
+    quantity_requested: int
+    unit_price: float
+
+class SalesQuoteCreate(BaseModel):
+    customer_id: str
+    items: List[SalesQuoteItemCreate]
+    status: QuoteStatus = QuoteStatus.DRAFT
+    priority: int = 0
+    notes: Optional[str] = None
+
+class SalesQuoteRead(BaseModel):
+    id: PydanticObjectId = Field(..., alias="_id")
+    quote_number: str
+    customer_id: str
+    date: datetime
+    items: List[SalesQuoteItemModel]
+    status: QuoteStatus
+    priority: int
+    total_amount: float
+    notes: Optional[str] = None
+    # Resolved from customer_id when listing
+    customer_name: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+        populate_by_name = True
+        json_encoders = {PydanticObjectId: str}
+
+class QuoteFillLine(BaseModel):
+    line: int
+    product_sku: str
+    quantity_requested: int
+    quantity_filled: int
+    quantity_pending: int
+    # Open lines of other quotes served before this one in the SKU queue
+    lines_ahead: Optional[int] = None
+
+class QuoteAllocation(BaseModel):
+    line: int
+    sku: str
+    quantity: int
+    reference_document: str
+    created_at: datetime
+
+class QuoteFillState(BaseModel):
+    quote_id: str
+    quote_number: str
+    status: QuoteStatus
+    quantity_requested: int
+    quantity_filled: int
+    fill_ratio: float
+    lines: List[QuoteFillLine]
+    allocations: List[QuoteAllocation]
@@ -0,0 +1,238 @@
+"""
+Antigüedad de saldos de cuentas por cobrar (facturas de venta) y por pagar (facturas
+de compra), por contraparte y tramo: 0-30, 31-60, 61-90 y más de 90 días desde la
+fecha de la factura.
+
+El saldo abierto de una factura es `total_amount - amount_paid - credit_applied`
+(`debit_applied` en compras). Todo se calcula en una agregación: `$match` de las
+facturas PENDING/PARTIAL (índices parciales `open_invoices_by_*_pending` y
+`_partial`, que solo contienen facturas con saldo), saldo y días por factura, y
+`$group` por contraparte.
+
+Con `as_of` en el pasado el estado de pago actual no sirve (una factura pagada después
+ya no está PENDING): se leen todas las facturas emitidas hasta esa fecha y el saldo se
+reconstruye con los `payments` y las notas APPLIED fechados hasta `as_of` (las notas,
+como mucho por lo aplicado hoy). Es más lento y no usa los índices parciales.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+from beanie import Document
+
+from app.exceptions.business_exceptions import ValidationException
+from app.models.purchasing import Invoice
+from app.models.sales import SalesInvoice
+from app.schemas.common import AgingBuckets, AgingReport, AgingRow
+from app.services.export_service import format_cell
+from app.services.pagination_service import lookup_stages
+
+OPEN_STATUSES = ["PENDING", "PARTIAL"]
+MS_PER_DAY = 24 * 60 * 60 * 1000
+# Saldos menores se consideran pagados (redondeo de montos a 3 decimales).
+BALANCE_EPSILON = 0.001
+EXPORT_BATCH_SIZE = 1000
+AS_OF_DESCRIPTION = (
+    "Age balances as of this date (default: now). A past date rebuilds each balance "
+    "from the payments and applied notes dated up to then."
+)
+
+# (campo, límite inferior de días, límite superior) de cada tramo
+BUCKETS = [
+    ("current", None, 30),
+    ("days_31_60", 31, 60),
+    ("days_61_90", 61, 90),
+    ("over_90", 91, None),
+]
+AMOUNT_FIELDS = [name for name, _, _ in BUCKETS] + ["total"]
+
+EXPORT_HEADERS = [
+    "counterparty_id", "counterparty_name", "current", "days_31_60", "days_61_90",
+    "over_90", "total", "invoices", "oldest_invoice_date",
+]
+
+
+@dataclass
+class AgingKind:
+    model: Type[Document]
+    counterparty_field: str
+    applied_field: str
+    counterparty_collection: str
+    # Notas de crédito/débito: colección y campo con el id de la factura.
+    note_collection: str
+    note_invoice_field: str
+
+
+AGING_KINDS: Dict[str, AgingKind] = {
+    "receivables": AgingKind(SalesInvoice, "customer_id", "credit_applied", "customers",
+                             "sales_credit_notes", "sales_invoice_id"),
+    "payables": AgingKind(Invoice, "supplier_id", "debit_applied", "suppliers",
+                          "purchase_debit_notes", "purchase_invoice_id"),
+}
+
+
+def _kind(kind: str) -> AgingKind:
+    try:
+        return AGING_KINDS[kind]
+    except KeyError:
+        raise ValidationException(f"Tipo de antigüedad desconocido: {kind}")
+
+
+def _bucket_amount(low: Optional[int], high: Optional[int]) -> Dict[str, Any]:
+    conditions = []
+    if low is not None:
+        conditions.append({"$gte": ["$days", low]})
+    if high is not None:
+        conditions.append({"$lte": ["$days", high]})
+    return {"$cond": [{"$and": conditions}, "$balance", 0]}
+
+
+def _historical_stages(spec: AgingKind, match: Dict[str, Any], as_of: datetime):
+    """Facturas emitidas hasta `as_of` y lo pagado/aplicado hasta esa fecha."""
+    stages = [
+        {"$match": match},
+        {"$lookup": {
+            "from": spec.note_collection,
+            "let": {"invoice_id": {"$toString": "$_id"}},
+            "pipeline": [
+                {"$match": {
+                    "$expr": {"$eq": [f"${spec.note_invoice_field}", "$$invoice_id"]},
+                    "status": "APPLIED",
+                    "date": {"$lte": as_of},
+                }},
+                {"$group": {"_id": None, "amount": {"$sum": "$total_amount"}}},
+            ],
+            "as": "applied_notes",
+        }},
+    ]
+    paid = {"$sum": {"$map": {
+        "input": {"$filter": {
+            "input": {"$ifNull": ["$payments", []]}, "as": "p", "cond": {"$lte": ["$$p.date", as_of]},
+        }},
+        "as": "p",
+        "in": "$$p.amount",
+    }}}
+    applied = {"$min": [
+        {"$ifNull": [f"${spec.applied_field}", 0]},
+        {"$ifNull": [{"$arrayElemAt": ["$applied_notes.amount", 0]}, 0]},
+    ]}
+    return stages, paid, applied
+
+
+def resolve_as_of(as_of: Optional[datetime]) -> Tuple[datetime, bool]:
+    """Fecha del reporte (hora local, como las facturas) y si es pasada (saldo reconstruido)."""
+    now = datetime.now()
+    if as_of is None:
+        return now, False
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone().replace(tzinfo=None)
+    return as_of, as_of < now
+
+
+def aging_pipeline(kind: str, as_of: Optional[datetime], counterparty_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Saldo abierto por contraparte y tramo a la fecha `as_of` (un documento por
+    contraparte; por defecto ahora). Con `as_of` pasado, el saldo se reconstruye a esa fecha.
+    """
+    spec = _kind(kind)
+    as_of, historical = resolve_as_of(as_of)
+    match: Dict[str, Any] = {"invoice_date": {"$lte": as_of}}
+    if counterparty_id:
+        match[spec.counterparty_field] = counterparty_id
+
+    if historical:
+        stages, paid, applied = _historical_stages(spec, match, as_of)
+    else:
+        # Un `$or` por estado (no `$in`): cada rama coincide con el filtro de su índice
+        # parcial y el planificador puede usarlo.
+        stages = [{"$match": {"$or": [{**match, "payment_status": status} for status in OPEN_STATUSES]}}]
+        paid = {"$ifNull": ["$amount_paid", 0]}
+        applied = {"$ifNull": [f"${spec.applied_field}", 0]}
+
+    balance = {"$subtract": ["$total_amount", {"$add": [paid, applied]}]}
+    return stages + [
+        {"$project": {
+            "_id": 0,
+            "counterparty": f"${spec.counterparty_field}",
+            "invoice_date": 1,
+            "balance": balance,
+            "days": {"$floor": {"$divide": [{"$subtract": [as_of, "$invoice_date"]}, MS_PER_DAY]}},
+        }},
+        {"$match": {"balance": {"$gt": BALANCE_EPSILON}}},
+        {"$group": {
+            "_id": "$counterparty",
+            **{name: {"$sum": _bucket_amount(low, high)} for name, low, high in BUCKETS},
+            "total": {"$sum": "$balance"},
+            "invoices": {"$sum": 1},
+            "oldest_invoice_date": {"$min": "$invoice_date"},
+        }},
+        {"$set": {name: {"$round": [f"${name}", 3]} for name in AMOUNT_FIELDS}},
+    ]
+
+
+def _rows_stages(spec: AgingKind) -> List[Dict[str, Any]]:
+    """Nombre de la contraparte de cada fila (después del `$group`, una consulta por `_id`)."""
+    return lookup_stages("_id", spec.counterparty_collection, "name", "counterparty_name")
+
+
+def _row(doc: Dict[str, Any]) -> AgingRow:
+    return AgingRow(counterparty_id=str(doc.pop("_id")), **doc)
+
+
+async def get_aging(
+    kind: str,
+    as_of: Optional[datetime] = None,
+    counterparty_id: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 50,
+) -> AgingReport:
+    """
+    Reporte de antigüedad: totales por tramo de todas las contrapartes y el detalle
+    paginado (mayor saldo primero), en una sola agregación.
+    """
+    spec = _kind(kind)
+    items_pipeline: List[Dict[str, Any]] = [{"$sort": {"total": -1, "_id": 1}}, {"$skip": skip}]
+    if limit > 0:
+        items_pipeline.append({"$limit": limit})
+    pipeline = aging_pipeline(kind, as_of, counterparty_id) + [
+        {"$facet": {
+            "items": items_pipeline + _rows_stages(spec),
+            "totals": [{"$group": {
+                "_id": None,
+                **{name: {"$sum": f"${name}"} for name in AMOUNT_FIELDS},
+                "invoices": {"$sum": "$invoices"},
+                "counterparties": {"$sum": 1},
+            }}],
+        }},
+    ]
+    result = await spec.model.aggregate(pipeline).to_list()
+    facet = result[0] if result else {"items": [], "totals": []}
+    totals = facet["totals"][0] if facet["totals"] else {}
+    return AgingReport(
+        kind=kind,
+        as_of=resolve_as_of(as_of)[0],
+        counterparties=totals.get("counterparties", 0),
+        totals=AgingBuckets(
+            **{name: round(totals.get(name, 0.0), 3) for name in AMOUNT_FIELDS},
+            invoices=totals.get("invoices", 0),
+        ),
+        items=[_row(doc) for doc in facet["items"]],
+    )
+
+
+async def aging_batches(kind: str, as_of: Optional[datetime] = None) -> AsyncIterator[List[List[Any]]]:
+    """Filas del reporte completo para exportar, por lotes (cursor de la agregación)."""
+    spec = _kind(kind)
+    pipeline = aging_pipeline(kind, as_of) + [{"$sort": {"total": -1, "_id": 1}}] + _rows_stages(spec)
+    cursor = await spec.model.get_pymongo_collection().aggregate(
+        pipeline, allowDiskUse=True, batchSize=EXPORT_BATCH_SIZE
+    )
+    batch: List[List[Any]] = []
+    async for doc in cursor:
+        row = _row(doc).model_dump()
+        batch.append([format_cell(row[h]) for h in EXPORT_HEADERS])
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
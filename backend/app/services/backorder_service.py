@@ -0,0 +1,320 @@
+"""
+Cotizaciones de venta y asignación de backorders contra los ingresos de stock.
+
+Cada ítem de una cotización con cantidad pendiente es una `BackorderLine` en la cola
+de su SKU, indexada por (sku, prioridad desc, fecha, _id): el orden de atención es la
+prioridad de la cotización y, a igual prioridad, la más antigua primero.
+
+Cuando un ingreso (recepción de compra, `register_movement(IN)`) sube el stock,
+`allocate_incoming` reparte las cantidades ingresadas entre las líneas abiertas:
+
+- Una sola agregación sobre la cola trae, para todos los SKUs del ingreso, solo las
+  líneas que el ingreso puede alcanzar (suma acumulada con `$setWindowFields`), ya en
+  orden de atención; el reparto se calcula en memoria.
+- Las líneas surtidas por completo se eliminan y las parciales se decrementan con un
+  `bulk_write`; las cotizaciones suman `quantity_filled` por ítem con otro `bulk_write`
+  y su estado (PARTIALLY_FILLED / COMPLETED) se recalcula en un solo `update_many`.
+- Con transacciones todo se aplica en una; sin ellas (mongod standalone), cada línea se
+  reclama con un update condicional (`quantity_pending >= cantidad`) y, si otro ingreso
+  la tomó antes, se relee y se reintenta con lo que quede.
+
+Solo se asigna lo que entra: el stock existente al crear la cotización no se reserva.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import DeleteOne, UpdateOne, ReturnDocument
+
+from app.database import get_client, supports_transactions
+from app.exceptions.business_exceptions import NotFoundException, ValidationException
+from app.models.inventory import Product
+from app.models.sales import Customer, SalesQuote, SalesQuoteItem, QuoteStatus, BackorderLine, BackorderAllocation
+from app.schemas.common import PaginatedResponse
+from app.schemas.sales_schemas import (
+    SalesQuoteCreate, SalesQuoteRead, QuoteFillState, QuoteFillLine, QuoteAllocation,
+)
+from app.services.document_number_service import get_document_number
+from app.services.pagination_service import paginate, invalidate_cached_totals, lookup_stages
+from app.services.sales_service import get_customer_by_id
+from app.services.search_service import counterparty_search_filter
+
+QUEUE_SORT = [("sku", 1), ("priority", -1), ("quote_date", 1), ("_id", 1)]
+# Reintentos por línea en el camino sin transacciones cuando otro ingreso la tomó antes.
+CLAIM_RETRIES = 3
+
+# (línea de la cola, cantidad asignada)
+Fill = Tuple[dict, int]
+
+
+# ================================================
+# ================ COTIZACIONES ==================
+# ================================================
+
+async def create_quote(quote_data: SalesQuoteCreate) -> SalesQuote:
+    """Registra una cotización y encola sus ítems como backorder."""
+    if not quote_data.items:
+        raise ValidationException("La cotización debe tener al menos un ítem.")
+    if quote_data.status not in (QuoteStatus.DRAFT, QuoteStatus.SENT):
+        raise ValidationException("Una cotización nueva solo puede estar en borrador o enviada.")
+    for item in quote_data.items:
+        if item.quantity_requested <= 0:
+            raise ValidationException(f"La cantidad solicitada de {item.product_sku} debe ser mayor a cero.")
+
+    await get_customer_by_id(quote_data.customer_id)
+    skus = {item.product_sku for item in quote_data.items}
+    found = {
+        doc["sku"] async for doc in Product.get_pymongo_collection().find(
+            {"sku": {"$in": list(skus)}}, {"sku": 1, "_id": 0}
+        )
+    }
+    missing = sorted(skus - found)
+    if missing:
+        raise NotFoundException("Product", ", ".join(missing))
+
+    items = [
+        SalesQuoteItem(product_sku=i.product_sku, quantity_requested=i.quantity_requested, unit_price=i.unit_price)
+        for i in quote_data.items
+    ]
+    quote = SalesQuote(
+        quote_number=await get_document_number("sales_quote"),
+        customer_id=quote_data.customer_id,
+        items=items,
+        status=quote_data.status,
+        priority=quote_data.priority,
+        total_amount=sum(i.quantity_requested * i.unit_price for i in items),
+        notes=quote_data.notes,
+    )
+    await quote.insert()
+    await BackorderLine.insert_many([
+        BackorderLine(
+            sku=item.product_sku, quote_id=str(quote.id), quote_number=quote.quote_number, line=index,
+            priority=quote.priority, quote_date=quote.date, quantity_pending=item.quantity_requested,
+        )
+        for index, item in enumerate(items)
+    ])
+    invalidate_cached_totals(SalesQuote)
+    return quote
+
+
+async def get_quotes(
+    skip: int = 0, limit: int = 10, search: Optional[str] = None, status: Optional[QuoteStatus] = None,
+) -> PaginatedResponse[SalesQuoteRead]:
+    """Listado paginado de cotizaciones, con el nombre del cliente resuelto."""
+    query_conditions = []
+    score = None
+    search_query = await counterparty_search_filter(search, "customer_id", Customer)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
+    if status:
+        query_conditions.append({"status": status.value})
+
+    query = {"$and": query_conditions} if query_conditions else {}
+    return await paginate(
+        SalesQuote, query, [("date", -1)], skip=skip, limit=limit, score=score,
+        lookups=lookup_stages("customer_id", "customers", "name", "customer_name"), item_model=SalesQuoteRead,
+    )
+
+
+async def get_quote(quote_id: str) -> SalesQuote:
+    quote = await SalesQuote.get(PydanticObjectId(quote_id))
+    if not quote:
+        raise NotFoundException("SalesQuote", quote_id)
+    return quote
+
+
+async def cancel_quote(quote_id: str) -> SalesQuote:
+    """Anula la cotización y retira sus líneas pendientes de la cola."""
+    quote = await get_quote(quote_id)
+    if quote.status == QuoteStatus.COMPLETED:
+        raise ValidationException(f"La cotización {quote.quote_number} ya fue surtida por completo.")
+    if quote.status != QuoteStatus.CANCELLED:
+        quote.status = QuoteStatus.CANCELLED
+        await quote.save()
+        await BackorderLine.get_pymongo_collection().delete_many({"quote_id": quote_id})
+    return quote
+
+
+async def get_quote_fill(quote_id: str) -> QuoteFillState:
+    """
+    Estado de surtido de una cotización: por ítem, lo solicitado, lo asignado, lo
+    pendiente y cuántas líneas de otras cotizaciones se atienden antes en la cola del SKU.
+    """
+    quote = await get_quote(quote_id)
+    queue = BackorderLine.get_pymongo_collection()
+    open_lines = {doc["line"]: doc async for doc in queue.find({"quote_id": quote_id})}
+
+    lines = []
+    for index, item in enumerate(quote.items):
+        pending = max(item.quantity_requested - item.quantity_filled, 0)
+        ahead = None
+        open_line = open_lines.get(index)
+        if open_line is not None:
+            ahead = await queue.count_documents({"sku": open_line["sku"], "$or": [
+                {"priority": {"$gt": open_line["priority"]}},
+                {"priority": open_line["priority"], "quote_date": {"$lt": open_line["quote_date"]}},
+                {"priority": open_line["priority"], "quote_date": open_line["quote_date"], "_id": {"$lt": open_line["_id"]}},
+            ]})
+        lines.append(QuoteFillLine(
+            line=index, product_sku=item.product_sku, quantity_requested=item.quantity_requested,
+            quantity_filled=item.quantity_filled, quantity_pending=pending, lines_ahead=ahead,
+        ))
+
+    allocations = await BackorderAllocation.find(
+        BackorderAllocation.quote_id == quote_id
+    ).sort("created_at").to_list()
+    requested = sum(item.quantity_requested for item in quote.items)
+    filled = sum(min(item.quantity_filled, item.quantity_requested) for item in quote.items)
+    return QuoteFillState(
+        quote_id=quote_id, quote_number=quote.quote_number, status=quote.status,
+        quantity_requested=requested, quantity_filled=filled,
+        fill_ratio=round(filled / requested, 4) if requested else 0.0,
+        lines=lines,
+        allocations=[
+            QuoteAllocation(
+                line=a.line, sku=a.sku, quantity=a.quantity,
+                reference_document=a.reference_document, created_at=a.created_at,
+            )
+            for a in allocations
+        ],
+    )
+
+
+# ================================================
+# ================= ASIGNACIÓN ===================
+# ================================================
+
+def plan_fills(queue: List[dict], quantities: Dict[str, int]) -> List[Fill]:
+    """Reparte `quantities` por SKU entre las líneas de `queue` (ya en orden de atención)."""
+    remaining = dict(quantities)
+    fills: List[Fill] = []
+    for line in queue:
+        available = remaining.get(line["sku"], 0)
+        if available <= 0:
+            continue
+        take = min(available, line["quantity_pending"])
+        if take > 0:
+            fills.append((line, take))
+            remaining[line["sku"]] = available - take
+    return fills
+
+
+async def allocate_incoming(quantities: Dict[str, int], reference: str) -> Dict[str, int]:
+    """
+    Asigna las cantidades ingresadas por SKU a las cotizaciones pendientes.
+    Devuelve las unidades asignadas por SKU (los SKUs sin backorder no aparecen).
+    """
+    quantities = {sku: qty for sku, qty in quantities.items() if qty > 0}
+    if not quantities:
+        return {}
+
+    if await supports_transactions():
+        async with get_client().start_session() as session:
+            fills = await session.with_transaction(lambda s: _allocate_in_transaction(quantities, reference, s))
+    else:
+        fills = await _allocate_with_claims(quantities, reference)
+
+    allocated: Dict[str, int] = defaultdict(int)
+    for line, take in fills:
+        allocated[line["sku"]] += take
+    return dict(allocated)
+
+
+async def _load_queue(quantities: Dict[str, int], session=None) -> List[dict]:
+    """
+    Líneas abiertas de los SKUs del ingreso, en orden de atención. `ahead` (unidades
+    pendientes antes de la línea en su cola) descarta en el servidor las líneas que ya
+    no alcanzaría ningún ingreso; el corte exacto por SKU lo hace `plan_fills`.
+    """
+    pipeline = [
+        {"$match": {"sku": {"$in": list(quantities)}}},
+        {"$setWindowFields": {
+            "partitionBy": "$sku",
+            "sortBy": {"priority": -1, "quote_date": 1, "_id": 1},
+            "output": {"ahead": {"$sum": "$quantity_pending", "window": {"documents": ["unbounded", -1]}}},
+        }},
+        {"$match": {"ahead": {"$lt": max(quantities.values())}}},
+        {"$sort": dict(QUEUE_SORT)},
+        {"$project": {"ahead": 0}},
+    ]
+    cursor = await BackorderLine.get_pymongo_collection().aggregate(pipeline, session=session)
+    return await cursor.to_list(None)
+
+
+async def _allocate_in_transaction(quantities: Dict[str, int], reference: str, session) -> List[Fill]:
+    fills = plan_fills(await _load_queue(quantities, session), quantities)
+    if not fills:
+        return []
+    operations = [
+        DeleteOne({"_id": line["_id"]}) if take == line["quantity_pending"]
+        else UpdateOne({"_id": line["_id"]}, {"$inc": {"quantity_pending": -take}})
+        for line, take in fills
+    ]
+    await BackorderLine.get_pymongo_collection().bulk_write(operations, ordered=False, session=session)
+    await _record_fills(fills, reference, session)
+    return fills
+
+
+async def _allocate_with_claims(quantities: Dict[str, int], reference: str) -> List[Fill]:
+    collection = BackorderLine.get_pymongo_collection()
+    remaining = dict(quantities)
+    fills: List[Fill] = []
+    drained = []
+
+    for line in await _load_queue(quantities):
+        pending = line["quantity_pending"]
+        for _ in range(CLAIM_RETRIES):
+            take = min(remaining[line["sku"]], pending)
+            if take <= 0:
+                break
+            after = await collection.find_one_and_update(
+                {"_id": line["_id"], "quantity_pending": {"$gte": take}},
+                {"$inc": {"quantity_pending": -take}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if after is not None:
+                fills.append((line, take))
+                remaining[line["sku"]] -= take
+                if after["quantity_pending"] <= 0:
+                    drained.append(line["_id"])
+                break
+            # Otro ingreso tomó parte (o toda) la línea: se relee lo que quede.
+            current = await collection.find_one({"_id": line["_id"]}, {"quantity_pending": 1})
+            pending = current["quantity_pending"] if current else 0
+
+    if drained:
+        await collection.delete_many({"_id": {"$in": drained}, "quantity_pending": {"$lte": 0}})
+    if fills:
+        await _record_fills(fills, reference)
+    return fills
+
+
+async def _record_fills(fills: List[Fill], reference: str, session=None) -> None:
+    """Suma lo asignado a cada ítem de las cotizaciones, recalcula su estado y deja el registro."""
+    quote_ids = list({PydanticObjectId(line["quote_id"]) for line, _ in fills})
+    await SalesQuote.get_pymongo_collection().bulk_write([
+        UpdateOne({"_id": PydanticObjectId(line["quote_id"])}, {"$inc": {f"items.{line['line']}.quantity_filled": take}})
+        for line, take in fills
+    ], ordered=False, session=session)
+    await SalesQuote.get_pymongo_collection().update_many(
+        {"_id": {"$in": quote_ids}, "status": {"$ne": QuoteStatus.CANCELLED.value}},
+        [{"$set": {"status": {"$cond": [
+            {"$allElementsTrue": [{"$map": {
+                "input": "$items", "as": "item",
+                "in": {"$gte": ["$$item.quantity_filled", "$$item.quantity_requested"]},
+            }}]},
+            QuoteStatus.COMPLETED.value,
+            QuoteStatus.PARTIALLY_FILLED.value,
+        ]}}}],
+        session=session,
+    )
+    now = datetime.now()
+    await BackorderAllocation.get_pymongo_collection().insert_many([
+        {
+            "quote_id": line["quote_id"], "quote_number": line["quote_number"], "line": line["line"],
+            "sku": line["sku"], "quantity": take, "reference_document": reference, "created_at": now,
+        }
+        for line, take in fills
+    ], session=session)
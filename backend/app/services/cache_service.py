@@ -0,0 +1,266 @@
+"""
+Caché de lectura (read-through) para las lecturas frecuentes del catálogo:
+producto por SKU, almacenes, categorías y clientes.
+
+Backends (CACHE_BACKEND):
+- "memory": LRU + TTL dentro del proceso. Guarda los objetos y entrega copias, así
+  quien modifique el resultado no altera la caché.
+- "redis": caché compartida entre procesos (requiere el paquete `redis`). Guarda JSON.
+- "local": sustituto local del backend compartido, con su mismo contrato (valores
+  serializados y TTL) pero en memoria; para desarrollo y pruebas sin Redis.
+- "off": sin caché.
+
+Las escrituras invalidan sus claves (`cache.invalidate`). Con el backend "memory" y
+varios procesos, la invalidación es local y el TTL acota cuánto puede durar un dato
+desactualizado en los demás procesos; para ese despliegue conviene "redis".
+"""
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from app.config import CACHE_BACKEND, CACHE_URL, CACHE_TTL, CACHE_MAX_ENTRIES
+
+# Espacios de nombres de las claves
+CACHE_PRODUCT = "product"
+CACHE_WAREHOUSES = "warehouses"
+CACHE_CATEGORIES = "categories"
+CACHE_CUSTOMER = "customer"
+
+
+class MemoryCacheBackend:
+    """LRU + TTL en el proceso."""
+    name = "memory"
+    serializes = False
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    async def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, copy.deepcopy(value))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class LocalSharedCacheBackend:
+    """
+    Sustituto local del backend compartido: valores serializados (bytes) con TTL,
+    igual que en Redis, para ejercitar la misma ruta de serialización sin servidor.
+    """
+    name = "local"
+    serializes = True
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return entry[1]
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    def size(self) -> Optional[int]:
+        return len(self._entries)
+
+
+class RedisCacheBackend:
+    """Caché compartida entre procesos sobre Redis."""
+    name = "redis"
+    serializes = True
+
+    def __init__(self, url: str, prefix: str = "erp:cache:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND=redis requiere el paquete 'redis' (pip install redis).")
+        self._redis = redis.from_url(url)
+        self._prefix = prefix
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self._prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self._redis.set(self._prefix + key, value, ex=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._redis.delete(*(self._prefix + key for key in keys))
+
+    async def clear(self) -> None:
+        async for key in self._redis.scan_iter(match=self._prefix + "*"):
+            await self._redis.delete(key)
+
+    def size(self) -> Optional[int]:
+        return None
+
+
+class NullCacheBackend:
+    name = "off"
+    serializes = False
+
+    async def get(self, key: str) -> Any:
+        return None
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        pass
+
+    async def delete(self, *keys: str) -> None:
+        pass
+
+    async def clear(self) -> None:
+        pass
+
+    def size(self) -> Optional[int]:
+        return 0
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, list):
+        return json.dumps({"many": True, "items": [v.model_dump(mode="json") for v in value]}).encode()
+    return json.dumps({"many": False, "items": [value.model_dump(mode="json")]}).encode()
+
+
+def _decode(raw: bytes, model: Type[BaseModel]) -> Any:
+    data = json.loads(raw)
+    items = [model.model_validate(item) for item in data["items"]]
+    return items if data["many"] else items[0]
+
+
+class Cache:
+    def __init__(self, backend, default_ttl: int = 30):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"hits": 0, "misses": 0, "invalidations": 0})
+        # Generación por clave: una carga que empezó antes de una invalidación no
+        # vuelve a guardar el valor anterior. Solo hay entradas para las claves con
+        # cargas en curso (`_loading`), así el mapa no crece con cada clave consultada.
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[str, int] = {}
+
+    async def get_or_load(
+        self,
+        namespace: str,
+        key: Any,
+        loader: Callable[[], Awaitable[Any]],
+        model: Type[BaseModel],
+        ttl: Optional[int] = None,
+    ) -> Any:
+        """
+        Devuelve el valor en caché o lo carga con `loader` y lo guarda. Los resultados
+        None (no encontrado) no se guardan. Un fallo del backend equivale a un miss.
+        """
+        full_key = f"{namespace}:{key}"
+        stats = self._stats[namespace]
+        try:
+            cached = await self.backend.get(full_key)
+        except Exception:
+            logging.warning("Fallo al leer la caché (%s)", full_key, exc_info=True)
+            cached = None
+        if cached is not None:
+            stats["hits"] += 1
+            return _decode(cached, model) if self.backend.serializes else cached
+
+        stats["misses"] += 1
+        generation = self._generations.get(full_key, 0)
+        self._loading[full_key] = self._loading.get(full_key, 0) + 1
+        try:
+            value = await loader()
+            if value is not None and generation == self._generations.get(full_key, 0):
+                try:
+                    stored = _encode(value) if self.backend.serializes else value
+                    await self.backend.set(full_key, stored, ttl or self.default_ttl)
+                except Exception:
+                    logging.warning("Fallo al escribir la caché (%s)", full_key, exc_info=True)
+        finally:
+            self._loading[full_key] -= 1
+            if not self._loading[full_key]:
+                del self._loading[full_key]
+                self._generations.pop(full_key, None)
+        return value
+
+    def _bump(self, full_key: str) -> None:
+        # Sin cargas en curso no hay nada que descartar.
+        if full_key in self._loading:
+            self._generations[full_key] = self._generations.get(full_key, 0) + 1
+
+    async def invalidate(self, namespace: str, *keys: Any) -> None:
+        full_keys = [f"{namespace}:{key}" for key in keys]
+        for full_key in full_keys:
+            self._bump(full_key)
+        self._stats[namespace]["invalidations"] += len(full_keys)
+        try:
+            await self.backend.delete(*full_keys)
+        except Exception:
+            logging.warning("Fallo al invalidar la caché (%s)", ", ".join(full_keys), exc_info=True)
+
+    async def clear(self) -> None:
+        for full_key in list(self._loading):
+            self._bump(full_key)
+        await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        namespaces = {}
+        for namespace, s in self._stats.items():
+            lookups = s["hits"] + s["misses"]
+            namespaces[namespace] = {**s, "hit_rate": round(s["hits"] / lookups, 4) if lookups else 0.0}
+        return {
+            "backend": self.backend.name,
+            "entries": self.backend.size(),
+            "evictions": getattr(self.backend, "evictions", 0),
+            "namespaces": namespaces,
+        }
+
+
+def build_backend(name: str):
+    if name == "memory":
+        return MemoryCacheBackend(CACHE_MAX_ENTRIES)
+    if name == "local":
+        return LocalSharedCacheBackend()
+    if name == "redis":
+        return RedisCacheBackend(CACHE_URL)
+    if name == "off":
+        return NullCacheBackend()
+    raise ValueError(f"CACHE_BACKEND desconocido: {name}")
+
+
+cache = Cache(build_backend(CACHE_BACKEND), CACHE_TTL)
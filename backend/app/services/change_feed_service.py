@@ -0,0 +1,334 @@
+"""
+Feed de cambios en tiempo real (change streams de MongoDB → Server-Sent Events).
+
+En lugar de que cada cliente vuelva a pedir páginas completas para ver datos frescos,
+el servidor sigue un change stream por tópico (`products`, `stock_movements`,
+`sales_invoices`, `purchase_invoices`) y reparte deltas compactos a los clientes
+suscritos, que parchean su estado:
+
+- Un solo change stream por tópico y proceso, sin importar cuántos clientes haya. Se
+  abre con el primer suscriptor y se mantiene hasta el cierre de la aplicación; si se
+  corta, se reanuda con su resume token (y si el oplog ya no lo tiene, se reabre desde
+  el momento actual y se avisa a los clientes con un evento `reset`).
+- Cada delta lleva solo los campos del tópico que se muestran en los listados: en los
+  updates, los `updatedFields` de esos campos (un update que solo toca otros campos,
+  p. ej. `search_tokens`, no genera evento).
+- El id de cada evento es el `clusterTime` de la operación (`segundos.incremento`),
+  ordenado en todo el replica set. Cada tópico guarda los últimos CHANGE_FEED_BUFFER
+  eventos: al reconectar con `Last-Event-ID`, el cliente recibe lo que se perdió (los
+  eventos con el mismo clusterTime se repiten: la entrega es al menos una vez y los
+  deltas son idempotentes) o un `reset` si el hueco es más antiguo que el buffer.
+- Contrapresión: cada suscriptor tiene una cola acotada (CHANGE_FEED_QUEUE_SIZE). Un
+  cliente que no la vacía a tiempo se desconecta en lugar de frenar el feed o acumular
+  memoria; EventSource reconecta solo y se pone al día desde el buffer.
+
+Los change streams requieren un replica set (Atlas lo es). En desarrollo basta un
+replica set de un solo nodo (ver CONFIGURACION_ENTORNOS.md).
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from bson import ObjectId, Timestamp
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import MONGO_DB_NAME, CHANGE_FEED_BUFFER, CHANGE_FEED_QUEUE_SIZE, CHANGE_FEED_MAX_SUBSCRIBERS
+from app.database import get_client, supports_transactions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Topic:
+    collection: str
+    # Campos incluidos en los deltas (lo que muestran los listados del frontend).
+    fields: Tuple[str, ...]
+
+
+TOPICS: Dict[str, Topic] = {
+    "products": Topic("products", (
+        "sku", "name", "brand", "category_id", "image_url", "price", "cost", "stock_current",
+    )),
+    "stock_movements": Topic("stock_movements", (
+        "product_sku", "movement_type", "quantity", "stock_change", "warehouse_id", "target_warehouse_id",
+        "unit_cost", "reference_document", "created_at",
+    )),
+    "sales_invoices": Topic("sales_invoices", (
+        "invoice_number", "order_id", "customer_id", "invoice_date", "total_amount", "payment_status",
+        "amount_paid", "dispatch_status", "credit_applied",
+    )),
+    "purchase_invoices": Topic("purchase_invoices", (
+        "invoice_number", "order_id", "supplier_id", "invoice_date", "total_amount", "payment_status",
+        "amount_paid", "reception_status", "debit_applied",
+    )),
+}
+
+# Códigos de error de un resume token que el oplog ya no tiene.
+HISTORY_LOST_CODES = {136, 280, 286}
+RETRY_DELAY_SECONDS = (1, 2, 5, 10, 30)
+# Espera máxima a que el change stream de un tópico quede abierto al suscribirse.
+OPEN_TIMEOUT_SECONDS = 10
+
+EventKey = Tuple[int, int]
+
+
+class ChangeFeedUnavailable(Exception):
+    """El feed no puede atender la suscripción (mongod standalone sin change streams, límite de clientes)."""
+
+
+@dataclass
+class ChangeEvent:
+    topic: str
+    key: EventKey
+    data: Dict[str, Any]
+    kind: str = "change"
+
+    @property
+    def id(self) -> str:
+        return format_key(self.key)
+
+    def encode(self) -> str:
+        """Formato de texto de Server-Sent Events."""
+        payload = json.dumps(self.data, default=_json_default, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {payload}\n\n"
+
+
+@dataclass(eq=False)
+class Subscription:
+    topics: Set[str]
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(CHANGE_FEED_QUEUE_SIZE))
+    # Se marca cuando la cola se llena: el stream se cierra y el cliente reconecta.
+    overflowed: bool = False
+
+
+def _end(subscription: Subscription) -> None:
+    """Descarta lo pendiente y encola el fin del stream (None)."""
+    while not subscription.queue.empty():
+        subscription.queue.get_nowait()
+    subscription.queue.put_nowait(None)
+
+
+def format_key(key: EventKey) -> str:
+    return f"{key[0]}.{key[1]}"
+
+
+def parse_key(value: Optional[str]) -> Optional[EventKey]:
+    if not value:
+        return None
+    try:
+        seconds, increment = value.split(".", 1)
+        return int(seconds), int(increment)
+    except ValueError:
+        return None
+
+
+def _key_of(timestamp: Timestamp) -> EventKey:
+    return timestamp.time, timestamp.inc
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Tipo no serializable en el feed de cambios: {type(value).__name__}")
+
+
+def build_delta(topic: str, change: dict) -> Optional[Dict[str, Any]]:
+    """Delta compacto de un evento del change stream, o None si no toca campos del tópico."""
+    fields = TOPICS[topic].fields
+    operation = change["operationType"]
+    delta: Dict[str, Any] = {"topic": topic, "op": operation, "id": str(change["documentKey"]["_id"])}
+    if operation in ("insert", "replace"):
+        document = change.get("fullDocument") or {}
+        delta["doc"] = {name: document.get(name) for name in fields}
+    elif operation == "update":
+        description = change.get("updateDescription") or {}
+        changes = {
+            path: value for path, value in (description.get("updatedFields") or {}).items()
+            if path.split(".", 1)[0] in fields
+        }
+        removed = [path for path in description.get("removedFields") or [] if path.split(".", 1)[0] in fields]
+        if not changes and not removed:
+            return None
+        delta["set"] = changes
+        if removed:
+            delta["unset"] = removed
+    return delta
+
+
+def _pipeline(topic: str) -> List[dict]:
+    projection = {"operationType": 1, "documentKey": 1, "clusterTime": 1, "updateDescription": 1}
+    projection.update({f"fullDocument.{name}": 1 for name in TOPICS[topic].fields})
+    return [
+        {"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}},
+        {"$project": projection},
+    ]
+
+
+class ChangeFeed:
+    def __init__(self, buffer_size: int = CHANGE_FEED_BUFFER):
+        self.buffer_size = buffer_size
+        self._subscriptions: Set[Subscription] = set()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._buffers: Dict[str, Deque[ChangeEvent]] = {name: deque() for name in TOPICS}
+        # El buffer de cada tópico tiene todos los eventos posteriores a este clusterTime.
+        self._covered_from: Dict[str, EventKey] = {}
+        self._ready: Dict[str, asyncio.Event] = {name: asyncio.Event() for name in TOPICS}
+        self.delivered = 0
+        self.disconnected_slow = 0
+
+    # --- Suscripciones ---
+
+    async def subscribe(self, topics: Iterable[str], last_event_id: Optional[str] = None) -> Subscription:
+        if not await supports_transactions():
+            raise ChangeFeedUnavailable("El feed de cambios requiere un replica set de MongoDB.")
+        if len(self._subscriptions) >= CHANGE_FEED_MAX_SUBSCRIBERS:
+            raise ChangeFeedUnavailable("Se alcanzó el máximo de suscriptores del feed de cambios.")
+
+        subscription = Subscription(set(topics))
+        for topic in subscription.topics:
+            self._ensure_watcher(topic)
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(self._ready[topic].wait() for topic in subscription.topics)), OPEN_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            raise ChangeFeedUnavailable("No se pudo abrir el change stream; reintente más tarde.")
+
+        # Se registra antes de copiar el buffer: un evento publicado entre ambos pasos
+        # puede llegar dos veces, pero no perderse.
+        self._subscriptions.add(subscription)
+        last_key = parse_key(last_event_id)
+        if last_key is not None:
+            for event in self._replay(subscription.topics, last_key):
+                self._offer(subscription, event)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    def _replay(self, topics: Set[str], last_key: EventKey) -> List[ChangeEvent]:
+        events = []
+        for topic in topics:
+            # El buffer tiene todos los eventos posteriores a `covered_from`; con un id
+            # igual o anterior pudieron perderse eventos de ese mismo clusterTime.
+            if last_key <= self._covered_from[topic]:
+                events.append(self._reset_event(topic, "El historial del feed no cubre la reconexión."))
+                continue
+            events.extend(event for event in self._buffers[topic] if event.key >= last_key)
+        return sorted(events, key=lambda event: event.key)
+
+    def _offer(self, subscription: Subscription, event: ChangeEvent) -> None:
+        if subscription.overflowed:
+            return
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta lo pendiente y se cierra su stream.
+            subscription.overflowed = True
+            self.disconnected_slow += 1
+            _end(subscription)
+
+    def _publish(self, event: ChangeEvent) -> None:
+        if event.kind == "change":
+            buffer = self._buffers[event.topic]
+            buffer.append(event)
+            if len(buffer) > self.buffer_size:
+                self._covered_from[event.topic] = buffer.popleft().key
+        for subscription in list(self._subscriptions):
+            if event.topic in subscription.topics:
+                self._offer(subscription, event)
+                self.delivered += 1
+
+    def _reset_event(self, topic: str, reason: str) -> ChangeEvent:
+        key = self._buffers[topic][-1].key if self._buffers[topic] else self._covered_from.get(topic, (0, 0))
+        return ChangeEvent(topic, key, {"topic": topic, "reason": reason}, kind="reset")
+
+    # --- Change streams ---
+
+    def _ensure_watcher(self, topic: str) -> None:
+        task = self._tasks.get(topic)
+        if task is None or task.done():
+            # Contexto vacío: los comandos del change stream no se atribuyen a la
+            # solicitud que abrió el primer suscriptor (ver metrics_service).
+            self._tasks[topic] = asyncio.create_task(
+                self._watch(topic), name=f"change-feed-{topic}", context=contextvars.Context()
+            )
+
+    async def _operation_time(self) -> Timestamp:
+        response = await get_client().admin.command("ping")
+        return response["operationTime"]
+
+    async def _watch(self, topic: str) -> None:
+        collection = get_client()[MONGO_DB_NAME][TOPICS[topic].collection]
+        resume_token = None
+        start_at = await self._operation_time()
+        self._covered_from[topic] = _key_of(start_at)
+        attempt = 0
+
+        while True:
+            options = {"resume_after": resume_token} if resume_token else {"start_at_operation_time": start_at}
+            try:
+                async with await collection.watch(_pipeline(topic), **options) as stream:
+                    self._ready[topic].set()
+                    attempt = 0
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        delta = build_delta(topic, change)
+                        if delta is not None:
+                            self._publish(ChangeEvent(topic, _key_of(change["clusterTime"]), delta))
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code not in HISTORY_LOST_CODES:
+                    logger.warning("Change stream de %s interrumpido: %s", topic, e)
+                else:
+                    # El oplog ya rotó: se reabre desde ahora y los clientes recargan.
+                    logger.warning("Change stream de %s sin historial para reanudar; se reinicia", topic)
+                    resume_token = None
+                    start_at = await self._operation_time()
+                    self._buffers[topic].clear()
+                    self._covered_from[topic] = _key_of(start_at)
+                    self._publish(self._reset_event(topic, "El feed se reinició en el servidor."))
+            except PyMongoError as e:
+                logger.warning("Change stream de %s interrumpido: %s", topic, e)
+            await asyncio.sleep(RETRY_DELAY_SECONDS[min(attempt, len(RETRY_DELAY_SECONDS) - 1)])
+            attempt += 1
+
+    async def close(self) -> None:
+        """Detiene los change streams y cierra los streams de los clientes."""
+        for subscription in list(self._subscriptions):
+            _end(subscription)
+        self._subscriptions.clear()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        for ready in self._ready.values():
+            ready.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "delivered": self.delivered,
+            "disconnected_slow": self.disconnected_slow,
+            "topics": {
+                name: {
+                    "watching": name in self._tasks and not self._tasks[name].done(),
+                    "buffered": len(self._buffers[name]),
+                    "covered_from": format_key(self._covered_from[name]) if name in self._covered_from else None,
+                    "last_event_id": self._buffers[name][-1].id if self._buffers[name] else None,
+                }
+                for name in TOPICS
+            },
+        }
+
+
+feed = ChangeFeed()
@@ -0,0 +1,348 @@
+"""
+Checkpoints de saldos de stock por SKU (kardex materializado).
+
+Un checkpoint guarda, por SKU y periodo cerrado (día o mes) con movimientos, la
+apertura, los ingresos, las salidas y el cierre, calculados desde `StockMovement`.
+Con ellos:
+
+- El saldo a una fecha es el cierre del último checkpoint anterior más los
+  movimientos posteriores (a lo sumo los de los periodos aún no materializados).
+- Un kardex por periodos lee los checkpoints del rango y solo agrega movimientos en
+  los extremos parciales o no materializados.
+
+Los checkpoints los actualiza un job de fondo (`run_checkpoint_job`) de forma
+incremental; `manage_checkpoints.py` los reconstruye y verifica su consistencia.
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.config import STOCK_CHECKPOINT_PERIOD
+from app.models.inventory import Product, StockMovement, StockCheckpoint, CheckpointPeriod
+from app.services.stock_service import INBOUND_TYPES, OUTBOUND_TYPES
+from app.exceptions.business_exceptions import ValidationException
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ISSUES = 100
+
+# Variación del stock total de un movimiento: `stock_change` si lo registró el motor de
+# stock; en movimientos anteriores se deduce del tipo. Los ADJUSTMENT antiguos guardaban
+# la cantidad sin signo y cuentan 0 (check_checkpoints los reporta como diferencias).
+STOCK_CHANGE_EXPR = {"$ifNull": ["$stock_change", {"$switch": {
+    "branches": [
+        {"case": {"$in": ["$movement_type", [t.value for t in INBOUND_TYPES]]}, "then": "$quantity"},
+        {"case": {"$in": ["$movement_type", [t.value for t in OUTBOUND_TYPES]]}, "then": {"$multiply": ["$quantity", -1]}},
+    ],
+    "default": 0,
+}}]}
+
+
+def _period(period) -> CheckpointPeriod:
+    try:
+        return CheckpointPeriod(period)
+    except ValueError:
+        raise ValidationException(f"Periodo de checkpoint inválido: {period}")
+
+
+def period_start(at: datetime, period: CheckpointPeriod) -> datetime:
+    if period == CheckpointPeriod.MONTH:
+        return datetime(at.year, at.month, 1)
+    return datetime(at.year, at.month, at.day)
+
+
+def next_period(start: datetime, period: CheckpointPeriod) -> datetime:
+    if period == CheckpointPeriod.MONTH:
+        return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+
+def _movement_totals_pipeline(match: Dict[str, Any], period: CheckpointPeriod) -> List[Dict[str, Any]]:
+    """Ingresos/salidas por (sku, periodo), ordenados por SKU y fecha."""
+    unit = "month" if period == CheckpointPeriod.MONTH else "day"
+    return [
+        {"$match": match},
+        {"$set": {"_change": STOCK_CHANGE_EXPR}},
+        {"$group": {
+            "_id": {"sku": "$product_sku", "start": {"$dateTrunc": {"date": "$created_at", "unit": unit}}},
+            "quantity_in": {"$sum": {"$cond": [{"$gt": ["$_change", 0]}, "$_change", 0]}},
+            "quantity_out": {"$sum": {"$cond": [{"$lt": ["$_change", 0]}, {"$multiply": ["$_change", -1]}, 0]}},
+            "movements_count": {"$sum": 1},
+        }},
+        {"$sort": {"_id.sku": 1, "_id.start": 1}},
+    ]
+
+
+async def get_watermark(period) -> Optional[datetime]:
+    """
+    Fin del último periodo materializado. Los periodos sin movimientos no generan
+    checkpoint, pero tampoco tienen movimientos que agregar, así que el máximo
+    `period_end` es un límite válido de "materializado hasta".
+    """
+    latest = await StockCheckpoint.find(
+        {"period": _period(period).value}
+    ).sort([("period_end", -1)]).first_or_none()
+    return latest.period_end if latest else None
+
+
+async def _closings_before(period: CheckpointPeriod, before: datetime) -> Dict[str, int]:
+    pipeline = [
+        {"$match": {"period": period.value, "period_end": {"$lte": before}}},
+        {"$sort": {"sku": 1, "period_start": -1}},
+        {"$group": {"_id": "$sku", "closing": {"$first": "$closing_quantity"}}},
+    ]
+    cursor = await StockCheckpoint.get_pymongo_collection().aggregate(pipeline, allowDiskUse=True)
+    return {row["_id"]: row["closing"] async for row in cursor}
+
+
+async def build_checkpoints(period, since: Optional[datetime] = None) -> int:
+    """
+    Materializa los checkpoints de los periodos cerrados desde `since` (inicio de un
+    periodo) o desde el primer movimiento. La apertura de cada SKU es el cierre de su
+    último checkpoint anterior a `since`. Es idempotente (upsert por sku/periodo).
+    """
+    period = _period(period)
+    until = period_start(datetime.now(), period)
+    match: Dict[str, Any] = {"created_at": {"$lt": until}}
+    openings: Dict[str, int] = {}
+    if since is not None:
+        match["created_at"]["$gte"] = since
+        openings = await _closings_before(period, since)
+
+    collection = StockCheckpoint.get_pymongo_collection()
+    cursor = await StockMovement.get_pymongo_collection().aggregate(
+        _movement_totals_pipeline(match, period), allowDiskUse=True
+    )
+    now = datetime.now()
+    operations: List[UpdateOne] = []
+    written = 0
+    current_sku, balance = None, 0
+    async for row in cursor:
+        sku, start = row["_id"]["sku"], row["_id"]["start"]
+        if sku != current_sku:
+            current_sku, balance = sku, openings.get(sku, 0)
+        closing = balance + row["quantity_in"] - row["quantity_out"]
+        operations.append(UpdateOne(
+            {"sku": sku, "period": period.value, "period_start": start},
+            {"$set": {
+                "period_end": next_period(start, period),
+                "opening_quantity": balance,
+                "quantity_in": row["quantity_in"],
+                "quantity_out": row["quantity_out"],
+                "closing_quantity": closing,
+                "movements_count": row["movements_count"],
+                "built_at": now,
+            }},
+            upsert=True,
+        ))
+        balance = closing
+        if len(operations) >= BATCH_SIZE:
+            await collection.bulk_write(operations, ordered=False)
+            written += len(operations)
+            operations = []
+    if operations:
+        await collection.bulk_write(operations, ordered=False)
+        written += len(operations)
+    return written
+
+
+async def refresh_checkpoints(period) -> int:
+    """Actualización incremental: rehace desde el último periodo materializado."""
+    return await build_checkpoints(period, since=await get_watermark(period))
+
+
+async def rebuild_checkpoints(period) -> int:
+    """Reconstrucción completa (p. ej. tras importar movimientos con fecha pasada)."""
+    period = _period(period)
+    await StockCheckpoint.get_pymongo_collection().delete_many({"period": period.value})
+    return await build_checkpoints(period)
+
+
+async def _sum_changes(sku: str, start: Optional[datetime], end: datetime, inclusive: bool) -> Tuple[int, int]:
+    created_at: Dict[str, Any] = {"$lte" if inclusive else "$lt": end}
+    if start is not None:
+        created_at["$gte"] = start
+    cursor = await StockMovement.get_pymongo_collection().aggregate([
+        {"$match": {"product_sku": sku, "created_at": created_at}},
+        {"$group": {"_id": None, "change": {"$sum": STOCK_CHANGE_EXPR}, "count": {"$sum": 1}}},
+    ])
+    rows = await cursor.to_list(None)
+    return (rows[0]["change"], rows[0]["count"]) if rows else (0, 0)
+
+
+async def _balance(sku: str, at: datetime, period: CheckpointPeriod, inclusive: bool) -> Dict[str, Any]:
+    checkpoint = await StockCheckpoint.find(
+        {"sku": sku, "period": period.value, "period_end": {"$lte": at}}
+    ).sort([("period_start", -1)]).first_or_none()
+    base = checkpoint.closing_quantity if checkpoint else 0
+    since = checkpoint.period_end if checkpoint else None
+    change, count = await _sum_changes(sku, since, at, inclusive)
+    return {
+        "sku": sku,
+        "at": at,
+        "quantity": base + change,
+        "checkpoint_end": since,
+        "tail_movements": count,
+    }
+
+
+async def get_balance_at(sku: str, at: datetime, period=None) -> Dict[str, Any]:
+    """Saldo del SKU con todos los movimientos hasta `at` (inclusive)."""
+    return await _balance(sku, at, _period(period or STOCK_CHECKPOINT_PERIOD), inclusive=True)
+
+
+async def _movement_rows(sku: str, start: datetime, end: datetime, period: CheckpointPeriod) -> List[Dict[str, Any]]:
+    if start >= end:
+        return []
+    cursor = await StockMovement.get_pymongo_collection().aggregate(_movement_totals_pipeline(
+        {"product_sku": sku, "created_at": {"$gte": start, "$lt": end}}, period
+    ))
+    return [{
+        "period_start": row["_id"]["start"],
+        "quantity_in": row["quantity_in"],
+        "quantity_out": row["quantity_out"],
+        "movements_count": row["movements_count"],
+        "source": "movements",
+    } async for row in cursor]
+
+
+async def get_kardex(sku: str, start: datetime, end: datetime, period=None) -> Dict[str, Any]:
+    """
+    Kardex del SKU en [start, end) por periodo: saldo inicial, ingresos, salidas y
+    saldo final de cada periodo con movimientos. Los periodos completos ya
+    materializados salen de los checkpoints; el resto, de los movimientos.
+    """
+    period = _period(period or STOCK_CHECKPOINT_PERIOD)
+    if start >= end:
+        raise ValidationException("La fecha inicial debe ser anterior a la final.")
+
+    opening = (await _balance(sku, start, period, inclusive=False))["quantity"]
+
+    first_full = start if period_start(start, period) == start else next_period(period_start(start, period), period)
+    watermark = await get_watermark(period) or first_full
+    last_full = min(period_start(end, period), watermark)
+
+    if first_full < last_full:
+        checkpoints = await StockCheckpoint.find({
+            "sku": sku, "period": period.value,
+            "period_start": {"$gte": first_full, "$lt": last_full},
+        }).sort([("period_start", 1)]).to_list()
+        rows = await _movement_rows(sku, start, first_full, period)
+        rows += [{
+            "period_start": c.period_start,
+            "quantity_in": c.quantity_in,
+            "quantity_out": c.quantity_out,
+            "movements_count": c.movements_count,
+            "source": "checkpoint",
+        } for c in checkpoints]
+        rows += await _movement_rows(sku, last_full, end, period)
+    else:
+        rows = await _movement_rows(sku, start, end, period)
+
+    balance = opening
+    for row in rows:
+        row["opening_quantity"] = balance
+        balance += row["quantity_in"] - row["quantity_out"]
+        row["closing_quantity"] = balance
+
+    return {
+        "sku": sku,
+        "period": period.value,
+        "start": start,
+        "end": end,
+        "opening_quantity": opening,
+        "total_in": sum(r["quantity_in"] for r in rows),
+        "total_out": sum(r["quantity_out"] for r in rows),
+        "closing_quantity": balance,
+        "rows": rows,
+    }
+
+
+async def check_checkpoints(period, deep: bool = False) -> Dict[str, Any]:
+    """
+    Verifica los checkpoints:
+    - cadena: cada cierre = apertura + ingresos - salidas y cada apertura = cierre anterior;
+    - productos: cierre del último checkpoint + movimientos posteriores = `stock_current`;
+    - `deep`: vuelve a agregar los movimientos de los periodos materializados y compara.
+    """
+    period = _period(period)
+    issues: List[str] = []
+    issue_count = 0
+
+    def report(message: str):
+        nonlocal issue_count
+        issue_count += 1
+        if len(issues) < MAX_REPORTED_ISSUES:
+            issues.append(message)
+
+    # Orden del índice (sku asc, period_start desc): se recorre la cadena hacia atrás.
+    latest: Dict[str, int] = {}
+    later = None
+    async for c in StockCheckpoint.find({"period": period.value}).sort([("sku", 1), ("period_start", -1)]):
+        if c.closing_quantity != c.opening_quantity + c.quantity_in - c.quantity_out:
+            report(f"{c.sku} {c.period_start:%Y-%m-%d}: cierre {c.closing_quantity} no cuadra con sus movimientos")
+        if later is not None and later.sku == c.sku:
+            if later.opening_quantity != c.closing_quantity:
+                report(f"{c.sku} {later.period_start:%Y-%m-%d}: apertura {later.opening_quantity} != cierre anterior {c.closing_quantity}")
+        elif later is not None and later.opening_quantity != 0:
+            report(f"{later.sku} {later.period_start:%Y-%m-%d}: primer checkpoint con apertura {later.opening_quantity}")
+        if c.sku not in latest:
+            latest[c.sku] = c.closing_quantity
+        later = c
+    if later is not None and later.opening_quantity != 0:
+        report(f"{later.sku} {later.period_start:%Y-%m-%d}: primer checkpoint con apertura {later.opening_quantity}")
+
+    watermark = await get_watermark(period)
+    if deep and watermark is not None:
+        cursor = await StockMovement.get_pymongo_collection().aggregate(
+            _movement_totals_pipeline({"created_at": {"$lt": watermark}}, period), allowDiskUse=True
+        )
+        async for row in cursor:
+            sku, start = row["_id"]["sku"], row["_id"]["start"]
+            c = await StockCheckpoint.find_one({"sku": sku, "period": period.value, "period_start": start})
+            if c is None:
+                report(f"{sku} {start:%Y-%m-%d}: periodo con movimientos sin checkpoint")
+            elif (c.quantity_in, c.quantity_out, c.movements_count) != (
+                row["quantity_in"], row["quantity_out"], row["movements_count"]
+            ):
+                report(f"{sku} {start:%Y-%m-%d}: checkpoint desactualizado respecto a los movimientos")
+
+    # Movimientos posteriores al último periodo materializado, en una sola agregación.
+    tail: Dict[str, int] = {}
+    tail_match = {"created_at": {"$gte": watermark}} if watermark else {}
+    cursor = await StockMovement.get_pymongo_collection().aggregate([
+        {"$match": tail_match},
+        {"$group": {"_id": "$product_sku", "change": {"$sum": STOCK_CHANGE_EXPR}}},
+    ], allowDiskUse=True)
+    async for row in cursor:
+        tail[row["_id"]] = row["change"]
+
+    checked = 0
+    async for product in Product.find_all():
+        checked += 1
+        expected = latest.get(product.sku, 0) + tail.get(product.sku, 0)
+        if expected != product.stock_current:
+            report(f"{product.sku}: stock_current {product.stock_current} != saldo por movimientos {expected}")
+
+    return {
+        "period": period.value,
+        "watermark": watermark,
+        "checked_products": checked,
+        "checkpoint_skus": len(latest),
+        "issue_count": issue_count,
+        "issues": issues,
+    }
+
+
+async def run_checkpoint_job(interval: int, period) -> None:
+    """Job de fondo: materializa los periodos cerrados cada `interval` segundos."""
+    while True:
+        try:
+            written = await refresh_checkpoints(period)
+            if written:
+                print(f"Checkpoints de stock actualizados: {written}")
+        except Exception:
+            logging.error("Fallo al actualizar los checkpoints de stock", exc_info=True)
+        await asyncio.sleep(interval)
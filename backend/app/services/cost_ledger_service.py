@@ -0,0 +1,168 @@
+"""
+Libro de costos (kardex valorizado) por SKU.
+
+Cada cambio del stock total o del costo de un producto deja una entrada en
+`cost_ledger` con el estado resultante: cantidad, costo promedio ponderado y valor
+acumulados. Las entradas de movimientos las escribe el motor de stock
+(`stock_service`) en la misma operación que actualiza el producto, por lo que el
+libro cuadra con `Product.stock_current` y `Product.cost` sin recalcular nada.
+
+La valorización a una fecha toma la última entrada de cada SKU anterior a la fecha
+con el índice (sku, created_at, _id), en lugar de reprocesar todos los movimientos.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.models.inventory import Product, CostLedgerEntry, CostEntryType
+from app.schemas.common import PaginatedResponse
+from app.services.pagination_service import paginate
+
+
+def build_entry(
+    sku: str,
+    before_quantity: int,
+    before_cost: float,
+    after_quantity: int,
+    after_cost: float,
+    entry_type: CostEntryType = CostEntryType.MOVEMENT,
+    reference_document: Optional[str] = None,
+    created_at: Optional[datetime] = None,
+) -> CostLedgerEntry:
+    before_value = round(before_quantity * before_cost, 3)
+    running_value = round(after_quantity * after_cost, 3)
+    return CostLedgerEntry(
+        sku=sku,
+        entry_type=entry_type,
+        reference_document=reference_document,
+        quantity_change=after_quantity - before_quantity,
+        value_change=round(running_value - before_value, 3),
+        running_quantity=after_quantity,
+        average_cost=after_cost,
+        running_value=running_value,
+        created_at=created_at or datetime.now(),
+    )
+
+
+async def record_opening(product: Product, reference_document: Optional[str] = None) -> CostLedgerEntry:
+    """Saldo inicial de un producto (alta con stock o datos anteriores al libro)."""
+    entry = build_entry(
+        product.sku, 0, 0.0, product.stock_current, product.cost,
+        entry_type=CostEntryType.OPENING, reference_document=reference_document,
+    )
+    await entry.insert()
+    return entry
+
+
+async def record_revaluation(product: Product, previous_cost: float) -> CostLedgerEntry:
+    """Cambio manual del costo: misma cantidad, nuevo costo promedio."""
+    entry = build_entry(
+        product.sku, product.stock_current, previous_cost, product.stock_current, product.cost,
+        entry_type=CostEntryType.REVALUATION,
+    )
+    await entry.insert()
+    return entry
+
+
+async def seed_opening_entries(batch_size: int = 1000) -> int:
+    """
+    Registra el saldo actual como apertura de los productos que aún no tienen entradas
+    (datos anteriores al libro de costos). La valorización anterior a la apertura es 0.
+    """
+    collection = CostLedgerEntry.get_pymongo_collection()
+    with_entries = set(await collection.distinct("sku"))
+    now = datetime.now()
+    created = 0
+    batch: List[CostLedgerEntry] = []
+    async for product in Product.find_all():
+        if product.sku in with_entries:
+            continue
+        batch.append(build_entry(
+            product.sku, 0, 0.0, product.stock_current, product.cost,
+            entry_type=CostEntryType.OPENING, reference_document="APERTURA", created_at=now,
+        ))
+        if len(batch) >= batch_size:
+            await CostLedgerEntry.insert_many(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        await CostLedgerEntry.insert_many(batch)
+        created += len(batch)
+    return created
+
+
+def valuation_pipeline(as_of: datetime) -> List[Dict[str, Any]]:
+    """
+    Última entrada de cada SKU hasta `as_of`. El $sort coincide con el índice
+    (sku, created_at desc, _id desc), por lo que el $group con $first lo resuelve el
+    índice sin ordenar en memoria.
+    """
+    return [
+        {"$match": {"created_at": {"$lte": as_of}}},
+        {"$sort": {"sku": 1, "created_at": -1, "_id": -1}},
+        {"$group": {
+            "_id": "$sku",
+            "running_quantity": {"$first": "$running_quantity"},
+            "average_cost": {"$first": "$average_cost"},
+            "running_value": {"$first": "$running_value"},
+            "last_entry_at": {"$first": "$created_at"},
+        }},
+    ]
+
+
+async def get_valuation(
+    as_of: Optional[datetime] = None,
+    skip: int = 0,
+    limit: int = 50,
+    include_zero: bool = False,
+) -> Dict[str, Any]:
+    """
+    Valorización del inventario a una fecha: totales del catálogo y el detalle por SKU
+    paginado, en una sola agregación.
+    """
+    as_of = as_of or datetime.now()
+    pipeline = valuation_pipeline(as_of)
+    if not include_zero:
+        pipeline.append({"$match": {"running_quantity": {"$ne": 0}}})
+    pipeline.append({"$facet": {
+        "items": [
+            {"$sort": {"_id": 1}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$project": {
+                "_id": 0, "sku": "$_id", "quantity": "$running_quantity",
+                "average_cost": 1, "value": "$running_value", "last_entry_at": 1,
+            }},
+        ],
+        "summary": [
+            {"$group": {
+                "_id": None,
+                "skus": {"$sum": 1},
+                "total_quantity": {"$sum": "$running_quantity"},
+                "total_value": {"$sum": "$running_value"},
+            }},
+        ],
+    }})
+
+    result = await CostLedgerEntry.aggregate(pipeline).to_list()
+    facet = result[0] if result else {"items": [], "summary": []}
+    summary = facet["summary"][0] if facet["summary"] else {}
+    return {
+        "as_of": as_of,
+        "skus": summary.get("skus", 0),
+        "total_quantity": summary.get("total_quantity", 0),
+        "total_value": round(summary.get("total_value", 0.0), 3),
+        "items": facet["items"],
+    }
+
+
+async def get_sku_cost_as_of(sku: str, as_of: datetime) -> Optional[CostLedgerEntry]:
+    """Estado de costo de un SKU a una fecha (None si no tenía entradas)."""
+    return await CostLedgerEntry.find(
+        {"sku": sku, "created_at": {"$lte": as_of}}
+    ).sort([("created_at", -1), ("_id", -1)]).first_or_none()
+
+
+async def get_cost_ledger(sku: str, skip: int = 0, limit: int = 50) -> PaginatedResponse[CostLedgerEntry]:
+    return await paginate(
+        CostLedgerEntry, {"sku": sku}, [("created_at", -1), ("_id", -1)], skip=skip, limit=limit
+    )
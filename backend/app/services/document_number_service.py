@@ -1,7 +1,28 @@
-from beanie import Document, Indexed
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo.errors import DuplicateKeyError
+"""
+Numeración de documentos (series).
+
+Cada serie tiene un contador en `document_sequences` que se incrementa con un único
+`find_one_and_update` atómico. Dos modos:
+
+- Bloques (por defecto): cada proceso reserva `block_size` números con un solo `$inc`
+  y los entrega desde memoria, así los documentos no compiten por el contador. Los
+  números son únicos y crecientes por proceso, pero no consecutivos entre procesos y
+  los no usados de un bloque se pierden al reiniciar (quedan huecos).
+- Sin huecos (series fiscales): el número se toma dentro de la misma transacción que
+  inserta el documento (`create_with_number`); si la inserción falla, el incremento se
+  revierte con ella.
+"""
 import asyncio
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from beanie import Document, Indexed
+from pymongo import ReturnDocument
+
+from app.config import DOCUMENT_NUMBER_BLOCK_SIZE, DOCUMENT_NUMBER_GAPLESS_SERIES
+from app.database import get_client, supports_transactions
+
+T = TypeVar("T")
+
 
 class DocumentSequence(Document):
     name: Indexed(str, unique=True)
@@ -10,42 +31,126 @@ class DocumentSequence(Document):
     class Settings:
         name = "document_sequences"
 
+
 class DocumentNumberService:
-    def __init__(self, prefix: str, model_name: str):
+    def __init__(self, prefix: str, model_name: str, width: int = 5, block_size: int = 1, gapless: bool = False):
         self.prefix = prefix
         self.model_name = model_name
+        self.width = width
+        self.block_size = 1 if gapless else max(1, block_size)
+        self.gapless = gapless
+        # Bloque reservado en este proceso: [_next, _end)
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
 
-    async def get_next_number(self) -> str:
-        """
-        Generates the next number in a sequence for a given document type.
-        Example: "NC-00001"
-        """
-        sequence_doc = await DocumentSequence.find_one(DocumentSequence.name == self.model_name)
-        if not sequence_doc:
-            sequence_doc = DocumentSequence(name=self.model_name, sequence=0)
+    def format(self, sequence: int) -> str:
+        return f"{self.prefix}-{sequence:0{self.width}d}"
 
-        # Atomically find and update the sequence
-        # This is a bit complex with beanie, so we drop to pymongo level for the update
-        client: AsyncIOMotorClient = DocumentSequence.get_motor_client()
-        collection = client[DocumentSequence.Settings.database][DocumentSequence.Settings.name]
-
-        result = await collection.find_one_and_update(
+    async def _increment(self, amount: int, session=None) -> int:
+        """Suma `amount` al contador y devuelve su nuevo valor (un solo round trip)."""
+        result = await DocumentSequence.get_pymongo_collection().find_one_and_update(
             {"name": self.model_name},
-            {"$inc": {"sequence": 1}},
+            {"$inc": {"sequence": amount}},
             upsert=True,
-            return_document=True
+            return_document=ReturnDocument.AFTER,
+            session=session,
         )
-        
-        next_seq = result['sequence']
-        return f"{self.prefix}-{next_seq:05d}"
+        return result["sequence"]
 
-# --- Specific Service Instances ---
+    async def get_next_number(self, session=None) -> str:
+        """
+        Generates the next number in the series, e.g. "NC-00001".
+        In gapless series, pass the session of the transaction that inserts the document.
+        """
+        if self.block_size == 1:
+            return self.format(await self._increment(1, session=session))
 
-async def get_credit_note_number() -> str:
-    service = DocumentNumberService(prefix="NC", model_name="credit_note")
-    return await service.get_next_number()
+        async with self._lock:
+            if self._next >= self._end:
+                last = await self._increment(self.block_size)
+                self._next, self._end = last - self.block_size + 1, last + 1
+            sequence = self._next
+            self._next += 1
+        return self.format(sequence)
+
+    async def create_with_number(self, create: Callable[[str, object], Awaitable[T]]) -> T:
+        """
+        Asigna el número y crea el documento como una sola unidad: `create(number, session)`
+        debe insertar con esa sesión. Sin transacciones (mongod standalone), si `create`
+        falla se devuelve el número cuando nadie tomó uno posterior. En las series por
+        bloques no hay transacción: `create` recibe el número y `session=None`.
+        """
+        if not self.gapless:
+            return await create(await self.get_next_number(), None)
+
+        if await supports_transactions():
+            async with get_client().start_session() as session:
+                async def run(s):
+                    number = await self.get_next_number(session=s)
+                    return await create(number, s)
+                return await session.with_transaction(run)
+
+        sequence = await self._increment(1)
+        try:
+            return await create(self.format(sequence), None)
+        except Exception:
+            await DocumentSequence.get_pymongo_collection().update_one(
+                {"name": self.model_name, "sequence": sequence}, {"$inc": {"sequence": -1}}
+            )
+            raise
+
+    async def peek(self) -> int:
+        """Último número asignado (o reservado en bloque) en la serie."""
+        doc = await DocumentSequence.get_pymongo_collection().find_one({"name": self.model_name})
+        return doc["sequence"] if doc else 0
+
+
+def _series(prefix: str, model_name: str) -> DocumentNumberService:
+    return DocumentNumberService(
+        prefix=prefix,
+        model_name=model_name,
+        block_size=DOCUMENT_NUMBER_BLOCK_SIZE,
+        gapless=model_name in DOCUMENT_NUMBER_GAPLESS_SERIES,
+    )
+
+
+# --- Series por tipo de documento ---
+SERIES: Dict[str, DocumentNumberService] = {
+    "sales_quote": _series("CV", "sales_quote"),
+    "purchase_quote": _series("CC", "purchase_quote"),
+    "sales_order": _series("OV", "sales_order"),
+    "purchase_order": _series("OC", "purchase_order"),
+    "sales_invoice": _series("FV", "sales_invoice"),
+    "purchase_invoice": _series("FC", "purchase_invoice"),
+    "credit_note": _series("NC", "credit_note"),
+    "debit_note": _series("ND", "debit_note"),
+    "delivery_guide": _series("GR", "delivery_guide"),
+}
+
+
+def get_series(document_type: str) -> DocumentNumberService:
+    try:
+        return SERIES[document_type]
+    except KeyError:
+        raise ValueError(f"Serie de documentos desconocida: {document_type}")
+
+
+async def get_document_number(document_type: str, session=None) -> str:
+    return await get_series(document_type).get_next_number(session=session)
+
+
+async def create_with_number(document_type: str, create: Callable[[str, object], Awaitable[T]]) -> T:
+    """
+    Crea un documento numerado en su serie. Las facturas y notas deben crearse por aquí
+    (y no con `get_document_number` + insert) para que las series sin huecos lo sean.
+    """
+    return await get_series(document_type).create_with_number(create)
+
+# --- Specific Service Instances ---
 
-async def get_debit_note_number() -> str:
-    service = DocumentNumberService(prefix="ND", model_name="debit_note")
-    return await service.get_next_number()
+async def get_credit_note_number(session=None) -> str:
+    return await get_document_number("credit_note", session=session)
 
+async def get_debit_note_number(session=None) -> str:
+    return await get_document_number("debit_note", session=session)
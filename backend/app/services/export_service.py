@@ -0,0 +1,305 @@
+"""
+Exportaciones CSV/XLSX generadas en el servidor.
+
+Cada exportación recorre un único cursor de MongoDB con proyección (solo se leen las
+columnas exportadas) y escribe las filas por lotes:
+
+- CSV: cada lote se envía al cliente en cuanto se escribe (`StreamingResponse`), así
+  la memoria no crece con el tamaño del resultado.
+- XLSX: openpyxl en modo write-only vuelca las filas a un archivo temporal; al cerrar
+  el libro se envía el archivo por partes. El formato (zip) no permite enviar bytes
+  antes de terminar, pero la memoria sigue siendo constante.
+"""
+import asyncio
+import csv
+import io
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
+
+from beanie import Document
+from fastapi.responses import StreamingResponse
+
+from app.exceptions.business_exceptions import ValidationException
+from app.models.inventory import Product, StockMovement
+from app.models.sales import SalesInvoice, CreditNote
+from app.models.purchasing import Invoice, DebitNote
+from app.services.search_service import search_filter
+
+EXPORT_BATCH_SIZE = 1000
+XLSX_SPOOL_SIZE = 8 * 1024 * 1024
+FILE_CHUNK_SIZE = 64 * 1024
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+Column = Tuple[str, Any]  # (encabezado, 1 para el campo homónimo o expresión de proyección)
+
+
+@dataclass
+class ExportSpec:
+    name: str
+    model: Type[Document]
+    columns: List[Column]
+    sort: List[Tuple[str, int]]
+
+    @property
+    def headers(self) -> List[str]:
+        return [header for header, _ in self.columns]
+
+    @property
+    def projection(self) -> Dict[str, Any]:
+        projection: Dict[str, Any] = {"_id": 0}
+        projection.update({header: expr for header, expr in self.columns})
+        return projection
+
+
+EXPORTS: Dict[str, ExportSpec] = {
+    "products": ExportSpec(
+        "productos", Product,
+        [
+            # `operation` permite reimportar el archivo como actualización masiva.
+            ("operation", {"$literal": "UPDATE"}),
+            ("sku", 1), ("name", 1), ("brand", 1), ("category_id", 1), ("description", 1),
+            ("price", 1), ("cost", 1), ("stock_current", 1),
+        ],
+        [("sku", 1)],
+    ),
+    "stock_movements": ExportSpec(
+        "movimientos_stock", StockMovement,
+        [
+            ("created_at", 1), ("product_sku", 1), ("movement_type", 1), ("quantity", 1),
+            ("stock_change", 1), ("unit_cost", 1), ("warehouse_id", 1), ("target_warehouse_id", 1),
+            ("reference_document", 1), ("notes", 1), ("responsible", 1),
+        ],
+        [("created_at", -1), ("_id", -1)],
+    ),
+    "sales_invoices": ExportSpec(
+        "facturas_venta", SalesInvoice,
+        [
+            ("invoice_number", 1), ("invoice_date", 1), ("order_id", 1), ("customer_id", 1),
+            ("items_count", {"$size": "$items"}), ("total_amount", 1), ("amount_paid", 1),
+            ("credit_applied", 1), ("payment_status", 1), ("dispatch_status", 1), ("delivery_address", 1),
+        ],
+        [("invoice_date", -1), ("_id", -1)],
+    ),
+    "credit_notes": ExportSpec(
+        "notas_credito", CreditNote,
+        [
+            ("credit_note_number", 1), ("date", 1), ("sales_invoice_id", 1), ("customer_id", 1),
+            ("reason", 1), ("status", 1), ("items_count", {"$size": "$items"}), ("total_amount", 1), ("notes", 1),
+        ],
+        [("date", -1), ("_id", -1)],
+    ),
+    "purchase_invoices": ExportSpec(
+        "facturas_compra", Invoice,
+        [
+            ("invoice_number", 1), ("invoice_date", 1), ("order_id", 1), ("supplier_id", 1),
+            ("items_count", {"$size": "$items"}), ("total_amount", 1), ("amount_paid", 1),
+            ("debit_applied", 1), ("payment_status", 1), ("reception_status", 1),
+        ],
+        [("invoice_date", -1), ("_id", -1)],
+    ),
+    "debit_notes": ExportSpec(
+        "notas_debito", DebitNote,
+        [
+            ("debit_note_number", 1), ("date", 1), ("purchase_invoice_id", 1), ("supplier_id", 1),
+            ("reason", 1), ("status", 1), ("items_count", {"$size": "$items"}), ("total_amount", 1), ("notes", 1),
+        ],
+        [("date", -1), ("_id", -1)],
+    ),
+}
+
+# Filas de ejemplo de la plantilla vacía de productos (mismas columnas que la exportación).
+PRODUCT_TEMPLATE_ROWS = [
+    ["INSERT", "FIL-0001", "Filtro de aceite", "ACME", "", "Filtro para motor 1.6", 25.0, 15.0, 10],
+    ["INSERT", "BUJ-0001", "Bujía de iridio", "NGK", "", "", 18.5, 9.9, 0],
+]
+
+
+def format_cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ", timespec="seconds")
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+async def _iter_batches(spec: ExportSpec, query: Dict[str, Any]) -> AsyncIterator[List[List[Any]]]:
+    cursor = spec.model.get_pymongo_collection().find(
+        query, spec.projection, sort=spec.sort, batch_size=EXPORT_BATCH_SIZE
+    )
+    headers = spec.headers
+    batch: List[List[Any]] = []
+    async for doc in cursor:
+        batch.append([format_cell(doc.get(h)) for h in headers])
+        if len(batch) >= EXPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _single_batch(rows: List[List[Any]]) -> AsyncIterator[List[List[Any]]]:
+    yield rows
+
+
+async def _stream_csv(headers: List[str], batches: AsyncIterator[List[List[Any]]]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ).
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    yield buffer.getvalue().encode("utf-8")
+    async for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def _stream_xlsx(sheet_name: str, headers: List[str], batches: AsyncIterator[List[List[Any]]]) -> AsyncIterator[bytes]:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    sheet.append(headers)
+
+    def append(batch):
+        for row in batch:
+            sheet.append(row)
+
+    async for batch in batches:
+        # openpyxl es síncrono: cada lote se escribe fuera del event loop.
+        await asyncio.to_thread(append, batch)
+
+    with tempfile.SpooledTemporaryFile(max_size=XLSX_SPOOL_SIZE) as output:
+        await asyncio.to_thread(workbook.save, output)
+        output.seek(0)
+        while True:
+            chunk = await asyncio.to_thread(output.read, FILE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def _encode(
+    name: str, headers: List[str], batches: AsyncIterator[List[List[Any]]], file_format: str,
+) -> Tuple[AsyncIterator[bytes], str]:
+    """Generador de bytes y media type del formato pedido (csv o xlsx)."""
+    if file_format == "csv":
+        return _stream_csv(headers, batches), CSV_MEDIA_TYPE
+    if file_format == "xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ValidationException("La exportación XLSX requiere el paquete 'openpyxl' en el servidor.")
+        return _stream_xlsx(name, headers, batches), XLSX_MEDIA_TYPE
+    raise ValidationException(f"Formato de exportación no soportado: {file_format}. Use csv o xlsx.")
+
+
+def rows_response(
+    name: str,
+    headers: List[str],
+    batches: AsyncIterator[List[List[Any]]],
+    file_format: str = "csv",
+    filename: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Respuesta de descarga a partir de lotes de filas ya calculadas (`batches`), para
+    reportes que no salen de un `find` (p. ej. agregaciones). Los errores de formato
+    se validan antes de empezar a enviar datos.
+    """
+    file_format = (file_format or "csv").lower()
+    filename = filename or f"{name}_{datetime.now():%Y%m%d_%H%M%S}"
+    body, media_type = _encode(name, headers, batches, file_format)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{file_format}"'},
+    )
+
+
+def export_response(
+    export: str,
+    query: Dict[str, Any],
+    file_format: str = "csv",
+    template: bool = False,
+) -> StreamingResponse:
+    """
+    Respuesta de descarga de la exportación `export` (clave de EXPORTS) con el filtro
+    `query`. Los errores de formato se validan antes de empezar a enviar datos.
+    """
+    spec = EXPORTS[export]
+    if template and export == "products":
+        return rows_response(spec.name, spec.headers, _single_batch(PRODUCT_TEMPLATE_ROWS), file_format,
+                             filename=f"plantilla_{spec.name}")
+    return rows_response(spec.name, spec.headers, _iter_batches(spec, query), file_format)
+
+
+async def write_export(
+    export: str,
+    query: Dict[str, Any],
+    file_format: str = "csv",
+    directory: str = tempfile.gettempdir(),
+) -> Dict[str, Any]:
+    """
+    Escribe la exportación `export` a un archivo en `directory` (para los jobs de
+    fondo, que la dejan lista para descargar). Devuelve ruta, nombre, media type,
+    tamaño y filas exportadas.
+    """
+    if export not in EXPORTS:
+        raise ValidationException(f"Exportación desconocida: {export}. Disponibles: {', '.join(EXPORTS)}.")
+    spec = EXPORTS[export]
+    file_format = (file_format or "csv").lower()
+    rows = 0
+
+    async def counted():
+        nonlocal rows
+        async for batch in _iter_batches(spec, query):
+            rows += len(batch)
+            yield batch
+
+    body, media_type = _encode(spec.name, spec.headers, counted(), file_format)
+    filename = f"{spec.name}_{datetime.now():%Y%m%d_%H%M%S}.{file_format}"
+    os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{spec.name}_", suffix=f".{file_format}", dir=directory)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async for chunk in body:
+                await asyncio.to_thread(f.write, chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return {"path": path, "filename": filename, "media_type": media_type, "size": size, "rows": rows}
+
+
+def date_range(start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Any]:
+    """Condición de rango de fechas [start, end] para los filtros de exportación."""
+    condition: Dict[str, Any] = {}
+    if start:
+        condition["$gte"] = start
+    if end:
+        condition["$lte"] = end
+    return condition
+
+
+def build_query(search: Optional[str] = None, **conditions: Any) -> Dict[str, Any]:
+    """
+    Filtro de exportación: búsqueda por tokens (como en los listados) más condiciones
+    exactas; las condiciones vacías (None, "" o {}) se omiten.
+    """
+    parts = [{field: value} for field, value in conditions.items() if value not in (None, "", {})]
+    search_query = search_filter(search)
+    if search_query:
+        parts.append(search_query[0])
+    if not parts:
+        return {}
+    return parts[0] if len(parts) == 1 else {"$and": parts}
@@ -0,0 +1,286 @@
+"""
+Claves de idempotencia (`Idempotency-Key`) para las rutas que modifican datos.
+
+Un cliente que reintenta un POST/PUT/PATCH/DELETE (p. ej. una conexión móvil que se
+cortó antes de recibir la respuesta) envía la misma cabecera `Idempotency-Key`; el
+servidor ejecuta la operación una sola vez y a los reintentos les devuelve la misma
+respuesta, sin volver a llamar al servicio (ni consumir otro número de documento).
+
+- `IdempotencyMiddleware` (ASGI) reclama la clave con un `insert_one` sobre
+  `idempotency_keys` (`_id` = método + ruta + clave). Si el insert gana, ejecuta la
+  ruta, pasa la respuesta al cliente a medida que sale y la guarda al terminar.
+- Si la clave ya existe y está completa, se reenvía la respuesta guardada con la
+  cabecera `Idempotent-Replayed: true`.
+- Si la clave está en curso, el duplicado espera al original: en el mismo proceso, a
+  su futuro (sin consultas); desde otro worker, consultando el registro con espera
+  creciente hasta IDEMPOTENCY_WAIT_TIMEOUT. Mientras el original se ejecuta renueva su
+  reclamo cada IDEMPOTENCY_LOCK_TTL / 3; solo si el proceso murió sin terminar (el
+  reclamo venció y la clave no está en curso en este proceso) el duplicado toma la
+  clave y ejecuta.
+- Solo se guardan respuestas < 500: tras un error del servidor se libera la clave y el
+  reintento vuelve a ejecutar. La misma clave con otro cuerpo responde 422.
+
+Los registros vencen solos con un índice TTL sobre `expires_at` (IDEMPOTENCY_TTL).
+Sin la cabecera, las solicitudes pasan sin cambios.
+"""
+import asyncio
+import hashlib
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from beanie import Document
+from pydantic import Field
+from pymongo import IndexModel, ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.config import IDEMPOTENCY_TTL, IDEMPOTENCY_LOCK_TTL, IDEMPOTENCY_WAIT_TIMEOUT
+
+HEADER = b"idempotency-key"
+REPLAYED_HEADER = (b"idempotent-replayed", b"true")
+MUTATING_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = "IN_PROGRESS"
+COMPLETED = "COMPLETED"
+# Cabeceras de la respuesta original que no se repiten al reenviarla.
+NOT_REPLAYED_HEADERS = {b"content-length", b"date", b"server", b"server-timing", b"set-cookie"}
+POLL_DELAYS = (0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+def _utcnow() -> datetime:
+    # El índice TTL compara en UTC; con la hora local un reclamo podría vencer antes de tiempo.
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class IdempotencyRecord(Document):
+    # `_id` = "MÉTODO /ruta clave"
+    id: Optional[str] = None
+    key: str
+    method: str
+    path: str
+    fingerprint: str
+    status: str = IN_PROGRESS
+    # Proceso/solicitud que tiene la clave mientras está en curso.
+    owner: Optional[str] = None
+    response_status: Optional[int] = None
+    response_headers: List[Tuple[str, str]] = []
+    response_body: Optional[bytes] = None
+    created_at: datetime = Field(default_factory=datetime.now)
+    expires_at: datetime
+
+    class Settings:
+        name = "idempotency_keys"
+        indexes = [
+            IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        ]
+
+
+@dataclass
+class StoredResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+
+    @classmethod
+    def from_record(cls, record: dict) -> "StoredResponse":
+        headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in record["response_headers"]]
+        return cls(record["response_status"], headers, bytes(record["response_body"] or b""))
+
+
+async def _send_json(send, status: int, detail: str) -> None:
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start", "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _replay(send, response: StoredResponse) -> None:
+    headers = response.headers + [REPLAYED_HEADER, (b"content-length", str(len(response.body)).encode())]
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    await send({"type": "http.response.body", "body": response.body})
+
+
+class IdempotencyMiddleware:
+    """Middleware ASGI: ejecuta una sola vez cada `Idempotency-Key` por método y ruta."""
+
+    def __init__(self, app):
+        self.app = app
+        # Claves en curso en este proceso: los duplicados esperan el resultado aquí.
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in MUTATING_METHODS:
+            await self.app(scope, receive, send)
+            return
+        raw_key = dict(scope["headers"]).get(HEADER)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        key = raw_key.decode("latin-1").strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres.")
+            return
+
+        body = await _read_body(receive)
+        record_id = f"{scope['method']} {scope['path']} {key}"
+        fingerprint = hashlib.sha256(scope.get("query_string", b"") + b"\0" + body).hexdigest()
+        deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_TIMEOUT
+
+        while True:
+            # Con la clave en curso en este proceso no se reclama: se espera a su futuro.
+            if record_id not in self._inflight:
+                owner = await self._claim(record_id, key, scope, fingerprint)
+                if owner:
+                    await self._execute(scope, _replay_body(body, receive), send, record_id, owner)
+                    return
+
+            record = await IdempotencyRecord.get_pymongo_collection().find_one({"_id": record_id})
+            if record is not None:
+                if record["fingerprint"] != fingerprint:
+                    await _send_json(send, 422, "Idempotency-Key ya se usó con otra solicitud.")
+                    return
+                if record["status"] == COMPLETED:
+                    await _replay(send, StoredResponse.from_record(record))
+                    return
+            elif record_id not in self._inflight:
+                continue  # el original falló y liberó la clave: se vuelve a reclamar
+
+            response = await self._wait(record_id, deadline)
+            if response is not None:
+                await _replay(send, response)
+                return
+            if asyncio.get_running_loop().time() >= deadline:
+                await _send_json(send, 409, "Hay una solicitud en curso con esta Idempotency-Key; reintente más tarde.")
+                return
+
+    async def _claim(self, record_id: str, key: str, scope, fingerprint: str) -> Optional[str]:
+        """Reclama la clave (nueva o con un reclamo vencido). Devuelve el dueño o None."""
+        owner = uuid.uuid4().hex
+        now = _utcnow()
+        collection = IdempotencyRecord.get_pymongo_collection()
+        try:
+            await collection.insert_one({
+                "_id": record_id, "key": key, "method": scope["method"], "path": scope["path"],
+                "fingerprint": fingerprint, "status": IN_PROGRESS, "owner": owner,
+                "response_status": None, "response_headers": [], "response_body": None,
+                "created_at": now, "expires_at": now + timedelta(seconds=IDEMPOTENCY_LOCK_TTL),
+            })
+            return owner
+        except DuplicateKeyError:
+            pass
+        # El dueño anterior no terminó a tiempo (proceso caído): se toma su lugar.
+        taken = await collection.find_one_and_update(
+            {"_id": record_id, "status": IN_PROGRESS, "fingerprint": fingerprint, "expires_at": {"$lt": now}},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=IDEMPOTENCY_LOCK_TTL)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        return owner if taken else None
+
+    async def _wait(self, record_id: str, deadline: float) -> Optional[StoredResponse]:
+        """Espera al original; devuelve su respuesta o None si hay que volver a intentar."""
+        loop = asyncio.get_running_loop()
+        future = self._inflight.get(record_id)
+        if future is not None:
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                return None
+
+        collection = IdempotencyRecord.get_pymongo_collection()
+        attempt = 0
+        while loop.time() < deadline:
+            await asyncio.sleep(POLL_DELAYS[min(attempt, len(POLL_DELAYS) - 1)])
+            attempt += 1
+            record = await collection.find_one({"_id": record_id})
+            if record is None:
+                return None
+            if record["status"] == COMPLETED:
+                return StoredResponse.from_record(record)
+            if record["expires_at"] < _utcnow():
+                return None
+        return None
+
+    async def _heartbeat(self, record_id: str, owner: str) -> None:
+        """Renueva el reclamo mientras la solicitud se ejecuta (ver job_service._heartbeat)."""
+        collection = IdempotencyRecord.get_pymongo_collection()
+        while True:
+            await asyncio.sleep(IDEMPOTENCY_LOCK_TTL / 3)
+            result = await collection.update_one(
+                {"_id": record_id, "owner": owner, "status": IN_PROGRESS},
+                {"$set": {"expires_at": _utcnow() + timedelta(seconds=IDEMPOTENCY_LOCK_TTL)}},
+            )
+            if not result.matched_count:
+                return
+
+    async def _execute(self, scope, receive, send, record_id: str, owner: str) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[record_id] = future
+        heartbeat = asyncio.create_task(self._heartbeat(record_id, owner))
+        status = 500
+        headers: List[Tuple[bytes, bytes]] = []
+        chunks: List[bytes] = []
+
+        async def capture(message):
+            nonlocal status, headers
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = [
+                    (name, value) for name, value in message.get("headers", [])
+                    if name.lower() not in NOT_REPLAYED_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+            await send(message)
+
+        response = None
+        collection = IdempotencyRecord.get_pymongo_collection()
+        try:
+            await self.app(scope, receive, capture)
+            if status < 500:
+                response = StoredResponse(status, headers, b"".join(chunks))
+                await collection.update_one({"_id": record_id, "owner": owner}, {"$set": {
+                    "status": COMPLETED,
+                    "response_status": response.status,
+                    "response_headers": [(n.decode("latin-1"), v.decode("latin-1")) for n, v in response.headers],
+                    "response_body": response.body,
+                    "expires_at": _utcnow() + timedelta(seconds=IDEMPOTENCY_TTL),
+                }})
+        finally:
+            heartbeat.cancel()
+            if response is None:
+                # Error del servidor (o excepción): la clave se libera para el reintento.
+                await collection.delete_one({"_id": record_id, "owner": owner})
+            if self._inflight.get(record_id) is future:
+                del self._inflight[record_id]
+            if not future.done():
+                future.set_result(response)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+def _replay_body(body: bytes, receive):
+    """`receive` que entrega el cuerpo ya leído y luego delega (p. ej. `http.disconnect`)."""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
@@ -0,0 +1,406 @@
+"""
+Importación masiva de productos desde CSV/XLSX (operaciones INSERT, UPDATE y DELETE).
+
+El archivo subido se copia a disco y un job de fondo lo lee por lotes
+(IMPORT_CHUNK_SIZE filas) sin cargarlo entero en memoria. Por cada lote:
+
+1. Valida las filas contra `ProductCreate` (las de UPDATE sobre el producto actual).
+2. Consulta los SKUs del lote con un solo `$in` (existencia y datos actuales).
+3. Escribe altas y cambios con un `bulk_write` (las altas son upserts con
+   `$setOnInsert`, así un SKU creado en paralelo no se sobrescribe), bajas con un
+   `delete_many`, y los movimientos de stock inicial, su apertura en el libro de
+   costos (`insert_many`) y los saldos por almacén (`bulk_write`).
+4. Guarda el avance y los errores por fila en el `ImportJob`.
+
+Cada SKU puede aparecer una sola vez por archivo. Los cambios de stock de UPDATE pasan
+por el motor de stock (movimiento de ajuste), igual que la edición de un producto: una
+fila que reduce el stock debe indicar en la columna `warehouse_id` el almacén del que se
+descuenta (un aumento sin almacén entra al principal). En las altas, `warehouse_id` es el
+almacén del stock inicial (por defecto el principal).
+"""
+import asyncio
+import csv
+import logging
+import os
+import shutil
+from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from beanie import PydanticObjectId
+from fastapi import UploadFile
+from pydantic import ValidationError
+from pymongo import UpdateOne
+
+from app.config import IMPORT_CHUNK_SIZE, IMPORT_MAX_STORED_ERRORS, JOB_FILES_DIR
+from app.exceptions.business_exceptions import NotFoundException, ValidationException
+from app.models.inventory import (
+    Product, StockMovement, MovementType, CostLedgerEntry, CostEntryType, WarehouseStock,
+    ImportJob, ImportJobStatus, ImportOperation, ImportRowError,
+)
+from app.schemas.inventory_schemas import ProductCreate
+from app.services.cache_service import cache, CACHE_PRODUCT
+from app.services.cost_ledger_service import build_entry
+from app.services.inventory_service import get_all_warehouses
+from app.services.job_service import enqueue
+from app.services.pagination_service import invalidate_cached_totals
+from app.services.search_service import build_search_tokens
+from app.services.stock_service import commit_stock_changes, DEFAULT_WAREHOUSE
+
+# Campos editables del producto que se leen del archivo.
+PRODUCT_FIELDS = ("name", "brand", "image_url", "category_id", "description", "price", "cost")
+TEXT_FIELDS = {"sku", "name", "brand", "image_url", "category_id", "description", "warehouse_id"}
+STOCK_COLUMNS = ("stock_initial", "stock_current")
+
+Row = Tuple[int, Dict[str, Any]]
+
+def detect_format(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension == ".xlsx":
+        try:
+            import openpyxl  # noqa: F401
+        except ImportError:
+            raise ValidationException("La importación XLSX requiere el paquete 'openpyxl' en el servidor.")
+        return "xlsx"
+    raise ValidationException(f"Formato de archivo no soportado: '{extension or filename}'. Use .csv o .xlsx.")
+
+
+def _header(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _read_csv(path: str) -> Iterator[Row]:
+    # utf-8-sig: acepta el BOM que agregan Excel y la exportación.
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        headers = [_header(h) for h in next(reader, [])]
+        for row_number, values in enumerate(reader, start=2):
+            if any(v.strip() for v in values):
+                yield row_number, dict(zip(headers, values))
+
+
+def _read_xlsx(path: str) -> Iterator[Row]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [_header(h) for h in next(rows, ())]
+        for row_number, values in enumerate(rows, start=2):
+            if any(v not in (None, "") for v in values):
+                yield row_number, dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+def _clean(values: Dict[str, Any]) -> Dict[str, Any]:
+    """Quita celdas vacías; los campos de texto se leen como texto (Excel entrega números)."""
+    data = {}
+    for key, value in values.items():
+        if not key or value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+            if not value:
+                continue
+        elif key in TEXT_FIELDS:
+            value = str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+        data[key] = value
+    return data
+
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+class _ChunkResult:
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.errors: List[ImportRowError] = []
+
+    def error(self, row_number: int, sku: Optional[str], message: str):
+        self.errors.append(ImportRowError(row=row_number, sku=sku, message=message))
+
+
+async def _process_chunk(rows: List[Row], seen: Set[str]) -> _ChunkResult:
+    result = _ChunkResult()
+    parsed: List[Tuple[int, ImportOperation, str, Dict[str, Any]]] = []
+    for row_number, values in rows:
+        data = _clean(values)
+        sku = data.get("sku")
+        try:
+            operation = ImportOperation(str(data.pop("operation", ImportOperation.INSERT.value)).upper())
+        except ValueError:
+            result.error(row_number, sku, "Operación no válida (use INSERT, UPDATE o DELETE)")
+            continue
+        if not sku:
+            result.error(row_number, None, "Falta el SKU")
+            continue
+        if sku in seen:
+            result.error(row_number, sku, "SKU repetido en el archivo")
+            continue
+        seen.add(sku)
+        parsed.append((row_number, operation, sku, data))
+
+    if not parsed:
+        return result
+
+    # Una sola consulta por lote: existencia y estado actual de los SKUs.
+    projection = {"_id": 0, "sku": 1, "stock_current": 1, **{f: 1 for f in PRODUCT_FIELDS}}
+    cursor = Product.get_pymongo_collection().find({"sku": {"$in": [p[2] for p in parsed]}}, projection)
+    existing = {doc["sku"]: doc async for doc in cursor}
+
+    now = datetime.now()
+    writes: List[UpdateOne] = []
+    inserts: List[Tuple[int, int, str, ProductCreate]] = []  # (índice en `writes`, fila, sku, datos)
+    updates: List[Tuple[int, str, ProductCreate, Dict[str, Any]]] = []
+    warehouses: Dict[str, str] = {}  # sku -> almacén del stock inicial o del ajuste
+    deletes: List[Tuple[int, str]] = []
+    with_warehouse = any(data.get("warehouse_id") for _, _, _, data in parsed)
+    known_warehouses = {w.code for w in await get_all_warehouses()} if with_warehouse else set()
+
+    for row_number, operation, sku, data in parsed:
+        current = existing.get(sku)
+        if operation == ImportOperation.DELETE:
+            if current is None:
+                result.error(row_number, sku, "El producto no existe")
+            else:
+                deletes.append((row_number, sku))
+            continue
+
+        warehouse_id = data.pop("warehouse_id", None)
+        if warehouse_id:
+            if warehouse_id not in known_warehouses:
+                result.error(row_number, sku, f"Almacén no encontrado: {warehouse_id}")
+                continue
+            warehouses[sku] = warehouse_id
+        stock = next((data.pop(c) for c in STOCK_COLUMNS if c in data), None)
+        for c in STOCK_COLUMNS:
+            data.pop(c, None)
+
+        if operation == ImportOperation.INSERT:
+            if current is not None:
+                result.error(row_number, sku, "El producto ya existe (use UPDATE)")
+                continue
+            source = {**data, "stock_initial": stock if stock is not None else 0}
+        else:
+            if current is None:
+                result.error(row_number, sku, "El producto no existe (use INSERT)")
+                continue
+            # Solo cambian las columnas con valor; el resto se valida con el dato actual.
+            source = {**current, **data, "stock_initial": stock if stock is not None else current.get("stock_current", 0)}
+        try:
+            product = ProductCreate.model_validate(source)
+        except ValidationError as e:
+            result.error(row_number, sku, _validation_message(e))
+            continue
+        if product.stock_initial < 0:
+            result.error(row_number, sku, "stock: no puede ser negativo")
+            continue
+
+        fields = {f: getattr(product, f) for f in PRODUCT_FIELDS}
+        fields["search_tokens"] = build_search_tokens(words=[product.name, product.brand], codes=[sku])
+        if operation == ImportOperation.INSERT:
+            inserts.append((len(writes), row_number, sku, product))
+            writes.append(UpdateOne(
+                {"sku": sku},
+                {"$setOnInsert": {
+                    "sku": sku, **fields, "measurements": None,
+                    "stock_current": product.stock_initial, "created_at": now,
+                }},
+                upsert=True,
+            ))
+        else:
+            changed = {f: fields[f] for f in data if f in PRODUCT_FIELDS}
+            if changed:
+                changed["search_tokens"] = fields["search_tokens"]
+                writes.append(UpdateOne({"sku": sku}, {"$set": changed}))
+            updates.append((row_number, sku, product, current))
+
+    collection = Product.get_pymongo_collection()
+    upserted: Dict[int, Any] = {}
+    if writes:
+        bulk = await collection.bulk_write(writes, ordered=False)
+        upserted = bulk.upserted_ids
+
+    # Altas: un upsert que no insertó es un SKU creado en paralelo desde otro origen.
+    created: List[Tuple[str, ProductCreate]] = []
+    for index, row_number, sku, product in inserts:
+        if index in upserted:
+            created.append((sku, product))
+        else:
+            result.error(row_number, sku, "El producto ya existe (creado durante la importación)")
+    result.inserted = len(created)
+
+    # Stock inicial: movimientos, aperturas del libro de costos y saldos por almacén en lote.
+    opening = [(sku, p, warehouses.get(sku, DEFAULT_WAREHOUSE)) for sku, p in created if p.stock_initial > 0]
+    if opening:
+        await StockMovement.insert_many([
+            StockMovement(
+                product_sku=sku, quantity=p.stock_initial, movement_type=MovementType.IN,
+                notes="Inventario Inicial (importación)", unit_cost=p.cost, warehouse_id=warehouse_id,
+                stock_change=p.stock_initial, reference_document=f"INITIAL-{sku}", created_at=now,
+            )
+            for sku, p, warehouse_id in opening
+        ])
+        await WarehouseStock.get_pymongo_collection().bulk_write([
+            UpdateOne(
+                {"sku": sku, "warehouse_id": warehouse_id},
+                {"$inc": {"quantity": p.stock_initial}, "$set": {"updated_at": now}},
+                upsert=True,
+            )
+            for sku, p, warehouse_id in opening
+        ], ordered=False)
+        await CostLedgerEntry.insert_many([
+            build_entry(sku, 0, 0.0, p.stock_initial, p.cost, entry_type=CostEntryType.OPENING,
+                        reference_document=f"INITIAL-{sku}", created_at=now)
+            for sku, p, _ in opening
+        ])
+
+    # Cambios: revaluación si cambió el costo y ajuste de stock por el motor de stock.
+    revaluations = [
+        build_entry(sku, current.get("stock_current", 0), current.get("cost", 0.0),
+                    current.get("stock_current", 0), p.cost, entry_type=CostEntryType.REVALUATION, created_at=now)
+        for _, sku, p, current in updates if p.cost != current.get("cost", 0.0)
+    ]
+    if revaluations:
+        await CostLedgerEntry.insert_many(revaluations)
+
+    adjustments = []
+    stock_failed: Set[str] = set()
+    for row_number, sku, p, current in updates:
+        diff = p.stock_initial - current.get("stock_current", 0)
+        if not diff:
+            continue
+        warehouse_id = warehouses.get(sku)
+        # Se valida por fila antes del commit, que aplica todos los ajustes o ninguno.
+        if diff < 0 and not warehouse_id:
+            result.error(row_number, sku, "Para reducir el stock indique el almacén en la columna warehouse_id")
+            stock_failed.add(sku)
+            continue
+        movement = StockMovement(
+            product_sku=sku, quantity=abs(diff),
+            movement_type=MovementType.IN if diff > 0 else MovementType.OUT,
+            notes="Ajuste desde importación", unit_cost=p.cost, warehouse_id=warehouse_id,
+            reference_document=f"IMPORT-{now:%Y%m%d%H%M%S}",
+        )
+        adjustments.append((movement, diff))
+    if adjustments:
+        try:
+            await commit_stock_changes(adjustments)
+        except Exception as e:
+            failed = {m.product_sku for m, _ in adjustments}
+            stock_failed |= failed
+            for row_number, sku, _, _ in updates:
+                if sku in failed:
+                    result.error(row_number, sku, f"No se pudo ajustar el stock: {e}")
+    result.updated = len(updates) - len(stock_failed)
+
+    if deletes:
+        deleted = await collection.delete_many({"sku": {"$in": [sku for _, sku in deletes]}})
+        result.deleted = deleted.deleted_count
+
+    if result.inserted or result.deleted:
+        invalidate_cached_totals(Product)
+    touched = [sku for _, sku, _, _ in updates] + [sku for _, sku in deletes]
+    if touched:
+        await cache.invalidate(CACHE_PRODUCT, *touched)
+    return result
+
+
+async def run_import(job: ImportJob, path: str) -> ImportJob:
+    """Procesa el archivo del job por lotes, guardando el avance después de cada lote."""
+    reader = _read_xlsx(path) if job.file_format == "xlsx" else _read_csv(path)
+    seen: Set[str] = set()
+    try:
+        await job.set({"status": ImportJobStatus.RUNNING, "started_at": datetime.now()})
+        while True:
+            # La lectura y el parseo (síncronos) se hacen fuera del event loop.
+            rows = await asyncio.to_thread(lambda: list(islice(reader, IMPORT_CHUNK_SIZE)))
+            if not rows:
+                break
+            result = await _process_chunk(rows, seen)
+            summary = job.summary
+            summary.inserted += result.inserted
+            summary.updated += result.updated
+            summary.deleted += result.deleted
+            summary.errors += len(result.errors)
+            room = IMPORT_MAX_STORED_ERRORS - len(job.errors)
+            errors = job.errors + result.errors[:max(room, 0)]
+            await job.set({
+                "processed_rows": job.processed_rows + len(rows),
+                "summary": summary.model_dump(),
+                "errors": [e.model_dump() for e in errors],
+            })
+            job.summary, job.errors = summary, errors
+        await job.set({"status": ImportJobStatus.COMPLETED, "finished_at": datetime.now()})
+    except asyncio.CancelledError:
+        # Job cancelado o aplicación detenida: lo ya aplicado queda, el resto no.
+        await asyncio.shield(job.set({
+            "status": ImportJobStatus.FAILED,
+            "message": f"Importación cancelada tras {job.processed_rows} filas.",
+            "finished_at": datetime.now(),
+        }))
+        raise
+    except Exception as e:
+        logging.error("Fallo en la importación %s", job.id, exc_info=True)
+        await job.set({
+            "status": ImportJobStatus.FAILED,
+            "message": str(e),
+            "finished_at": datetime.now(),
+        })
+    finally:
+        reader.close()
+        os.unlink(path)
+    return job
+
+
+def upload_path(job: ImportJob) -> str:
+    """Archivo subido de la importación: se deriva del job, nunca de parámetros del cliente."""
+    return os.path.join(JOB_FILES_DIR, f"import_{job.id}.{job.file_format}")
+
+
+def _save_upload(source, path: str) -> None:
+    # El archivo debe quedar donde lo lea el worker que tome el job (JOB_FILES_DIR).
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as target:
+        shutil.copyfileobj(source, target)
+
+
+async def start_import(upload: UploadFile) -> ImportJob:
+    """
+    Crea el job y encola la importación en la cola de jobs de fondo (job
+    `import_products`). El archivo se copia a disco antes de responder, porque FastAPI
+    cierra el `UploadFile` al terminar la petición.
+    """
+    file_format = detect_format(upload.filename)
+    job = ImportJob(filename=upload.filename, file_format=file_format)
+    await job.insert()
+    path = upload_path(job)
+    try:
+        await asyncio.to_thread(_save_upload, upload.file, path)
+        await enqueue("import_products", {"import_job_id": str(job.id)}, internal=True)
+    except Exception as e:
+        # Sin job en la cola nadie procesaría la importación: no se deja PENDING.
+        await job.set({"status": ImportJobStatus.FAILED, "message": f"No se pudo encolar la importación: {e}",
+                       "finished_at": datetime.now()})
+        if os.path.exists(path):
+            os.unlink(path)
+        raise
+    return job
+
+
+async def get_import_job(job_id: str) -> ImportJob:
+    try:
+        job = await ImportJob.get(PydanticObjectId(job_id))
+    except Exception:
+        job = None
+    if not job:
+        raise NotFoundException("ImportJob", job_id)
+    return job
@@ -0,0 +1,175 @@
+"""
+Registro declarativo de índices.
+
+Cada modelo declara sus índices en `Settings.indexes` (además de los campos
+`Indexed(...)`). `reconcile_indexes` compara lo declarado con lo que existe en
+MongoDB y, según el modo, solo informa (dry-run) o crea los que faltan.
+Los índices existentes que no están declarados se reportan como "no declarados"
+junto con su uso según `$indexStats`; solo se eliminan si se pide explícitamente.
+"""
+import logging
+from typing import Any, Dict, List, Mapping, Sequence, Tuple, Type
+
+from beanie import Document
+from beanie.odm.settings.document import IndexModelField
+from beanie.odm.utils.pydantic import get_model_fields
+from beanie.odm.utils.typing import get_index_attributes
+from pymongo import IndexModel
+
+logger = logging.getLogger(__name__)
+
+# Opciones que cambian la semántica del índice y deben coincidir para considerarlo igual.
+_RELEVANT_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+_FLAG_OPTIONS = ("unique", "sparse")
+
+IndexSignature = Tuple[Tuple[Tuple[str, Any], ...], Tuple[Tuple[str, Any], ...]]
+
+
+def _plain(value: Any) -> Any:
+    """
+    Forma comparable de una opción: el servidor devuelve los documentos como SON y los
+    números como float, lo declarado son dicts y enteros.
+    """
+    if isinstance(value, Mapping):
+        return tuple((k, _plain(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_plain(v) for v in value)
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def _signature(key: Sequence[Tuple[str, Any]], options: Dict[str, Any]) -> IndexSignature:
+    # A diferencia de IndexModelField, se respeta el orden de las claves:
+    # (a, b) y (b, a) son índices distintos.
+    normalized_key = tuple((field, _plain(direction)) for field, direction in key)
+    normalized_options = tuple(
+        (opt, _plain(options[opt])) for opt in _RELEVANT_OPTIONS
+        # `unique: false` equivale a no declararlo; `expireAfterSeconds: 0` sí cuenta.
+        if opt in options and (options[opt] or opt not in _FLAG_OPTIONS)
+    )
+    return normalized_key, normalized_options
+
+
+def declared_indexes(model: Type[Document]) -> List[IndexModel]:
+    """Índices declarados para un modelo: campos `Indexed(...)` + `Settings.indexes`."""
+    result: List[IndexModel] = []
+
+    for name, field in get_model_fields(model).items():
+        attrs = get_index_attributes(field)
+        if attrs is not None:
+            result.append(IndexModel([(field.alias or name, attrs[0])], **attrs[1]))
+
+    for index in model.get_settings().indexes or []:
+        if isinstance(index, IndexModelField):
+            index = index.index
+        elif not isinstance(index, IndexModel):
+            # Beanie también admite "campo" o [("campo", dir)] en Settings.indexes
+            index = IndexModel(index if isinstance(index, list) else [(index, 1)])
+        result.append(index)
+    return result
+
+
+async def _index_usage(collection) -> Dict[str, int]:
+    try:
+        stats = await (await collection.aggregate([{"$indexStats": {}}])).to_list(None)
+    except Exception:
+        # $indexStats no está disponible en todos los planes/permisos de Atlas.
+        logger.warning("No se pudo leer $indexStats de %s", collection.name, exc_info=True)
+        return {}
+    return {s["name"]: s.get("accesses", {}).get("ops", 0) for s in stats}
+
+
+async def reconcile_model_indexes(
+    model: Type[Document], dry_run: bool = True, drop_undeclared: bool = False
+) -> Dict[str, Any]:
+    collection = model.get_pymongo_collection()
+    existing = await collection.index_information()
+    existing_by_signature = {
+        _signature(info["key"], info): name
+        for name, info in existing.items()
+        if name != "_id_"
+    }
+
+    declared = declared_indexes(model)
+    declared_signatures = set()
+    missing: List[IndexModel] = []
+    for index in declared:
+        doc = index.document
+        signature = _signature(list(doc["key"].items()), doc)
+        declared_signatures.add(signature)
+        if signature not in existing_by_signature:
+            missing.append(index)
+
+    undeclared = [
+        name for signature, name in existing_by_signature.items()
+        if signature not in declared_signatures
+    ]
+    usage = await _index_usage(collection) if undeclared else {}
+
+    report = {
+        "collection": collection.name,
+        "missing": [index.document["name"] for index in missing],
+        "undeclared": [{"name": name, "ops": usage.get(name)} for name in undeclared],
+        "created": [],
+        "dropped": [],
+        "errors": [],
+    }
+
+    if dry_run:
+        return report
+
+    # Índice por índice: uno que el servidor rechaza no impide crear los demás.
+    for index in missing:
+        try:
+            report["created"] += await collection.create_indexes([index])
+        except Exception as e:
+            logger.warning("No se pudo crear el índice %s en %s", index.document["name"], collection.name, exc_info=True)
+            report["errors"].append(f"{index.document['name']}: {e}")
+    if drop_undeclared:
+        for name in undeclared:
+            try:
+                await collection.drop_index(name)
+                report["dropped"].append(name)
+            except Exception as e:
+                logger.warning("No se pudo eliminar el índice %s de %s", name, collection.name, exc_info=True)
+                report["errors"].append(f"{name}: {e}")
+    return report
+
+
+async def reconcile_indexes(
+    models: Sequence[Type[Document]], dry_run: bool = True, drop_undeclared: bool = False
+) -> List[Dict[str, Any]]:
+    """Reconcilia los índices de todos los modelos y devuelve un reporte por colección."""
+    reports = []
+    for model in models:
+        try:
+            reports.append(await reconcile_model_indexes(model, dry_run=dry_run, drop_undeclared=drop_undeclared))
+        except Exception as e:
+            # Una colección con error no detiene la reconciliación de las siguientes.
+            logger.warning("No se pudieron reconciliar los índices de %s", model.__name__, exc_info=True)
+            reports.append({
+                "collection": model.get_settings().name, "missing": [], "undeclared": [],
+                "created": [], "dropped": [], "errors": [str(e)],
+            })
+    return reports
+
+
+def format_report(reports: List[Dict[str, Any]], dry_run: bool) -> str:
+    lines = [f"Reconciliación de índices ({'dry-run' if dry_run else 'aplicada'}):"]
+    for report in reports:
+        if not (report["missing"] or report["undeclared"] or report["errors"]):
+            continue
+        lines.append(f"  [{report['collection']}]")
+        for name in report["missing"]:
+            action = "creado" if name in report["created"] else "FALTA"
+            lines.append(f"    + {name} ({action})")
+        for item in report["undeclared"]:
+            ops = "sin datos de uso" if item["ops"] is None else f"{item['ops']} usos"
+            action = " (eliminado)" if item["name"] in report["dropped"] else ""
+            lines.append(f"    - {item['name']}: no declarado, {ops}{action}")
+        for error in report["errors"]:
+            lines.append(f"    ! ERROR {error}")
+    if len(lines) == 1:
+        lines.append("  Todos los índices declarados existen.")
+    return "\n".join(lines)
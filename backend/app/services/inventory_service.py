@@ -1,12 +1,37 @@
 
+import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from fastapi.encoders import jsonable_encoder
-from beanie import SortDirection
-from app.models.inventory import Product, StockMovement, MovementType, Warehouse
-from app.exceptions.business_exceptions import NotFoundException, ValidationException, InsufficientStockException, DuplicateException
+from app.models.inventory import Product, StockMovement, MovementType, Warehouse, Category
+from app.exceptions.business_exceptions import (
+    NotFoundException, ValidationException, InsufficientStockException, DuplicateException, StockConflictException,
+)
 
 from app.schemas.common import PaginatedResponse
+from app.schemas.inventory_schemas import PaginatedStockMovements
+from app.services.pagination_service import paginate, build_sort, invalidate_cached_totals, keyset_page
+from app.services.search_service import search_filter
+from app.services.stock_service import commit_stock_changes, get_warehouse_balances, DEFAULT_WAREHOUSE
+from app.services.cost_ledger_service import record_opening, record_revaluation
+from app.services.cache_service import cache, CACHE_PRODUCT, CACHE_WAREHOUSES, CACHE_CATEGORIES
+from app.services.document_number_service import get_document_number
+from app.services.projection_service import FieldSet, select_fields, page_options, page_model, VIEW_SUMMARY
+
+# Campos que aceptan `fields=` / `view=` en los listados (ver projection_service).
+PRODUCT_FIELDS = FieldSet(Product, {
+    VIEW_SUMMARY: ["sku", "name", "brand", "category_id", "price", "cost", "stock_current"],
+})
+# `created_at` va siempre: es la clave de la paginación por cursor.
+STOCK_MOVEMENT_FIELDS = FieldSet(StockMovement, {
+    VIEW_SUMMARY: [
+        "product_sku", "movement_type", "quantity", "stock_change", "warehouse_id", "reference_document",
+    ],
+}, always=("created_at",))
+
+# Reintentos de adjust_stock cuando el stock cambia entre la lectura y el update.
+ADJUST_STOCK_ATTEMPTS = 5
+
+logger = logging.getLogger(__name__)
 
 async def get_products(
     skip: int = 0, 
@@ -14,43 +39,62 @@ async def get_products(
     search: Optional[str] = None, 
     category: Optional[str] = None,
     sort_by: Optional[str] = "sku",
-    sort_order: Optional[str] = "asc"
+    sort_order: Optional[str] = "asc",
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
 ) -> PaginatedResponse[Product]:
+    selection = select_fields(PRODUCT_FIELDS, fields, view)
     query = {}
+    score = None
     
-    if search and search.strip():
-        query["$or"] = [
-            {"name": {"$regex": search, "$options": "i"}},
-            {"sku": {"$regex": search, "$options": "i"}}
-        ]
+    # Búsqueda por tokens indexados de SKU, nombre y marca (ver search_service)
+    search_query = search_filter(search)
+    if search_query:
+        search_condition, score = search_query
+        query.update(search_condition)
         
     if category:
         query["category"] = category
         
-    total = await Product.find(query).count()
-    
-    # Iniciar la consulta base
-    items_query = Product.find(query)
-
-    # Aplicar la ordenación solo si se especifica un campo
-    if sort_by:
-        order = SortDirection.ASCENDING if sort_order == "asc" else SortDirection.DESCENDING
-        items_query = items_query.sort((sort_by, order))
-        
-    items = await items_query.skip(skip).limit(limit).to_list()
-    
-    encoded_items = jsonable_encoder(items)
-    
-    return PaginatedResponse(
-        items=encoded_items,
-        total=total,
-        page=skip // limit + 1,
-        pages=(total + limit - 1) // limit,
-        size=limit
+    return await paginate(
+        Product, query, build_sort(sort_by, sort_order), skip=skip, limit=limit, score=score,
+        **page_options(selection)
     )
 
-async def get_product_by_sku(sku: str) -> Product:
-    product = await Product.find_one(Product.sku == sku)
+async def get_stock_movements(
+    query: Dict[str, Any],
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: Optional[str] = None,
+) -> PaginatedStockMovements:
+    """
+    Movimientos de stock, los más recientes primero. Con `cursor` (vacío para la primera
+    página) se pagina por (created_at, _id) y no se calcula el total.
+    """
+    selection = select_fields(STOCK_MOVEMENT_FIELDS, fields, view)
+    projection_model = selection.item_model if selection else None
+    page = page_model(PaginatedStockMovements, projection_model) if selection else PaginatedStockMovements
+
+    if cursor is not None:
+        movements, next_cursor = await keyset_page(
+            StockMovement, query, limit, cursor or None, projection_model=projection_model
+        )
+        return page(items=movements, next_cursor=next_cursor)
+
+    movements = await StockMovement.find(query, projection_model=projection_model).sort(
+        -StockMovement.created_at
+    ).skip(skip).limit(limit).to_list()
+    total = await StockMovement.find(query).count()
+    return page(items=movements, total=total)
+
+async def get_product_by_sku(sku: str, use_cache: bool = True) -> Product:
+    # Las rutas de escritura leen sin caché: calculan sobre el stock/costo vigentes.
+    if use_cache:
+        product = await cache.get_or_load(CACHE_PRODUCT, sku, lambda: Product.find_one(Product.sku == sku), Product)
+    else:
+        product = await Product.find_one(Product.sku == sku)
     if not product:
         raise NotFoundException("Product", sku)
     return product
@@ -62,6 +106,7 @@ async def create_product(product_data: Product, initial_stock: int = 0) -> Produ
     
     product_data.stock_current = initial_stock
     await product_data.insert()
+    invalidate_cached_totals(Product)
     
     if initial_stock > 0:
         movement = StockMovement(
@@ -71,14 +116,17 @@ async def create_product(product_data: Product, initial_stock: int = 0) -> Produ
             notes="Inventario Inicial",
             date=datetime.now(),
             unit_cost=product_data.cost,
+            stock_change=initial_stock,
             reference_document=f"INITIAL-{product_data.sku}"
         )
         await movement.insert()
+        await record_opening(product_data, movement.reference_document)
         
     return product_data
 
-async def update_product(sku: str, update_data: Product, new_stock: int = None) -> Product:
-    product = await get_product_by_sku(sku)
+async def update_product(sku: str, update_data: Product, new_stock: int = None, warehouse_id: Optional[str] = None) -> Product:
+    product = await get_product_by_sku(sku, use_cache=False)
+    previous_cost = product.cost
     
     product.name = update_data.name
     product.price = update_data.price
@@ -87,11 +135,25 @@ async def update_product(sku: str, update_data: Product, new_stock: int = None)
     product.description = update_data.description
     if getattr(update_data, 'measurements', None) is not None:
         product.measurements = update_data.measurements
+    product.refresh_search_tokens()
     
-    await product.save()
+    # $set solo de los campos editados: save() reemplazaría el documento completo y
+    # pisaría el stock_current (y el costo) actualizados por movimientos concurrentes.
+    await product.set({
+        "name": product.name,
+        "price": product.price,
+        "cost": product.cost,
+        "brand": product.brand,
+        "description": product.description,
+        "measurements": product.measurements,
+        "search_tokens": product.search_tokens,
+    })
+    await cache.invalidate(CACHE_PRODUCT, sku)
+    if product.cost != previous_cost:
+        await record_revaluation(product, previous_cost)
     
     if new_stock is not None and new_stock != product.stock_current:
-        product = await adjust_stock(sku, new_stock, "Ajuste desde edición de producto")
+        product = await adjust_stock(sku, new_stock, "Ajuste desde edición de producto", warehouse_id)
         
     return product
 
@@ -100,88 +162,140 @@ async def delete_product(sku: str) -> bool:
     if not product:
         raise NotFoundException("Product", sku)
     await product.delete()
+    invalidate_cached_totals(Product)
+    await cache.invalidate(CACHE_PRODUCT, sku)
     return True
 
-async def adjust_stock(sku: str, new_quantity: int, notes: str, movement_type: MovementType = MovementType.ADJUSTMENT) -> Product:
-    product = await get_product_by_sku(sku)
-    
-    diff = new_quantity - product.stock_current
-    if diff == 0:
-        return product
-        
-    if movement_type == MovementType.ADJUSTMENT:
-        actual_type = MovementType.IN if diff > 0 else MovementType.OUT
-    else:
-        actual_type = movement_type
+async def _require_warehouse(warehouse_id: Optional[str]) -> str:
+    """Valida el almacén de un movimiento que puede reducir stock (no se asume SL01)."""
+    if not warehouse_id:
+        raise ValidationException("Indique el almacén (warehouse_id) del movimiento.")
+    if warehouse_id not in {w.code for w in await get_all_warehouses()}:
+        raise NotFoundException("Warehouse", warehouse_id)
+    return warehouse_id
 
-    movement = StockMovement(
-        product_sku=sku,
-        quantity=abs(diff),
-        movement_type=actual_type,
-        notes=notes,
-        date=datetime.now(),
-        unit_cost=product.cost,
-        reference_document=f"ADJUST-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    )
-    await movement.insert()
-    
-    product.stock_current = new_quantity
-    await product.save()
-    
-    return product
+async def adjust_stock(
+    sku: str, new_quantity: int, notes: str, warehouse_id: Optional[str],
+    movement_type: MovementType = MovementType.ADJUSTMENT,
+) -> Product:
+    """
+    Lleva el stock total del producto a `new_quantity`; la diferencia se aplica al
+    saldo de `warehouse_id`. La diferencia se calcula con el stock leído y el update
+    solo se aplica si el stock sigue siendo ese: si otro movimiento lo cambió entre
+    medio, se vuelve a leer y a calcular (hasta ADJUST_STOCK_ATTEMPTS veces).
+    """
+    warehouse_id = await _require_warehouse(warehouse_id)
+    for _ in range(ADJUST_STOCK_ATTEMPTS):
+        product = await get_product_by_sku(sku, use_cache=False)
 
-async def get_warehouses() -> List[Warehouse]:
-    return await Warehouse.find(Warehouse.is_active == True).to_list()
+        diff = new_quantity - product.stock_current
+        if diff == 0:
+            return product
+
+        if movement_type == MovementType.ADJUSTMENT:
+            actual_type = MovementType.IN if diff > 0 else MovementType.OUT
+        else:
+            actual_type = movement_type
 
-async def register_transfer_out(target_warehouse_id: str, items: List[Dict[str, Any]], notes: str = None) -> Dict[str, Any]:
-    target_warehouse = await Warehouse.find_one({"code": target_warehouse_id})
-    if not target_warehouse:
-        raise NotFoundException("Warehouse", target_warehouse_id)
-        
-    ref_id = f"GUIA-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-    transferred_items = []
-    total_cost = 0
-    
-    for item in items:
-        sku = item['sku']
-        quantity = item['quantity']
-        
-        product = await get_product_by_sku(sku)
-        
-        if product.stock_current < quantity:
-            raise InsufficientStockException(sku, product.stock_current, quantity)
-            
         movement = StockMovement(
             product_sku=sku,
-            quantity=quantity,
-            movement_type=MovementType.TRANSFER_OUT,
-            warehouse_id="SL01",
-            target_warehouse_id=target_warehouse.code,
-            reference_document=ref_id,
-            unit_cost=product.cost,
+            quantity=abs(diff),
+            movement_type=actual_type,
             notes=notes,
-            date=datetime.now()
+            date=datetime.now(),
+            unit_cost=product.cost,
+            warehouse_id=warehouse_id,
+            reference_document=f"ADJUST-{datetime.now().strftime('%Y%m%d%H%M%S')}"
         )
-        await movement.insert()
-        
-        product.stock_current -= quantity
-        await product.save()
-        
-        transferred_items.append({
-            "sku": product.sku,
-            "name": product.name,
-            "quantity": quantity
-        })
-        total_cost += quantity * product.cost
-        
+        try:
+            products = await commit_stock_changes([(movement, diff)], expected_stock={sku: product.stock_current})
+            return products[sku]
+        except StockConflictException:
+            continue
+    raise ValidationException(f"El stock de {sku} cambió durante el ajuste, reintente la operación.")
+
+async def get_all_warehouses() -> List[Warehouse]:
+    return await cache.get_or_load(CACHE_WAREHOUSES, "all", lambda: Warehouse.find_all().to_list(), Warehouse)
+
+async def get_warehouses() -> List[Warehouse]:
+    return [w for w in await get_all_warehouses() if w.is_active]
+
+async def get_categories() -> List[Category]:
+    return await cache.get_or_load(CACHE_CATEGORIES, "all", lambda: Category.find_all().to_list(), Category)
+
+async def create_category(category: Category) -> Category:
+    if await Category.find_one(Category.name == category.name):
+        raise DuplicateException("Category", "name", category.name)
+    await category.insert()
+    await cache.invalidate(CACHE_CATEGORIES, "all")
+    return category
+
+async def register_transfer(
+    source_warehouse_id: str,
+    target_warehouse_id: str,
+    items: List[Dict[str, Any]],
+    notes: str = None
+) -> Dict[str, Any]:
+    """
+    Transfiere stock entre almacenes. Valida todas las líneas de una vez (una consulta
+    `$in` por colección) y registra los pares TRANSFER_OUT/TRANSFER_IN en una sola
+    operación atómica: si una línea no tiene saldo en el origen, no se transfiere nada.
+    El stock total del producto no cambia.
+    """
+    if source_warehouse_id == target_warehouse_id:
+        raise ValidationException("El almacén de origen y destino deben ser distintos.")
+    if not items:
+        raise ValidationException("La transferencia no tiene ítems.")
+
+    by_code = {w.code: w for w in await get_all_warehouses()}
+    for code in (source_warehouse_id, target_warehouse_id):
+        if code not in by_code:
+            raise NotFoundException("Warehouse", code)
+
+    # Líneas repetidas del mismo SKU se agrupan en un solo par de movimientos.
+    quantities: Dict[str, int] = {}
+    for item in items:
+        if item['quantity'] <= 0:
+            raise ValidationException(f"Cantidad inválida para {item['sku']}: {item['quantity']}")
+        quantities[item['sku']] = quantities.get(item['sku'], 0) + item['quantity']
+
+    ref_id = await get_document_number("delivery_guide")
+    changes = []
+    for sku, quantity in quantities.items():
+        for movement_type in (MovementType.TRANSFER_OUT, MovementType.TRANSFER_IN):
+            movement = StockMovement(
+                product_sku=sku,
+                quantity=quantity,
+                movement_type=movement_type,
+                warehouse_id=source_warehouse_id,
+                target_warehouse_id=target_warehouse_id,
+                reference_document=ref_id,
+                notes=notes,
+            )
+            changes.append((movement, 0))
+
+    await commit_stock_changes(changes)
+    total_cost = sum(
+        movement.quantity * movement.unit_cost
+        for movement, _ in changes if movement.movement_type == MovementType.TRANSFER_OUT
+    )
+
     return {
         "message": "Transfer registered successfully",
         "guide_number": ref_id,
-        "target_warehouse": target_warehouse.name,
-        "items_count": len(transferred_items),
+        "source_warehouse": by_code[source_warehouse_id].name,
+        "target_warehouse": by_code[target_warehouse_id].name,
+        "items_count": len(quantities),
         "total_cost": round(total_cost, 3)
     }
 
+async def register_transfer_out(target_warehouse_id: str, items: List[Dict[str, Any]], notes: str = None) -> Dict[str, Any]:
+    return await register_transfer(DEFAULT_WAREHOUSE, target_warehouse_id, items, notes)
+
+async def get_stock_by_warehouse(sku: str) -> Dict[str, int]:
+    balances = await get_warehouse_balances([sku])
+    return balances[sku]
+
 async def calculate_weighted_average_cost(product: Product, new_quantity: int, new_unit_cost: float) -> float:
     current_value = product.stock_current * product.cost
     new_value = new_quantity * new_unit_cost
@@ -197,44 +311,89 @@ async def register_movement(
     quantity: int, 
     movement_type: MovementType, 
     reference: str,
-    unit_cost: Optional[float] = None
+    unit_cost: Optional[float] = None,
+    warehouse_id: Optional[str] = None,
 ) -> StockMovement:
-    product = await get_product_by_sku(sku)
-
-    if movement_type == MovementType.IN and unit_cost is not None:
-        new_average_cost = await calculate_weighted_average_cost(product, quantity, unit_cost)
-        product.cost = new_average_cost
-
+    """
+    Registra un ingreso o salida simple. Las salidas (OUT) requieren `warehouse_id`;
+    un ingreso sin almacén entra al principal.
+    """
+    if movement_type == MovementType.OUT or warehouse_id:
+        warehouse_id = await _require_warehouse(warehouse_id)
     movement = StockMovement(
         product_sku=sku,
         quantity=quantity,
         movement_type=movement_type,
-        unit_cost=unit_cost or product.cost,
+        unit_cost=unit_cost,
+        warehouse_id=warehouse_id,
         reference_document=reference,
         date=datetime.now()
     )
-    await movement.insert()
 
     if movement_type == MovementType.IN:
-        product.stock_current += quantity
+        delta = quantity
     elif movement_type == MovementType.OUT:
-        if product.stock_current < quantity:
-            raise InsufficientStockException(sku, product.stock_current, quantity)
-        product.stock_current -= quantity
-    
-    await product.save()
+        delta = -quantity
+    else:
+        delta = 0
+
+    # El costo promedio ponderado de los ingresos se recalcula en el mismo update atómico.
+    await commit_stock_changes([(movement, delta)], update_cost=True)
+    if movement_type == MovementType.IN:
+        await _allocate_backorders({sku: quantity}, reference)
     return movement
 
-async def create_inventory_adjustment(sku: str, quantity_adjusted: int, reason: str, responsible: Optional[str] = None) -> Product:
-    if quantity_adjusted == 0:
-        raise ValidationException("La cantidad a ajustar no puede ser cero.")
+async def register_reception(
+    items: List[Dict[str, Any]], reference: str, warehouse_id: Optional[str] = None, notes: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Recepción de compra de varias líneas: un solo commit de stock (costo promedio
+    incluido) y una sola asignación en bloque a las cotizaciones con backorder.
+    """
+    if not items:
+        raise ValidationException("La recepción no tiene ítems.")
+    if warehouse_id:
+        await _require_warehouse(warehouse_id)
+    changes = []
+    quantities: Dict[str, int] = {}
+    for item in items:
+        if item['quantity'] <= 0:
+            raise ValidationException(f"Cantidad inválida para {item['sku']}: {item['quantity']}")
+        movement = StockMovement(
+            product_sku=item['sku'],
+            quantity=item['quantity'],
+            movement_type=MovementType.IN,
+            unit_cost=item.get('unit_cost'),
+            warehouse_id=warehouse_id,
+            reference_document=reference,
+            notes=notes,
+        )
+        changes.append((movement, item['quantity']))
+        quantities[item['sku']] = quantities.get(item['sku'], 0) + item['quantity']
 
-    product = await get_product_by_sku(sku)
+    await commit_stock_changes(changes, update_cost=True)
+    return {
+        "reference_document": reference,
+        "items_count": len(changes),
+        "allocated": await _allocate_backorders(quantities, reference),
+    }
 
-    if quantity_adjusted < 0 and product.stock_current < abs(quantity_adjusted):
-        raise InsufficientStockException(sku, product.stock_current, abs(quantity_adjusted))
+async def _allocate_backorders(quantities: Dict[str, int], reference: str) -> Dict[str, int]:
+    # El stock ya quedó registrado: un fallo al asignar no revierte el ingreso, se deja
+    # en el log y las líneas siguen pendientes para el próximo ingreso.
+    from app.services.backorder_service import allocate_incoming
+    try:
+        return await allocate_incoming(quantities, reference)
+    except Exception:
+        logger.exception("No se pudieron asignar backorders del ingreso %s", reference)
+        return {}
 
-    actual_type = MovementType.IN if quantity_adjusted > 0 else MovementType.OUT
+async def create_inventory_adjustment(
+    sku: str, quantity_adjusted: int, reason: str, warehouse_id: Optional[str], responsible: Optional[str] = None
+) -> Product:
+    if quantity_adjusted == 0:
+        raise ValidationException("La cantidad a ajustar no puede ser cero.")
+    warehouse_id = await _require_warehouse(warehouse_id)
 
     movement = StockMovement(
         product_sku=sku,
@@ -242,12 +401,9 @@ async def create_inventory_adjustment(sku: str, quantity_adjusted: int, reason:
         movement_type=MovementType.ADJUSTMENT,
         notes=reason,
         responsible=responsible,
-        unit_cost=product.cost,
+        warehouse_id=warehouse_id,
         reference_document=f"ADJUST-{datetime.now().strftime('%Y%m%d%H%M%S')}"
     )
-    await movement.insert()
 
-    product.stock_current += quantity_adjusted
-    await product.save()
-
-    return product
+    products = await commit_stock_changes([(movement, quantity_adjusted)])
+    return products[sku]
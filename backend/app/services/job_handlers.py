@@ -0,0 +1,95 @@
+"""
+Tipos de job de fondo (ver job_service.py). Cada handler recibe el `JobContext` y los
+`params` del job, y devuelve el `result` que queda guardado en el job.
+"""
+import os
+from datetime import date, datetime
+from typing import Optional
+
+from beanie import PydanticObjectId
+
+from app.config import JOB_FILES_DIR
+from app.models.inventory import ImportJob, ImportJobStatus
+from app.services.job_service import JobContext, job_kind
+
+
+@job_kind("import_products", public=False,
+          description="Importación masiva de productos (la encola POST /inventory/products/import).")
+async def import_products(ctx: JobContext, import_job_id: str):
+    from app.services.import_service import run_import, upload_path
+
+    import_job = await ImportJob.get(PydanticObjectId(import_job_id))
+    if import_job is None:
+        return None
+    path = upload_path(import_job)
+    if import_job.status != ImportJobStatus.PENDING or not os.path.exists(path):
+        # Retomada tras una caída: parte del archivo ya se aplicó y repetirlo no es seguro.
+        await import_job.set({
+            "status": ImportJobStatus.FAILED,
+            "message": "La importación se interrumpió; revise los cambios y vuelva a importar las filas restantes.",
+            "finished_at": datetime.now(),
+        })
+        if os.path.exists(path):
+            os.unlink(path)
+        return {"import_job_id": import_job_id, "status": ImportJobStatus.FAILED.value}
+    import_job = await run_import(import_job, path)
+    return {"import_job_id": import_job_id, "status": import_job.status.value, **import_job.summary.model_dump()}
+
+
+@job_kind("export", max_attempts=2, description="Exportación CSV/XLSX a un archivo descargable (params: export, format, search).")
+async def export(ctx: JobContext, export: str, format: str = "csv", search: Optional[str] = None):
+    from app.services.export_service import write_export, build_query
+
+    await ctx.progress(0.0, f"Exportando {export}", force=True)
+    return await write_export(export, build_query(search), format, directory=JOB_FILES_DIR)
+
+
+@job_kind("rebuild_rollups", max_attempts=3, description="Recalcula los resúmenes diarios (params: kind, since, until).")
+async def rebuild_rollups(ctx: JobContext, kind: Optional[str] = None,
+                         since: Optional[str] = None, until: Optional[str] = None):
+    from app.services.rollup_service import rebuild_rollups as rebuild, ROLLUPS
+
+    kinds = [kind] if kind else list(ROLLUPS)
+    since_date = date.fromisoformat(since) if since else None
+    until_date = date.fromisoformat(until) if until else None
+    counts = {}
+    for n, name in enumerate(kinds):
+        await ctx.progress(n / len(kinds), f"Resúmenes de {name}", force=True)
+        counts[name] = await rebuild(name, since_date, until_date)
+    return {"rollups": counts}
+
+
+@job_kind("rebuild_checkpoints", max_attempts=3, description="Reconstruye los checkpoints de stock (params: period).")
+async def rebuild_checkpoints(ctx: JobContext, period: Optional[str] = None):
+    from app.services.checkpoint_service import rebuild_checkpoints as rebuild
+    from app.models.inventory import CheckpointPeriod
+
+    periods = [period] if period else [p.value for p in CheckpointPeriod]
+    counts = {}
+    for n, name in enumerate(periods):
+        await ctx.progress(n / len(periods), f"Checkpoints {name}", force=True)
+        counts[name] = await rebuild(name)
+    return {"checkpoints": counts}
+
+
+@job_kind("reconcile_indexes", description="Compara (y con apply=true crea) los índices declarados (params: apply).")
+async def reconcile_indexes(ctx: JobContext, apply: bool = False):
+    from app.database import get_document_models
+    from app.services.index_service import reconcile_indexes as reconcile
+
+    reports = await reconcile(get_document_models(), dry_run=not apply)
+    return {"applied": apply, "reports": [r for r in reports if r["missing"] or r["undeclared"] or r["errors"]]}
+
+
+@job_kind("replenishment", max_attempts=2, description="Motor de reposición; el cálculo vectorial corre en el pool de procesos.")
+async def replenishment(ctx: JobContext, history_days: Optional[int] = None, lead_time_days: Optional[float] = None,
+                        review_days: Optional[float] = None, service_level: Optional[float] = None,
+                        create_orders: bool = True):
+    from app.services.replenishment_service import run_replenishment
+
+    run = await run_replenishment(history_days, lead_time_days, review_days, service_level,
+                                  create_orders, run_cpu=ctx.run_cpu)
+    return {
+        "run_id": str(run.id), "skus_analyzed": run.skus_analyzed, "skus_to_reorder": run.skus_to_reorder,
+        "draft_order_ids": run.draft_order_ids, "duration_ms": run.duration_ms,
+    }
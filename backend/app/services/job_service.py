@@ -0,0 +1,411 @@
+"""
+Jobs en segundo plano: cola en MongoDB y workers dentro del proceso de la API.
+
+Importaciones, exportaciones, reconstrucciones y recálculos no se ejecutan dentro de
+la solicitud (bloquean el event loop y chocan con el timeout de Render): la ruta
+encola un `Job` y responde 202; el cliente consulta el avance en `/api/v1/jobs/{id}`.
+
+- Cola: la colección `jobs`. Un worker toma el siguiente pendiente (mayor prioridad,
+  luego el más antiguo) con un `find_one_and_update` atómico, así varios workers y
+  varios procesos comparten la cola sin tomar dos veces el mismo job.
+- Workers: JOB_WORKERS tareas asyncio por proceso. El trabajo con I/O (MongoDB) corre
+  en el event loop; el cálculo pesado se envía al pool de procesos con
+  `JobContext.run_cpu` (JOB_PROCESS_WORKERS procesos), para no frenar las solicitudes.
+- Reclamo: mientras corre, el worker renueva `locked_until` cada tercio de
+  JOB_LEASE_SECONDS. Si el proceso muere, al vencer el reclamo otro worker retoma el
+  job (cuenta como un intento).
+- Reintentos: un job que falla vuelve a PENDING con espera exponencial
+  (JOB_RETRY_BACKOFF · 2^(intento-1)) hasta agotar `max_attempts`; luego queda FAILED.
+- Cancelación: un pendiente pasa a CANCELLED directamente; en uno en curso se marca
+  `cancel_requested` y el worker que lo ejecuta (en este u otro proceso) cancela la
+  tarea en su siguiente renovación del reclamo.
+- Avance: el job informa `progress` (0..1) y un mensaje con `JobContext.progress`.
+
+Los tipos de job se registran con `@job_kind` (ver job_handlers.py).
+"""
+import asyncio
+import contextvars
+import inspect
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from beanie import PydanticObjectId
+from pymongo import ReturnDocument
+
+from app.config import (
+    JOB_WORKERS, JOB_PROCESS_WORKERS, JOB_POLL_INTERVAL, JOB_LEASE_SECONDS, JOB_RETRY_BACKOFF,
+    JOB_RETENTION_DAYS, JOB_FILES_DIR,
+)
+from app.exceptions.business_exceptions import NotFoundException, ValidationException
+from app.models.jobs import Job, JobStatus
+from app.schemas.common import PaginatedResponse
+from app.services.pagination_service import paginate
+
+logger = logging.getLogger(__name__)
+
+CLAIM_SORT = [("priority", -1), ("run_after", 1), ("_id", 1)]
+MAX_RETRY_DELAY = 3600
+# Cada cuánto se borran de JOB_FILES_DIR los archivos más antiguos que JOB_RETENTION_DAYS.
+FILES_SWEEP_INTERVAL = 3600
+# Escrituras de avance como máximo una vez por este intervalo (segundos).
+PROGRESS_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class JobKind:
+    name: str
+    handler: Callable[..., Awaitable[Optional[Dict[str, Any]]]]
+    max_attempts: int = 1
+    description: str = ""
+    # False: solo lo encola el propio servidor (p. ej. importaciones), no POST /api/v1/jobs.
+    public: bool = True
+
+
+REGISTRY: Dict[str, JobKind] = {}
+
+
+def job_kind(name: str, max_attempts: int = 1, description: str = "", public: bool = True):
+    """
+    Registra un tipo de job. El handler es `async def handler(ctx, **params)` y
+    devuelve un dict (el `result` del job) o None.
+    """
+    def register(handler):
+        REGISTRY[name] = JobKind(name, handler, max_attempts, description, public)
+        return handler
+    return register
+
+
+def _load_handlers() -> Dict[str, JobKind]:
+    # Los handlers importan servicios que a su vez encolan jobs: se cargan al usarlos.
+    from app.services import job_handlers  # noqa: F401
+    return REGISTRY
+
+
+class JobCancelled(Exception):
+    """Se pidió cancelar el job (o el worker perdió su reclamo)."""
+
+
+class JobContext:
+    """Lo que ve un handler del job en curso: parámetros, avance, cancelación y pool de procesos."""
+
+    def __init__(self, runner: "JobRunner", job: Job):
+        self.runner = runner
+        self.job = job
+        self.cancelled = False
+        self._last_progress = 0.0
+
+    @property
+    def job_id(self) -> str:
+        return str(self.job.id)
+
+    async def progress(self, fraction: float, message: Optional[str] = None, force: bool = False) -> None:
+        """Informa el avance (0..1). Las escrituras se agrupan a una por PROGRESS_INTERVAL."""
+        if self.cancelled:
+            raise JobCancelled()
+        loop = asyncio.get_running_loop()
+        if not force and loop.time() - self._last_progress < PROGRESS_INTERVAL:
+            return
+        self._last_progress = loop.time()
+        update: Dict[str, Any] = {"progress": round(min(max(fraction, 0.0), 1.0), 4)}
+        if message is not None:
+            update["progress_message"] = message
+        await Job.get_pymongo_collection().update_one(
+            {"_id": self.job.id, "locked_by": self.runner.worker_id}, {"$set": update}
+        )
+
+    async def run_cpu(self, fn: Callable, *args, **kwargs):
+        """Ejecuta `fn(*args, **kwargs)` en el pool de procesos (argumentos y resultado serializables)."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.runner.process_pool(), partial(fn, *args, **kwargs)
+        )
+
+
+class JobRunner:
+    def __init__(self, workers: int = JOB_WORKERS, process_workers: int = JOB_PROCESS_WORKERS):
+        self.workers = workers
+        self.process_workers = process_workers
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[PydanticObjectId, tuple] = {}  # job id -> (tarea, contexto)
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # "spawn": un fork copiaría el event loop y los sockets del cliente de MongoDB.
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(1, self.process_workers), mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def start(self) -> None:
+        if self.started:
+            return
+        _load_handlers()
+        self._stopping = False
+        for n in range(self.workers):
+            # Contexto vacío: los comandos de los jobs no se atribuyen a ninguna solicitud.
+            self._tasks.append(asyncio.create_task(
+                self._work(), name=f"job-worker-{n}", context=contextvars.Context()
+            ))
+        self._tasks.append(asyncio.create_task(self._sweep_files(), name="job-files-sweep"))
+
+    async def stop(self) -> None:
+        """Detiene los workers; los jobs en curso vuelven a la cola para otro proceso."""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def notify(self) -> None:
+        """Despierta a los workers de este proceso (hay un job nuevo)."""
+        self._wakeup.set()
+
+    def cancel_local(self, job_id: PydanticObjectId) -> bool:
+        running = self._running.get(job_id)
+        if running is None:
+            return False
+        task, context = running
+        context.cancelled = True
+        task.cancel()
+        return True
+
+    async def _sweep_files(self) -> None:
+        """Borra los archivos de jobs vencidos (los jobs terminados se borran por TTL)."""
+        while True:
+            cutoff = datetime.now().timestamp() - JOB_RETENTION_DAYS * 86400
+            try:
+                for entry in await asyncio.to_thread(lambda: list(os.scandir(JOB_FILES_DIR))):
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        await asyncio.to_thread(os.remove, entry.path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                logger.warning("No se pudieron limpiar los archivos de jobs", exc_info=True)
+            await asyncio.sleep(FILES_SWEEP_INTERVAL)
+
+    # --- Worker ---
+
+    async def _work(self) -> None:
+        while not self._stopping:
+            try:
+                job = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("No se pudo leer la cola de jobs", exc_info=True)
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _claim(self) -> Optional[Job]:
+        now = datetime.now()
+        document = await Job.get_pymongo_collection().find_one_and_update(
+            {
+                "kind": {"$in": list(REGISTRY)},
+                "$or": [
+                    {"status": JobStatus.PENDING.value, "run_after": {"$lte": now}},
+                    # Reclamo vencido: el proceso que lo ejecutaba se detuvo.
+                    {"status": JobStatus.RUNNING.value, "locked_until": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING.value,
+                    "locked_by": self.worker_id,
+                    "locked_until": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                    "started_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=CLAIM_SORT,
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is None:
+            return None
+        job = Job.model_validate(document)
+        if job.attempts > job.max_attempts or job.cancel_requested:
+            # Retomado tras una caída sin intentos disponibles, o cancelado mientras tanto.
+            if job.cancel_requested:
+                await self._finish(job, JobStatus.CANCELLED, error="Cancelado.")
+            else:
+                await self._finish(job, JobStatus.FAILED, error="El proceso que ejecutaba el job se detuvo.")
+            return None
+        return job
+
+    async def _run(self, job: Job) -> None:
+        kind = REGISTRY[job.kind]
+        context = JobContext(self, job)
+        task = asyncio.create_task(kind.handler(context, **job.params))
+        self._running[job.id] = (task, context)
+        heartbeat = asyncio.create_task(self._heartbeat(job, task, context))
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if not context.cancelled:
+                # Cierre de la aplicación: el job vuelve a la cola sin gastar el intento.
+                await self._release(job)
+                raise
+            await self._finish(job, JobStatus.CANCELLED, error="Cancelado.")
+        except JobCancelled:
+            await self._finish(job, JobStatus.CANCELLED, error="Cancelado.")
+        except Exception as e:
+            message = str(e) or type(e).__name__
+            if isinstance(e, (ValidationException, NotFoundException)) or job.attempts >= job.max_attempts:
+                logger.error("Job %s (%s) falló: %s", job.id, job.kind, message, exc_info=True)
+                await self._finish(job, JobStatus.FAILED, error=message)
+            else:
+                await self._retry(job, message)
+        else:
+            await self._finish(job, JobStatus.COMPLETED, result=result)
+        finally:
+            heartbeat.cancel()
+            self._running.pop(job.id, None)
+
+    async def _heartbeat(self, job: Job, task: asyncio.Task, context: JobContext) -> None:
+        collection = Job.get_pymongo_collection()
+        while not task.done():
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            document = await collection.find_one_and_update(
+                {"_id": job.id, "locked_by": self.worker_id},
+                {"$set": {"locked_until": datetime.now() + timedelta(seconds=JOB_LEASE_SECONDS)}},
+                projection={"cancel_requested": 1},
+            )
+            if document is None or document.get("cancel_requested"):
+                # Se pidió cancelar, o el reclamo venció y otro worker tomó el job.
+                context.cancelled = True
+                task.cancel()
+                return
+
+    async def _finish(self, job: Job, status: JobStatus, result=None, error: Optional[str] = None) -> None:
+        update: Dict[str, Any] = {"status": status.value, "finished_at": datetime.now(), "locked_until": None}
+        if status == JobStatus.COMPLETED:
+            update.update(progress=1.0, result=result, error=None)
+        else:
+            update["error"] = error
+        await Job.get_pymongo_collection().update_one({"_id": job.id, "locked_by": self.worker_id}, {"$set": update})
+
+    async def _retry(self, job: Job, error: str) -> None:
+        delay = min(JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1), MAX_RETRY_DELAY)
+        logger.warning("Job %s (%s) falló (intento %d); se reintenta en %d s: %s",
+                       job.id, job.kind, job.attempts, delay, error)
+        await Job.get_pymongo_collection().update_one({"_id": job.id, "locked_by": self.worker_id}, {"$set": {
+            "status": JobStatus.PENDING.value, "error": error, "locked_by": None, "locked_until": None,
+            "run_after": datetime.now() + timedelta(seconds=delay),
+        }})
+
+    async def _release(self, job: Job) -> None:
+        await asyncio.shield(Job.get_pymongo_collection().update_one(
+            {"_id": job.id, "locked_by": self.worker_id},
+            {"$set": {"status": JobStatus.PENDING.value, "locked_by": None, "locked_until": None},
+             "$inc": {"attempts": -1}},
+        ))
+
+
+runner = JobRunner()
+
+
+# ================================================
+# ================== COLA ========================
+# ================================================
+
+async def enqueue(
+    kind: str,
+    params: Optional[Dict[str, Any]] = None,
+    priority: int = 0,
+    max_attempts: Optional[int] = None,
+    internal: bool = False,
+) -> Job:
+    """
+    Encola un job del tipo `kind` y despierta a los workers de este proceso. Los tipos
+    no públicos solo se encolan desde el servidor (`internal=True`).
+    """
+    kinds = _load_handlers()
+    if kind not in kinds or not (internal or kinds[kind].public):
+        available = ", ".join(sorted(k.name for k in kinds.values() if k.public))
+        raise ValidationException(f"Tipo de job desconocido: {kind}. Disponibles: {available}.")
+    try:
+        inspect.signature(kinds[kind].handler).bind(None, **(params or {}))
+    except TypeError as e:
+        raise ValidationException(f"Parámetros inválidos para el job {kind}: {e}")
+    job = Job(
+        kind=kind,
+        params=params or {},
+        priority=priority,
+        max_attempts=max(1, max_attempts or kinds[kind].max_attempts),
+    )
+    await job.insert()
+    runner.notify()
+    return job
+
+
+def list_kinds() -> List[JobKind]:
+    """Tipos que se pueden encolar por la API."""
+    return sorted((kind for kind in _load_handlers().values() if kind.public), key=lambda kind: kind.name)
+
+
+async def get_job(job_id: str) -> Job:
+    try:
+        job = await Job.get(PydanticObjectId(job_id))
+    except Exception:
+        job = None
+    if not job:
+        raise NotFoundException("Job", job_id)
+    return job
+
+
+async def get_jobs(
+    skip: int = 0, limit: int = 20, status: Optional[JobStatus] = None, kind: Optional[str] = None,
+) -> PaginatedResponse[Job]:
+    query: Dict[str, Any] = {}
+    if status:
+        query["status"] = status.value
+    if kind:
+        query["kind"] = kind
+    return await paginate(Job, query, [("created_at", -1)], skip=skip, limit=limit)
+
+
+async def cancel_job(job_id: str) -> Job:
+    """
+    Cancela un job: si está pendiente, de inmediato; si está en curso, lo detiene el
+    worker que lo ejecuta. Un job terminado no se puede cancelar.
+    """
+    job = await get_job(job_id)
+    collection = Job.get_pymongo_collection()
+    cancelled = await collection.find_one_and_update(
+        {"_id": job.id, "status": JobStatus.PENDING.value},
+        {"$set": {"status": JobStatus.CANCELLED.value, "cancel_requested": True, "finished_at": datetime.now()}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if cancelled is None:
+        cancelled = await collection.find_one_and_update(
+            {"_id": job.id, "status": JobStatus.RUNNING.value},
+            {"$set": {"cancel_requested": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if cancelled is None:
+            raise ValidationException(f"El job {job_id} ya terminó ({job.status.value}).")
+        runner.cancel_local(job.id)
+    return Job.model_validate(cancelled)
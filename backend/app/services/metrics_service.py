@@ -0,0 +1,194 @@
+"""
+Instrumentación por solicitud y métricas de Prometheus (`GET /metrics`).
+
+- `MetricsMiddleware` (ASGI) mide cada solicitud HTTP por método, ruta y estado. La
+  ruta es la plantilla (`/api/v1/inventory/products/{sku}`), no la URL, para acotar la
+  cardinalidad; lo que no coincide con ninguna ruta cuenta como "unmatched".
+- `CommandMonitor` (CommandListener de pymongo) cuenta los comandos enviados a MongoDB
+  y su duración, y los asigna a la solicitud en curso (contextvar). Una ruta con un
+  patrón N+1 se ve como muchos comandos por solicitud sobre la misma colección.
+- Las solicitudes que superan SLOW_REQUEST_MS se registran en el log `erp.slow_requests`
+  con el desglose por comando y colección. Cada respuesta lleva además una cabecera
+  `Server-Timing` con el tiempo en MongoDB (visible en las herramientas del navegador).
+
+Con varios workers, cada proceso tiene sus propias métricas; para agregarlas se define
+PROMETHEUS_MULTIPROC_DIR (modo multiproceso de prometheus_client).
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from fastapi import Response
+from pymongo import monitoring
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess,
+)
+
+from app.config import SLOW_REQUEST_MS, SLOW_REQUEST_BREAKDOWN
+
+logger = logging.getLogger("erp.slow_requests")
+
+UNMATCHED_ROUTE = "unmatched"
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Duración de las solicitudes HTTP", ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+HTTP_MONGO_COMMANDS = Histogram(
+    "http_request_mongo_commands", "Comandos de MongoDB por solicitud HTTP", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000),
+)
+HTTP_MONGO_SECONDS = Histogram(
+    "http_request_mongo_seconds", "Tiempo en MongoDB por solicitud HTTP", ["method", "route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_SLOW_REQUESTS = Counter(
+    "http_slow_requests_total", "Solicitudes HTTP más lentas que SLOW_REQUEST_MS", ["method", "route"],
+)
+MONGO_COMMANDS = Counter(
+    "mongo_commands_total", "Comandos enviados a MongoDB", ["command", "collection", "outcome"],
+)
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "Duración de los comandos de MongoDB", ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+# Comandos internos del driver (handshake, monitoreo, sesiones) que no son consultas.
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue", "endSessions", "buildInfo"}
+
+
+@dataclass
+class RequestStats:
+    commands: int = 0
+    db_seconds: float = 0.0
+    # (comando, colección) -> [cantidad, segundos]
+    breakdown: Dict[Tuple[str, str], list] = field(default_factory=dict)
+
+    def add(self, command: str, collection: str, seconds: float) -> None:
+        self.commands += 1
+        self.db_seconds += seconds
+        entry = self.breakdown.setdefault((command, collection), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    Cuenta los comandos de MongoDB y su duración. El driver publica los eventos dentro
+    de la tarea que ejecuta la consulta, así que `_current` es la solicitud que la hizo
+    (las subtareas de `asyncio.gather` copian el contexto y suman a la misma).
+    """
+
+    def __init__(self):
+        # request_id del comando -> colección (el evento de fin no trae el comando)
+        self._collections: Dict[int, str] = {}
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        # `getMore` lleva el id del cursor; la colección va en `collection`.
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self._collections[event.request_id] = target if isinstance(target, str) else ""
+
+    def _finished(self, event, outcome: str):
+        collection = self._collections.pop(event.request_id, None)
+        if collection is None:
+            return
+        seconds = event.duration_micros / 1_000_000
+        MONGO_COMMANDS.labels(event.command_name, collection, outcome).inc()
+        MONGO_COMMAND_SECONDS.labels(event.command_name).observe(seconds)
+        stats = _current.get()
+        if stats is not None:
+            stats.add(event.command_name, collection, seconds)
+
+    def succeeded(self, event):
+        self._finished(event, "ok")
+
+    def failed(self, event):
+        self._finished(event, "error")
+
+
+command_monitor = CommandMonitor()
+
+
+def _route_of(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+
+def _log_slow_request(method: str, path: str, status: int, elapsed: float, stats: RequestStats) -> None:
+    top = sorted(stats.breakdown.items(), key=lambda kv: kv[1][1], reverse=True)[:SLOW_REQUEST_BREAKDOWN]
+    lines = [
+        f"  {command:<14} {collection or '-':<28} x{count:<5} {seconds * 1000:>9.1f} ms"
+        for (command, collection), (count, seconds) in top
+    ]
+    logger.warning(
+        "Solicitud lenta: %s %s -> %s en %.0f ms; MongoDB: %d comandos, %.0f ms\n%s",
+        method, path, status, elapsed * 1000, stats.commands, stats.db_seconds * 1000, "\n".join(lines),
+    )
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: latencia por ruta, comandos de MongoDB por solicitud y solicitudes lentas."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        streaming = False
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    name.lower() == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+                timing = f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.commands} mongo"'
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current.reset(token)
+            method, route = scope["method"], _route_of(scope)
+            # Un stream SSE dura lo que dure la conexión: no es latencia ni solicitud lenta.
+            if not streaming:
+                HTTP_LATENCY.labels(method, route, str(status)).observe(elapsed)
+                HTTP_MONGO_COMMANDS.labels(method, route).observe(stats.commands)
+                HTTP_MONGO_SECONDS.labels(method, route).observe(stats.db_seconds)
+                if SLOW_REQUEST_MS > 0 and elapsed * 1000 >= SLOW_REQUEST_MS:
+                    HTTP_SLOW_REQUESTS.labels(method, route).inc()
+                    _log_slow_request(method, scope["path"], status, elapsed, stats)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Comandos y tiempo en MongoDB acumulados por la solicitud en curso (None fuera de una)."""
+    return _current.get()
+
+
+def metrics_response() -> Response:
+    """Métricas en el formato de texto de Prometheus."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,223 @@
+import base64
+import json
+import math
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from beanie import Document
+from beanie.odm.utils.parsing import parse_obj
+from bson import ObjectId
+from pydantic import BaseModel
+from bson.errors import InvalidId
+
+from app.config import PAGINATION_TOTAL_MODE
+from app.exceptions.business_exceptions import ValidationException
+from app.schemas.common import PaginatedResponse
+
+# Modos de cálculo del total:
+# - "exact": total exacto en la misma agregación ($facet) que trae la página.
+# - "estimated": usa los metadatos de la colección cuando no hay filtro
+#   (estimated_document_count, sin escanear). Con filtro se comporta como "cached".
+# - "cached": reutiliza el último total calculado para el mismo filtro durante
+#   CACHED_TOTAL_TTL segundos; en ese caso la página se trae con un find simple.
+TOTAL_EXACT = "exact"
+TOTAL_ESTIMATED = "estimated"
+TOTAL_CACHED = "cached"
+
+CACHED_TOTAL_TTL = 30  # segundos
+
+SortSpec = List[Tuple[str, int]]
+
+_total_cache: Dict[Tuple[str, str], Tuple[float, int]] = {}
+
+
+def build_sort(sort_by: Optional[str], sort_order: Optional[str] = "asc") -> SortSpec:
+    """Convierte los parámetros `sort_by`/`sort_order` de las rutas en un SortSpec."""
+    if not sort_by:
+        return []
+    return [(sort_by, 1 if sort_order == "asc" else -1)]
+
+
+def _stable_sort(sort: SortSpec) -> Dict[str, int]:
+    # `_id` como desempate para que skip/limit sea determinista entre páginas.
+    stage = dict(sort)
+    stage.setdefault("_id", 1)
+    return stage
+
+
+def _cache_key(model: Type[Document], query: Dict[str, Any]) -> Tuple[str, str]:
+    return (model.get_settings().name, repr(sorted(query.items(), key=lambda kv: kv[0])))
+
+
+def _get_cached_total(key: Tuple[str, str]) -> Optional[int]:
+    entry = _total_cache.get(key)
+    if entry and time.monotonic() - entry[0] < CACHED_TOTAL_TTL:
+        return entry[1]
+    return None
+
+
+def invalidate_cached_totals(model: Type[Document]) -> None:
+    """Descarta los totales en caché de una colección (p. ej. tras insertar/eliminar)."""
+    name = model.get_settings().name
+    for key in [k for k in _total_cache if k[0] == name]:
+        _total_cache.pop(key, None)
+
+
+def _build_response(items: List[Any], total: int, skip: int, limit: int) -> PaginatedResponse:
+    return PaginatedResponse(
+        items=items,
+        total=total,
+        page=(skip // limit) + 1 if limit > 0 else 1,
+        pages=math.ceil(total / limit) if limit > 0 else 0,
+        size=limit
+    )
+
+
+async def paginate(
+    model: Type[Document],
+    query: Dict[str, Any],
+    sort: SortSpec,
+    skip: int = 0,
+    limit: int = 10,
+    total_mode: Optional[str] = None,
+    score: Optional[Dict[str, Any]] = None,
+    lookups: Optional[List[Dict[str, Any]]] = None,
+    item_model: Optional[Type[BaseModel]] = None,
+    projection: Optional[Dict[str, Any]] = None,
+) -> PaginatedResponse:
+    """
+    Devuelve una página de `model` y su total en un solo viaje a MongoDB,
+    usando una agregación `$match` + `$facet` en lugar de `count()` + `find()`.
+    `score` es una expresión de ranking (ver search_service.search_filter); si se
+    indica, los resultados se ordenan primero por ella.
+    `lookups` son etapas de enriquecimiento (ver `lookup_stages`) que se aplican solo
+    a las filas de la página; con ellas, `item_model` es el esquema que recibe los
+    campos agregados (por defecto se devuelven documentos de `model`).
+    `projection` es un `$project` de inclusión (ver projection_service.select_fields)
+    que reemplaza al documento completo; va con el `item_model` reducido que le corresponde.
+    """
+    total_mode = total_mode or PAGINATION_TOTAL_MODE
+    total: Optional[int] = None
+    cache_key = _cache_key(model, query)
+
+    if total_mode == TOTAL_ESTIMATED and not query:
+        total = await model.get_pymongo_collection().estimated_document_count()
+    elif total_mode in (TOTAL_CACHED, TOTAL_ESTIMATED):
+        total = _get_cached_total(cache_key)
+
+    items_pipeline: List[Dict[str, Any]] = []
+    if score is not None:
+        items_pipeline.append({"$addFields": {"_score": score}})
+        sort = [("_score", -1)] + list(sort)
+    items_pipeline += [{"$sort": _stable_sort(sort)}, {"$skip": skip}]
+    if limit > 0:
+        items_pipeline.append({"$limit": limit})
+    items_pipeline += lookups or []
+    # Los tokens de búsqueda no forman parte de la respuesta.
+    items_pipeline.append({"$project": projection or {"_score": 0, "search_tokens": 0}})
+
+    def parse(doc):
+        return item_model.model_validate(doc) if item_model else parse_obj(model, doc)
+
+    if total is not None:
+        # El total ya se conoce: basta con traer la página.
+        docs = await model.aggregate([{"$match": query}] + items_pipeline).to_list()
+        return _build_response([parse(doc) for doc in docs], total, skip, limit)
+
+    pipeline = [
+        {"$match": query},
+        {"$facet": {
+            "items": items_pipeline,
+            "total": [{"$count": "count"}],
+        }},
+    ]
+    result = await model.aggregate(pipeline).to_list()
+    facet = result[0] if result else {"items": [], "total": []}
+
+    total = facet["total"][0]["count"] if facet["total"] else 0
+    if total_mode != TOTAL_EXACT:
+        _total_cache[cache_key] = (time.monotonic(), total)
+
+    items = [parse(doc) for doc in facet["items"]]
+    return _build_response(items, total, skip, limit)
+
+
+def lookup_stages(local_field: str, collection: str, field: str, as_field: str) -> List[Dict[str, Any]]:
+    """
+    Copia en `as_field` el campo `field` del documento de `collection` referenciado por
+    `local_field` (id guardado como texto). El id se convierte a ObjectId para que el
+    `$lookup` use el índice de `_id`; un id inválido o inexistente deja `as_field` en null.
+    """
+    ref = f"_{as_field}_ref"
+    return [
+        {"$addFields": {ref: {"$convert": {"input": f"${local_field}", "to": "objectId", "onError": None, "onNull": None}}}},
+        {"$lookup": {"from": collection, "localField": ref, "foreignField": "_id", "as": ref}},
+        {"$addFields": {as_field: {"$arrayElemAt": [f"${ref}.{field}", 0]}}},
+        {"$project": {ref: 0}},
+    ]
+
+
+# ==================== KEYSET (CURSOR) ====================
+
+def encode_cursor(doc: Document, sort_field: str) -> str:
+    """Cursor opaco con la posición (sort_field, _id) del último documento entregado."""
+    value = getattr(doc, sort_field)
+    payload = {"v": value.isoformat() if isinstance(value, datetime) else value, "id": str(doc.id)}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = payload["v"]
+        if isinstance(value, str):
+            try:
+                value = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+        return value, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise ValidationException("Cursor de paginación inválido.")
+
+
+async def keyset_page(
+    model: Type[Document],
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    sort_field: str = "created_at",
+    descending: bool = True,
+    projection_model: Optional[Type[BaseModel]] = None,
+) -> Tuple[List[Document], Optional[str]]:
+    """
+    Página por cursor ordenada por (sort_field, _id). A diferencia de skip/limit,
+    el costo no depende de la profundidad: se continúa desde la última clave vista
+    usando el índice compuesto correspondiente.
+    Devuelve los documentos y el cursor de la página siguiente (None si no hay más).
+    Con `projection_model` solo se leen sus campos (debe incluir `sort_field`).
+    """
+    if limit < 1:
+        raise ValidationException("El límite de la página debe ser mayor que cero.")
+    direction = -1 if descending else 1
+    conditions = [query] if query else []
+
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        op = "$lt" if descending else "$gt"
+        conditions.append({"$or": [
+            {sort_field: {op: last_value}},
+            {sort_field: last_value, "_id": {op: last_id}},
+        ]})
+
+    find_query = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+    docs = await model.find(find_query, projection_model=projection_model).sort(
+        [(sort_field, direction), ("_id", direction)]
+    ).limit(limit + 1).to_list()
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_field)
+    return docs, next_cursor
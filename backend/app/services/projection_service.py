@@ -0,0 +1,128 @@
+"""
+Campos parciales (sparse fieldsets) en los listados.
+
+Cada listado declara un `FieldSet`: el esquema completo de sus filas y sus vistas
+predefinidas (p. ej. "summary" para tablas y selectores). Con `fields=a,b,c` o
+`view=summary`, `select_fields` devuelve una `FieldSelection` con:
+
+- la proyección de MongoDB (`$project` de inclusión): solo viajan esas columnas;
+- un esquema reducido con los campos elegidos (mismos tipos, alias y valores por
+  defecto que el completo), así Pydantic construye solo lo que se devuelve.
+
+Sin `fields` ni `view` (o con `view=full`) el listado devuelve el esquema completo.
+El id (`_id`) se incluye siempre. Las respuestas con un esquema reducido se entregan
+con `app.responses.json_response`, que no las valida contra el `response_model` completo.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ConfigDict, create_model
+
+from app.exceptions.business_exceptions import ValidationException
+
+VIEW_FULL = "full"
+VIEW_SUMMARY = "summary"
+
+# Descripciones de los parámetros `fields` y `view` en las rutas de listado.
+FIELDS_DESCRIPTION = "Campos a devolver, separados por comas (p. ej. `sku,name,price`); el id va siempre."
+VIEW_DESCRIPTION = "Vista predefinida: `summary` (columnas de tablas y selectores) o `full` (por defecto)."
+
+# Campos internos que no se exponen aunque estén en el esquema.
+HIDDEN_FIELDS = {"revision_id", "search_tokens"}
+ID_FIELD = "id"
+
+
+@dataclass
+class FieldSet:
+    model: Type[BaseModel]
+    views: Dict[str, List[str]]
+    # Campos que se incluyen siempre, p. ej. la clave del cursor en la paginación por cursor.
+    always: Tuple[str, ...] = ()
+
+    @property
+    def allowed(self) -> List[str]:
+        return [name for name in self.model.model_fields if name not in HIDDEN_FIELDS]
+
+
+@dataclass
+class FieldSelection:
+    fields: FrozenSet[str]
+    item_model: Type[BaseModel]
+    projection: Dict[str, Any] = field(default_factory=dict)
+
+
+def wants(selection: Optional[FieldSelection], name: str) -> bool:
+    """Si el listado debe calcular `name` (sin selección se devuelven todos los campos)."""
+    return selection is None or name in selection.fields
+
+
+@lru_cache(maxsize=256)
+def partial_model(model: Type[BaseModel], fields: FrozenSet[str], name: Optional[str] = None) -> Type[BaseModel]:
+    """Esquema con solo `fields` de `model` (se cachea por combinación de campos)."""
+    definitions = {
+        field_name: (info.annotation, info)
+        for field_name, info in model.model_fields.items()
+        if field_name in fields
+    }
+    return create_model(
+        name or f"{model.__name__}Fields",
+        __config__=ConfigDict(populate_by_name=True, from_attributes=True),
+        **definitions,
+    )
+
+
+@lru_cache(maxsize=64)
+def page_model(page: Type[BaseModel], item_model: Type[BaseModel]) -> Type[BaseModel]:
+    """`page` con `items: List[item_model]`, para respuestas paginadas de un esquema reducido."""
+    return create_model(f"{page.__name__}{item_model.__name__}", __base__=page, items=(List[item_model], ...))
+
+
+def _parse_fields(value: str) -> List[str]:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def select_fields(fieldset: FieldSet, fields: Optional[str] = None, view: Optional[str] = None) -> Optional[FieldSelection]:
+    """
+    Selección de campos pedida con `fields` (lista separada por comas) o `view`; `fields`
+    tiene prioridad. Devuelve None si se piden todos los campos.
+    """
+    if fields:
+        requested = _parse_fields(fields)
+        unknown = [name for name in requested if name not in fieldset.allowed]
+        if unknown:
+            raise ValidationException(
+                f"Campos no válidos: {', '.join(unknown)}. Disponibles: {', '.join(fieldset.allowed)}."
+            )
+        name = None
+    elif view and view != VIEW_FULL:
+        if view not in fieldset.views:
+            available = ", ".join([VIEW_FULL] + list(fieldset.views))
+            raise ValidationException(f"Vista no válida: {view}. Use {available}.")
+        requested = fieldset.views[view]
+        name = f"{fieldset.model.__name__}{view.capitalize()}"
+    else:
+        return None
+
+    selected = frozenset([ID_FIELD, *fieldset.always, *requested]) & set(fieldset.model.model_fields)
+    return FieldSelection(
+        fields=selected,
+        item_model=partial_model(fieldset.model, selected, name),
+        projection=projection_of(fieldset.model, selected),
+    )
+
+
+def projection_of(model: Type[BaseModel], fields: Iterable[str]) -> Dict[str, Any]:
+    """`$project` de inclusión con los nombres en MongoDB (alias) de `fields`."""
+    projection: Dict[str, Any] = {"_id": 1}
+    for name, info in model.model_fields.items():
+        if name in fields:
+            projection[info.alias or name] = 1
+    return projection
+
+
+def page_options(selection: Optional[FieldSelection], default_model: Optional[Type[BaseModel]] = None) -> Dict[str, Any]:
+    """Argumentos `item_model` y `projection` de `paginate` para la selección (o el esquema completo)."""
+    if selection is None:
+        return {"item_model": default_model}
+    return {"item_model": selection.item_model, "projection": selection.projection}
@@ -15,37 +15,54 @@ from app.models.purchasing import (
     OrderDetail
 )
 from app.models.inventory import Product
-from app.services.document_number_service import get_debit_note_number
+from app.services.document_number_service import create_with_number
 from app.exceptions.business_exceptions import NotFoundException, ValidationException
 from app.schemas.common import PaginatedResponse
+from app.schemas import purchasing_schemas
 from app.schemas.purchasing_schemas import DebitNoteCreate
-import math
+from app.services.pagination_service import paginate, lookup_stages
+from app.services.search_service import search_filter, counterparty_search_filter
+from app.services.projection_service import FieldSet, select_fields, page_options, wants, VIEW_SUMMARY
+from app.services.rollup_service import record_document
+
+# Campos que aceptan `fields=` / `view=` en los listados (ver projection_service).
+SUPPLIER_FIELDS = FieldSet(purchasing_schemas.Supplier, {VIEW_SUMMARY: ["name", "email", "phone"]})
+PURCHASE_ORDER_FIELDS = FieldSet(purchasing_schemas.PurchaseOrder, {
+    VIEW_SUMMARY: ["order_number", "supplier_id", "supplier_name", "date", "status", "total_amount"],
+})
+PURCHASE_INVOICE_FIELDS = FieldSet(purchasing_schemas.PurchaseInvoice, {
+    VIEW_SUMMARY: [
+        "invoice_number", "order_id", "order_number", "supplier_id", "supplier_name",
+        "invoice_date", "total_amount", "payment_status", "amount_paid",
+    ],
+})
+DEBIT_NOTE_FIELDS = FieldSet(purchasing_schemas.DebitNoteResponse, {
+    VIEW_SUMMARY: ["debit_note_number", "purchase_invoice_id", "supplier_id", "date", "reason", "status", "total_amount"],
+})
 
 # ==================== SUPPLIERS ====================
 async def get_suppliers(
-    skip: int = 0, limit: int = 10, search: Optional[str] = None
-) -> PaginatedResponse[Supplier]:
+    skip: int = 0, limit: int = 10, search: Optional[str] = None,
+    fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[purchasing_schemas.Supplier]:
+    selection = select_fields(SUPPLIER_FIELDS, fields, view)
     query = {}
-    if search:
-        query = {"name": {"$regex": search, "$options": "i"}}
+    score = None
+    search_query = search_filter(search)
+    if search_query:
+        query, score = search_query
     
-    total = await Supplier.find(query).count()
-    items = await Supplier.find(query).sort("+name").skip(skip).limit(limit).to_list()
-    
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=(skip // limit) + 1,
-        pages=math.ceil(total / limit) if limit > 0 else 0,
-        size=limit
+    return await paginate(
+        Supplier, query, [("name", 1)], skip=skip, limit=limit, score=score, **page_options(selection, purchasing_schemas.Supplier)
     )
 
 # ==================== ORDERS ====================
 async def get_orders(
     skip: int = 0, limit: int = 50, status: Optional[str] = None, 
     date_from: Optional[date] = None, date_to: Optional[date] = None, 
-    search: Optional[str] = None
-) -> PaginatedResponse[PurchaseOrder]:
+    search: Optional[str] = None, fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[purchasing_schemas.PurchaseOrder]:
+    selection = select_fields(PURCHASE_ORDER_FIELDS, fields, view)
     query_conditions = []
 
     if status:
@@ -57,59 +74,58 @@ async def get_orders(
     if date_to:
         query_conditions.append({"date": {"$lte": datetime.combine(date_to, datetime.max.time())}})
 
-    if search:
-        query_conditions.append({"$or": [
-            {"order_number": {"$regex": search, "$options": "i"}},
-            {"supplier_id.name": {"$regex": search, "$options": "i"}}, # Assuming supplier is populated
-        ]})
+    score = None
+    search_query = await counterparty_search_filter(search, "supplier_id", Supplier)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
 
     query = {"$and": query_conditions} if query_conditions else {}
 
-    total = await PurchaseOrder.find(query).count()
-    items = await PurchaseOrder.find(query).sort("-date").skip(skip).limit(limit).to_list()
+    lookups = []
+    if wants(selection, "supplier_name"):
+        lookups += lookup_stages("supplier_id", "suppliers", "name", "supplier_name")
 
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=(skip // limit) + 1,
-        pages=math.ceil(total / limit) if limit > 0 else 0,
-        size=limit
+    return await paginate(
+        PurchaseOrder, query, [("date", -1)], skip=skip, limit=limit, score=score,
+        lookups=lookups, **page_options(selection, purchasing_schemas.PurchaseOrder),
     )
 
 # ==================== INVOICES ====================
 async def get_invoices(
     skip: int = 0, limit: int = 50, status: Optional[str] = None,
     date_from: Optional[date] = None, date_to: Optional[date] = None,
-    search: Optional[str] = None
-) -> PaginatedResponse[PurchaseInvoice]:
+    search: Optional[str] = None, fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[purchasing_schemas.PurchaseInvoice]:
+    selection = select_fields(PURCHASE_INVOICE_FIELDS, fields, view)
     query_conditions = []
 
     if status:
         query_conditions.append({"status": status})
 
     if date_from:
-        query_conditions.append({"date": {"$gte": datetime.combine(date_from, datetime.min.time())}})
+        query_conditions.append({"invoice_date": {"$gte": datetime.combine(date_from, datetime.min.time())}})
 
     if date_to:
-        query_conditions.append({"date": {"$lte": datetime.combine(date_to, datetime.max.time())}})
+        query_conditions.append({"invoice_date": {"$lte": datetime.combine(date_to, datetime.max.time())}})
 
-    if search:
-        query_conditions.append({"$or": [
-            {"invoice_number": {"$regex": search, "$options": "i"}},
-            {"supplier_id.name": {"$regex": search, "$options": "i"}}, # Assuming supplier is populated
-        ]})
+    score = None
+    search_query = await counterparty_search_filter(search, "supplier_id", Supplier)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
 
     query = {"$and": query_conditions} if query_conditions else {}
-    
-    total = await PurchaseInvoice.find(query).count()
-    items = await PurchaseInvoice.find(query).sort("-date").skip(skip).limit(limit).to_list()
-
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=(skip // limit) + 1,
-        pages=math.ceil(total / limit) if limit > 0 else 0,
-        size=limit
+
+    lookups = []
+    if wants(selection, "supplier_name"):
+        lookups += lookup_stages("supplier_id", "suppliers", "name", "supplier_name")
+    if wants(selection, "order_number"):
+        lookups += lookup_stages("order_id", "purchase_orders", "order_number", "order_number")
+
+    return await paginate(
+        PurchaseInvoice, query, [("invoice_date", -1)], skip=skip, limit=limit, score=score,
+        lookups=lookups, **page_options(selection, purchasing_schemas.PurchaseInvoice),
     )
 
 async def get_invoice(invoice_id: PydanticObjectId) -> PurchaseInvoice:
@@ -120,25 +136,56 @@ async def get_invoice(invoice_id: PydanticObjectId) -> PurchaseInvoice:
 
 # ==================== DEBIT NOTES ====================
 async def create_debit_note(invoice_id: PydanticObjectId, debit_note_data: DebitNoteCreate) -> DebitNote:
-    # ... (logic remains the same, assuming it's correct)
-    pass
+    """
+    Crea una nota de débito sobre una factura de compra. El número ND se toma en la
+    misma transacción que inserta la nota y la enlaza a la factura (serie sin huecos).
+    """
+    invoice = await get_invoice(invoice_id)
+    invoiced = {item.product_sku for item in invoice.items}
+    if not debit_note_data.items:
+        raise ValidationException("La nota de débito debe tener al menos una línea")
+    for item in debit_note_data.items:
+        if item.product_sku not in invoiced:
+            raise ValidationException(f"El producto {item.product_sku} no está en la factura {invoice.invoice_number}")
+        if item.quantity <= 0 or item.unit_cost < 0:
+            raise ValidationException(f"Cantidad o costo inválido para {item.product_sku}")
+
+    items = [DebitNoteItem(**item.model_dump()) for item in debit_note_data.items]
+    total_amount = sum(item.quantity * item.unit_cost for item in items)
+
+    async def create(number: str, session) -> DebitNote:
+        debit_note = DebitNote(
+            debit_note_number=number,
+            purchase_invoice_id=str(invoice.id),
+            supplier_id=invoice.supplier_id,
+            reason=debit_note_data.reason,
+            items=items,
+            total_amount=total_amount,
+            notes=debit_note_data.notes,
+        )
+        # Los resúmenes se actualizan tras el commit: un reintento de la transacción no
+        # debe sumarlos dos veces.
+        await debit_note.insert(session=session, skip_actions=["add_to_rollups"])
+        await PurchaseInvoice.get_pymongo_collection().update_one(
+            {"_id": invoice.id}, {"$push": {"debit_note_ids": str(debit_note.id)}}, session=session
+        )
+        return debit_note
+
+    debit_note = await create_with_number("debit_note", create)
+    await record_document(debit_note)
+    return debit_note
 
 async def get_debit_notes(
-    skip: int = 0, limit: int = 50, search: Optional[str] = None
-) -> PaginatedResponse[DebitNote]:
+    skip: int = 0, limit: int = 50, search: Optional[str] = None,
+    fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[purchasing_schemas.DebitNoteResponse]:
+    selection = select_fields(DEBIT_NOTE_FIELDS, fields, view)
     query = {}
-    if search:
-        query["$or"] = [
-            {"debit_note_number": {"$regex": search, "$options": "i"}},
-        ]
+    score = None
+    search_query = search_filter(search)
+    if search_query:
+        query, score = search_query
 
-    total = await DebitNote.find(query).count()
-    items = await DebitNote.find(query).sort("-date").skip(skip).limit(limit).to_list()
-    
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=skip // limit + 1,
-        pages=math.ceil(total / limit) if limit > 0 else 0,
-        size=limit
+    return await paginate(
+        DebitNote, query, [("date", -1)], skip=skip, limit=limit, score=score, **page_options(selection, purchasing_schemas.DebitNoteResponse)
     )
@@ -0,0 +1,296 @@
+"""
+Motor de reposición: punto de reorden y cantidad sugerida para todo el catálogo.
+
+1. MongoDB reduce las salidas (`StockMovement` tipo OUT) de la ventana de historia a
+   la demanda diaria por SKU y de ahí a sus estadísticos suficientes (total, suma de
+   cuadrados y primer día con venta): a Python llega una fila por SKU, no una por
+   movimiento ni por día.
+2. Con el catálogo en arreglos de NumPy se calcula en una sola pasada vectorizada:
+   demanda media diaria y su desviación (contando los días sin venta), stock de
+   seguridad `z·σ·√L`, punto de reorden `μ·L + SS` y nivel objetivo `μ·(L+R) + SS`.
+   Un SKU se repone cuando su posición (stock + pedido en órdenes PENDING) está en o
+   bajo el punto de reorden, hasta el nivel objetivo.
+3. Los resultados de los SKUs con demanda se guardan en `replenishment_items` con el
+   id de la ejecución; la ejecución (`replenishment_runs`) se registra al final, así
+   las lecturas siempre ven una ejecución completa. Después se borran las anteriores.
+4. Opcionalmente se proponen órdenes de compra en estado DRAFT, una por proveedor. El
+   proveedor de un SKU es el de su última orden de compra no anulada.
+
+L (plazo de entrega) y R (periodo de revisión) son iguales para todos los SKUs
+(REPLENISHMENT_LEAD_TIME_DAYS y REPLENISHMENT_REVIEW_DAYS).
+"""
+import math
+import time
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from app.config import (
+    REPLENISHMENT_HISTORY_DAYS, REPLENISHMENT_LEAD_TIME_DAYS, REPLENISHMENT_REVIEW_DAYS, REPLENISHMENT_SERVICE_LEVEL,
+)
+from app.exceptions.business_exceptions import NotFoundException, ValidationException
+from app.models.inventory import Product, StockMovement, MovementType
+from app.models.purchasing import Order, OrderDetail, OrderStatus, ReplenishmentItem, ReplenishmentRun
+from app.schemas.common import PaginatedResponse
+from app.services.document_number_service import get_document_number
+from app.services.pagination_service import paginate
+
+BATCH_SIZE = 10_000
+SECONDS_PER_DAY = 86_400
+
+
+def compute_reorder_points(
+    total: np.ndarray,
+    sum_squares: np.ndarray,
+    days: np.ndarray,
+    position: np.ndarray,
+    lead_time_days: float,
+    review_days: float,
+    service_level: float,
+) -> Dict[str, np.ndarray]:
+    """
+    Cálculo vectorizado para todos los SKUs. `total` y `sum_squares` son la suma de la
+    demanda diaria y de sus cuadrados en `days` días; `position` es stock + pedido.
+    """
+    z = NormalDist().inv_cdf(service_level)
+    days = np.maximum(days, 1)
+    mean = total / days
+    std = np.sqrt(np.maximum(sum_squares / days - mean ** 2, 0.0))
+    safety_stock = z * std * math.sqrt(lead_time_days)
+    reorder_point = mean * lead_time_days + safety_stock
+    order_up_to = mean * (lead_time_days + review_days) + safety_stock
+    needs_reorder = (mean > 0) & (position <= reorder_point)
+    suggested = np.where(needs_reorder, np.ceil(np.maximum(order_up_to - position, 0)), 0).astype(np.int64)
+    days_of_cover = np.divide(position, mean, out=np.zeros_like(mean), where=mean > 0)
+    return {
+        "avg_daily_demand": mean,
+        "demand_std": std,
+        "safety_stock": safety_stock,
+        "reorder_point": reorder_point,
+        "order_up_to": order_up_to,
+        "days_of_cover": days_of_cover,
+        "needs_reorder": needs_reorder,
+        "suggested_quantity": suggested,
+    }
+
+
+def _demand_pipeline(since: datetime, until: datetime) -> List[Dict[str, Any]]:
+    # El $match por fecha usa el índice (created_at, _id) de los movimientos.
+    return [
+        {"$match": {"created_at": {"$gte": since, "$lt": until}, "movement_type": MovementType.OUT.value}},
+        {"$group": {
+            "_id": {"sku": "$product_sku", "day": {"$dateTrunc": {"date": "$created_at", "unit": "day"}}},
+            "quantity": {"$sum": "$quantity"},
+        }},
+        {"$group": {
+            "_id": "$_id.sku",
+            "total": {"$sum": "$quantity"},
+            "sum_squares": {"$sum": {"$multiply": ["$quantity", "$quantity"]}},
+            "first_day": {"$min": "$_id.day"},
+        }},
+    ]
+
+
+async def _load_catalog():
+    """SKU, stock, costo y fecha de alta de todos los productos, en arreglos."""
+    skus: List[str] = []
+    stock: List[int] = []
+    cost: List[float] = []
+    created: List[float] = []
+    cursor = Product.get_pymongo_collection().find(
+        {}, {"_id": 0, "sku": 1, "stock_current": 1, "cost": 1, "created_at": 1}, batch_size=BATCH_SIZE
+    )
+    async for doc in cursor:
+        skus.append(doc["sku"])
+        stock.append(doc.get("stock_current") or 0)
+        cost.append(doc.get("cost") or 0.0)
+        created_at = doc.get("created_at")
+        created.append(created_at.timestamp() if created_at else 0.0)
+    return skus, np.array(stock, dtype=np.int64), np.array(cost, dtype=np.float64), np.array(created, dtype=np.float64)
+
+
+async def _pending_quantities() -> Dict[str, int]:
+    """Cantidad pedida y no recibida (órdenes PENDING) por SKU."""
+    cursor = await Order.get_pymongo_collection().aggregate([
+        {"$match": {"status": OrderStatus.PENDING.value}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.product_sku", "quantity": {"$sum": "$items.quantity"}}},
+    ], allowDiskUse=True)
+    return {row["_id"]: row["quantity"] async for row in cursor}
+
+
+async def _last_suppliers() -> Dict[str, str]:
+    """Proveedor de la última orden de compra no anulada de cada SKU."""
+    cursor = await Order.get_pymongo_collection().aggregate([
+        {"$match": {"status": {"$nin": [OrderStatus.CANCELLED.value, OrderStatus.DRAFT.value]}}},
+        {"$sort": {"date": -1}},
+        {"$unwind": "$items"},
+        {"$group": {"_id": "$items.product_sku", "supplier_id": {"$first": "$supplier_id"}}},
+    ], allowDiskUse=True)
+    return {row["_id"]: row["supplier_id"] async for row in cursor}
+
+
+async def _create_draft_orders(rows: List[Dict[str, Any]]) -> List[str]:
+    """Una orden DRAFT por proveedor con las líneas a reponer (al costo actual)."""
+    by_supplier: Dict[str, List[OrderDetail]] = {}
+    for row in rows:
+        by_supplier.setdefault(row["supplier_id"], []).append(OrderDetail(
+            product_sku=row["sku"], quantity=row["suggested_quantity"], unit_cost=row["unit_cost"],
+        ))
+    ids = []
+    for supplier_id, items in by_supplier.items():
+        order = Order(
+            order_number=await get_document_number("purchase_order"),
+            supplier_id=supplier_id,
+            items=items,
+            status=OrderStatus.DRAFT,
+            total_amount=sum(item.quantity * item.unit_cost for item in items),
+        )
+        await order.insert()
+        ids.append(str(order.id))
+    return ids
+
+
+def resolve_parameters(
+    history_days: Optional[int] = None,
+    lead_time_days: Optional[float] = None,
+    review_days: Optional[float] = None,
+    service_level: Optional[float] = None,
+) -> Tuple[int, float, float, float]:
+    """Parámetros de la ejecución con sus valores por defecto; ValidationException si no son válidos."""
+    history_days = history_days or REPLENISHMENT_HISTORY_DAYS
+    lead_time_days = REPLENISHMENT_LEAD_TIME_DAYS if lead_time_days is None else lead_time_days
+    review_days = REPLENISHMENT_REVIEW_DAYS if review_days is None else review_days
+    service_level = service_level or REPLENISHMENT_SERVICE_LEVEL
+    if history_days <= 0 or lead_time_days < 0 or review_days < 0:
+        raise ValidationException("Los días de historia deben ser positivos y los plazos no pueden ser negativos.")
+    if not 0.5 <= service_level < 1:
+        raise ValidationException("El nivel de servicio debe estar entre 0.5 y 1 (p. ej. 0.95).")
+    return history_days, lead_time_days, review_days, service_level
+
+
+async def run_replenishment(
+    history_days: Optional[int] = None,
+    lead_time_days: Optional[float] = None,
+    review_days: Optional[float] = None,
+    service_level: Optional[float] = None,
+    create_orders: bool = True,
+    run_cpu: Optional[Callable[..., Awaitable[Any]]] = None,
+) -> ReplenishmentRun:
+    """
+    Calcula los puntos de reorden de todo el catálogo y guarda la ejecución. Con
+    `run_cpu` (p. ej. `JobContext.run_cpu` desde un job de fondo) el cálculo vectorial
+    corre en otro proceso en lugar del event loop.
+    """
+    history_days, lead_time_days, review_days, service_level = resolve_parameters(
+        history_days, lead_time_days, review_days, service_level
+    )
+
+    started = time.perf_counter()
+    until = datetime.now()
+    since = until - timedelta(days=history_days)
+
+    skus, stock, cost, created = await _load_catalog()
+    index = {sku: i for i, sku in enumerate(skus)}
+    total = np.zeros(len(skus))
+    sum_squares = np.zeros(len(skus))
+    # La ventana de cada SKU empieza en su alta (o en `since`): los días anteriores no son días sin venta.
+    window_start = np.maximum(created, since.timestamp())
+    cursor = await StockMovement.get_pymongo_collection().aggregate(_demand_pipeline(since, until), allowDiskUse=True)
+    async for row in cursor:
+        i = index.get(row["_id"])
+        if i is None:
+            continue  # salidas de SKUs que ya no existen
+        total[i] = row["total"]
+        sum_squares[i] = row["sum_squares"]
+        window_start[i] = min(window_start[i], row["first_day"].timestamp())
+    days = np.ceil((until.timestamp() - window_start) / SECONDS_PER_DAY)
+
+    pending = await _pending_quantities()
+    on_order = np.array([pending.get(sku, 0) for sku in skus], dtype=np.int64)
+    args = (total, sum_squares, days, stock + on_order, lead_time_days, review_days, service_level)
+    result = await run_cpu(compute_reorder_points, *args) if run_cpu else compute_reorder_points(*args)
+    suppliers = await _last_suppliers()
+
+    run_id = ObjectId()
+    rows = []
+    for i in np.flatnonzero(result["avg_daily_demand"] > 0):
+        rows.append({
+            "run_id": str(run_id),
+            "sku": skus[i],
+            "supplier_id": suppliers.get(skus[i]),
+            "avg_daily_demand": round(float(result["avg_daily_demand"][i]), 3),
+            "demand_std": round(float(result["demand_std"][i]), 3),
+            "safety_stock": round(float(result["safety_stock"][i]), 3),
+            "reorder_point": round(float(result["reorder_point"][i]), 3),
+            "order_up_to": round(float(result["order_up_to"][i]), 3),
+            "stock_current": int(stock[i]),
+            "on_order": int(on_order[i]),
+            "days_of_cover": round(float(result["days_of_cover"][i]), 1),
+            "needs_reorder": bool(result["needs_reorder"][i]),
+            "suggested_quantity": int(result["suggested_quantity"][i]),
+            "unit_cost": round(float(cost[i]), 3),
+        })
+    items = ReplenishmentItem.get_pymongo_collection()
+    for start in range(0, len(rows), BATCH_SIZE):
+        await items.insert_many(rows[start:start + BATCH_SIZE], ordered=False)
+
+    to_reorder = [row for row in rows if row["needs_reorder"] and row["suggested_quantity"] > 0]
+    with_supplier = [row for row in to_reorder if row["supplier_id"]]
+    previous = await get_latest_run()
+    draft_order_ids = await _create_draft_orders(with_supplier) if create_orders else []
+
+    run = ReplenishmentRun(
+        id=run_id,
+        history_days=history_days,
+        lead_time_days=lead_time_days,
+        review_days=review_days,
+        service_level=service_level,
+        skus_analyzed=len(skus),
+        skus_with_demand=len(rows),
+        skus_to_reorder=len(to_reorder),
+        skus_without_supplier=len(to_reorder) - len(with_supplier),
+        draft_order_ids=draft_order_ids,
+        computed_at=until,
+    )
+    run.duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    await run.insert()
+
+    # Desde aquí la ejecución vigente es la nueva: se descartan los resultados anteriores
+    # y los borradores anteriores que nadie confirmó (siguen en DRAFT).
+    await items.delete_many({"run_id": {"$ne": str(run_id)}})
+    await ReplenishmentRun.get_pymongo_collection().delete_many({"_id": {"$ne": run_id}})
+    if create_orders and previous and previous.draft_order_ids:
+        await Order.get_pymongo_collection().delete_many({
+            "_id": {"$in": [ObjectId(i) for i in previous.draft_order_ids]},
+            "status": OrderStatus.DRAFT.value,
+        })
+    return run
+
+
+async def get_latest_run() -> Optional[ReplenishmentRun]:
+    return await ReplenishmentRun.find_all().sort([("computed_at", -1)]).first_or_none()
+
+
+async def get_replenishment(
+    skip: int = 0,
+    limit: int = 50,
+    needs_reorder: Optional[bool] = True,
+    supplier_id: Optional[str] = None,
+    sku: Optional[str] = None,
+) -> PaginatedResponse[ReplenishmentItem]:
+    """Resultados de la última ejecución, de menor a mayor cobertura en días."""
+    run = await get_latest_run()
+    if not run:
+        raise NotFoundException("ReplenishmentRun", "latest")
+    query: Dict[str, Any] = {"run_id": str(run.id)}
+    if needs_reorder is not None:
+        query["needs_reorder"] = needs_reorder
+    if supplier_id:
+        query["supplier_id"] = supplier_id
+    if sku:
+        query["sku"] = sku
+    return await paginate(ReplenishmentItem, query, [("days_of_cover", 1), ("sku", 1)], skip=skip, limit=limit)
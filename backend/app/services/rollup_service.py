@@ -0,0 +1,329 @@
+"""
+Resúmenes diarios (rollups) de ventas y compras para los dashboards.
+
+Cada documento de `sales_daily_rollups` / `purchase_daily_rollups` acumula, para un
+(día, SKU, cliente/proveedor), las cantidades y montos facturados y los devueltos o
+ajustados por notas de crédito/débito. Un reporte de un año lee como máximo 365
+documentos por SKU o contraparte en lugar de desenrollar todas las líneas de factura.
+
+- Incremental: los hooks de Beanie de las facturas y notas llaman a `record_document`
+  al insertarlas (+) y al eliminarlas (−), con un `bulk_write` de `$inc` por documento.
+  Al reemplazarlas o actualizarlas (`replace`, `save`, `set`, ...) se resta lo que
+  aportaba el documento almacenado y se suma lo que aporta ahora (`snapshot_document` /
+  `record_change`): anular una nota (CANCELLED) la saca de los resúmenes, y un cambio
+  que no afecta los montos (un pago) no escribe. Los `insert_many` y `update_many` (que
+  no ejecutan hooks) y los cambios hechos por fuera de Beanie se corrigen
+  reconstruyendo el rango afectado.
+- Reconstrucción: `rebuild_rollups` borra el rango y lo recalcula desde los documentos
+  con una agregación por fuente que termina en `$merge` (ver manage_rollups.py).
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, date
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from beanie import Document
+from pymongo import UpdateOne
+
+from app.exceptions.business_exceptions import ValidationException
+from app.models.purchasing import Invoice, DebitNote, DailyPurchaseRollup
+from app.models.sales import SalesInvoice, CreditNote, DailySalesRollup
+from app.schemas.common import RollupReport, RollupRow
+from app.services.pagination_service import lookup_stages
+
+COUNTERS = ["quantity", "amount", "returned_quantity", "returned_amount", "lines"]
+GROUP_BY = ("day", "sku", "counterparty")
+
+
+@dataclass
+class RollupSource:
+    model: Type[Document]
+    date_field: str
+    price_field: str
+    # Notas de crédito/débito: suman a los campos `returned_*`.
+    returns: bool = False
+
+
+@dataclass
+class RollupKind:
+    rollup_model: Type[Document]
+    counterparty_field: str
+    counterparty_collection: str
+    sources: List[RollupSource]
+
+
+ROLLUPS: Dict[str, RollupKind] = {
+    "sales": RollupKind(DailySalesRollup, "customer_id", "customers", [
+        RollupSource(SalesInvoice, "invoice_date", "unit_price"),
+        RollupSource(CreditNote, "date", "unit_price", returns=True),
+    ]),
+    "purchases": RollupKind(DailyPurchaseRollup, "supplier_id", "suppliers", [
+        RollupSource(Invoice, "invoice_date", "unit_cost"),
+        RollupSource(DebitNote, "date", "unit_cost", returns=True),
+    ]),
+}
+
+
+def _kind(kind: str) -> RollupKind:
+    try:
+        return ROLLUPS[kind]
+    except KeyError:
+        raise ValidationException(f"Tipo de resumen desconocido: {kind}")
+
+
+def _source_of(document: Document) -> Optional[Tuple[RollupKind, RollupSource]]:
+    for spec in ROLLUPS.values():
+        for source in spec.sources:
+            if type(document) is source.model:
+                return spec, source
+    return None
+
+
+def day_of(value: datetime) -> datetime:
+    return datetime(value.year, value.month, value.day)
+
+
+Contribution = Dict[Tuple[datetime, str, str], Dict[str, float]]
+
+
+def _contribution(spec: RollupKind, source: RollupSource, data: Optional[Dict[str, Any]]) -> Contribution:
+    """Lo que una factura o nota (como dict) suma a cada (día, SKU, contraparte)."""
+    if not data or data.get("status") == "CANCELLED":
+        return {}
+    day = day_of(data[source.date_field])
+    counterparty = data[spec.counterparty_field]
+    quantity_field, amount_field = ("returned_quantity", "returned_amount") if source.returns else ("quantity", "amount")
+    result: Contribution = {}
+    for item in data.get("items") or []:
+        inc = result.setdefault((day, item["product_sku"], counterparty), {quantity_field: 0, amount_field: 0.0, "lines": 0})
+        inc[quantity_field] += item["quantity"]
+        inc[amount_field] += item["quantity"] * item[source.price_field]
+        inc["lines"] += 1
+    return result
+
+
+def _delta(new: Contribution, old: Contribution) -> Contribution:
+    delta: Contribution = {}
+    for key in set(new) | set(old):
+        fields = set(new.get(key, {})) | set(old.get(key, {}))
+        inc = {f: new.get(key, {}).get(f, 0) - old.get(key, {}).get(f, 0) for f in fields}
+        if any(round(value, 3) for value in inc.values()):
+            delta[key] = {f: round(value, 3) for f, value in inc.items()}
+    return delta
+
+
+async def _apply(spec: RollupKind, document: Document, delta: Contribution) -> None:
+    if not delta:
+        return
+    now = datetime.now()
+    writes = [
+        UpdateOne(
+            {"day": day, "sku": sku, spec.counterparty_field: counterparty},
+            {"$inc": inc, "$set": {"updated_at": now}},
+            upsert=True,
+        )
+        for (day, sku, counterparty), inc in delta.items()
+    ]
+    try:
+        await spec.rollup_model.get_pymongo_collection().bulk_write(writes, ordered=False)
+    except Exception:
+        logging.error(
+            "Fallo al actualizar los resúmenes diarios (%s %s); reconstruir con manage_rollups.py",
+            type(document).__name__, document.id, exc_info=True,
+        )
+
+
+async def record_document(document: Document, sign: int = 1) -> None:
+    """
+    Suma (sign=1) o resta (sign=-1) las líneas de una factura o nota en los resúmenes
+    de su día. Un fallo se registra en el log sin afectar al documento: los resúmenes
+    se pueden reconstruir.
+    """
+    found = _source_of(document)
+    if not found:
+        return
+    spec, source = found
+    contribution = _contribution(spec, source, document.model_dump())
+    await _apply(spec, document, _delta(contribution, {}) if sign > 0 else _delta({}, contribution))
+
+
+async def _stored(document: Document, source: RollupSource, spec: RollupKind) -> Optional[Dict[str, Any]]:
+    if document.id is None:
+        return None
+    projection = {source.date_field: 1, spec.counterparty_field: 1, "items": 1, "status": 1}
+    return await type(document).get_pymongo_collection().find_one({"_id": document.id}, projection)
+
+
+async def snapshot_document(document: Document) -> None:
+    """
+    Antes de un replace/save/update: guarda lo que el documento almacenado aporta a
+    los resúmenes (el documento en memoria puede traer ya los cambios).
+    """
+    found = _source_of(document)
+    if not found:
+        return
+    spec, source = found
+    try:
+        document._rollup_snapshot = _contribution(spec, source, await _stored(document, source, spec))
+    except Exception:
+        document._rollup_snapshot = None
+        logging.error("No se pudo leer %s %s antes de actualizarlo", type(document).__name__, document.id, exc_info=True)
+
+
+async def record_change(document: Document) -> None:
+    """
+    Después de un replace/save/update: aplica la diferencia entre lo que aportaba el
+    documento antes (`snapshot_document`) y lo que aporta ahora. Un cambio que no toca
+    fecha, contraparte, líneas ni estado (p. ej. un pago) no escribe nada.
+    """
+    found = _source_of(document)
+    previous = getattr(document, "_rollup_snapshot", None)
+    document._rollup_snapshot = None
+    if not found or previous is None:
+        return
+    spec, source = found
+    await _apply(spec, document, _delta(_contribution(spec, source, document.model_dump()), previous))
+
+
+def _source_pipeline(spec: RollupKind, source: RollupSource, match: Dict[str, Any], now: datetime) -> List[Dict[str, Any]]:
+    """Agregación que recalcula los resúmenes de una fuente y los combina con `$merge`."""
+    date_field = f"${source.date_field}"
+    quantity_field, amount_field = ("returned_quantity", "returned_amount") if source.returns else ("quantity", "amount")
+    if source.returns:
+        match = {**match, "status": {"$ne": "CANCELLED"}}
+    return [
+        {"$match": match},
+        {"$unwind": "$items"},
+        {"$group": {
+            "_id": {
+                "day": {"$dateFromParts": {
+                    "year": {"$year": date_field}, "month": {"$month": date_field}, "day": {"$dayOfMonth": date_field},
+                }},
+                "sku": "$items.product_sku",
+                "counterparty": f"${spec.counterparty_field}",
+            },
+            quantity_field: {"$sum": "$items.quantity"},
+            amount_field: {"$sum": {"$multiply": ["$items.quantity", f"$items.{source.price_field}"]}},
+            "lines": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "day": "$_id.day",
+            "sku": "$_id.sku",
+            spec.counterparty_field: "$_id.counterparty",
+            **{field: {"$ifNull": [f"${field}", 0]} for field in COUNTERS},
+            amount_field: {"$round": [f"${amount_field}", 3]},
+            "updated_at": {"$literal": now},
+        }},
+        {"$merge": {
+            "into": spec.rollup_model.get_settings().name,
+            "on": ["day", "sku", spec.counterparty_field],
+            # La segunda fuente (notas) se suma a lo que dejó la primera (facturas).
+            "whenMatched": [{"$set": {
+                **{field: {"$add": [f"${field}", f"$$new.{field}"]} for field in COUNTERS},
+                "updated_at": "$$new.updated_at",
+            }}],
+            "whenNotMatched": "insert",
+        }},
+    ]
+
+
+async def rebuild_rollups(kind: str, since: Optional[date] = None, until: Optional[date] = None) -> int:
+    """
+    Recalcula los resúmenes de `kind` para los días [since, until] (todo si se omiten)
+    desde las facturas y notas. Devuelve cuántos documentos de resumen quedaron en el
+    rango. Conviene ejecutarlo sin escrituras en curso sobre ese rango.
+    """
+    spec = _kind(kind)
+    day_range: Dict[str, Any] = {}
+    if since:
+        day_range["$gte"] = datetime(since.year, since.month, since.day)
+    if until:
+        day_range["$lt"] = datetime(until.year, until.month, until.day) + timedelta(days=1)
+    rollup_filter = {"day": day_range} if day_range else {}
+
+    collection = spec.rollup_model.get_pymongo_collection()
+    await collection.delete_many(rollup_filter)
+    now = datetime.now()
+    for source in spec.sources:
+        match = {source.date_field: day_range} if day_range else {}
+        cursor = await source.model.get_pymongo_collection().aggregate(
+            _source_pipeline(spec, source, match, now), allowDiskUse=True
+        )
+        await cursor.to_list()
+    return await collection.count_documents(rollup_filter)
+
+
+async def get_rollup(
+    kind: str,
+    start: date,
+    end: date,
+    group_by: str = "day",
+    sku: Optional[str] = None,
+    counterparty_id: Optional[str] = None,
+    limit: int = 100,
+) -> RollupReport:
+    """
+    Totales de ventas/compras entre `start` y `end` (inclusive) agrupados por día, SKU
+    o contraparte, leyendo solo los resúmenes diarios. Por día se devuelven en orden
+    cronológico; por SKU o contraparte, los de mayor monto neto primero (hasta `limit`).
+    """
+    spec = _kind(kind)
+    if group_by not in GROUP_BY:
+        raise ValidationException(f"Agrupación no válida: {group_by}. Use {', '.join(GROUP_BY)}.")
+    start_dt = datetime(start.year, start.month, start.day)
+    end_dt = datetime(end.year, end.month, end.day) + timedelta(days=1)
+
+    match: Dict[str, Any] = {"day": {"$gte": start_dt, "$lt": end_dt}}
+    if sku:
+        match["sku"] = sku
+    if counterparty_id:
+        match[spec.counterparty_field] = counterparty_id
+
+    key = {
+        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$day"}},
+        "sku": "$sku",
+        "counterparty": f"${spec.counterparty_field}",
+    }[group_by]
+    net = {
+        "net_quantity": {"$subtract": ["$quantity", "$returned_quantity"]},
+        "net_amount": {"$round": [{"$subtract": ["$amount", "$returned_amount"]}, 3]},
+    }
+    sums = {field: {"$sum": f"${field}"} for field in COUNTERS}
+
+    items_pipeline: List[Dict[str, Any]] = [{"$set": net}]
+    if group_by == "day":
+        items_pipeline.append({"$sort": {"_id": 1}})
+    else:
+        items_pipeline += [{"$sort": {"net_amount": -1, "_id": 1}}, {"$limit": limit}]
+    if group_by == "counterparty":
+        items_pipeline += lookup_stages("_id", spec.counterparty_collection, "name", "name")
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": key, **sums}},
+        {"$facet": {
+            "items": items_pipeline,
+            "totals": [{"$group": {"_id": None, **sums}}, {"$set": net}],
+        }},
+    ]
+    result = await spec.rollup_model.aggregate(pipeline).to_list()
+    facet = result[0] if result else {"items": [], "totals": []}
+
+    def row(doc: Dict[str, Any]) -> RollupRow:
+        doc = dict(doc)
+        doc["key"] = str(doc.pop("_id") or "")
+        doc["amount"] = round(doc.get("amount", 0.0), 3)
+        doc["returned_amount"] = round(doc.get("returned_amount", 0.0), 3)
+        return RollupRow(**doc)
+
+    totals = row(facet["totals"][0]) if facet["totals"] else RollupRow(key="total")
+    totals.key = "total"
+    return RollupReport(
+        kind=kind,
+        group_by=group_by,
+        start=start_dt,
+        end=end_dt - timedelta(microseconds=1),
+        totals=totals,
+        items=[row(doc) for doc in facet["items"]],
+    )
@@ -10,8 +10,26 @@ from app.services import inventory_service
 from app.services.document_number_service import get_credit_note_number
 from app.exceptions.business_exceptions import NotFoundException, ValidationException, DuplicateException
 from app.schemas.common import PaginatedResponse
-from app.schemas.sales_schemas import CreditNoteCreate, CustomerCreate, CustomerUpdate
-import math
+from app.schemas.sales_schemas import CreditNoteCreate, CustomerCreate, CustomerUpdate, CustomerRead, SalesOrderRead, SalesInvoiceRead, CreditNoteRead
+from app.services.pagination_service import paginate, invalidate_cached_totals, lookup_stages
+from app.services.search_service import search_filter, counterparty_search_filter
+from app.services.projection_service import FieldSet, select_fields, page_options, wants, VIEW_SUMMARY
+from app.services.cache_service import cache, CACHE_CUSTOMER
+
+# Campos que aceptan `fields=` / `view=` en los listados (ver projection_service).
+CUSTOMER_FIELDS = FieldSet(CustomerRead, {VIEW_SUMMARY: ["name", "ruc", "phone", "email"]})
+SALES_ORDER_FIELDS = FieldSet(SalesOrderRead, {
+    VIEW_SUMMARY: ["order_number", "customer_id", "customer_name", "date", "status", "total_amount"],
+})
+SALES_INVOICE_FIELDS = FieldSet(SalesInvoiceRead, {
+    VIEW_SUMMARY: [
+        "invoice_number", "order_id", "order_number", "customer_id", "customer_name",
+        "invoice_date", "total_amount", "payment_status",
+    ],
+})
+CREDIT_NOTE_FIELDS = FieldSet(CreditNoteRead, {
+    VIEW_SUMMARY: ["credit_note_number", "sales_invoice_id", "customer_id", "date", "reason", "status", "total_amount"],
+})
 
 # ================================================
 # =============== CUSTOMERS ======================
@@ -25,45 +43,43 @@ async def create_customer(customer_data: CustomerCreate) -> Customer:
 
     new_customer = Customer(**customer_data.model_dump())
     await new_customer.insert()
+    invalidate_cached_totals(Customer)
     return new_customer
 
 async def get_customers(
-    skip: int = 0, limit: int = 10, search: Optional[str] = None
-) -> PaginatedResponse[Customer]:
-    """Retrieves a paginated list of customers."""
+    skip: int = 0, limit: int = 10, search: Optional[str] = None,
+    fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[CustomerRead]:
+    """Retrieves a paginated list of customers (optionally only some `fields` or a `view`)."""
+    selection = select_fields(CUSTOMER_FIELDS, fields, view)
     query_conditions = []
-    if search:
-        search_regex = {"$regex": search, "$options": "i"}
-        query_conditions.append(
-            {"$or": [
-                {"name": search_regex},
-                {"ruc": search_regex}
-            ]}
-        )
+    score = None
+    search_query = search_filter(search)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
 
     query = {"$and": query_conditions} if query_conditions else {}
     
-    total = await Customer.find(query).count()
-    items = await Customer.find(query).sort("+name").skip(skip).limit(limit).to_list()
-    
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=math.ceil(skip / limit) + 1 if limit > 0 else 1,
-        pages=math.ceil(total / limit) if limit > 0 else 1,
-        size=limit
+    return await paginate(
+        Customer, query, [("name", 1)], skip=skip, limit=limit, score=score, **page_options(selection, CustomerRead)
     )
 
-async def get_customer_by_id(customer_id: str) -> Optional[Customer]:
-    """Fetches a single customer by their ID."""
-    customer = await Customer.get(PydanticObjectId(customer_id))
+async def get_customer_by_id(customer_id: str, use_cache: bool = True) -> Optional[Customer]:
+    """Fetches a single customer by their ID (read-through cache unless `use_cache` is False)."""
+    if use_cache:
+        customer = await cache.get_or_load(
+            CACHE_CUSTOMER, customer_id, lambda: Customer.get(PydanticObjectId(customer_id)), Customer
+        )
+    else:
+        customer = await Customer.get(PydanticObjectId(customer_id))
     if not customer:
         raise NotFoundException(f"Customer with ID {customer_id} not found.")
     return customer
 
 async def update_customer(customer_id: str, customer_data: CustomerUpdate) -> Customer:
     """Updates an existing customer."""
-    customer = await get_customer_by_id(customer_id)
+    customer = await get_customer_by_id(customer_id, use_cache=False)
     
     # Check for duplicate RUC if it's being changed
     if customer_data.ruc and customer.ruc != customer_data.ruc:
@@ -77,12 +93,15 @@ async def update_customer(customer_id: str, customer_data: CustomerUpdate) -> Cu
         setattr(customer, key, value)
     
     await customer.save()
+    await cache.invalidate(CACHE_CUSTOMER, customer_id)
     return customer
 
 async def delete_customer(customer_id: str) -> bool:
     """Deletes a customer by their ID."""
-    customer = await get_customer_by_id(customer_id)
+    customer = await get_customer_by_id(customer_id, use_cache=False)
     await customer.delete()
+    invalidate_cached_totals(Customer)
+    await cache.invalidate(CACHE_CUSTOMER, customer_id)
     return True
 
 # ================================================
@@ -90,30 +109,27 @@ async def delete_customer(customer_id: str) -> bool:
 # ================================================
 
 async def get_sales_orders(
-    skip: int = 0, limit: int = 10, search: Optional[str] = None
-) -> PaginatedResponse[SalesOrder]:
-    """Retrieves a paginated list of sales orders."""
+    skip: int = 0, limit: int = 10, search: Optional[str] = None,
+    fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[SalesOrderRead]:
+    """Retrieves a paginated list of sales orders, with the customer name resolved."""
+    selection = select_fields(SALES_ORDER_FIELDS, fields, view)
     query_conditions = []
-    if search:
-        search_regex = {"$regex": search, "$options": "i"}
-        query_conditions.append(
-            {"$or": [
-                {"order_number": search_regex},
-                {"customer_id": search_regex} # This assumes customer_id is a searchable string
-            ]}
-        )
+    score = None
+    search_query = await counterparty_search_filter(search, "customer_id", Customer)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
 
     query = {"$and": query_conditions} if query_conditions else {}
-    
-    total = await SalesOrder.find(query).count()
-    items = await SalesOrder.find(query).sort("-date").skip(skip).limit(limit).to_list()
-    
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=math.ceil(skip / limit) + 1 if limit > 0 else 1,
-        pages=math.ceil(total / limit) if limit > 0 else 1,
-        size=limit
+
+    lookups = []
+    if wants(selection, "customer_name"):
+        lookups += lookup_stages("customer_id", "customers", "name", "customer_name")
+
+    return await paginate(
+        SalesOrder, query, [("date", -1)], skip=skip, limit=limit, score=score,
+        lookups=lookups, **page_options(selection, SalesOrderRead),
     )
 
 # ================================================
@@ -121,30 +137,29 @@ async def get_sales_orders(
 # ================================================
 
 async def get_sales_invoices(
-    skip: int = 0, limit: int = 10, search: Optional[str] = None
-) -> PaginatedResponse[SalesInvoice]:
-    """Retrieves a paginated list of sales invoices."""
+    skip: int = 0, limit: int = 10, search: Optional[str] = None,
+    fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[SalesInvoiceRead]:
+    """Retrieves a paginated list of sales invoices, with customer name and order number resolved."""
+    selection = select_fields(SALES_INVOICE_FIELDS, fields, view)
     query_conditions = []
-    if search:
-        search_regex = {"$regex": search, "$options": "i"}
-        query_conditions.append(
-            {"$or": [
-                {"invoice_number": search_regex},
-                {"order_id": search_regex} # This assumes order_id is a searchable string
-            ]}
-        )
+    score = None
+    search_query = await counterparty_search_filter(search, "customer_id", Customer)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
 
     query = {"$and": query_conditions} if query_conditions else {}
-    
-    total = await SalesInvoice.find(query).count()
-    items = await SalesInvoice.find(query).sort("-invoice_date").skip(skip).limit(limit).to_list()
-    
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=math.ceil(skip / limit) + 1 if limit > 0 else 1,
-        pages=math.ceil(total / limit) if limit > 0 else 1,
-        size=limit
+
+    lookups = []
+    if wants(selection, "customer_name"):
+        lookups += lookup_stages("customer_id", "customers", "name", "customer_name")
+    if wants(selection, "order_number"):
+        lookups += lookup_stages("order_id", "sales_orders", "order_number", "order_number")
+
+    return await paginate(
+        SalesInvoice, query, [("invoice_date", -1)], skip=skip, limit=limit, score=score,
+        lookups=lookups, **page_options(selection, SalesInvoiceRead),
     )
 
 # ================================================
@@ -152,28 +167,20 @@ async def get_sales_invoices(
 # ================================================
 
 async def get_credit_notes(
-    skip: int = 0, limit: int = 10, search: Optional[str] = None
-) -> PaginatedResponse[CreditNote]:
-    """Retrieves a paginated list of credit notes."""
+    skip: int = 0, limit: int = 10, search: Optional[str] = None,
+    fields: Optional[str] = None, view: Optional[str] = None,
+) -> PaginatedResponse[CreditNoteRead]:
+    """Retrieves a paginated list of credit notes (optionally only some `fields` or a `view`)."""
+    selection = select_fields(CREDIT_NOTE_FIELDS, fields, view)
     query_conditions = []
-    if search:
-        search_regex = {"$regex": search, "$options": "i"}
-        query_conditions.append(
-            {"$or": [
-                {"credit_note_number": search_regex},
-                {"invoice_id": search_regex}
-            ]}
-        )
+    score = None
+    search_query = search_filter(search)
+    if search_query:
+        search_condition, score = search_query
+        query_conditions.append(search_condition)
 
     query = {"$and": query_conditions} if query_conditions else {}
     
-    total = await CreditNote.find(query).count()
-    items = await CreditNote.find(query).sort("-date").skip(skip).limit(limit).to_list()
-    
-    return PaginatedResponse(
-        items=items,
-        total=total,
-        page=math.ceil(skip / limit) + 1 if limit > 0 else 1,
-        pages=math.ceil(total / limit) if limit > 0 else 1,
-        size=limit
+    return await paginate(
+        CreditNote, query, [("date", -1)], skip=skip, limit=limit, score=score, **page_options(selection, CreditNoteRead)
     )
@@ -0,0 +1,172 @@
+"""
+Búsqueda indexada por tokens.
+
+Cada documento buscable guarda en `search_tokens` (índice multikey) los tokens
+normalizados (minúsculas, sin tildes) de sus campos de búsqueda:
+
+- Campos de texto (nombre, marca): prefijos de cada palabra ("fil", "filt", ...)
+  y la palabra completa marcada con "=" para el ranking.
+- Códigos (SKU, RUC, números de documento): todas las subcadenas del código
+  compactado, para que "123" encuentre "ABC-0123-X" igual que el antiguo $regex.
+  El código completo se marca con "==" para priorizar coincidencias exactas.
+- Identificadores (ids de referencia): solo la coincidencia exacta "==".
+
+Una búsqueda exige que todos sus términos estén en `search_tokens` ($all), lo
+que resuelve el índice en lugar de recorrer la colección con $regex.
+"""
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+MAX_TOKEN_LENGTH = 15
+MAX_CODE_LENGTH = 24
+# Contrapartes (proveedores/clientes) que puede resolver una búsqueda por nombre.
+MAX_COUNTERPARTY_MATCHES = 500
+
+WORD_MARK = "="
+EXACT_MARK = "=="
+LEADING_MARK = "^"
+
+# Pesos del ranking
+EXACT_CODE_SCORE = 100
+WORD_MATCH_SCORE = 10
+LEADING_PREFIX_SCORE = 5
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Minúsculas, sin tildes/diacríticos y con separadores reducidos a espacios."""
+    if not value:
+        return ""
+    folded = unicodedata.normalize("NFKD", str(value))
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", folded.lower()).strip()
+
+
+def compact_code(value: Optional[str]) -> str:
+    return normalize_text(value).replace(" ", "")[:MAX_CODE_LENGTH]
+
+
+def _prefixes(word: str) -> Iterable[str]:
+    for end in range(1, min(len(word), MAX_TOKEN_LENGTH) + 1):
+        yield word[:end]
+
+
+def _substrings(code: str) -> Iterable[str]:
+    for start in range(len(code)):
+        for end in range(start + 1, min(len(code), start + MAX_TOKEN_LENGTH) + 1):
+            yield code[start:end]
+
+
+def build_search_tokens(
+    words: Iterable[Optional[str]] = (),
+    codes: Iterable[Optional[str]] = (),
+    exact: Iterable[Optional[str]] = (),
+) -> List[str]:
+    """Tokens a guardar en `search_tokens`. El primer campo de `words` es el principal."""
+    tokens = set()
+    leading_done = False
+
+    for text in words:
+        for word in normalize_text(text).split():
+            tokens.update(_prefixes(word))
+            tokens.add(WORD_MARK + word[:MAX_TOKEN_LENGTH])
+            if not leading_done:
+                tokens.update(LEADING_MARK + p for p in _prefixes(word))
+                leading_done = True
+
+    for code in codes:
+        compact = compact_code(code)
+        if compact:
+            tokens.update(_substrings(compact))
+            tokens.add(EXACT_MARK + compact)
+            tokens.update(WORD_MARK + w[:MAX_TOKEN_LENGTH] for w in normalize_text(code).split())
+
+    for value in exact:
+        compact = compact_code(value)
+        if compact:
+            tokens.add(EXACT_MARK + compact)
+
+    return sorted(tokens)
+
+
+def _query_terms(search: str) -> List[str]:
+    terms = []
+    for word in normalize_text(search).split():
+        term = word[:MAX_TOKEN_LENGTH]
+        if term not in terms:
+            terms.append(term)
+    return terms
+
+
+def search_filter(search: Optional[str]) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Traduce el texto de búsqueda en (filtro Mongo, expresión de ranking).
+    Devuelve None si el texto no contiene términos buscables.
+    """
+    terms = _query_terms(search or "")
+    if not terms:
+        return None
+
+    query: Dict[str, Any] = {"search_tokens": {"$all": terms}}
+    compact = compact_code(search)
+    if compact and compact not in terms:
+        # "ABC-12" debe encontrar "ABC12": se acepta tanto el código compacto como las palabras.
+        query = {"$or": [query, {"search_tokens": compact[:MAX_TOKEN_LENGTH]}]}
+
+    score = {"$add": [
+        {"$cond": [{"$in": [EXACT_MARK + compact, "$search_tokens"]}, EXACT_CODE_SCORE, 0]},
+        {"$multiply": [
+            {"$size": {"$setIntersection": ["$search_tokens", [WORD_MARK + t for t in terms]]}},
+            WORD_MATCH_SCORE,
+        ]},
+        {"$cond": [{"$in": [LEADING_MARK + terms[0], "$search_tokens"]}, LEADING_PREFIX_SCORE, 0]},
+    ]}
+    return query, score
+
+
+async def counterparty_search_filter(
+    search: Optional[str],
+    field: str,
+    counterparty_model,
+    limit: int = MAX_COUNTERPARTY_MATCHES,
+) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Como `search_filter`, pero además acepta los documentos cuya contraparte (`field`,
+    id de proveedor o cliente guardado como texto) coincide con la búsqueda por nombre.
+    Las contrapartes se resuelven primero con el índice de tokens de su colección
+    (hasta `limit`) y luego se filtra por `field` con `$in`, que usa el índice de `field`.
+    """
+    search_query = search_filter(search)
+    if not search_query:
+        return None
+    query, score = search_query
+    cursor = counterparty_model.get_pymongo_collection().find(query, {"_id": 1}).limit(limit)
+    ids = [str(doc["_id"]) async for doc in cursor]
+    if ids:
+        query = {"$or": [query, {field: {"$in": ids}}]}
+    return query, score
+
+
+async def rebuild_search_tokens(model, batch_size: int = 1000) -> int:
+    """
+    Recalcula `search_tokens` de todos los documentos de `model` (p. ej. datos
+    anteriores a la búsqueda indexada). Usa el hook `refresh_search_tokens` del modelo.
+    """
+    collection = model.get_pymongo_collection()
+    updated = 0
+    batch = []
+    async for doc in model.find_all():
+        doc.refresh_search_tokens()
+        batch.append(UpdateOne({"_id": doc.id}, {"$set": {"search_tokens": doc.search_tokens}}))
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
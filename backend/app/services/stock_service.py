@@ -0,0 +1,426 @@
+"""
+Motor de mutación de stock.
+
+Reemplaza el patrón leer-modificar-guardar (`product.stock_current -= q; product.save()`)
+por actualizaciones atómicas en MongoDB:
+
+- Cada SKU recibe un único update con `$inc` condicional ("solo si stock_current >= q")
+  o, si el ingreso actualiza el costo promedio ponderado, un update con pipeline
+  que calcula el nuevo costo con los valores actuales del documento. Quien calculó la
+  variación a partir del stock leído (un ajuste a un valor absoluto) pasa ese valor en
+  `expected_stock` y el update solo se aplica si el stock sigue siendo ese.
+- El saldo por almacén (`WarehouseStock`) se actualiza igual, con un update condicional
+  por (sku, almacén). `Product.stock_current` es el total de todos los almacenes, por lo
+  que una transferencia mueve saldo entre almacenes sin cambiar el total.
+- Todas las líneas de un documento se aplican con un `bulk_write` por colección y los
+  movimientos se registran con `insert_many`, dentro de una misma transacción, junto
+  con las entradas del libro de costos (`cost_ledger_service`) con el estado resultante.
+- Si el servidor no soporta transacciones (mongod standalone de desarrollo), se aplica
+  cada update con `find_one_and_update` condicional y se revierten los ya aplicados si
+  alguna línea falla.
+"""
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from beanie.odm.utils.parsing import parse_obj
+from pymongo import UpdateOne, ReturnDocument
+
+from app.database import get_client, supports_transactions
+from app.models.inventory import Product, StockMovement, MovementType, WarehouseStock, CostLedgerEntry
+from app.exceptions.business_exceptions import (
+    NotFoundException, InsufficientStockException, ValidationException, StockConflictException,
+)
+from app.services.cost_ledger_service import build_entry
+from app.services.cache_service import cache, CACHE_PRODUCT
+
+# Almacén al que entran los ingresos sin `warehouse_id` y al que se asigna el stock
+# previo a la existencia de saldos por almacén.
+DEFAULT_WAREHOUSE = "SL01"
+
+# Movimientos que suman o restan stock cuando no se indica una variación explícita.
+INBOUND_TYPES = {MovementType.IN, MovementType.TRANSFER_IN}
+OUTBOUND_TYPES = {
+    MovementType.OUT, MovementType.TRANSFER_OUT,
+    MovementType.LOSS_DAMAGED, MovementType.LOSS_DEFECTIVE, MovementType.LOSS_HUMIDITY,
+    MovementType.LOSS_EXPIRED, MovementType.LOSS_THEFT, MovementType.LOSS_OTHER,
+}
+TRANSFER_TYPES = {MovementType.TRANSFER_IN, MovementType.TRANSFER_OUT}
+
+StockChange = Tuple[StockMovement, int]
+
+
+def signed_quantity(movement: StockMovement) -> int:
+    """Variación de stock implícita en un movimiento (positiva para ingresos)."""
+    if movement.movement_type in INBOUND_TYPES:
+        return movement.quantity
+    if movement.movement_type in OUTBOUND_TYPES:
+        return -movement.quantity
+    raise ValueError(f"El movimiento {movement.movement_type} requiere una variación explícita.")
+
+
+def _warehouse_change(movement: StockMovement, delta: int) -> Tuple[str, int]:
+    """
+    Almacén afectado y variación de su saldo. En las transferencias ambos movimientos
+    llevan origen (`warehouse_id`) y destino (`target_warehouse_id`); el TRANSFER_IN
+    afecta al destino. Para el resto, el saldo del almacén varía igual que el total.
+
+    Una salida debe indicar su almacén: tomar DEFAULT_WAREHOUSE haría fallar por falta
+    de saldo salidas que otro almacén sí cubre. Un ingreso sin almacén entra al principal
+    (y el movimiento queda registrado con él).
+    """
+    if movement.movement_type in TRANSFER_TYPES and movement.target_warehouse_id:
+        if movement.movement_type == MovementType.TRANSFER_IN:
+            return movement.target_warehouse_id, movement.quantity
+        if not movement.warehouse_id:
+            raise ValidationException(f"La transferencia de {movement.product_sku} requiere el almacén de origen.")
+        return movement.warehouse_id, -movement.quantity
+    if not movement.warehouse_id:
+        if delta < 0:
+            raise ValidationException(
+                f"La salida de {movement.product_sku} requiere el almacén (warehouse_id) del que se descuenta."
+            )
+        movement.warehouse_id = DEFAULT_WAREHOUSE
+    return movement.warehouse_id, delta
+
+
+class _SkuPlan:
+    """Variación agregada de un SKU dentro de un mismo documento."""
+
+    def __init__(self, sku: str):
+        self.sku = sku
+        self.delta = 0
+        self.cost_quantity = 0
+        self.cost_value = 0.0
+        # Stock total leído por quien calculó la variación (ver commit_stock_changes).
+        self.expected: Optional[int] = None
+
+    @property
+    def required(self) -> int:
+        return -self.delta if self.delta < 0 else 0
+
+    @property
+    def changes_product(self) -> bool:
+        return bool(self.delta or self.cost_quantity)
+
+    def filter(self, allow_negative: bool) -> dict:
+        query = {"sku": self.sku}
+        if self.expected is not None:
+            query["stock_current"] = self.expected
+        elif self.required and not allow_negative:
+            query["stock_current"] = {"$gte": self.required}
+        return query
+
+    def update(self):
+        if not self.cost_quantity:
+            return {"$inc": {"stock_current": self.delta}}
+        # Costo promedio ponderado calculado en el servidor con el stock y costo actuales.
+        base_quantity = {"$add": ["$stock_current", self.cost_quantity]}
+        return [{"$set": {
+            "cost": {"$cond": [
+                {"$gt": [base_quantity, 0]},
+                {"$round": [
+                    {"$divide": [
+                        {"$add": [{"$multiply": ["$stock_current", "$cost"]}, self.cost_value]},
+                        base_quantity,
+                    ]},
+                    3,
+                ]},
+                "$cost",
+            ]},
+            "stock_current": {"$add": ["$stock_current", self.delta]},
+        }}]
+
+    def apply_to(self, product: Product):
+        """Replica en memoria el efecto de `update()` sobre el estado leído."""
+        if self.cost_quantity:
+            base_quantity = product.stock_current + self.cost_quantity
+            if base_quantity > 0:
+                product.cost = round(
+                    (product.stock_current * product.cost + self.cost_value) / base_quantity, 3
+                )
+        product.stock_current += self.delta
+
+
+class _WarehousePlan:
+    """Variación agregada del saldo de un SKU en un almacén."""
+
+    def __init__(self, sku: str, warehouse_id: str):
+        self.sku = sku
+        self.warehouse_id = warehouse_id
+        self.delta = 0
+
+    @property
+    def required(self) -> int:
+        return -self.delta if self.delta < 0 else 0
+
+    def filter(self, allow_negative: bool) -> dict:
+        query = {"sku": self.sku, "warehouse_id": self.warehouse_id}
+        if self.required and not allow_negative:
+            query["quantity"] = {"$gte": self.required}
+        return query
+
+    def update(self) -> dict:
+        return {"$inc": {"quantity": self.delta}, "$set": {"updated_at": datetime.now()}}
+
+    @property
+    def upsert(self) -> bool:
+        # Solo los ingresos pueden crear el saldo; una salida exige que exista.
+        return self.delta >= 0
+
+
+def _build_plans(changes: List[StockChange], update_cost: bool, expected_stock: Dict[str, int]):
+    plans: "OrderedDict[str, _SkuPlan]" = OrderedDict()
+    warehouse_plans: "OrderedDict[Tuple[str, str], _WarehousePlan]" = OrderedDict()
+    for movement, delta in changes:
+        movement.stock_change = delta
+        sku = movement.product_sku
+        plan = plans.setdefault(sku, _SkuPlan(sku))
+        plan.delta += delta
+        if update_cost and delta > 0 and movement.movement_type == MovementType.IN and movement.unit_cost is not None:
+            plan.cost_quantity += delta
+            plan.cost_value += delta * movement.unit_cost
+
+        warehouse_id, warehouse_delta = _warehouse_change(movement, delta)
+        if warehouse_delta:
+            key = (sku, warehouse_id)
+            warehouse_plans.setdefault(key, _WarehousePlan(sku, warehouse_id)).delta += warehouse_delta
+    for sku, expected in expected_stock.items():
+        if sku in plans:
+            plans[sku].expected = expected
+    return plans, warehouse_plans
+
+
+def _fill_unit_costs(changes: List[StockChange], products: Dict[str, Product]):
+    for movement, _ in changes:
+        if movement.unit_cost is None:
+            movement.unit_cost = products[movement.product_sku].cost
+
+
+def _apply_plans(changes: List[StockChange], plans, products: Dict[str, Product]) -> List[CostLedgerEntry]:
+    """
+    Lleva `products` (leídos antes del update) a su estado resultante y devuelve las
+    entradas del libro de costos de los SKUs cuyo stock total o costo cambió.
+    """
+    references: Dict[str, str] = {}
+    for movement, _ in changes:
+        references.setdefault(movement.product_sku, movement.reference_document)
+
+    entries = []
+    now = datetime.now()
+    for plan in plans.values():
+        product = products[plan.sku]
+        before_quantity, before_cost = product.stock_current, product.cost
+        plan.apply_to(product)
+        if plan.changes_product:
+            entries.append(build_entry(
+                plan.sku, before_quantity, before_cost, product.stock_current, product.cost,
+                reference_document=references[plan.sku], created_at=now,
+            ))
+    return entries
+
+
+async def _load_products(skus: List[str], session=None) -> Dict[str, Product]:
+    products = await Product.find({"sku": {"$in": skus}}, session=session).to_list()
+    found = {p.sku: p for p in products}
+    for sku in skus:
+        if sku not in found:
+            raise NotFoundException("Product", sku)
+    return found
+
+
+async def _load_balances(skus: List[str], products: Dict[str, Product], session=None) -> Dict[Tuple[str, str], int]:
+    """
+    Saldos por (sku, almacén). Los productos que aún no tienen saldos por almacén
+    (datos anteriores) se inicializan con todo su stock en DEFAULT_WAREHOUSE.
+
+    La inicialización es un upsert con `$setOnInsert`: si dos movimientos concurrentes
+    la intentan, solo se aplica la primera. Por eso debe hacerse antes de modificar el
+    stock del producto (con el `stock_current` leído antes del update), y los saldos se
+    vuelven a leer en lugar de suponer que ganó la propia.
+    """
+    collection = WarehouseStock.get_pymongo_collection()
+    rows = await collection.find({"sku": {"$in": skus}}, session=session).to_list(None)
+    with_rows = {row["sku"] for row in rows}
+
+    seeds = [
+        UpdateOne(
+            {"sku": sku, "warehouse_id": DEFAULT_WAREHOUSE},
+            {"$setOnInsert": {"quantity": products[sku].stock_current, "updated_at": datetime.now()}},
+            upsert=True,
+        )
+        for sku in skus if sku not in with_rows
+    ]
+    if seeds:
+        await collection.bulk_write(seeds, ordered=False, session=session)
+        rows = await collection.find({"sku": {"$in": skus}}, session=session).to_list(None)
+    return {(row["sku"], row["warehouse_id"]): row["quantity"] for row in rows}
+
+
+async def get_warehouse_balances(skus: List[str]) -> Dict[str, Dict[str, int]]:
+    """Saldos por almacén de varios SKUs en una sola consulta: {sku: {almacén: cantidad}}."""
+    products = await _load_products(skus)
+    balances = await _load_balances(skus, products)
+    result: Dict[str, Dict[str, int]] = {sku: {} for sku in skus}
+    for (sku, warehouse_id), quantity in balances.items():
+        result[sku][warehouse_id] = quantity
+    return result
+
+
+async def commit_stock_changes(
+    changes: List[StockChange],
+    update_cost: bool = False,
+    allow_negative: bool = False,
+    expected_stock: Optional[Dict[str, int]] = None,
+) -> Dict[str, Product]:
+    """
+    Aplica de forma atómica un conjunto de movimientos de stock.
+
+    `changes` es una lista de (movimiento, variación del stock total con signo). Las
+    variaciones de un mismo SKU se agregan en un solo update; las transferencias llevan
+    variación 0 sobre el total y mueven saldo entre almacenes. Si `update_cost` es True,
+    los ingresos (IN) con `unit_cost` recalculan el costo promedio ponderado.
+    `expected_stock` ({sku: stock_current leído}) condiciona el update de esos SKUs a
+    que su stock no haya cambiado desde la lectura.
+    Devuelve los productos afectados con su stock (y costo) resultante.
+    Lanza InsufficientStockException sin aplicar ningún cambio si alguna línea no alcanza,
+    y StockConflictException si el stock de un SKU de `expected_stock` ya no es el leído.
+    """
+    if not changes:
+        return {}
+    plans, warehouse_plans = _build_plans(changes, update_cost, expected_stock or {})
+    if not allow_negative:
+        for plan in plans.values():
+            if plan.expected is not None and plan.required > plan.expected:
+                raise InsufficientStockException(plan.sku, plan.expected, plan.required)
+
+    if await supports_transactions():
+        async with get_client().start_session() as session:
+            products = await session.with_transaction(
+                lambda s: _commit_in_transaction(changes, plans, warehouse_plans, allow_negative, s)
+            )
+    else:
+        products = await _commit_with_compensation(changes, plans, warehouse_plans, allow_negative)
+
+    await cache.invalidate(CACHE_PRODUCT, *[sku for sku, plan in plans.items() if plan.changes_product])
+    return products
+
+
+async def _commit_in_transaction(changes, plans, warehouse_plans, allow_negative: bool, session) -> Dict[str, Product]:
+    skus = list(plans)
+    products = await _load_products(skus, session=session)
+    for plan in plans.values():
+        current = products[plan.sku].stock_current
+        if plan.expected is not None and current != plan.expected:
+            raise StockConflictException(plan.sku, plan.expected, current)
+    balances = await _load_balances(skus, products, session=session) if warehouse_plans else {}
+
+    if not allow_negative:
+        for plan in plans.values():
+            available = products[plan.sku].stock_current
+            if plan.required and available < plan.required:
+                raise InsufficientStockException(plan.sku, available, plan.required)
+        for plan in warehouse_plans.values():
+            available = balances.get((plan.sku, plan.warehouse_id), 0)
+            if plan.required and available < plan.required:
+                raise InsufficientStockException(f"{plan.sku}@{plan.warehouse_id}", available, plan.required)
+
+    operations = [
+        UpdateOne(plan.filter(allow_negative), plan.update())
+        for plan in plans.values() if plan.changes_product
+    ]
+    warehouse_operations = [
+        UpdateOne(plan.filter(allow_negative), plan.update(), upsert=plan.upsert)
+        for plan in warehouse_plans.values()
+    ]
+
+    if operations:
+        result = await Product.get_pymongo_collection().bulk_write(operations, ordered=True, session=session)
+        _check_applied(result, len(operations))
+    if warehouse_operations:
+        result = await WarehouseStock.get_pymongo_collection().bulk_write(warehouse_operations, ordered=True, session=session)
+        _check_applied(result, len(warehouse_operations))
+
+    _fill_unit_costs(changes, products)
+    ledger_entries = _apply_plans(changes, plans, products)
+    await StockMovement.insert_many([movement for movement, _ in changes], session=session)
+    if ledger_entries:
+        await CostLedgerEntry.insert_many(ledger_entries, session=session)
+    return products
+
+
+def _check_applied(result, expected: int):
+    if result.matched_count + result.upserted_count != expected:
+        # No debería ocurrir dentro de la transacción (un cambio concurrente produce un
+        # WriteConflict que with_transaction reintenta); al lanzar, nada queda aplicado.
+        raise ValidationException("Conflicto de concurrencia al actualizar el stock, reintente la operación.")
+
+
+async def _commit_with_compensation(changes, plans, warehouse_plans, allow_negative: bool) -> Dict[str, Product]:
+    product_collection = Product.get_pymongo_collection()
+    warehouse_collection = WarehouseStock.get_pymongo_collection()
+    applied: List[Tuple[object, dict, object]] = []
+    products: Dict[str, Product] = {}
+
+    if warehouse_plans:
+        # Inicializa los saldos por almacén antes de tocar el stock total (ver _load_balances).
+        skus = list(plans)
+        await _load_balances(skus, await _load_products(skus))
+
+    try:
+        for plan in plans.values():
+            if not plan.changes_product:
+                continue
+            before = await product_collection.find_one_and_update(
+                plan.filter(allow_negative), plan.update(), return_document=ReturnDocument.BEFORE
+            )
+            if before is None:
+                current = await Product.find_one(Product.sku == plan.sku)
+                if not current:
+                    raise NotFoundException("Product", plan.sku)
+                if plan.expected is not None:
+                    raise StockConflictException(plan.sku, plan.expected, current.stock_current)
+                raise InsufficientStockException(plan.sku, current.stock_current, plan.required)
+            applied.append((plan, before, product_collection))
+            products[plan.sku] = parse_obj(Product, before)
+
+        missing = [sku for sku in plans if sku not in products]
+        if missing:
+            products.update(await _load_products(missing))
+
+        for plan in warehouse_plans.values():
+            before = await warehouse_collection.find_one_and_update(
+                plan.filter(allow_negative), plan.update(), upsert=plan.upsert,
+                return_document=ReturnDocument.BEFORE
+            )
+            if before is None and not plan.upsert:
+                current = await WarehouseStock.find_one({"sku": plan.sku, "warehouse_id": plan.warehouse_id})
+                available = current.quantity if current else 0
+                raise InsufficientStockException(f"{plan.sku}@{plan.warehouse_id}", available, plan.required)
+            applied.append((plan, before, warehouse_collection))
+
+        _fill_unit_costs(changes, products)
+        # `products` tiene el estado previo a cada update atómico: el estado resultante
+        # calculado para el libro de costos es exacto aunque haya escrituras concurrentes.
+        ledger_entries = _apply_plans(changes, plans, products)
+        await StockMovement.insert_many([movement for movement, _ in changes])
+        if ledger_entries:
+            await CostLedgerEntry.insert_many(ledger_entries)
+    except Exception:
+        await _revert(applied)
+        raise
+
+    return products
+
+
+async def _revert(applied):
+    for plan, before, collection in reversed(applied):
+        if isinstance(plan, _WarehousePlan):
+            await collection.update_one(
+                {"sku": plan.sku, "warehouse_id": plan.warehouse_id}, {"$inc": {"quantity": -plan.delta}}
+            )
+            continue
+        update: dict = {"$inc": {"stock_current": -plan.delta}}
+        if plan.cost_quantity:
+            update["$set"] = {"cost": before.get("cost", 0.0)}
+        await collection.update_one({"sku": plan.sku}, update)
@@ -0,0 +1,111 @@
+"""
+Antigüedad de cuentas por cobrar sobre un volumen grande de facturas de venta:
+compara traer las facturas abiertas al cliente y agrupar en Python (lo que exigía
+el reporte antes) con la agregación de `aging_service`, y mide la exportación CSV.
+
+    python -m benchmarks.bench_aging --invoices 1000000 --customers 5000
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+async def seed(invoices: int, customers: int):
+    from app.models.sales import SalesInvoice, Customer
+
+    collection = SalesInvoice.get_pymongo_collection()
+    existing = await collection.estimated_document_count()
+    if existing >= invoices:
+        print(f"Ya existen {existing} facturas, no se generan más.")
+        return
+
+    if await Customer.count() < customers:
+        batch = []
+        for i in range(customers):
+            customer = Customer(name=f"Cliente {i:05d}", ruc=f"20{i:09d}")
+            customer.refresh_search_tokens()
+            batch.append(customer)
+        await Customer.insert_many(batch)
+    customer_ids = [str(c["_id"]) async for c in Customer.get_pymongo_collection().find({}, {"_id": 1})]
+
+    print(f"Generando {invoices - existing} facturas de venta...")
+    now = datetime.now()
+    batch = []
+    for i in range(existing, invoices):
+        total = round(random.uniform(50, 5000), 2)
+        status = random.choices(["PAID", "PENDING", "PARTIAL"], weights=[70, 20, 10])[0]
+        paid = total if status == "PAID" else (round(total * random.uniform(0.1, 0.9), 2) if status == "PARTIAL" else 0.0)
+        batch.append({
+            "invoice_number": f"FV-B{i:08d}",
+            "order_id": "",
+            "customer_id": random.choice(customer_ids),
+            "invoice_date": now - timedelta(days=random.randint(0, 365)),
+            "items": [],
+            "total_amount": total,
+            "delivery_address": "-",
+            "payment_status": status,
+            "amount_paid": paid,
+            "payments": [],
+            "credit_applied": 0.0,
+            "search_tokens": [],
+        })
+        if len(batch) == 10_000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed(args.invoices, args.customers)
+
+    from app.models.sales import SalesInvoice
+    from app.services import aging_service
+
+    as_of = datetime.now()
+    collection = SalesInvoice.get_pymongo_collection()
+
+    async def client_side():
+        # Facturas completas (con pagos) al cliente y agrupación en Python.
+        totals = defaultdict(lambda: [0.0, 0.0, 0.0, 0.0])
+        async for doc in collection.find({"payment_status": {"$in": aging_service.OPEN_STATUSES}}):
+            balance = doc["total_amount"] - doc.get("amount_paid", 0) - doc.get("credit_applied", 0)
+            if balance <= aging_service.BALANCE_EPSILON:
+                continue
+            days = (as_of - doc["invoice_date"]).days
+            bucket = 0 if days <= 30 else 1 if days <= 60 else 2 if days <= 90 else 3
+            totals[doc["customer_id"]][bucket] += balance
+        return totals
+
+    async def aggregation():
+        await aging_service.get_aging("receivables", as_of, limit=50)
+
+    async def export_csv():
+        async for _ in aging_service.aging_batches("receivables", as_of):
+            pass
+
+    results = {
+        "cliente (find + Python)": await measure(client_side, iterations=args.iterations, warmup=1),
+        "agregación (página de 50)": await measure(aggregation, iterations=args.iterations, warmup=1),
+        "exportación completa": await measure(export_csv, iterations=args.iterations, warmup=1),
+    }
+    print_report(f"Antigüedad CxC ({args.invoices} facturas, {args.customers} clientes)", results)
+
+    start = time.perf_counter()
+    report = await aging_service.get_aging("receivables", as_of, limit=1)
+    print(f"\n{report.counterparties} clientes con saldo, total {report.totals.total:,.2f} "
+          f"({report.totals.invoices} facturas abiertas) en {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=1_000_000)
+    parser.add_argument("--customers", type=int, default=5_000)
+    parser.add_argument("--iterations", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,83 @@
+"""
+Asignación de backorders de una recepción de 500 SKUs contra cotizaciones pendientes:
+una sola asignación en bloque (`allocate_incoming` con todos los SKUs: una consulta a
+la cola y un `bulk_write` por colección) frente a una asignación por SKU, como haría
+un `register_movement(IN)` por línea.
+
+    python -m benchmarks.bench_backorders --skus 500 --quotes 20000
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+PREFIX = "BKO-"
+
+
+async def seed(skus, quotes: int, items_per_quote: int):
+    from app.models.sales import SalesQuote, BackorderLine, BackorderAllocation, QuoteStatus
+
+    await SalesQuote.get_pymongo_collection().delete_many({"quote_number": {"$regex": f"^{PREFIX}"}})
+    await BackorderLine.get_pymongo_collection().delete_many({"sku": {"$in": skus}})
+    await BackorderAllocation.get_pymongo_collection().delete_many({"sku": {"$in": skus}})
+
+    rng = random.Random(7)
+    start = datetime.now() - timedelta(days=90)
+    quote_docs, line_docs = [], []
+    for n in range(quotes):
+        number = f"{PREFIX}{n:07d}"
+        date = start + timedelta(minutes=n)
+        priority = rng.choice((0, 0, 0, 1, 2))
+        items = [
+            {"product_sku": sku, "quantity_requested": rng.randint(1, 20), "quantity_filled": 0, "unit_price": 10.0}
+            for sku in rng.sample(skus, items_per_quote)
+        ]
+        quote_docs.append({
+            "quote_number": number, "customer_id": "benchmark", "date": date, "items": items,
+            "status": QuoteStatus.SENT.value, "priority": priority, "total_amount": 0.0, "search_tokens": [],
+        })
+    result = await SalesQuote.get_pymongo_collection().insert_many(quote_docs)
+    for quote_id, doc in zip(result.inserted_ids, quote_docs):
+        for index, item in enumerate(doc["items"]):
+            line_docs.append({
+                "sku": item["product_sku"], "quote_id": str(quote_id), "quote_number": doc["quote_number"],
+                "line": index, "priority": doc["priority"], "quote_date": doc["date"],
+                "quantity_pending": item["quantity_requested"],
+            })
+    await BackorderLine.get_pymongo_collection().insert_many(line_docs)
+    return len(line_docs)
+
+
+async def main(args):
+    await init_bench_db()
+    from app.services.backorder_service import allocate_incoming
+
+    skus = [f"{PREFIX}{i:05d}" for i in range(args.skus)]
+    lines = await seed(skus, args.quotes, args.items)
+    print(f"Cola: {lines} líneas abiertas en {args.skus} SKUs")
+
+    reception = {sku: args.quantity for sku in skus}
+
+    async def bulk():
+        await allocate_incoming(reception, "BENCH-BULK")
+
+    async def per_sku():
+        for sku, quantity in reception.items():
+            await allocate_incoming({sku: quantity}, "BENCH-SKU")
+
+    print_report(f"Recepción de {args.skus} SKUs ({args.quantity} u. c/u)", {
+        "en bloque (una asignación)": await measure(bulk, iterations=args.iterations, warmup=1),
+        "por SKU (una asignación por línea)": await measure(per_sku, iterations=args.iterations, warmup=1),
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--quotes", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=5, help="Ítems por cotización")
+    parser.add_argument("--quantity", type=int, default=8, help="Unidades recibidas por SKU en cada recepción")
+    parser.add_argument("--iterations", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""
+Latencia p50/p99 de las lecturas calientes del catálogo con y sin la caché de
+lecturas: producto por SKU, lista de almacenes, categorías y cliente por id.
+
+    python -m benchmarks.bench_cache --products 10000 --iterations 2000
+    CACHE_BACKEND=local python -m benchmarks.bench_cache   # ruta serializada (compartida)
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+async def seed(products: int):
+    from app.models.inventory import Product, Category
+    from app.models.sales import Customer
+
+    if await Product.count() < products:
+        print(f"Generando {products} productos...")
+        docs = []
+        for i in range(products):
+            product = Product(sku=f"CACHE-{i:06d}", name=f"Producto {i}", brand="Marca", price=10, cost=5, stock_current=100)
+            product.refresh_search_tokens()
+            docs.append(product)
+        await Product.insert_many(docs)
+    if await Category.count() < 20:
+        for i in range(20):
+            if not await Category.find_one(Category.name == f"Categoría {i}"):
+                await Category(name=f"Categoría {i}").insert()
+    customer = await Customer.find_one({})
+    if not customer:
+        customer = Customer(name="Cliente Benchmark", ruc="20123456789")
+        await customer.insert()
+    return str(customer.id)
+
+
+async def main(args):
+    await init_bench_db()
+    customer_id = await seed(args.products)
+
+    from app.services import inventory_service, sales_service
+    from app.services.cache_service import cache, build_backend
+
+    skus = [f"CACHE-{random.randrange(args.products):06d}" for _ in range(args.hot_skus)]
+
+    cases = {
+        "producto por SKU": lambda: inventory_service.get_product_by_sku(random.choice(skus)),
+        "almacenes": inventory_service.get_all_warehouses,
+        "categorías": inventory_service.get_categories,
+        "cliente por id": lambda: sales_service.get_customer_by_id(customer_id),
+    }
+
+    results = {}
+    backend = cache.backend
+    for label, active in (("sin caché", build_backend("off")), (f"caché {backend.name}", backend)):
+        cache.backend = active
+        await cache.clear()
+        for name, fn in cases.items():
+            results[f"{name} ({label})"] = await measure(fn, args.iterations, warmup=args.hot_skus)
+
+    print_report("Lecturas calientes del catálogo", results)
+    print(cache.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--hot-skus", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,105 @@
+"""
+Concurrencia de la numeración de documentos entre varios procesos, como los workers
+de `uvicorn --workers N`: cada proceso tiene su propio cliente y sus propios bloques.
+
+Compara, para la misma carga, el contador de un número por `$inc`, la reserva por
+bloques y la serie sin huecos (transacción por número), y verifica que no haya
+números repetidos y, en la serie sin huecos, que no haya huecos.
+
+    python -m benchmarks.bench_document_numbers --workers 4 --numbers 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import multiprocessing
+import time
+
+from benchmarks.common import init_bench_db
+
+
+def _worker(series_name: str, block_size: int, gapless: bool, count: int, concurrency: int, queue):
+    async def run():
+        await init_bench_db()
+        from app.models.inventory import StockMovement, MovementType
+        from app.services.document_number_service import DocumentNumberService
+
+        service = DocumentNumberService("BN", series_name, block_size=block_size, gapless=gapless)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def create(number, session):
+            # Documento mínimo insertado con el número, en la misma transacción.
+            await StockMovement(
+                product_sku="BENCH-NUM", quantity=1, movement_type=MovementType.IN, reference_document=number
+            ).insert(session=session)
+            return number
+
+        async def one():
+            async with semaphore:
+                if gapless:
+                    return await service.create_with_number(create)
+                return await service.get_next_number()
+
+        start = time.perf_counter()
+        numbers = await asyncio.gather(*(one() for _ in range(count)))
+        queue.put((time.perf_counter() - start, numbers))
+
+    asyncio.run(run())
+
+
+def run_mode(label: str, series_name: str, block_size: int, gapless: bool, args) -> None:
+    queue = multiprocessing.Queue()
+    per_worker = args.numbers // args.workers
+    processes = [
+        multiprocessing.Process(
+            target=_worker, args=(series_name, block_size, gapless, per_worker, args.concurrency, queue)
+        )
+        for _ in range(args.workers)
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+    results = [queue.get() for _ in processes]
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+
+    numbers = [n for _, worker_numbers in results for n in worker_numbers]
+    sequences = sorted(int(n.split("-")[1]) for n in numbers)
+    duplicates = len(sequences) - len(set(sequences))
+    gaps = (sequences[-1] - sequences[0] + 1 - len(sequences)) if sequences else 0
+    worker_time = max(t for t, _ in results)
+    print(
+        f"{label:<28} {len(numbers):>7} números  {len(numbers) / worker_time:>9.0f} núm/s  "
+        f"repetidos={duplicates}  huecos={gaps}  (total {elapsed:.1f}s)"
+    )
+    if duplicates or (gapless and gaps):
+        raise SystemExit(f"FALLO en modo {label}")
+
+
+async def reset(series_names):
+    await init_bench_db()
+    from app.models.inventory import StockMovement
+    from app.services.document_number_service import DocumentSequence
+
+    await DocumentSequence.find({"name": {"$in": series_names}}).delete()
+    await StockMovement.find({"product_sku": "BENCH-NUM"}).delete()
+
+
+def main(args):
+    modes = [
+        ("un $inc por número", "bench_single", 1, False),
+        (f"bloques de {args.block_size}", "bench_block", args.block_size, False),
+        ("sin huecos (transacción)", "bench_gapless", 1, True),
+    ]
+    asyncio.run(reset([m[1] for m in modes]))
+    print(f"{args.workers} procesos x {args.concurrency} solicitudes concurrentes")
+    for label, series_name, block_size, gapless in modes:
+        run_mode(label, series_name, block_size, gapless, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--numbers", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--block-size", type=int, default=100)
+    main(parser.parse_args())
@@ -0,0 +1,53 @@
+"""
+Exportación completa del catálogo en streaming: tiempo total, filas por segundo y
+memoria máxima asignada por Python durante la generación (tracemalloc), que debe
+mantenerse constante aunque crezca el número de productos.
+
+    python -m benchmarks.bench_export --products 200000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import init_bench_db
+from benchmarks.bench_pagination import seed_products
+
+
+async def consume(response) -> int:
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    return size
+
+
+async def main(args):
+    await init_bench_db()
+    await seed_products(args.products)
+
+    from app.services.export_service import export_response
+
+    for file_format in args.formats:
+        try:
+            response = export_response("products", {}, file_format)
+        except Exception as e:
+            print(f"{file_format}: {e}")
+            continue
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = await consume(response)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(
+            f"{file_format}: {args.products} filas en {elapsed:.2f}s "
+            f"({args.products / elapsed:.0f} filas/s), {size / 1e6:.1f} MB, "
+            f"pico de memoria {peak / 1e6:.1f} MB"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "xlsx"])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Listado de productos completo contra campos parciales (`view=summary` y `fields=`):
+latencia de la página (consulta + construcción de modelos + serialización) y bytes
+de la respuesta. Los productos de prueba llevan descripción y medidas, que es lo que
+la vista resumida deja de leer.
+
+    python -m benchmarks.bench_fieldsets --products 50000 --limit 100 --iterations 50
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+CATEGORY = "bench-fieldsets"
+
+
+async def seed(count: int):
+    from app.models.inventory import Product
+
+    existing = await Product.find({"category_id": CATEGORY}).count()
+    if existing >= count:
+        print(f"Ya existen {existing} productos de prueba, no se generan más.")
+        return
+    print(f"Generando {count - existing} productos con medidas...")
+    batch = []
+    for i in range(existing, count):
+        batch.append(Product(
+            sku=f"FS-{i:08d}",
+            name=f"Producto con medidas {i}",
+            brand=random.choice(["ACME", "TOYO", "BOSCH", "SKF", "NGK"]),
+            category_id=CATEGORY,
+            description="Repuesto de prueba con descripción larga para el listado. " * 6,
+            measurements=[{"name": f"medida {m}", "value": f"{random.uniform(1, 100):.1f} mm"} for m in range(12)],
+            price=round(random.uniform(1, 500), 2),
+            cost=round(random.uniform(1, 300), 2),
+            stock_current=random.randint(0, 1000),
+        ))
+        if len(batch) == 5000:
+            await Product.insert_many(batch)
+            batch = []
+    if batch:
+        await Product.insert_many(batch)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed(args.products)
+
+    from app.models.inventory import Product
+    from app.responses import json_response
+    from app.services.inventory_service import PRODUCT_FIELDS
+    from app.services.pagination_service import paginate, TOTAL_CACHED
+    from app.services.projection_service import select_fields, page_options
+
+    query = {"category_id": CATEGORY}
+    cases = {
+        "completo": select_fields(PRODUCT_FIELDS),
+        "view=summary": select_fields(PRODUCT_FIELDS, view="summary"),
+        "fields=sku,name": select_fields(PRODUCT_FIELDS, fields="sku,name"),
+    }
+
+    async def page(selection):
+        result = await paginate(
+            Product, query, [("sku", 1)], limit=args.limit, total_mode=TOTAL_CACHED, **page_options(selection)
+        )
+        return json_response(result, exclude={"items": {"__all__": {"search_tokens"}}})
+
+    results = {}
+    sizes = {}
+    for label, selection in cases.items():
+        results[label] = await measure(lambda: page(selection), args.iterations)
+        sizes[label] = len((await page(selection)).body)
+    print_report(f"Página de {args.limit} productos", results)
+    for label, size in sizes.items():
+        print(f"{label:<40}{size / 1024:>10.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=50000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""
+Importación masiva de productos: compara el alta uno por uno (`create_product`, como
+`POST /inventory/products/`) con el pipeline por lotes de `import_service` sobre un
+CSV generado, y luego reimporta el mismo archivo como UPDATE.
+
+    python -m benchmarks.bench_import --products 20000 --one-by-one 1000
+"""
+import argparse
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+from benchmarks.common import init_bench_db
+
+PREFIX = "IMP-"
+
+
+def write_csv(path: str, count: int, operation: str, offset: int = 0):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["operation", "sku", "name", "brand", "price", "cost", "stock_initial"])
+        for i in range(offset, offset + count):
+            writer.writerow([operation, f"{PREFIX}{i:07d}", f"Producto importado {i}", "ACME", 10 + i % 50, 5 + i % 20, i % 7])
+
+
+async def main(args):
+    await init_bench_db()
+    from app.models.inventory import Product, StockMovement, CostLedgerEntry, ImportJob
+    from app.services import inventory_service, import_service
+
+    pattern = {"$regex": f"^{PREFIX}"}
+    await Product.find({"sku": pattern}).delete()
+    await StockMovement.find({"product_sku": pattern}).delete()
+    await CostLedgerEntry.find({"sku": pattern}).delete()
+
+    start = time.perf_counter()
+    for i in range(args.one_by_one):
+        product = Product(sku=f"{PREFIX}X{i:06d}", name=f"Producto {i}", brand="ACME", price=10, cost=5)
+        await inventory_service.create_product(product, i % 7)
+    elapsed = time.perf_counter() - start
+    print(f"create_product uno por uno: {args.one_by_one} filas en {elapsed:.2f}s ({args.one_by_one / elapsed:.0f} filas/s)")
+
+    for operation in ("INSERT", "UPDATE"):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        os.close(fd)
+        write_csv(path, args.products, operation)
+        job = ImportJob(filename=os.path.basename(path), file_format="csv")
+        await job.insert()
+        start = time.perf_counter()
+        job = await import_service.run_import(job, path)
+        elapsed = time.perf_counter() - start
+        print(
+            f"importación {operation:<6}: {job.processed_rows} filas en {elapsed:.2f}s "
+            f"({job.processed_rows / elapsed:.0f} filas/s) estado={job.status.value} {job.summary.model_dump()}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--one-by-one", type=int, default=1_000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,122 @@
+"""
+Muestra el plan de ejecución (COLLSCAN vs IXSCAN) y la latencia de las consultas
+más frecuentes antes y después de reconciliar los índices declarados.
+
+    python -m benchmarks.bench_indexes --movements 500000 --invoices 100000
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+def _leaf_stages(plan):
+    """Etapas de acceso (COLLSCAN/IXSCAN/...) del plan ganador."""
+    stages = []
+    if "inputStage" in plan:
+        stages += _leaf_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _leaf_stages(child)
+    if not stages:
+        stages.append(plan.get("stage"))
+    return stages
+
+
+async def seed(movements: int, invoices: int):
+    from app.models.inventory import StockMovement, MovementType
+    from app.models.sales import SalesInvoice, SalesOrderDetail
+
+    now = datetime.now()
+    if await StockMovement.count() < movements:
+        print(f"Generando {movements} movimientos de stock...")
+        docs = []
+        for i in range(movements):
+            docs.append(StockMovement(
+                product_sku=f"BENCH-{random.randint(0, 20000):08d}",
+                quantity=random.randint(1, 50),
+                movement_type=random.choice([MovementType.IN, MovementType.OUT]),
+                reference_document=f"BENCH-{i}",
+                created_at=now - timedelta(minutes=i),
+            ))
+            if len(docs) == 10000:
+                await StockMovement.insert_many(docs)
+                docs = []
+        if docs:
+            await StockMovement.insert_many(docs)
+
+    if await SalesInvoice.count() < invoices:
+        print(f"Generando {invoices} facturas de venta...")
+        docs = []
+        for i in range(invoices):
+            docs.append(SalesInvoice(
+                invoice_number=f"BENCH-F-{i:08d}",
+                order_id=f"BENCH-OV-{i:08d}",
+                customer_id=f"CUST-{random.randint(0, 5000)}",
+                invoice_date=now - timedelta(hours=i),
+                items=[SalesOrderDetail(product_sku="BENCH-00000001", quantity=1, unit_price=10.0)],
+                total_amount=10.0,
+                delivery_address="Av. Benchmark 123",
+                payment_status=random.choice(["PENDING", "PARTIAL", "PAID"]),
+            ))
+            if len(docs) == 10000:
+                await SalesInvoice.insert_many(docs)
+                docs = []
+        if docs:
+            await SalesInvoice.insert_many(docs)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed(args.movements, args.invoices)
+
+    from app.database import get_document_models
+    from app.models.inventory import StockMovement
+    from app.models.sales import SalesInvoice
+    from app.services.index_service import reconcile_indexes, format_report
+
+    queries = {
+        "kardex por SKU": (StockMovement, {"product_sku": "BENCH-00000042"}, [("created_at", -1)]),
+        "movimientos recientes": (StockMovement, {}, [("created_at", -1)]),
+        "facturas por cliente": (SalesInvoice, {"customer_id": "CUST-42"}, [("invoice_date", -1)]),
+        "facturas pendientes": (SalesInvoice, {"payment_status": "PENDING"}, [("invoice_date", -1)]),
+    }
+
+    async def run(label_suffix):
+        results = {}
+        for name, (model, query, sort) in queries.items():
+            collection = model.get_pymongo_collection()
+            explain = await collection.find(query).sort(sort).limit(20).explain()
+            stages = _leaf_stages(explain["queryPlanner"]["winningPlan"])
+            print(f"  {name:<25} -> {', '.join(stages)}")
+            results[f"{name} ({label_suffix})"] = await measure(
+                lambda: collection.find(query).sort(sort).limit(20).to_list(None), args.iterations
+            )
+        return results
+
+    # Estado "antes": solo los índices únicos y _id.
+    for model in (StockMovement, SalesInvoice):
+        collection = model.get_pymongo_collection()
+        for name, info in (await collection.index_information()).items():
+            if name != "_id_" and not info.get("unique"):
+                await collection.drop_index(name)
+
+    print("\nPlanes sin índices declarados:")
+    results = await run("antes")
+
+    reports = await reconcile_indexes(get_document_models(), dry_run=False)
+    print("\n" + format_report(reports, dry_run=False))
+
+    print("\nPlanes con índices reconciliados:")
+    results.update(await run("después"))
+
+    print_report("Consultas frecuentes antes/después de los índices", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--movements", type=int, default=500_000)
+    parser.add_argument("--invoices", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Listado de órdenes de compra con el nombre del proveedor: compara resolver el nombre
+fila por fila (N+1 consultas, lo que hacía el frontend) con el `$lookup` por página
+de `purchasing_service.get_orders`, y mide la búsqueda por nombre de proveedor.
+
+    python -m benchmarks.bench_lookup --suppliers 2000 --orders 200000
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+NAMES = ["Distribuidora", "Importaciones", "Repuestos", "Comercial", "Autopartes", "Inversiones"]
+PLACES = ["Lima", "Arequipa", "Trujillo", "Cusco", "Piura", "Callao", "Ica", "Tacna"]
+
+
+async def seed(suppliers: int, orders: int):
+    from app.models.purchasing import Supplier, Order, OrderDetail
+
+    if await Order.count() >= orders:
+        print("Ya existen órdenes suficientes, no se generan más.")
+        return
+    batch = []
+    for i in range(suppliers):
+        supplier = Supplier(name=f"{random.choice(NAMES)} {random.choice(PLACES)} {i:05d} SAC")
+        supplier.refresh_search_tokens()
+        batch.append(supplier)
+    await Supplier.insert_many(batch)
+    supplier_ids = [str(s["_id"]) async for s in Supplier.get_pymongo_collection().find({}, {"_id": 1})]
+
+    print(f"Generando {orders} órdenes de compra...")
+    batch = []
+    for i in range(orders):
+        order = Order(
+            order_number=f"OC-B{i:07d}",
+            supplier_id=random.choice(supplier_ids),
+            items=[OrderDetail(product_sku="BENCH", quantity=1, unit_cost=10.0)],
+            total_amount=10.0,
+        )
+        order.refresh_search_tokens()
+        batch.append(order)
+        if len(batch) == 5000:
+            await Order.insert_many(batch)
+            batch = []
+    if batch:
+        await Order.insert_many(batch)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed(args.suppliers, args.orders)
+
+    from app.models.purchasing import Supplier, Order
+    from app.services import purchasing_service
+    from app.services.pagination_service import paginate
+    from beanie import PydanticObjectId
+
+    async def n_plus_one():
+        page = await paginate(Order, {}, [("date", -1)], skip=0, limit=args.limit)
+        for order in page.items:
+            await Supplier.get(PydanticObjectId(order.supplier_id))
+
+    async def lookup():
+        await purchasing_service.get_orders(skip=0, limit=args.limit)
+
+    async def search_by_supplier():
+        await purchasing_service.get_orders(skip=0, limit=args.limit, search=random.choice(PLACES))
+
+    results = {
+        f"página + N+1 proveedores ({args.limit})": await measure(n_plus_one, iterations=args.iterations),
+        f"página con $lookup ({args.limit})": await measure(lookup, iterations=args.iterations),
+        "búsqueda por nombre de proveedor": await measure(search_by_supplier, iterations=args.iterations),
+    }
+    print_report(f"Órdenes de compra ({args.orders} órdenes, {args.suppliers} proveedores)", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suppliers", type=int, default=2_000)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+"""
+Compara el listado paginado clásico (`count()` + `find().sort().skip().limit()`)
+con `pagination_service.paginate` ($facet en una sola agregación).
+
+    python -m benchmarks.bench_pagination --products 200000 --iterations 50
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+async def seed_products(count: int):
+    from app.models.inventory import Product
+
+    existing = await Product.count()
+    if existing >= count:
+        print(f"Ya existen {existing} productos, no se generan más.")
+        return
+
+    print(f"Generando {count - existing} productos...")
+    batch = []
+    for i in range(existing, count):
+        batch.append(Product(
+            sku=f"BENCH-{i:08d}",
+            name=f"Producto de prueba {i}",
+            brand=random.choice(["ACME", "TOYO", "BOSCH", "SKF", "NGK"]),
+            price=round(random.uniform(1, 500), 2),
+            cost=round(random.uniform(1, 300), 2),
+            stock_current=random.randint(0, 1000),
+        ))
+        if len(batch) == 5000:
+            await Product.insert_many(batch)
+            batch = []
+    if batch:
+        await Product.insert_many(batch)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed_products(args.products)
+
+    from app.models.inventory import Product
+    from app.services.pagination_service import paginate, TOTAL_EXACT, TOTAL_ESTIMATED, TOTAL_CACHED
+
+    query = {}
+    search_query = {"name": {"$regex": "9", "$options": "i"}}
+    skip = args.page * args.limit
+
+    async def legacy(q):
+        await Product.find(q).count()
+        await Product.find(q).sort("+sku").skip(skip).limit(args.limit).to_list()
+
+    results = {}
+    for label, q in (("sin filtro", query), ("con búsqueda", search_query)):
+        results[f"count+find ({label})"] = await measure(lambda: legacy(q), args.iterations)
+        for mode in (TOTAL_EXACT, TOTAL_ESTIMATED, TOTAL_CACHED):
+            results[f"$facet {mode} ({label})"] = await measure(
+                lambda: paginate(Product, q, [("sku", 1)], skip=skip, limit=args.limit, total_mode=mode),
+                args.iterations,
+            )
+
+    print_report(f"Paginación de productos (page={args.page}, limit={args.limit})", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=200_000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--page", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
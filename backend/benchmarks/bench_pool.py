@@ -0,0 +1,81 @@
+"""
+Dimensionamiento del pool de conexiones: latencia de consultas simultáneas con
+distintos `maxPoolSize` (espera por conexión incluida) y costo de la primera ráfaga
+de solicitudes con y sin calentamiento del pool.
+
+    python -m benchmarks.bench_pool --concurrency 100 --requests 2000 --pool-sizes 5,20,50,100
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import init_bench_db, summarize
+
+
+async def burst(collection, concurrency: int, requests: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await collection.find_one({}, {"_id": 1})
+            samples.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return samples, time.perf_counter() - start
+
+
+async def run_pool_size(size: int, args) -> None:
+    from app.config import MONGO_DB_NAME
+    from app.database import create_client, PoolMonitor
+
+    monitor = PoolMonitor()
+    client = create_client(event_listeners=[monitor], maxPoolSize=size, minPoolSize=0)
+    collection = client[MONGO_DB_NAME]["products"]
+    try:
+        await burst(collection, args.concurrency, args.concurrency)  # abre las conexiones
+        samples, elapsed = await burst(collection, args.concurrency, args.requests)
+    finally:
+        await client.close()
+    s = summarize(samples)
+    pool = next(iter(monitor.stats().values()), {})
+    print(
+        f"maxPoolSize={size:<5} {len(samples) / elapsed:>9.0f} cons/s  p50={s['p50']:.2f}  p95={s['p95']:.2f}  "
+        f"p99={s['p99']:.2f} ms  max_in_use={pool.get('max_in_use', 0)}  espera máx={pool.get('wait_max_ms', 0):.1f} ms"
+    )
+
+
+async def run_warmup(warm: bool, args) -> None:
+    from app.config import MONGO_DB_NAME
+    from app.database import create_client
+
+    client = create_client(minPoolSize=0)
+    try:
+        if warm:
+            await asyncio.gather(*(client.admin.command("ping") for _ in range(args.concurrency)))
+        samples, _ = await burst(client[MONGO_DB_NAME]["products"], args.concurrency, args.concurrency)
+    finally:
+        await client.close()
+    s = summarize(samples)
+    label = "con calentamiento" if warm else "sin calentamiento"
+    print(f"primera ráfaga {label:<18} p50={s['p50']:.2f}  p95={s['p95']:.2f}  p99={s['p99']:.2f} ms")
+
+
+async def main(args):
+    # Solo para fijar la base de datos de benchmark; cada caso usa su propio cliente.
+    await init_bench_db()
+    print(f"{args.requests} consultas con {args.concurrency} simultáneas")
+    for size in args.pool_sizes:
+        await run_pool_size(size, args)
+    for warm in (False, True):
+        await run_warmup(warm, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--pool-sizes", type=lambda v: [int(x) for x in v.split(",")], default=[5, 20, 50, 100])
+    asyncio.run(main(parser.parse_args()))
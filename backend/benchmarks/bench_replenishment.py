@@ -0,0 +1,92 @@
+"""
+Motor de reposición sobre el catálogo completo.
+
+- Cálculo: `compute_reorder_points` vectorizado con NumPy contra el mismo cálculo
+  SKU por SKU en Python, sobre estadísticos de demanda sintéticos (no usa MongoDB).
+- Ejecución completa (`--full`): `run_replenishment` sobre la base de benchmark
+  generada con `benchmarks.seed_data` (agregación de salidas, cálculo, escritura de
+  resultados y órdenes borrador).
+
+    python -m benchmarks.bench_replenishment --skus 200000 --days 1095
+    python -m benchmarks.bench_replenishment --full --days 1095
+"""
+import argparse
+import asyncio
+import math
+import time
+from statistics import NormalDist
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+LEAD_TIME, REVIEW, SERVICE_LEVEL = 7.0, 7.0, 0.95
+
+
+def synthetic_stats(skus: int, days: int):
+    import numpy as np
+
+    rng = np.random.default_rng(42)
+    # Demanda diaria ~ Poisson con tasas muy dispares (cola larga de SKUs de baja rotación).
+    rate = rng.lognormal(mean=-1.0, sigma=1.5, size=skus)
+    total = rng.poisson(rate * days).astype(np.float64)
+    sum_squares = total * (1 + rate)  # E[x²] de Poisson por día, acumulado
+    window = np.full(skus, float(days))
+    position = rng.integers(0, 500, size=skus)
+    return total, sum_squares, window, position
+
+
+def python_loop(total, sum_squares, window, position):
+    z = NormalDist().inv_cdf(SERVICE_LEVEL)
+    rows = []
+    for t, sq, d, p in zip(total.tolist(), sum_squares.tolist(), window.tolist(), position.tolist()):
+        mean = t / d
+        std = math.sqrt(max(sq / d - mean * mean, 0.0))
+        safety = z * std * math.sqrt(LEAD_TIME)
+        reorder_point = mean * LEAD_TIME + safety
+        order_up_to = mean * (LEAD_TIME + REVIEW) + safety
+        needs = mean > 0 and p <= reorder_point
+        rows.append((mean, std, safety, reorder_point, math.ceil(max(order_up_to - p, 0)) if needs else 0))
+    return rows
+
+
+async def main(args):
+    from app.services.replenishment_service import compute_reorder_points
+
+    total, sum_squares, window, position = synthetic_stats(args.skus, args.days)
+
+    async def vectorized():
+        compute_reorder_points(total, sum_squares, window, position, LEAD_TIME, REVIEW, SERVICE_LEVEL)
+
+    async def loop():
+        python_loop(total, sum_squares, window, position)
+
+    result = compute_reorder_points(total, sum_squares, window, position, LEAD_TIME, REVIEW, SERVICE_LEVEL)
+    expected = python_loop(total, sum_squares, window, position)
+    if any(int(result["suggested_quantity"][i]) != row[4] for i, row in enumerate(expected)):
+        raise SystemExit("FALLO: el cálculo vectorizado no coincide con el de referencia")
+
+    print_report(f"Puntos de reorden de {args.skus} SKUs", {
+        "NumPy (vectorizado)": await measure(vectorized, iterations=args.iterations),
+        "Python (SKU por SKU)": await measure(loop, iterations=max(1, args.iterations // 10), warmup=1),
+    })
+    print(f"SKUs a reponer: {int(result['needs_reorder'].sum())}")
+
+    if args.full:
+        await init_bench_db()
+        from app.services.replenishment_service import run_replenishment
+
+        start = time.perf_counter()
+        run = await run_replenishment(history_days=args.days, create_orders=True)
+        print(
+            f"\nEjecución completa: {time.perf_counter() - start:.2f} s · {run.skus_analyzed} SKUs, "
+            f"{run.skus_with_demand} con demanda, {run.skus_to_reorder} a reponer, "
+            f"{len(run.draft_order_ids)} órdenes borrador"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=1095)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--full", action="store_true", help="Ejecuta también run_replenishment sobre la base de benchmark")
+    asyncio.run(main(parser.parse_args()))
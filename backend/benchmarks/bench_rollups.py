@@ -0,0 +1,101 @@
+"""
+Reportes de ventas de un año: compara agregar directamente las facturas (con
+`$unwind` de las líneas) con leer los resúmenes diarios de `rollup_service`, y mide
+la reconstrucción completa de los resúmenes.
+
+    python -m benchmarks.bench_rollups --invoices 300000 --customers 2000 --skus 5000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+async def seed(invoices: int, customers: int, skus: int):
+    from app.models.sales import SalesInvoice
+
+    collection = SalesInvoice.get_pymongo_collection()
+    if await collection.count_documents({"invoice_number": {"$regex": "^FV-R"}}) >= invoices:
+        print("Ya existen facturas suficientes, no se generan más.")
+        return
+    customer_ids = [f"{i:024x}" for i in range(1, customers + 1)]
+    now = datetime.now()
+    print(f"Generando {invoices} facturas de venta con líneas...")
+    batch = []
+    for i in range(invoices):
+        items = [
+            {"product_sku": f"SKU-{random.randrange(skus):05d}", "quantity": random.randint(1, 20),
+             "unit_price": round(random.uniform(1, 300), 2)}
+            for _ in range(random.randint(1, 5))
+        ]
+        batch.append({
+            "invoice_number": f"FV-R{i:08d}", "order_id": "", "customer_id": random.choice(customer_ids),
+            "invoice_date": now - timedelta(days=random.randint(0, 364), minutes=random.randint(0, 1439)),
+            "items": items, "total_amount": sum(it["quantity"] * it["unit_price"] for it in items),
+            "delivery_address": "-", "payment_status": "PAID", "amount_paid": 0.0, "payments": [],
+            "credit_applied": 0.0, "search_tokens": [],
+        })
+        if len(batch) == 10_000:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed(args.invoices, args.customers, args.skus)
+
+    from app.models.sales import SalesInvoice
+    from app.services import rollup_service
+
+    start = time.perf_counter()
+    count = await rollup_service.rebuild_rollups("sales")
+    print(f"Reconstrucción: {count} resúmenes en {time.perf_counter() - start:.1f}s")
+
+    end = date.today()
+    begin = end - timedelta(days=364)
+    since = datetime(begin.year, begin.month, begin.day)
+    collection = SalesInvoice.get_pymongo_collection()
+
+    def scan(key):
+        async def run():
+            cursor = await collection.aggregate([
+                {"$match": {"invoice_date": {"$gte": since}}},
+                {"$unwind": "$items"},
+                {"$group": {"_id": key, "quantity": {"$sum": "$items.quantity"},
+                            "amount": {"$sum": {"$multiply": ["$items.quantity", "$items.unit_price"]}}}},
+            ], allowDiskUse=True)
+            await cursor.to_list()
+        return run
+
+    def rollup(group_by):
+        async def run():
+            await rollup_service.get_rollup("sales", begin, end, group_by=group_by)
+        return run
+
+    results = {}
+    for label, key, group_by in [
+        ("por día", {"$dateToString": {"format": "%Y-%m-%d", "date": "$invoice_date"}}, "day"),
+        ("por SKU", "$items.product_sku", "sku"),
+        ("por cliente", "$customer_id", "counterparty"),
+    ]:
+        results[f"facturas + $unwind {label}"] = await measure(scan(key), iterations=args.iterations, warmup=1)
+        results[f"resúmenes diarios {label}"] = await measure(rollup(group_by), iterations=args.iterations, warmup=1)
+    results["resúmenes diarios de un SKU"] = await measure(
+        lambda: rollup_service.get_rollup("sales", begin, end, group_by="day", sku="SKU-00042"),
+        iterations=args.iterations, warmup=1,
+    )
+    print_report(f"Ventas de un año ({args.invoices} facturas)", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=300_000)
+    parser.add_argument("--customers", type=int, default=2_000)
+    parser.add_argument("--skus", type=int, default=5_000)
+    parser.add_argument("--iterations", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,86 @@
+"""
+Compara la búsqueda de productos por $regex sin anclar (ruta anterior) con la
+búsqueda por tokens indexados de search_service, sobre un catálogo grande.
+
+    python -m benchmarks.bench_search --products 500000
+"""
+import argparse
+import asyncio
+import random
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+WORDS = [
+    "filtro", "aceite", "aire", "combustible", "bujía", "pastilla", "freno", "disco",
+    "amortiguador", "rodaje", "faja", "bomba", "agua", "radiador", "embrague", "válvula",
+    "sensor", "bobina", "correa", "junta", "empaque", "retén", "terminal", "rótula",
+]
+BRANDS = ["BOSCH", "NGK", "SKF", "DENSO", "MANN", "GATES", "VALEO", "TRW", "MONROE", "FRAM"]
+
+
+async def seed_catalog(count: int):
+    from app.models.inventory import Product
+
+    existing = await Product.count()
+    if existing >= count:
+        print(f"Ya existen {existing} productos, no se generan más.")
+        return
+
+    print(f"Generando {count - existing} productos con tokens de búsqueda...")
+    batch = []
+    for i in range(existing, count):
+        product = Product(
+            sku=f"{random.choice(BRANDS)[:3]}-{i:07d}-{random.choice('ABCDEFX')}",
+            name=" ".join(random.sample(WORDS, 3)).capitalize(),
+            brand=random.choice(BRANDS),
+            price=round(random.uniform(1, 500), 2),
+        )
+        # insert_many no ejecuta los hooks de Beanie: se calculan aquí.
+        product.refresh_search_tokens()
+        batch.append(product)
+        if len(batch) == 5000:
+            await Product.insert_many(batch)
+            batch = []
+    if batch:
+        await Product.insert_many(batch)
+
+
+async def main(args):
+    await init_bench_db()
+    await seed_catalog(args.products)
+
+    from app.models.inventory import Product
+    from app.services.pagination_service import paginate
+
+    searches = ["fil", "bujia ngk", "0004321", "BOS-00012", "amortiguador monroe"]
+
+    async def regex_path(search):
+        query = {"$or": [
+            {"name": {"$regex": search, "$options": "i"}},
+            {"sku": {"$regex": search, "$options": "i"}},
+        ]}
+        await paginate(Product, query, [("sku", 1)], skip=0, limit=10)
+
+    async def token_path(search):
+        from app.services.inventory_service import get_products
+        await get_products(skip=0, limit=10, search=search)
+
+    results = {}
+    for search in searches:
+        results[f"regex '{search}'"] = await measure(lambda: regex_path(search), args.iterations)
+        results[f"tokens '{search}'"] = await measure(lambda: token_path(search), args.iterations)
+
+    print_report(f"Búsqueda de productos ({args.products} productos, primera página)", results)
+
+    print("\nTop 5 por ranking:")
+    from app.services.inventory_service import get_products
+    for search in searches:
+        page = await get_products(skip=0, limit=5, search=search)
+        print(f"  '{search}' ({page.total} resultados): {[p.sku + ' ' + p.name for p in page.items]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--products", type=int, default=500_000)
+    parser.add_argument("--iterations", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,110 @@
+"""
+Serialización de páginas de 100 filas (productos y facturas de venta), sin contar la
+consulta: parte de la página ya validada, como la devuelve `paginate`.
+
+Compara:
+- jsonable_encoder: lo que hacían los listados de movimientos (dicts intermedios) y
+  después la validación y serialización de `response_model`.
+- response_model: lo que hace FastAPI al devolver el modelo (se valida de nuevo
+  contra el modelo de respuesta y se serializa con pydantic-core).
+- json_response: una sola serialización a bytes (app.responses), sin validar de nuevo.
+
+Comprueba además que json_response produce los mismos bytes que response_model.
+
+    python -m benchmarks.bench_serialization --rows 100 --iterations 200
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+def product_docs(rows: int):
+    from bson import ObjectId
+
+    return [
+        {
+            "_id": ObjectId(), "sku": f"SER-{i:05d}", "name": f"Producto de prueba {i}", "brand": "ACME",
+            "category_id": str(ObjectId()), "description": "Descripción de prueba " * 3,
+            "price": round(random.uniform(1, 500), 3), "cost": round(random.uniform(1, 300), 3),
+            "measurements": [{"name": "largo", "value": "10 cm"}], "stock_current": random.randint(0, 500),
+            "created_at": datetime.now() - timedelta(days=i),
+        }
+        for i in range(rows)
+    ]
+
+
+def invoice_docs(rows: int):
+    from bson import ObjectId
+
+    return [
+        {
+            "_id": ObjectId(), "invoice_number": f"FV-{i:07d}", "order_id": str(ObjectId()),
+            "order_number": f"OV-{i:07d}", "customer_id": str(ObjectId()), "customer_name": f"Cliente {i} SAC",
+            "invoice_date": datetime.now() - timedelta(hours=i), "total_amount": 350.0,
+            "items": [{"product_sku": f"SER-{j:05d}", "quantity": 2, "unit_price": 35.0} for j in range(5)],
+            "delivery_address": "Av. Principal 123", "payment_status": "PENDING",
+        }
+        for i in range(rows)
+    ]
+
+
+def build_cases(page, response_type, exclude=None):
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+
+    from app.responses import json_response
+
+    adapter = TypeAdapter(response_type)
+
+    def via_response_model(content):
+        value = adapter.validate_python(content, from_attributes=True)
+        return adapter.dump_json(value, by_alias=True, exclude=exclude)
+
+    async def encoder():
+        via_response_model(jsonable_encoder(page))
+
+    async def response_model():
+        via_response_model(page)
+
+    async def single_pass():
+        json_response(page, exclude=exclude)
+
+    if json_response(page, exclude=exclude).body != via_response_model(page):
+        raise SystemExit("FALLO: json_response no coincide con la salida de response_model")
+    return {"jsonable_encoder + response_model": encoder, "response_model": response_model, "json_response": single_pass}
+
+
+async def main(args):
+    await init_bench_db()
+    from beanie.odm.utils.parsing import parse_obj
+
+    from app.models.inventory import Product
+    from app.schemas.common import PaginatedResponse
+    from app.schemas.sales_schemas import SalesInvoiceRead
+    from app.services.pagination_service import _build_response
+
+    pages = {
+        "productos": (
+            _build_response([parse_obj(Product, doc) for doc in product_docs(args.rows)], 10_000, 0, args.rows),
+            PaginatedResponse[Product], {"items": {"__all__": {"search_tokens"}}},
+        ),
+        "facturas de venta": (
+            _build_response([SalesInvoiceRead.model_validate(doc) for doc in invoice_docs(args.rows)], 10_000, 0, args.rows),
+            PaginatedResponse[SalesInvoiceRead], None,
+        ),
+    }
+    for title, (page, response_type, exclude) in pages.items():
+        results = {}
+        for name, fn in build_cases(page, response_type, exclude).items():
+            results[name] = await measure(fn, iterations=args.iterations)
+        print_report(f"Página de {args.rows} {title}", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
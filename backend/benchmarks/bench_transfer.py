@@ -0,0 +1,45 @@
+"""
+Mide una transferencia masiva de 1,000 líneas entre almacenes: validación de todas
+las líneas con consultas `$in` y aplicación con un `bulk_write` por colección.
+
+    python -m benchmarks.bench_transfer --lines 1000
+"""
+import argparse
+import asyncio
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+
+async def main(args):
+    await init_bench_db()
+
+    from app.models.inventory import Product, StockMovement, Warehouse, WarehouseStock
+    from app.services import inventory_service
+
+    skus = [f"TRF-{i:06d}" for i in range(args.lines)]
+    await Product.find({"sku": {"$in": skus}}).delete()
+    await StockMovement.find({"product_sku": {"$in": skus}}).delete()
+    await WarehouseStock.find({"sku": {"$in": skus}}).delete()
+    products = [Product(sku=sku, name=f"Transferencia {sku}", price=10, cost=5, stock_current=1_000_000) for sku in skus]
+    for product in products:
+        product.refresh_search_tokens()
+    await Product.insert_many(products)
+    for code, name in (("SL01", "Almacén San Luis"), ("ATE01", "Almacén Ate")):
+        if not await Warehouse.find_one({"code": code}):
+            await Warehouse(name=name, code=code, address="-", is_main=code == "SL01").insert()
+
+    items = [{"sku": sku, "quantity": 1} for sku in skus]
+    results = {
+        f"transferencia {args.lines} líneas": await measure(
+            lambda: inventory_service.register_transfer("SL01", "ATE01", items, "Benchmark"),
+            args.iterations, warmup=1,
+        )
+    }
+    print_report("Transferencia masiva", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=10)
+    asyncio.run(main(parser.parse_args()))
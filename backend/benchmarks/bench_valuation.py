@@ -0,0 +1,135 @@
+"""
+Valorización del inventario a una fecha: reprocesar todos los movimientos (costo
+promedio ponderado recalculado en Python) frente a la consulta al libro de costos.
+
+    python -m benchmarks.bench_valuation --movements 10000000 --skus 20000
+
+La generación escribe directamente con PyMongo (sin validar modelos) para que los
+10M de movimientos y sus entradas del libro se carguen en minutos.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import init_bench_db, measure, print_report
+
+BATCH_SIZE = 20_000
+
+
+async def seed(movements: int, skus: int):
+    from app.models.inventory import StockMovement, CostLedgerEntry
+
+    movement_collection = StockMovement.get_pymongo_collection()
+    ledger_collection = CostLedgerEntry.get_pymongo_collection()
+    if await ledger_collection.estimated_document_count() >= movements:
+        return
+
+    print(f"Generando {movements} movimientos y entradas del libro para {skus} SKUs...")
+    await movement_collection.delete_many({"reference_document": {"$regex": "^BENCH-VAL-"}})
+    await ledger_collection.delete_many({})
+
+    state = {}
+    start = datetime.now() - timedelta(days=365)
+    step = timedelta(days=365) / movements
+    movement_docs, ledger_docs = [], []
+    for i in range(movements):
+        sku = f"VAL-{random.randrange(skus):06d}"
+        quantity, cost = state.get(sku, (0, 0.0))
+        created_at = start + step * i
+        if quantity and random.random() < 0.45:
+            delta = -random.randint(1, quantity)
+            movement_type, unit_cost = "OUT", cost
+            new_cost = cost
+        else:
+            delta = random.randint(1, 50)
+            movement_type, unit_cost = "IN", round(random.uniform(5, 50), 3)
+            new_cost = round((quantity * cost + delta * unit_cost) / (quantity + delta), 3)
+        new_quantity = quantity + delta
+        state[sku] = (new_quantity, new_cost)
+
+        reference = f"BENCH-VAL-{i}"
+        movement_docs.append({
+            "product_sku": sku, "quantity": abs(delta), "movement_type": movement_type,
+            "unit_cost": unit_cost, "reference_document": reference, "created_at": created_at,
+        })
+        running_value = round(new_quantity * new_cost, 3)
+        ledger_docs.append({
+            "sku": sku, "entry_type": "MOVEMENT", "reference_document": reference,
+            "quantity_change": delta, "value_change": round(running_value - quantity * cost, 3),
+            "running_quantity": new_quantity, "average_cost": new_cost,
+            "running_value": running_value, "created_at": created_at,
+        })
+        if len(movement_docs) == BATCH_SIZE:
+            await movement_collection.insert_many(movement_docs, ordered=False)
+            await ledger_collection.insert_many(ledger_docs, ordered=False)
+            movement_docs, ledger_docs = [], []
+    if movement_docs:
+        await movement_collection.insert_many(movement_docs, ordered=False)
+        await ledger_collection.insert_many(ledger_docs, ordered=False)
+
+
+async def replay_valuation(as_of: datetime) -> float:
+    """Lo que costaba sin libro: recorrer todos los movimientos hasta la fecha."""
+    from app.models.inventory import StockMovement
+
+    state = {}
+    cursor = StockMovement.get_pymongo_collection().find(
+        {"created_at": {"$lte": as_of}, "reference_document": {"$regex": "^BENCH-VAL-"}},
+        {"product_sku": 1, "quantity": 1, "movement_type": 1, "unit_cost": 1, "_id": 0},
+    ).sort([("created_at", 1), ("_id", 1)])
+    async for m in cursor:
+        quantity, cost = state.get(m["product_sku"], (0, 0.0))
+        if m["movement_type"] == "IN":
+            cost = round((quantity * cost + m["quantity"] * m["unit_cost"]) / (quantity + m["quantity"]), 3)
+            quantity += m["quantity"]
+        else:
+            quantity -= m["quantity"]
+        state[m["product_sku"]] = (quantity, cost)
+    return sum(round(q * c, 3) for q, c in state.values())
+
+
+async def main(args):
+    await init_bench_db()
+    await seed(args.movements, args.skus)
+
+    from app.database import get_client
+    from app.config import MONGO_DB_NAME
+    from app.models.inventory import CostLedgerEntry
+    from app.services.cost_ledger_service import get_valuation, valuation_pipeline
+
+    as_of = datetime.now() - timedelta(days=180)
+
+    explain = await get_client()[MONGO_DB_NAME].command({
+        "explain": {
+            "aggregate": CostLedgerEntry.get_settings().name,
+            "pipeline": valuation_pipeline(as_of),
+            "cursor": {},
+        },
+        "verbosity": "queryPlanner",
+    })
+    plan = str(explain)
+    stage = next((s for s in ("DISTINCT_SCAN", "IXSCAN", "COLLSCAN") if s in plan), "?")
+    print(f"Plan de la valorización por libro: {stage}")
+
+    ledger = await get_valuation(as_of, limit=50)
+    results = {
+        "libro de costos": await measure(lambda: get_valuation(as_of, limit=50), args.iterations, warmup=1),
+    }
+    if not args.skip_replay:
+        start = time.perf_counter()
+        replayed = await replay_valuation(as_of)
+        results["reproceso de movimientos"] = [(time.perf_counter() - start) * 1000]
+        print(f"Valor total: libro={ledger['total_value']:.3f} reproceso={replayed:.3f}")
+
+    print_report(f"Valorización al {as_of:%Y-%m-%d} ({args.movements} movimientos)", results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--movements", type=int, default=10_000_000)
+    parser.add_argument("--skus", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--skip-replay", action="store_true", help="No medir el reproceso completo (lento)")
+    asyncio.run(main(parser.parse_args()))
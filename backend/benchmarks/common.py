@@ -0,0 +1,58 @@
+"""
+Utilidades compartidas por los scripts de benchmark.
+
+Los benchmarks se ejecutan contra una base de datos aparte (por defecto
+`erp_benchmark`, configurable con BENCH_DB_NAME) para no tocar datos reales.
+Ejecutar desde `backend/`:
+
+    python -m benchmarks.bench_pagination
+"""
+import os
+import sys
+import time
+import statistics
+from typing import Awaitable, Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Debe fijarse antes de importar app.config (load_dotenv no sobreescribe variables existentes).
+os.environ["MONGO_DB_NAME"] = os.getenv("BENCH_DB_NAME", "erp_benchmark")
+
+
+async def init_bench_db():
+    from app.database import init_db
+    await init_db()
+
+
+async def measure(fn: Callable[[], Awaitable], iterations: int = 50, warmup: int = 3) -> List[float]:
+    """Ejecuta `fn` varias veces y devuelve las latencias en milisegundos."""
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "mean": statistics.fmean(ordered),
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+    }
+
+
+def print_report(title: str, results: Dict[str, List[float]]):
+    print(f"\n=== {title} ===")
+    print(f"{'caso':<40}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name, samples in results.items():
+        s = summarize(samples)
+        print(f"{name:<40}{s['mean']:>10.2f}{s['p50']:>10.2f}{s['p95']:>10.2f}{s['p99']:>10.2f}")
@@ -0,0 +1,297 @@
+"""
+Prueba de carga de la API: recorre las rutas reales (listados, búsquedas, detalle,
+kardex, antigüedad, resúmenes) con una mezcla ponderada de solicitudes y una
+concurrencia fija, y reporta por endpoint la cantidad de solicitudes, throughput,
+errores y latencias p50/p95/p99.
+
+Se ejecuta contra un servidor levantado sobre la base de benchmark, generada antes
+con `benchmarks.seed_data`:
+
+    MONGO_DB_NAME=erp_benchmark uvicorn main:app --workers 4
+    python -m benchmarks.load_test --concurrency 50 --duration 60 --output resultados/v1.json
+    python -m benchmarks.load_test --concurrency 50 --duration 60 --baseline resultados/v1.json
+
+Con `--in-process` la API corre en el mismo proceso (httpx.ASGITransport), sin
+servidor ni red: sirve para perfilar, pero el cliente comparte el event loop.
+
+`--output` guarda los resultados en JSON (con la versión de git y los parámetros) y
+`--baseline` compara la ejecución con otra guardada, endpoint por endpoint.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.common import summarize
+
+API = "/api/v1"
+
+
+@dataclass
+class Endpoint:
+    name: str
+    weight: int
+    # (contexto, rng) -> (ruta, parámetros)
+    request: Callable[["Context", random.Random], Tuple[str, Dict[str, Any]]]
+
+
+@dataclass
+class Context:
+    """Valores reales de la base (SKUs, clientes, proveedores) para armar las solicitudes."""
+    skus: List[str]
+    search_terms: List[str]
+    customer_ids: List[str]
+    supplier_ids: List[str]
+
+
+def _days_ago(days: int) -> str:
+    return (datetime.now() - timedelta(days=days)).isoformat(timespec="seconds")
+
+
+ENDPOINTS: List[Endpoint] = [
+    Endpoint("GET /inventory/products/", 12, lambda c, r: (
+        f"{API}/inventory/products/", {"page": r.randint(1, 50), "limit": 20, "view": "summary"})),
+    Endpoint("GET /inventory/products/?search", 12, lambda c, r: (
+        f"{API}/inventory/products/", {"search": r.choice(c.search_terms), "limit": 20, "view": "summary"})),
+    Endpoint("GET /inventory/products/{sku}", 10, lambda c, r: (
+        f"{API}/inventory/products/{r.choice(c.skus)}", {})),
+    Endpoint("GET /inventory/products/{sku}/stock", 5, lambda c, r: (
+        f"{API}/inventory/products/{r.choice(c.skus)}/stock", {})),
+    Endpoint("GET /inventory/stock-movements/", 5, lambda c, r: (
+        f"{API}/inventory/stock-movements/", {"limit": 50})),
+    Endpoint("GET /inventory/stock-movements/product/{sku}/history", 5, lambda c, r: (
+        f"{API}/inventory/stock-movements/product/{r.choice(c.skus)}/history", {"limit": 20})),
+    Endpoint("GET /inventory/stock-movements/product/{sku}/kardex", 3, lambda c, r: (
+        f"{API}/inventory/stock-movements/product/{r.choice(c.skus)}/kardex", {"start": _days_ago(90)})),
+    Endpoint("GET /inventory/stock-movements/product/{sku}/balance", 3, lambda c, r: (
+        f"{API}/inventory/stock-movements/product/{r.choice(c.skus)}/balance", {"at": _days_ago(r.randint(0, 180))})),
+    Endpoint("GET /inventory/valuation", 1, lambda c, r: (f"{API}/inventory/valuation", {})),
+    Endpoint("GET /inventory/warehouses/", 1, lambda c, r: (f"{API}/inventory/warehouses/", {})),
+    Endpoint("GET /sales/customers/", 5, lambda c, r: (
+        f"{API}/sales/customers/", {"skip": r.randint(0, 200), "limit": 20, "view": "summary"})),
+    Endpoint("GET /sales/customers/{customer_id}", 3, lambda c, r: (
+        f"{API}/sales/customers/{r.choice(c.customer_ids)}", {})),
+    Endpoint("GET /sales/orders/", 5, lambda c, r: (
+        f"{API}/sales/orders/", {"skip": r.randint(0, 200), "limit": 20})),
+    Endpoint("GET /sales/invoices/", 8, lambda c, r: (
+        f"{API}/sales/invoices/", {"skip": r.randint(0, 200), "limit": 20})),
+    Endpoint("GET /sales/credit-notes/", 2, lambda c, r: (f"{API}/sales/credit-notes/", {"limit": 20})),
+    Endpoint("GET /sales/receivables/aging", 2, lambda c, r: (f"{API}/sales/receivables/aging", {"limit": 50})),
+    Endpoint("GET /sales/rollups", 2, lambda c, r: (
+        f"{API}/sales/rollups", {"group_by": r.choice(["day", "sku", "customer"])})),
+    Endpoint("GET /purchasing/suppliers/", 2, lambda c, r: (f"{API}/purchasing/suppliers/", {"limit": 20})),
+    Endpoint("GET /purchasing/orders/", 4, lambda c, r: (
+        f"{API}/purchasing/orders/", {"page": r.randint(1, 20), "limit": 20})),
+    Endpoint("GET /purchasing/invoices/", 4, lambda c, r: (
+        f"{API}/purchasing/invoices/", {"page": r.randint(1, 20), "limit": 20})),
+    Endpoint("GET /purchasing/debit-notes/", 2, lambda c, r: (f"{API}/purchasing/debit-notes/", {"limit": 20})),
+    Endpoint("GET /purchasing/payables/aging", 2, lambda c, r: (f"{API}/purchasing/payables/aging", {"limit": 50})),
+    Endpoint("GET /purchasing/rollups", 2, lambda c, r: (
+        f"{API}/purchasing/rollups", {"group_by": r.choice(["day", "sku", "supplier"])})),
+]
+
+
+async def discover(client: httpx.AsyncClient) -> Context:
+    """Toma SKUs, nombres, clientes y proveedores existentes desde la propia API."""
+    async def items(path: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        response = await client.get(path, params=params)
+        response.raise_for_status()
+        return response.json()["items"]
+
+    products = await items(f"{API}/inventory/products/", {"limit": 100, "fields": "sku,name,brand"})
+    customers = await items(f"{API}/sales/customers/", {"limit": 100, "fields": "name"})
+    suppliers = await items(f"{API}/purchasing/suppliers/", {"limit": 100, "fields": "name"})
+    if not products or not customers or not suppliers:
+        raise SystemExit("La base no tiene productos, clientes o proveedores; genere datos con benchmarks.seed_data.")
+
+    terms = set()
+    for product in products:
+        terms.add(product["sku"][:6])
+        terms.add(product["name"].split()[0][:4].lower())
+        if product.get("brand"):
+            terms.add(product["brand"].lower())
+    return Context(
+        skus=[p["sku"] for p in products],
+        search_terms=sorted(terms),
+        customer_ids=[c["_id"] for c in customers],
+        supplier_ids=[s["_id"] for s in suppliers],
+    )
+
+
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name: str, elapsed_ms: float, status: Optional[int]):
+        self.samples[name].append(elapsed_ms)
+        if status is None or status >= 400:
+            self.errors[name] += 1
+        self.statuses[name][status or 0] += 1
+
+
+async def run_load(client: httpx.AsyncClient, context: Context, args) -> Tuple[Recorder, float]:
+    """
+    Bucle cerrado: `concurrency` usuarios virtuales hacen una solicitud tras otra durante
+    `duration` segundos (las de `warmup` no se cuentan).
+    """
+    rng = random.Random(args.seed)
+    endpoints = [e for e in ENDPOINTS if not args.only or any(part in e.name for part in args.only)]
+    weights = [e.weight for e in endpoints]
+    recorder = Recorder()
+    warmup_end = time.perf_counter() + args.warmup
+    end = warmup_end + args.duration
+
+    async def user(worker: int):
+        user_rng = random.Random(rng.random() + worker)
+        while time.perf_counter() < end:
+            endpoint = user_rng.choices(endpoints, weights=weights)[0]
+            path, params = endpoint.request(context, user_rng)
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                await response.aread()
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            finished = time.perf_counter()
+            if start >= warmup_end:
+                recorder.record(endpoint.name, (finished - start) * 1000, status)
+
+    await asyncio.gather(*(user(i) for i in range(args.concurrency)))
+    return recorder, args.duration
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_results(recorder: Recorder, elapsed: float, args) -> Dict[str, Any]:
+    endpoints = {}
+    all_samples: List[float] = []
+    for name in sorted(recorder.samples):
+        samples = recorder.samples[name]
+        all_samples.extend(samples)
+        endpoints[name] = {
+            "requests": len(samples),
+            "errors": recorder.errors[name],
+            "rps": len(samples) / elapsed,
+            **summarize(samples),
+            "statuses": {str(status): count for status, count in sorted(recorder.statuses[name].items())},
+        }
+    total = {
+        "requests": len(all_samples),
+        "errors": sum(recorder.errors.values()),
+        "rps": len(all_samples) / elapsed,
+        **(summarize(all_samples) if all_samples else {}),
+    }
+    return {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "target": "in-process" if args.in_process else args.base_url,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "seed": args.seed,
+        },
+        "endpoints": endpoints,
+        "total": total,
+    }
+
+
+def _delta(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return ""
+    return f"{(current - previous) / previous * 100:+.0f}%"
+
+
+def print_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None):
+    meta = results["meta"]
+    print(
+        f"\n=== Prueba de carga: {meta['target']} · {meta['concurrency']} usuarios · {meta['duration']} s "
+        f"· {meta['revision'] or 'sin git'} ==="
+    )
+    if baseline:
+        print(f"(comparado con {baseline['meta'].get('revision')} del {baseline['meta'].get('date')})")
+    print(f"{'endpoint':<56}{'req':>8}{'req/s':>9}{'err':>6}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+    rows = list(results["endpoints"].items()) + [("TOTAL", results["total"])]
+    for name, row in rows:
+        if not row.get("requests"):
+            continue
+        print(
+            f"{name:<56}{row['requests']:>8}{row['rps']:>9.1f}{row['errors']:>6}"
+            f"{row['p50']:>9.1f}{row['p95']:>9.1f}{row['p99']:>9.1f}"
+        )
+        if baseline:
+            previous = baseline["total"] if name == "TOTAL" else baseline["endpoints"].get(name)
+            if previous and previous.get("requests"):
+                print(
+                    f"{'':<56}{'':>8}{_delta(row['rps'], previous['rps']):>9}{'':>6}"
+                    f"{_delta(row['p50'], previous['p50']):>9}{_delta(row['p95'], previous['p95']):>9}"
+                    f"{_delta(row['p99'], previous['p99']):>9}"
+                )
+
+
+async def main(args):
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    timeout = httpx.Timeout(args.timeout)
+    if args.in_process:
+        from benchmarks.common import init_bench_db
+        from main import app
+
+        # ASGITransport no ejecuta los eventos de inicio: la conexión se abre aquí.
+        await init_bench_db()
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout)
+    else:
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout)
+
+    async with client:
+        context = await discover(client)
+        print(
+            f"{len(context.skus)} SKUs, {len(context.customer_ids)} clientes, {len(context.supplier_ids)} proveedores; "
+            f"{args.warmup} s de calentamiento y {args.duration} s de medición con {args.concurrency} usuarios..."
+        )
+        recorder, elapsed = await run_load(client, context, args)
+
+    results = build_results(recorder, elapsed, args)
+    print_results(results, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga de la API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--in-process", action="store_true", help="Ejecuta la API en este proceso (sin servidor)")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=int, default=60, help="Segundos de medición")
+    parser.add_argument("--warmup", type=int, default=10, help="Segundos iniciales que no se cuentan")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--only", nargs="*", help="Solo los endpoints cuyo nombre contiene alguno de estos textos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--baseline", help="Resultados JSON de otra versión para comparar")
+    asyncio.run(main(parser.parse_args()))
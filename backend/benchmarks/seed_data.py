@@ -0,0 +1,519 @@
+"""
+Generador de datos sintéticos a escala de producción para los benchmarks y la prueba
+de carga (`benchmarks.load_test`).
+
+Genera, contra la base de benchmark (BENCH_DB_NAME, por defecto `erp_benchmark`):
+
+- almacenes, categorías y productos con medidas;
+- clientes con sucursales y proveedores;
+- órdenes y facturas de compra con pagos y notas de débito;
+- órdenes y facturas de venta con pagos y notas de crédito;
+- movimientos de stock en orden cronológico (ingresos, salidas, transferencias y
+  mermas) con su libro de costos, sin dejar saldos negativos.
+
+Los documentos se insertan como dicts con `insert_many` (sin pasar por Beanie) y con
+la misma forma que producen los modelos, incluidos los `search_tokens`. Al final se
+derivan los saldos por almacén, el stock y costo de cada producto, los resúmenes
+diarios, los checkpoints de saldos y los contadores de las series de documentos,
+así la API ve un estado coherente. Los movimientos referencian facturas y guías
+existentes, pero no replican línea por línea sus ítems.
+
+    python -m benchmarks.seed_data --scale medium --reset
+    python -m benchmarks.seed_data --products 100000 --movements 5000000 --days 730 --reset
+
+Con el mismo `--seed` se generan los mismos datos (salvo los ObjectId) en cada
+ejecución, así los resultados de la prueba de carga son comparables entre versiones.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List
+
+from bson import ObjectId
+
+from benchmarks.common import init_bench_db
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": dict(products=5_000, customers=500, suppliers=100, sales_orders=20_000, purchase_orders=5_000, movements=200_000),
+    "medium": dict(products=50_000, customers=5_000, suppliers=500, sales_orders=200_000, purchase_orders=50_000, movements=2_000_000),
+    "large": dict(products=200_000, customers=20_000, suppliers=2_000, sales_orders=1_000_000, purchase_orders=200_000, movements=10_000_000),
+}
+
+BATCH_SIZE = 10_000
+WAREHOUSES = [
+    {"name": "Almacén San Luis (Principal)", "code": "SL01", "address": "Av. San Luis 123", "is_main": True, "is_active": True},
+    {"name": "Almacén Ate", "code": "ATE01", "address": "Carretera Central Km 5", "is_main": False, "is_active": True},
+]
+BRANDS = ["ACME", "TOYO", "BOSCH", "SKF", "NGK", "DENSO", "GATES", "FAG", "TIMKEN", "NSK", "KOYO", "MAHLE"]
+PART_NAMES = [
+    "Rodamiento", "Retén", "Faja", "Filtro de aceite", "Filtro de aire", "Bujía", "Pastilla de freno",
+    "Amortiguador", "Bomba de agua", "Empaquetadura", "Perno", "Tuerca", "Manguera", "Polea", "Sensor",
+]
+CATEGORY_NAMES = [
+    "Rodamientos", "Retenes", "Fajas", "Filtros", "Encendido", "Frenos", "Suspensión", "Refrigeración",
+    "Empaquetaduras", "Pernería", "Mangueras", "Poleas", "Sensores", "Lubricantes", "Herramientas",
+]
+DISTRICTS = ["Lima", "Ate", "San Luis", "Surquillo", "Los Olivos", "Callao", "Chorrillos", "Comas", "Arequipa", "Trujillo"]
+COMPANY_WORDS = ["Andina", "Pacífico", "Industrial", "Motores", "Repuestos", "Norte", "Sur", "Global", "Minera", "Agro"]
+LOSS_TYPES = ["LOSS_DAMAGED", "LOSS_DEFECTIVE", "LOSS_HUMIDITY", "LOSS_EXPIRED", "LOSS_THEFT", "LOSS_OTHER"]
+
+
+def batched(docs: Iterable[Dict[str, Any]], size: int = BATCH_SIZE) -> Iterable[List[Dict[str, Any]]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def insert_all(model, docs: Iterable[Dict[str, Any]], label: str) -> int:
+    collection = model.get_pymongo_collection()
+    count = 0
+    start = time.perf_counter()
+    for batch in batched(docs):
+        await collection.insert_many(batch, ordered=False)
+        count += len(batch)
+        if count % (BATCH_SIZE * 50) == 0:
+            print(f"  {label}: {count}...")
+    print(f"{label}: {count} en {time.perf_counter() - start:.1f} s")
+    return count
+
+
+class Generator:
+    """Estado compartido entre las etapas (ids, números de documento, precios)."""
+
+    def __init__(self, args):
+        from app.services.document_number_service import SERIES
+
+        self.args = args
+        self.series = SERIES
+        self.rng = random.Random(args.seed)
+        self.now = datetime.now().replace(microsecond=0)
+        self.start = self.now - timedelta(days=args.days)
+        self.products: List[Dict[str, Any]] = []
+        self.category_ids: List[str] = []
+        self.customers: List[Dict[str, Any]] = []
+        self.supplier_ids: List[str] = []
+        self.sales_invoice_numbers: List[str] = []
+        self.purchase_invoice_numbers: List[str] = []
+        self.sequences: Dict[str, int] = {}
+        self.warehouse_stock: List[Dict[str, Any]] = []
+
+    def random_date(self) -> datetime:
+        return self.start + timedelta(seconds=self.rng.uniform(0, (self.now - self.start).total_seconds()))
+
+    def number(self, document_type: str, sequence: int) -> str:
+        self.sequences[document_type] = max(self.sequences.get(document_type, 0), sequence)
+        return self.series[document_type].format(sequence)
+
+    def lines(self, max_lines: int) -> List[Dict[str, Any]]:
+        return self.rng.sample(self.products, k=self.rng.randint(1, max_lines))
+
+    def payments(self, total: float, at: datetime):
+        """Estado de pago y pagos de una factura de `total` emitida en `at`."""
+        status = self.rng.choices(["PAID", "PARTIAL", "PENDING"], weights=[70, 15, 15])[0]
+        if status == "PENDING":
+            return status, 0.0, []
+        paid = total if status == "PAID" else round(total * self.rng.uniform(0.1, 0.9), 3)
+        parts = self.rng.randint(1, 3)
+        amounts = [round(paid / parts, 3)] * (parts - 1)
+        amounts.append(round(paid - sum(amounts), 3))
+        payments = [
+            {"amount": amount, "date": min(self.now, at + timedelta(days=self.rng.randint(1, 60))), "notes": None}
+            for amount in amounts
+        ]
+        return status, paid, payments
+
+    # --- Catálogo ---
+
+    def product_docs(self) -> Iterable[Dict[str, Any]]:
+        from app.services.search_service import build_search_tokens
+
+        for i in range(self.args.products):
+            brand = self.rng.choice(BRANDS)
+            name = f"{self.rng.choice(PART_NAMES)} {self.rng.randint(10, 9999)}"
+            sku = f"{brand[:3]}-{i:07d}"
+            cost = round(self.rng.uniform(1, 400), 3)
+            measurements = [
+                {"label": label, "unit": "mm", "value": f"{self.rng.uniform(5, 300):.1f}"}
+                for label in self.rng.sample(["Diámetro interior", "Diámetro exterior", "Ancho", "Largo", "Alto"], k=self.rng.randint(0, 4))
+            ]
+            if self.rng.random() < 0.2:
+                measurements.append({"label": "Rosca", "unit": "rosca", "value": self.rng.choice(["M8x1.25", "M10x1.5", "M12x1.75"])})
+            yield {
+                "sku": sku,
+                "name": name,
+                "brand": brand,
+                "image_url": None,
+                "category_id": self.rng.choice(self.category_ids),
+                "description": f"{name} marca {brand}, para uso industrial y automotriz.",
+                "price": round(cost * self.rng.uniform(1.2, 1.8), 3),
+                "cost": cost,
+                "measurements": measurements or None,
+                "stock_current": 0,
+                "created_at": self.start - timedelta(days=self.rng.randint(1, 365)),
+                "search_tokens": build_search_tokens(words=[name, brand], codes=[sku]),
+            }
+
+    def customer_docs(self) -> Iterable[Dict[str, Any]]:
+        from app.services.search_service import build_search_tokens
+
+        for i in range(self.args.customers):
+            name = f"{self.rng.choice(COMPANY_WORDS)} {self.rng.choice(COMPANY_WORDS)} {i:06d} S.A.C."
+            ruc = f"20{i:09d}"
+            branches = [
+                {
+                    "branch_name": "Principal" if b == 0 else f"Sucursal {self.rng.choice(DISTRICTS)} {b}",
+                    "address": f"Av. {self.rng.choice(DISTRICTS)} {self.rng.randint(100, 9999)}",
+                    "contact_person": f"Contacto {b}",
+                    "phone": f"9{self.rng.randint(10_000_000, 99_999_999)}",
+                    "is_main": b == 0,
+                    "is_active": True,
+                }
+                for b in range(self.rng.randint(1, 4))
+            ]
+            yield {
+                "_id": ObjectId(),
+                "name": name,
+                "ruc": ruc,
+                "address": branches[0]["address"],
+                "phone": branches[0]["phone"],
+                "email": f"compras{i}@cliente.pe",
+                "branches": branches,
+                "created_at": self.start - timedelta(days=self.rng.randint(1, 365)),
+                "search_tokens": build_search_tokens(words=[name], codes=[ruc]),
+            }
+
+    def supplier_docs(self) -> Iterable[Dict[str, Any]]:
+        from app.services.search_service import build_search_tokens
+
+        for i in range(self.args.suppliers):
+            name = f"Distribuidora {self.rng.choice(COMPANY_WORDS)} {i:05d} S.A."
+            yield {
+                "_id": ObjectId(),
+                "name": name,
+                "email": f"ventas{i}@proveedor.pe",
+                "phone": f"01{self.rng.randint(1_000_000, 9_999_999)}",
+                "address": f"Jr. {self.rng.choice(DISTRICTS)} {self.rng.randint(100, 999)}",
+                "created_at": self.start - timedelta(days=self.rng.randint(1, 365)),
+                "search_tokens": build_search_tokens(words=[name]),
+            }
+
+    # --- Compras ---
+
+    def purchase_docs(self, orders: list, invoices: list, debit_notes: list) -> Iterable[None]:
+        """Llena las listas por lotes (una orden, su factura y su nota de débito juntas)."""
+        from app.services.search_service import build_search_tokens
+
+        invoice_seq = note_seq = 0
+        for i in range(1, self.args.purchase_orders + 1):
+            order_id, supplier_id, date = ObjectId(), self.rng.choice(self.supplier_ids), self.random_date()
+            items = [
+                {"product_sku": p["sku"], "quantity": self.rng.randint(5, 200), "unit_cost": round(p["cost"] * self.rng.uniform(0.9, 1.1), 3)}
+                for p in self.lines(8)
+            ]
+            total = round(sum(item["quantity"] * item["unit_cost"] for item in items), 3)
+            status = self.rng.choices(["INVOICED", "PENDING", "CANCELLED"], weights=[85, 10, 5])[0]
+            order_number = self.number("purchase_order", i)
+            orders.append({
+                "_id": order_id, "order_number": order_number, "supplier_id": supplier_id, "date": date,
+                "items": items, "status": status, "total_amount": total,
+                "search_tokens": build_search_tokens(codes=[order_number], exact=[supplier_id]),
+            })
+            if status == "INVOICED":
+                invoice_seq += 1
+                invoice_id = ObjectId()
+                invoice_date = min(self.now, date + timedelta(days=self.rng.randint(0, 5)))
+                invoice_number = self.number("purchase_invoice", invoice_seq)
+                payment_status, paid, payments = self.payments(total, invoice_date)
+                invoice = {
+                    "_id": invoice_id, "invoice_number": invoice_number, "order_id": str(order_id),
+                    "supplier_id": supplier_id, "invoice_date": invoice_date, "items": items,
+                    "total_amount": total, "payment_status": payment_status, "amount_paid": paid,
+                    "payments": payments, "reception_status": "RECEIVED", "guide_id": None,
+                    "debit_note_ids": [], "debit_applied": 0.0,
+                    "search_tokens": build_search_tokens(codes=[invoice_number], exact=[supplier_id, str(order_id)]),
+                }
+                if self.rng.random() < 0.03:
+                    note_seq += 1
+                    item = self.rng.choice(items)
+                    quantity = self.rng.randint(1, item["quantity"])
+                    note_id, note_number = ObjectId(), self.number("debit_note", note_seq)
+                    note_total = round(quantity * item["unit_cost"], 3)
+                    debit_notes.append({
+                        "_id": note_id, "debit_note_number": note_number, "purchase_invoice_id": str(invoice_id),
+                        "supplier_id": supplier_id, "date": min(self.now, invoice_date + timedelta(days=self.rng.randint(1, 20))),
+                        "reason": "RETURN", "status": "APPLIED",
+                        "items": [{"product_sku": item["product_sku"], "quantity": quantity, "unit_cost": item["unit_cost"], "reason": "Devolución"}],
+                        "total_amount": note_total, "notes": None,
+                        "search_tokens": build_search_tokens(codes=[note_number], exact=[str(invoice_id), supplier_id]),
+                    })
+                    invoice["debit_note_ids"] = [str(note_id)]
+                    invoice["debit_applied"] = note_total
+                invoices.append(invoice)
+                self.purchase_invoice_numbers.append(invoice_number)
+            if len(orders) >= BATCH_SIZE:
+                yield
+
+        yield
+
+    # --- Ventas ---
+
+    def sales_docs(self, orders: list, invoices: list, credit_notes: list) -> Iterable[None]:
+        from app.services.search_service import build_search_tokens
+
+        invoice_seq = note_seq = 0
+        for i in range(1, self.args.sales_orders + 1):
+            customer = self.rng.choice(self.customers)
+            customer_id = str(customer["_id"])
+            branch = self.rng.choice(customer["branches"])
+            order_id, date = ObjectId(), self.random_date()
+            items = [
+                {"product_sku": p["sku"], "quantity": self.rng.randint(1, 20), "unit_price": p["price"]}
+                for p in self.lines(6)
+            ]
+            total = round(sum(item["quantity"] * item["unit_price"] for item in items), 3)
+            status = self.rng.choices(["INVOICED", "PENDING", "CANCELLED"], weights=[85, 10, 5])[0]
+            order_number = self.number("sales_order", i)
+            orders.append({
+                "_id": order_id, "order_number": order_number, "customer_id": customer_id, "date": date,
+                "items": items, "status": status, "total_amount": total,
+                "delivery_branch_name": branch["branch_name"], "delivery_address": branch["address"],
+                "search_tokens": build_search_tokens(codes=[order_number], exact=[customer_id]),
+            })
+            if status == "INVOICED":
+                invoice_seq += 1
+                invoice_id = ObjectId()
+                invoice_date = min(self.now, date + timedelta(days=self.rng.randint(0, 3)))
+                invoice_number = self.number("sales_invoice", invoice_seq)
+                payment_status, paid, payments = self.payments(total, invoice_date)
+                invoice = {
+                    "_id": invoice_id, "invoice_number": invoice_number, "order_id": str(order_id),
+                    "customer_id": customer_id, "invoice_date": invoice_date, "items": items,
+                    "total_amount": total, "delivery_branch_name": branch["branch_name"],
+                    "delivery_address": branch["address"], "payment_status": payment_status,
+                    "amount_paid": paid, "payments": payments, "dispatch_status": "DISPATCHED", "guide_id": None,
+                    "credit_note_ids": [], "credit_applied": 0.0,
+                    "search_tokens": build_search_tokens(codes=[invoice_number], exact=[str(order_id), customer_id]),
+                }
+                if self.rng.random() < 0.04:
+                    note_seq += 1
+                    item = self.rng.choice(items)
+                    quantity = self.rng.randint(1, item["quantity"])
+                    note_id, note_number = ObjectId(), self.number("credit_note", note_seq)
+                    note_total = round(quantity * item["unit_price"], 3)
+                    credit_notes.append({
+                        "_id": note_id, "credit_note_number": note_number, "sales_invoice_id": str(invoice_id),
+                        "customer_id": customer_id, "date": min(self.now, invoice_date + timedelta(days=self.rng.randint(1, 20))),
+                        "reason": self.rng.choice(["RETURN", "PRICE_CORRECTION", "DISCOUNT"]), "status": "APPLIED",
+                        "items": [{"product_sku": item["product_sku"], "quantity": quantity, "unit_price": item["unit_price"], "reason": None}],
+                        "total_amount": note_total, "notes": None,
+                        "search_tokens": build_search_tokens(codes=[note_number], exact=[str(invoice_id), customer_id]),
+                    })
+                    invoice["credit_note_ids"] = [str(note_id)]
+                    invoice["credit_applied"] = note_total
+                invoices.append(invoice)
+                self.sales_invoice_numbers.append(invoice_number)
+            if len(orders) >= BATCH_SIZE:
+                yield
+
+        yield
+
+    # --- Movimientos de stock y libro de costos ---
+
+    def movement_docs(self, ledger: list) -> Iterable[Dict[str, Any]]:
+        """
+        Movimientos en orden cronológico. Lleva el saldo por (SKU, almacén) y el costo
+        promedio por SKU: una salida sin saldo se convierte en ingreso, así ningún saldo
+        queda negativo. Deja en `ledger` las entradas del libro de costos.
+        """
+        rng = self.rng
+        codes = [w["code"] for w in WAREHOUSES]
+        stock = {(p["sku"], code): 0 for p in self.products for code in codes}
+        totals = {p["sku"]: 0 for p in self.products}
+        costs = {p["sku"]: p["cost"] for p in self.products}
+        guide_seq = self.sequences.get("delivery_guide", 0)
+        step = (self.now - self.start).total_seconds() / max(1, self.args.movements)
+        at = self.start
+        produced = 0
+
+        def ledger_entry(sku, before_quantity, before_cost, reference):
+            before_value = round(before_quantity * before_cost, 3)
+            running_value = round(totals[sku] * costs[sku], 3)
+            ledger.append({
+                "sku": sku, "entry_type": "MOVEMENT", "reference_document": reference,
+                "quantity_change": totals[sku] - before_quantity, "value_change": round(running_value - before_value, 3),
+                "running_quantity": totals[sku], "average_cost": costs[sku], "running_value": running_value,
+                "created_at": at,
+            })
+
+        while produced < self.args.movements:
+            at += timedelta(seconds=rng.expovariate(1 / step))
+            if at > self.now:
+                at = self.now
+            product = rng.choice(self.products)
+            sku = product["sku"]
+            warehouse = rng.choices(codes, weights=[75, 25])[0]
+            kind = rng.random()
+            quantity = rng.randint(1, 20)
+            available = stock[(sku, warehouse)]
+
+            if kind < 0.08 and available > 0:
+                target = codes[1] if warehouse == codes[0] else codes[0]
+                quantity = min(quantity, available)
+                guide_seq += 1
+                reference = self.number("delivery_guide", guide_seq)
+                for movement_type in ("TRANSFER_OUT", "TRANSFER_IN"):
+                    yield {
+                        "product_sku": sku, "quantity": quantity, "movement_type": movement_type,
+                        "warehouse_id": warehouse, "target_warehouse_id": target, "unit_cost": costs[sku],
+                        "reference_document": reference, "created_at": at, "notes": None,
+                        "responsible": None, "stock_change": 0,
+                    }
+                stock[(sku, warehouse)] -= quantity
+                stock[(sku, target)] += quantity
+                produced += 2
+                continue
+
+            before_quantity, before_cost = totals[sku], costs[sku]
+            if kind < 0.6 and available >= quantity:
+                movement_type = "OUT" if kind < 0.58 else rng.choice(LOSS_TYPES)
+                reference = rng.choice(self.sales_invoice_numbers) if movement_type == "OUT" and self.sales_invoice_numbers else "MERMA"
+                change, unit_cost = -quantity, costs[sku]
+            else:
+                movement_type = "IN"
+                quantity = rng.randint(10, 200)
+                reference = rng.choice(self.purchase_invoice_numbers) if self.purchase_invoice_numbers else "INGRESO"
+                unit_cost = round(product["cost"] * rng.uniform(0.9, 1.1), 3)
+                change = quantity
+                costs[sku] = round((before_quantity * before_cost + quantity * unit_cost) / (before_quantity + quantity), 3)
+            stock[(sku, warehouse)] += change
+            totals[sku] += change
+            ledger_entry(sku, before_quantity, before_cost, reference)
+            yield {
+                "product_sku": sku, "quantity": quantity, "movement_type": movement_type,
+                "warehouse_id": warehouse, "target_warehouse_id": None, "unit_cost": unit_cost,
+                "reference_document": reference, "created_at": at, "notes": None,
+                "responsible": None, "stock_change": change,
+            }
+            produced += 1
+
+        for product in self.products:
+            product["stock_current"] = totals[product["sku"]]
+            product["cost"] = costs[product["sku"]]
+        self.warehouse_stock = [
+            {"sku": sku, "warehouse_id": code, "quantity": quantity, "updated_at": self.now}
+            for (sku, code), quantity in stock.items() if quantity
+        ]
+
+
+async def reset_database():
+    from app.database import get_document_models
+    from app.services.index_service import reconcile_indexes
+
+    models = get_document_models()
+    for model in models:
+        await model.get_pymongo_collection().drop()
+    await reconcile_indexes(models, dry_run=False)
+    print("Colecciones vaciadas e índices recreados.")
+
+
+async def main(args):
+    await init_bench_db()
+
+    from app.config import STOCK_CHECKPOINT_PERIOD
+    from app.models.inventory import Category, CostLedgerEntry, Product, StockMovement, Warehouse, WarehouseStock
+    from app.models.purchasing import DebitNote, Invoice, Order, Supplier
+    from app.models.sales import CreditNote, Customer, SalesInvoice, SalesOrder
+    from app.services.checkpoint_service import rebuild_checkpoints
+    from app.services.document_number_service import DocumentSequence
+    from app.services.rollup_service import ROLLUPS, rebuild_rollups
+
+    if args.reset:
+        await reset_database()
+    elif await Product.get_pymongo_collection().estimated_document_count():
+        raise SystemExit("La base de benchmark ya tiene datos; use --reset para regenerarla.")
+
+    started = time.perf_counter()
+    gen = Generator(args)
+
+    await insert_all(Warehouse, [dict(w) for w in WAREHOUSES], "almacenes")
+    categories = [{"_id": ObjectId(), "name": name, "description": None} for name in CATEGORY_NAMES]
+    await insert_all(Category, categories, "categorías")
+    gen.category_ids = [str(c["_id"]) for c in categories]
+    gen.products = list(gen.product_docs())
+
+    gen.customers = list(gen.customer_docs())
+    await insert_all(Customer, gen.customers, "clientes")
+    suppliers = list(gen.supplier_docs())
+    await insert_all(Supplier, suppliers, "proveedores")
+    gen.supplier_ids = [str(s["_id"]) for s in suppliers]
+
+    for title, stage, models in (
+        ("compras", gen.purchase_docs, (Order, Invoice, DebitNote)),
+        ("ventas", gen.sales_docs, (SalesOrder, SalesInvoice, CreditNote)),
+    ):
+        lists = ([], [], [])
+        counts = [0, 0, 0]
+        stage_start = time.perf_counter()
+        for _ in stage(*lists):
+            for index, (model, docs) in enumerate(zip(models, lists)):
+                if docs:
+                    await model.get_pymongo_collection().insert_many(docs, ordered=False)
+                    counts[index] += len(docs)
+                    docs.clear()
+        print(
+            f"{title}: {counts[0]} órdenes, {counts[1]} facturas, {counts[2]} notas "
+            f"en {time.perf_counter() - stage_start:.1f} s"
+        )
+
+    ledger: list = []
+    # El libro de costos se vacía en cada lote de movimientos para no acumularlo en memoria.
+    movements = StockMovement.get_pymongo_collection()
+    ledger_collection = CostLedgerEntry.get_pymongo_collection()
+    stage_start, moved, entries = time.perf_counter(), 0, 0
+    for batch in batched(gen.movement_docs(ledger)):
+        await movements.insert_many(batch, ordered=False)
+        moved += len(batch)
+        if ledger:
+            await ledger_collection.insert_many(ledger, ordered=False)
+            entries += len(ledger)
+            ledger.clear()
+        if moved % (BATCH_SIZE * 50) == 0:
+            print(f"  movimientos: {moved}...")
+    if ledger:
+        await ledger_collection.insert_many(ledger, ordered=False)
+        entries += len(ledger)
+    print(f"movimientos: {moved} ({entries} entradas del libro de costos) en {time.perf_counter() - stage_start:.1f} s")
+
+    await insert_all(Product, gen.products, "productos")
+    await insert_all(WarehouseStock, gen.warehouse_stock, "saldos por almacén")
+
+    sequences = DocumentSequence.get_pymongo_collection()
+    for name, sequence in gen.sequences.items():
+        await sequences.update_one({"name": name}, {"$max": {"sequence": sequence}}, upsert=True)
+
+    for kind in ROLLUPS:
+        print(f"resúmenes diarios ({kind}): {await rebuild_rollups(kind)}")
+    print(f"checkpoints de saldos ({STOCK_CHECKPOINT_PERIOD}): {await rebuild_checkpoints(STOCK_CHECKPOINT_PERIOD)}")
+    print(f"\nDatos generados en {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Datos sintéticos para benchmarks y pruebas de carga")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    for name in SCALES["small"]:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, help="Reemplaza el valor de la escala")
+    parser.add_argument("--days", type=int, default=365, help="Días de historia hacia atrás")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reset", action="store_true", help="Vacía la base de benchmark antes de generar")
+    args = parser.parse_args()
+    for name, value in SCALES[args.scale].items():
+        if getattr(args, name) is None:
+            setattr(args, name, value)
+    asyncio.run(main(args))
@@ -0,0 +1,122 @@
+"""
+Prueba de estrés de concurrencia del motor de stock.
+
+Lanza muchas salidas, ingresos y transferencias concurrentes sobre los mismos SKUs
+y verifica que no haya deriva: el stock final de cada producto debe ser igual al
+stock inicial más la suma de los movimientos registrados, nunca negativo, y igual a
+la suma de sus saldos por almacén (las transferencias no cambian el total). Salidas y
+ajustes indican su almacén (SL01 o ATE01): un rechazo por falta de saldo se cuenta
+aparte según sea del total o del almacén elegido. La última entrada del libro de costos debe coincidir con el stock y costo del producto.
+
+    python -m benchmarks.stress_stock --workers 200 --operations 2000
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime
+
+from benchmarks.common import init_bench_db
+
+INITIAL_STOCK = 500
+WAREHOUSES = ("SL01", "ATE01")
+
+
+async def main(args):
+    await init_bench_db()
+
+    from app.models.inventory import Product, StockMovement, MovementType, Warehouse, WarehouseStock, CostLedgerEntry
+    from app.services import inventory_service
+    from app.services.stock_service import get_warehouse_balances
+    from app.services.cost_ledger_service import get_sku_cost_as_of
+    from app.exceptions.business_exceptions import InsufficientStockException, ValidationException
+
+    skus = [f"STRESS-{i:03d}" for i in range(args.skus)]
+    reference_prefix = f"STRESS-{int(time.time())}"
+
+    await Product.find({"sku": {"$in": skus}}).delete()
+    await StockMovement.find({"product_sku": {"$in": skus}}).delete()
+    await WarehouseStock.find({"sku": {"$in": skus}}).delete()
+    await CostLedgerEntry.find({"sku": {"$in": skus}}).delete()
+    for sku in skus:
+        await Product(sku=sku, name=f"Producto estrés {sku}", price=10, cost=5, stock_current=INITIAL_STOCK).insert()
+    if not await Warehouse.find_one({"code": "ATE01"}):
+        await Warehouse(name="Almacén Ate", code="ATE01", address="-", is_main=False).insert()
+
+    counters = {"ok": 0, "insufficient_total": 0, "insufficient_warehouse": 0, "adjust_conflicts": 0, "errors": 0}
+    semaphore = asyncio.Semaphore(args.workers)
+
+    async def operation(i: int):
+        async with semaphore:
+            kind = random.random()
+            try:
+                if kind < 0.55:
+                    await inventory_service.register_movement(
+                        random.choice(skus), random.randint(1, 20), MovementType.OUT, f"{reference_prefix}-{i}",
+                        warehouse_id=random.choice(WAREHOUSES)
+                    )
+                elif kind < 0.8:
+                    await inventory_service.register_movement(
+                        random.choice(skus), random.randint(1, 15), MovementType.IN, f"{reference_prefix}-{i}",
+                        unit_cost=round(random.uniform(3, 8), 2), warehouse_id=random.choice(WAREHOUSES)
+                    )
+                elif kind < 0.9:
+                    # adjust_stock registra el ajuste como IN/OUT con la diferencia aplicada.
+                    await inventory_service.adjust_stock(
+                        random.choice(skus), random.randint(0, INITIAL_STOCK), "Estrés", random.choice(WAREHOUSES)
+                    )
+                else:
+                    lines = random.sample(skus, k=min(3, len(skus)))
+                    await inventory_service.register_transfer_out(
+                        "ATE01", [{"sku": sku, "quantity": random.randint(1, 10)} for sku in lines]
+                    )
+                counters["ok"] += 1
+            except InsufficientStockException as e:
+                # El SKU de un rechazo por almacén viene como "sku@almacén".
+                counters["insufficient_warehouse" if "@" in e.product_sku else "insufficient_total"] += 1
+            except ValidationException:
+                # adjust_stock agotó sus reintentos porque el stock seguía cambiando.
+                counters["adjust_conflicts"] += 1
+            except Exception as e:
+                counters["errors"] += 1
+                print(f"Error inesperado: {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(operation(i) for i in range(args.operations)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.operations} operaciones en {elapsed:.2f}s ({args.operations / elapsed:.0f} op/s): {counters}")
+
+    sign = {MovementType.IN: 1, MovementType.OUT: -1}
+    balances = await get_warehouse_balances(skus)
+    drift = 0
+    for sku in skus:
+        product = await Product.find_one(Product.sku == sku)
+        movements = await StockMovement.find({"product_sku": sku}).to_list()
+        expected = INITIAL_STOCK + sum(sign.get(m.movement_type, 0) * m.quantity for m in movements)
+        by_warehouse = balances[sku]
+        last_entry = await get_sku_cost_as_of(sku, datetime.now())
+        ok = (
+            product.stock_current == expected
+            and product.stock_current >= 0
+            and sum(by_warehouse.values()) == expected
+            and all(quantity >= 0 for quantity in by_warehouse.values())
+            and last_entry is not None
+            and last_entry.running_quantity == product.stock_current
+            and last_entry.average_cost == product.cost
+        )
+        if not ok:
+            drift += 1
+        print(f"  {sku}: stock={product.stock_current} esperado={expected} almacenes={by_warehouse} ok={ok}")
+
+    if drift or counters["errors"]:
+        raise SystemExit(f"FALLO: {drift} SKUs con deriva, {counters['errors']} errores")
+    print("OK: sin deriva de stock.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--skus", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=200)
+    parser.add_argument("--operations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
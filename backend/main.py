@@ -1,16 +1,19 @@
 import os
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Importa las configuraciones centralizadas
-from app.config import ALLOWED_ORIGINS
-from app.database import init_db
+from app.config import ALLOWED_ORIGINS, STOCK_CHECKPOINT_INTERVAL, STOCK_CHECKPOINT_PERIOD, JOB_WORKERS
+from app.database import init_db, close_db, warm_up_pool, pool_stats
 
 # Importa las rutas y los manejadores de excepciones
-from app.routes import inventory, purchasing, sales
+from app.routes import inventory, purchasing, sales, changes, jobs
 from app.exceptions.business_exceptions import BusinessException
 from app.exceptions.handlers import business_exception_handler
+from app.services.metrics_service import MetricsMiddleware, metrics_response
+from app.services.idempotency_service import IdempotencyMiddleware
 
 # --- Configuración del Logger ---
 if os.path.exists('backend_startup_error.log'):
@@ -22,9 +25,22 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Solicitudes lentas con su desglose de consultas (ver metrics_service): también a la
+# consola, que es lo que recogen los logs de Render.
+slow_request_logger = logging.getLogger("erp.slow_requests")
+slow_request_logger.setLevel(logging.WARNING)
+slow_request_logger.addHandler(logging.StreamHandler())
+slow_request_logger.propagate = False
+
 app = FastAPI(title="ERP System API", version="1.0.0")
 app.add_exception_handler(BusinessException, business_exception_handler)
 
+# --- Idempotency-Key en las rutas que modifican datos (dentro de las métricas) ---
+app.add_middleware(IdempotencyMiddleware)
+
+# --- Métricas por solicitud (latencia por ruta y comandos de MongoDB) ---
+app.add_middleware(MetricsMiddleware)
+
 # --- Configuración de CORS ---
 app.add_middleware(
     CORSMiddleware,
@@ -38,6 +54,8 @@ app.add_middleware(
 app.include_router(inventory.router, prefix="/api/v1/inventory", tags=["inventory"])
 app.include_router(purchasing.router, prefix="/api/v1/purchasing", tags=["purchasing"])
 app.include_router(sales.router, prefix="/api/v1/sales", tags=["sales"])
+app.include_router(changes.router, prefix="/api/v1/changes", tags=["changes"])
+app.include_router(jobs.router, prefix="/api/v1/jobs", tags=["jobs"])
 
 @app.on_event("startup")
 async def on_startup():
@@ -47,7 +65,8 @@ async def on_startup():
     print("Iniciando la aplicación ERP...")
     try:
         await init_db()
-        print("Conexión a la base de datos verificada.")
+        warmed = await warm_up_pool()
+        print(f"Conexión a la base de datos verificada ({warmed} conexiones abiertas en el pool).")
     except Exception as e:
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         print("!!! ERROR CRÍTICO: No se pudo conectar a la base de datos.")
@@ -67,25 +86,61 @@ async def on_startup():
             await Warehouse(name="Almacén San Luis (Principal)", code="SL01", address="Av. San Luis 123", is_main=True).insert()
         if not await Warehouse.find_one({"code": "ATE01"}):
             await Warehouse(name="Almacén Ate", code="ATE01", address="Carretera Central Km 5", is_main=False).insert()
+        from app.services.cache_service import cache, CACHE_WAREHOUSES
+        await cache.invalidate(CACHE_WAREHOUSES, "all")
         print("Datos iniciales de almacenes verificados.")
     except Exception as e:
         print(f"!!! ERROR: No se pudieron crear los datos iniciales (almacenes): {e}")
         logging.error("Fallo al crear datos iniciales (Warehouse)", exc_info=True)
 
-    try:
-        from app.models.inventory import Product
-        print("Verificando/creando índices de la base de datos...")
-        coll = Product.get_pymongo_collection()
-        await coll.create_index([
-            ("measurements.label", 1),
-            ("measurements.unit", 1),
-            ("measurements.value", 1),
-        ])
-        print("Índices de 'measurements' verificados/creados.")
-    except Exception as e:
-        print(f"!!! ADVERTENCIA: No se pudo crear el índice de 'measurements': {e}")
-        logging.warning("No se pudo crear el índice de 'measurements'", exc_info=True)
+    # Job de fondo que materializa los checkpoints de saldos de stock.
+    if STOCK_CHECKPOINT_INTERVAL > 0:
+        from app.services.checkpoint_service import run_checkpoint_job
+        app.state.checkpoint_job = asyncio.create_task(
+            run_checkpoint_job(STOCK_CHECKPOINT_INTERVAL, STOCK_CHECKPOINT_PERIOD)
+        )
+
+    # Workers de la cola de jobs (importaciones, exportaciones, reconstrucciones).
+    if JOB_WORKERS > 0:
+        from app.services.job_service import runner
+        await runner.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Eventos al detener la aplicación: detiene los jobs de fondo (los que estaban en
+    curso vuelven a la cola) y el feed de cambios y cierra el pool de conexiones a MongoDB.
+    """
+    checkpoint_job = getattr(app.state, "checkpoint_job", None)
+    if checkpoint_job:
+        checkpoint_job.cancel()
+        try:
+            await checkpoint_job
+        except (asyncio.CancelledError, Exception):
+            pass
+    from app.services.job_service import runner
+    await runner.stop()
+    from app.services.change_feed_service import feed
+    await feed.close()
+    await close_db()
+    print("Conexiones a la base de datos cerradas.")
 
 @app.get("/")
 async def root():
     return {"message": "ERP System API is running"}
+
+@app.get("/api/v1/cache/stats")
+async def cache_stats():
+    """Aciertos/fallos de la caché de lecturas por espacio de nombres."""
+    from app.services.cache_service import cache
+    return cache.stats()
+
+@app.get("/api/v1/db/pool")
+async def db_pool_stats():
+    """Configuración y uso del pool de conexiones a MongoDB de este worker."""
+    return pool_stats()
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Métricas de Prometheus: latencia por ruta, comandos y tiempo en MongoDB."""
+    return metrics_response()
@@ -0,0 +1,54 @@
+import asyncio
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Este script no necesita reconciliar índices al conectar.
+os.environ["INDEX_RECONCILE_MODE"] = "off"
+
+from app.config import STOCK_CHECKPOINT_PERIOD
+from app.database import init_db, close_db
+from app.services.checkpoint_service import rebuild_checkpoints, refresh_checkpoints, check_checkpoints
+
+async def main(period: str, rebuild: bool, check: bool, deep: bool):
+    """
+    Mantenimiento de los checkpoints de saldos de stock.
+
+    Uso (desde backend/):
+        python manage_checkpoints.py                    # actualización incremental
+        python manage_checkpoints.py --rebuild          # borra y reconstruye desde los movimientos
+        python manage_checkpoints.py --check [--deep]   # verifica la consistencia
+        python manage_checkpoints.py --period MONTH ...
+    """
+    # Sin límite de espera por respuesta: las reconstrucciones pueden tardar minutos.
+    await init_db(socketTimeoutMS=None)
+    try:
+        if rebuild:
+            count = await rebuild_checkpoints(period)
+            print(f"Checkpoints ({period}) reconstruidos: {count}")
+        elif not check:
+            count = await refresh_checkpoints(period)
+            print(f"Checkpoints ({period}) actualizados: {count}")
+
+        if check:
+            result = await check_checkpoints(period, deep=deep)
+            print(f"Materializado hasta: {result['watermark']}")
+            print(f"Productos verificados: {result['checked_products']}, SKUs con checkpoints: {result['checkpoint_skus']}")
+            for issue in result["issues"]:
+                print(f"  - {issue}")
+            if result["issue_count"]:
+                raise SystemExit(f"{result['issue_count']} inconsistencias encontradas")
+            print("Checkpoints consistentes.")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkpoints de saldos de stock")
+    parser.add_argument("--period", default=STOCK_CHECKPOINT_PERIOD, choices=["DAY", "MONTH"])
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruir todos los checkpoints del periodo")
+    parser.add_argument("--check", action="store_true", help="Verificar la consistencia de los checkpoints")
+    parser.add_argument("--deep", action="store_true", help="Con --check: comparar también contra los movimientos")
+    args = parser.parse_args()
+    asyncio.run(main(args.period, args.rebuild, args.check, args.deep))
@@ -0,0 +1,55 @@
+import asyncio
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# La reconciliación la hace este script, no el arranque de init_db.
+os.environ["INDEX_RECONCILE_MODE"] = "off"
+
+from app.database import init_db, close_db, get_document_models
+from app.services.index_service import reconcile_indexes, format_report
+from app.services.search_service import rebuild_search_tokens
+from app.services.cost_ledger_service import seed_opening_entries
+
+async def main(apply: bool, drop_undeclared: bool, rebuild_search: bool, seed_cost_ledger: bool):
+    """
+    Compara los índices declarados en los modelos (`Settings.indexes` e `Indexed`)
+    con los existentes en MongoDB.
+
+    Uso (desde backend/):
+        python manage_indexes.py                  # dry-run: solo informa
+        python manage_indexes.py --apply          # crea los índices faltantes
+        python manage_indexes.py --apply --drop-undeclared
+        python manage_indexes.py --rebuild-search # recalcula `search_tokens`
+        python manage_indexes.py --seed-cost-ledger # apertura del libro de costos
+    """
+    # Sin límite de espera por respuesta: las reconstrucciones pueden tardar minutos.
+    await init_db(socketTimeoutMS=None)
+    try:
+        reports = await reconcile_indexes(
+            get_document_models(), dry_run=not apply, drop_undeclared=drop_undeclared
+        )
+        print(format_report(reports, dry_run=not apply))
+
+        if rebuild_search:
+            for model in get_document_models():
+                if "search_tokens" in model.model_fields:
+                    count = await rebuild_search_tokens(model)
+                    print(f"Tokens de búsqueda recalculados en '{model.get_settings().name}': {count}")
+
+        if seed_cost_ledger:
+            count = await seed_opening_entries()
+            print(f"Entradas de apertura del libro de costos: {count}")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconciliación de índices de MongoDB")
+    parser.add_argument("--apply", action="store_true", help="Crear los índices faltantes")
+    parser.add_argument("--drop-undeclared", action="store_true", help="Eliminar índices no declarados (requiere --apply)")
+    parser.add_argument("--rebuild-search", action="store_true", help="Recalcular los tokens de búsqueda de todos los documentos")
+    parser.add_argument("--seed-cost-ledger", action="store_true", help="Registrar el saldo actual de los productos sin entradas en el libro de costos")
+    args = parser.parse_args()
+    asyncio.run(main(args.apply, args.drop_undeclared and args.apply, args.rebuild_search, args.seed_cost_ledger))
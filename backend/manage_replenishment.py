@@ -0,0 +1,44 @@
+import asyncio
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Este script no necesita reconciliar índices al conectar.
+os.environ["INDEX_RECONCILE_MODE"] = "off"
+
+from app.database import init_db, close_db
+from app.services.replenishment_service import run_replenishment
+
+async def main(args):
+    """
+    Cálculo de puntos de reorden y órdenes de compra borrador (p. ej. desde un cron nocturno).
+
+    Uso (desde backend/):
+        python manage_replenishment.py                          # parámetros de REPLENISHMENT_*
+        python manage_replenishment.py --history-days 1095 --lead-time-days 15
+        python manage_replenishment.py --no-orders              # solo calcular, sin borradores
+    """
+    # Sin límite de espera por respuesta: la agregación de movimientos puede tardar.
+    await init_db(socketTimeoutMS=None)
+    try:
+        run = await run_replenishment(
+            args.history_days, args.lead_time_days, args.review_days, args.service_level,
+            create_orders=not args.no_orders,
+        )
+        print(f"SKUs analizados: {run.skus_analyzed}, con demanda: {run.skus_with_demand}")
+        print(f"SKUs a reponer: {run.skus_to_reorder} ({run.skus_without_supplier} sin proveedor)")
+        print(f"Órdenes borrador: {len(run.draft_order_ids)}")
+        print(f"Tiempo: {run.duration_ms / 1000:.1f} s")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motor de reposición")
+    parser.add_argument("--history-days", type=int)
+    parser.add_argument("--lead-time-days", type=float)
+    parser.add_argument("--review-days", type=float)
+    parser.add_argument("--service-level", type=float)
+    parser.add_argument("--no-orders", action="store_true", help="No proponer órdenes de compra borrador")
+    asyncio.run(main(parser.parse_args()))
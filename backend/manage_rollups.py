@@ -0,0 +1,40 @@
+import asyncio
+import argparse
+import os
+import sys
+from datetime import date
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+# Este script no necesita reconciliar índices al conectar.
+os.environ["INDEX_RECONCILE_MODE"] = "off"
+
+from app.database import init_db, close_db
+from app.services.rollup_service import rebuild_rollups, ROLLUPS
+
+async def main(kinds, since, until):
+    """
+    Reconstrucción (backfill) de los resúmenes diarios de ventas y compras.
+
+    Uso (desde backend/):
+        python manage_rollups.py                                   # todo, ventas y compras
+        python manage_rollups.py --kind sales --since 2025-01-01   # desde una fecha
+        python manage_rollups.py --since 2025-03-01 --until 2025-03-31
+    """
+    # Sin límite de espera por respuesta: las reconstrucciones pueden tardar minutos.
+    await init_db(socketTimeoutMS=None)
+    try:
+        for kind in kinds:
+            count = await rebuild_rollups(kind, since, until)
+            print(f"Resúmenes diarios ({kind}) reconstruidos: {count}")
+    finally:
+        await close_db()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resúmenes diarios de ventas y compras")
+    parser.add_argument("--kind", choices=list(ROLLUPS) + ["all"], default="all")
+    parser.add_argument("--since", type=date.fromisoformat, help="Primer día (YYYY-MM-DD)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Último día, inclusive (YYYY-MM-DD)")
+    args = parser.parse_args()
+    kinds = list(ROLLUPS) if args.kind == "all" else [args.kind]
+    asyncio.run(main(kinds, args.since, args.until))
@@ -1,8 +1,9 @@
 import os
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
+from app.database import create_client
+
 # Load environment variables
 load_dotenv()
 
@@ -19,8 +20,8 @@ async def test_connection():
         return
     
     try:
-        # Create client
-        client = AsyncIOMotorClient(mongo_uri, serverSelectionTimeoutMS=5000)
+        # Same pool, timeouts and compression as the API (app.database)
+        client = create_client(serverSelectionTimeoutMS=5000)
         
         # Test connection
         await client.admin.command('ping')
@@ -41,7 +42,7 @@ async def test_connection():
         else:
             print(f"⚠️  Database '{db_name}' does not exist yet (will be created on first write)")
         
-        client.close()
+        await client.close()
         
     except Exception as e:
         print(f"❌ Connection failed: {type(e).__name__}: {str(e)}")
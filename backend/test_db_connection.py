@@ -1,9 +1,10 @@
 # backend/test_db_connection.py
 import os
 import asyncio
-from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
 
+from app.database import create_client
+
 async def check_mongodb_connection():
     """
     Carga las variables de entorno, se conecta a MongoDB y 
@@ -23,8 +24,8 @@ async def check_mongodb_connection():
 
         print(f"Intentando conectar a la base de datos: '{db_name}'...")
 
-        # Crear un cliente de Motor
-        client = AsyncIOMotorClient(mongodb_uri)
+        # Mismo pool, timeouts y compresión que la API (app.database)
+        client = create_client()
 
         # La conexión es perezosa. Se necesita un comando para forzar la conexión.
         # server_info() es ideal para esto.
@@ -44,7 +45,7 @@ async def check_mongodb_connection():
         print(f"Error: {e}")
     finally:
         if 'client' in locals():
-            client.close()
+            await client.close()
             print("\nConexión cerrada.")
 
 if __name__ == "__main__":
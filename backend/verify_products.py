@@ -2,9 +2,9 @@
 import asyncio
 import os
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
 from app.models.inventory import Product
+from app.database import create_client
 
 async def verify_connection_and_data():
     """
@@ -21,7 +21,7 @@ async def verify_connection_and_data():
 
     try:
         print(f"Connecting to MongoDB with URI: {mongodb_uri[:30]}...")
-        client = AsyncIOMotorClient(mongodb_uri)
+        client = create_client()
         await client.server_info()
         print("MongoDB connection successful.")
 
@@ -43,6 +43,9 @@ async def verify_connection_and_data():
 
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        if 'client' in locals():
+            await client.close()
 
 if __name__ == "__main__":
     # Note: If running from the root directory, ensure Python path is correct
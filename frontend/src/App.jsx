@@ -3,6 +3,7 @@ import { BrowserRouter, Routes, Route, Navigate } from 'react-router-dom';
 import { QueryClient, QueryClientProvider } from '@tanstack/react-query';
 import { NotificationProvider } from './context/NotificationContext';
 import Layout from './components/Layout';
+import { useChangeFeed } from './hooks/useChangeFeed';
 
 // Import Pages
 import Inventory from './pages/Inventory';
@@ -30,6 +31,12 @@ const Placeholder = ({ title }) => (
     </div>
 );
 
+// Mantiene al día los listados en caché con el feed de cambios del servidor.
+const ChangeFeedListener = () => {
+  useChangeFeed();
+  return null;
+};
+
 // --- React Query Client ---
 const queryClient = new QueryClient({
   defaultOptions: {
@@ -47,6 +54,7 @@ const queryClient = new QueryClient({
 function App() {
   return (
     <QueryClientProvider client={queryClient}>
+      <ChangeFeedListener />
       <NotificationProvider>
         <BrowserRouter>
           <Layout>
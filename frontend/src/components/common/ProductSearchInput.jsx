@@ -13,8 +13,8 @@ const ProductSearchInput = ({ onSelectProduct }) => {
         queryKey: ['products', { search, limit: 10 }],
         queryFn: () => {
             if (search.trim() === '') return [];
-            // CORREGIDO: Pasar un solo objeto como parámetro
-            return getProducts({ page: 1, limit: 10, search }).then(res => res.data.items);
+            // Solo las columnas del selector (vista resumida)
+            return getProducts(1, 10, { search, view: 'summary' }).then(res => res.data.items);
         },
         enabled: search.trim().length > 2, 
     });
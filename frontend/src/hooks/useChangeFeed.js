@@ -0,0 +1,73 @@
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { getChangeFeedUrl } from '../services/api';
+
+// Tópico del feed de cambios -> prefijo de las queryKeys que lo muestran.
+const TOPIC_QUERY_KEYS = {
+    products: 'products',
+    stock_movements: 'stockMovements',
+    sales_invoices: 'sales-invoices',
+    purchase_invoices: 'purchase-invoices',
+};
+
+// Las altas/bajas de un tópico se agrupan en una sola invalidación cada este intervalo:
+// una importación masiva no debe disparar un refetch por cada documento.
+const INVALIDATE_INTERVAL_MS = 500;
+
+// Aplica un delta `update`/`replace` a los ítems en caché de una página.
+const patchPage = (page, delta) => {
+    if (!page || !Array.isArray(page.items)) return page;
+    let changed = false;
+    const items = page.items.map(item => {
+        if (item?._id !== delta.id) return item;
+        changed = true;
+        return { ...item, ...(delta.doc || delta.set) };
+    });
+    return changed ? { ...page, items } : page;
+};
+
+/**
+ * Se suscribe al feed de cambios del servidor (SSE) y mantiene al día las páginas en
+ * caché de React Query sin volver a pedirlas: los updates se parchean en su lugar y
+ * las altas/bajas (que cambian el orden o el total de la página) invalidan el tópico,
+ * como mucho una vez cada INVALIDATE_INTERVAL_MS.
+ * EventSource reconecta solo y el servidor reenvía lo perdido desde `Last-Event-ID`.
+ */
+export const useChangeFeed = (topics = Object.keys(TOPIC_QUERY_KEYS)) => {
+    const queryClient = useQueryClient();
+    const topicList = topics.join(',');
+
+    useEffect(() => {
+        if (typeof EventSource === 'undefined') return undefined;
+        const source = new EventSource(getChangeFeedUrl(topicList), { withCredentials: true });
+        const pending = new Map(); // tópico -> timeout de la invalidación programada
+
+        const scheduleInvalidation = (topic) => {
+            if (pending.has(topic)) return;
+            pending.set(topic, setTimeout(() => {
+                pending.delete(topic);
+                queryClient.invalidateQueries({ queryKey: [TOPIC_QUERY_KEYS[topic]] });
+            }, INVALIDATE_INTERVAL_MS));
+        };
+
+        source.addEventListener('change', (message) => {
+            const delta = JSON.parse(message.data);
+            if (delta.op === 'update' || delta.op === 'replace') {
+                const queryKey = [TOPIC_QUERY_KEYS[delta.topic]];
+                queryClient.setQueriesData({ queryKey }, page => patchPage(page, delta));
+            } else {
+                scheduleInvalidation(delta.topic);
+            }
+        });
+        source.addEventListener('reset', (message) => {
+            const { topic } = JSON.parse(message.data);
+            scheduleInvalidation(topic);
+        });
+
+        return () => {
+            source.close();
+            pending.forEach(clearTimeout);
+            pending.clear();
+        };
+    }, [queryClient, topicList]);
+};
@@ -1,12 +1,13 @@
 import React, { useState } from 'react';
 import Layout from '../components/Layout';
-import { importProducts, exportProducts } from '../services/api';
+import { importProducts, exportProducts, getImportJob } from '../services/api';
 import { useNotification } from '../hooks/useNotification';
 
 const ImportExport = () => {
     const { showNotification } = useNotification();
     const [importResult, setImportResult] = useState(null);
     const [isLoading, setIsLoading] = useState(false);
+    const [processedRows, setProcessedRows] = useState(0);
     const [exportType, setExportType] = useState('current'); // 'current' or 'empty'
 
     const handleImport = async (e) => {
@@ -15,10 +16,23 @@ const ImportExport = () => {
 
         setIsLoading(true);
         setImportResult(null);
+        setProcessedRows(0);
 
         try {
-            const response = await importProducts(file);
-            setImportResult({ success: true, data: response.data });
+            // La importación corre en segundo plano: se consulta el job hasta que termine.
+            let { data: job } = await importProducts(file);
+            while (job.status === 'PENDING' || job.status === 'RUNNING') {
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                ({ data: job } = await getImportJob(job.id || job._id));
+                setProcessedRows(job.processed_rows);
+            }
+            const errors = job.errors.map((err) => `Fila ${err.row}${err.sku ? ` (${err.sku})` : ''}: ${err.message}`);
+            if (job.summary.errors > job.errors.length) {
+                errors.push(`... y ${job.summary.errors - job.errors.length} errores más`);
+            }
+            setImportResult(job.status === 'COMPLETED'
+                ? { success: true, data: { summary: job.summary, details: { errors } } }
+                : { success: false, error: job.message || 'La importación falló' });
         } catch (error) {
             setImportResult({
                 success: false,
@@ -103,18 +117,18 @@ const ImportExport = () => {
                             📥 Importar Productos
                         </h4>
                         <p style={{ fontSize: '0.9rem', color: '#64748b' }}>
-                            Sube tu archivo CSV con operaciones INSERT, UPDATE o DELETE.
+                            Sube tu archivo CSV o XLSX con operaciones INSERT, UPDATE o DELETE.
                         </p>
 
                         <div style={{ marginTop: '1.5rem' }}>
                             <input
                                 type="file"
-                                accept=".csv"
+                                accept=".csv,.xlsx"
                                 onChange={handleImport}
                                 disabled={isLoading}
                                 style={{ width: '100%' }}
                             />
-                            {isLoading && <div style={{ marginTop: '0.5rem', color: '#2563eb' }}>Procesando archivo...</div>}
+                            {isLoading && <div style={{ marginTop: '0.5rem', color: '#2563eb' }}>Procesando archivo... {processedRows > 0 && `${processedRows} filas`}</div>}
                         </div>
                     </div>
                 </div>
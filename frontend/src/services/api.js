@@ -27,12 +27,15 @@ api.interceptors.response.use(
 // --- Endpoints de la API ---
 
 // Inventory
-export const getProducts = (page, limit, { search, sortBy, sortOrder } = {}) => {
+export const getProducts = (page, limit, { search, sortBy, sortOrder, view, fields } = {}) => {
     const params = {
         page,
         limit,
         sort_by: sortBy,
         sort_order: sortOrder,
+        // 'summary' o lista de campos: el backend devuelve solo esas columnas
+        view,
+        fields,
     };
 
     // Solo añadir el parámetro de búsqueda si tiene un valor
@@ -49,8 +52,13 @@ export const getProductById = (id) => api.get(`/api/v1/inventory/products/${id}`
 export const createProduct = (product) => api.post('/api/v1/inventory/products/', product);
 export const updateProduct = (sku, product) => api.put(`/api/v1/inventory/products/${sku}`, product);
 export const deleteProduct = (sku) => api.delete(`/api/v1/inventory/products/${sku}`);
-export const exportProducts = () => api.get('/api/v1/inventory/products/export/json');
-export const importProducts = (products) => api.post('/api/v1/inventory/products/import/json', products);
+export const exportProducts = (mode = 'current', format = 'csv') => api.get('/api/v1/inventory/products/export', { params: { mode, format }, responseType: 'blob' });
+export const importProducts = (file) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    return api.post('/api/v1/inventory/products/import', formData, { headers: { 'Content-Type': 'multipart/form-data' } });
+};
+export const getImportJob = (jobId) => api.get(`/api/v1/inventory/products/import/${jobId}`);
 export const getWarehouses = () => api.get('/api/v1/inventory/warehouses/');
 
 // Stock
@@ -58,8 +66,20 @@ export const getStockMovements = (params) => api.get("/api/v1/inventory/stock-mo
 export const getStockMovementsByProduct = (productSku, params) => api.get(`/api/v1/inventory/stock-movements/product/${productSku}/history`, { params });
 export const adjustInventory = (data) => api.post('/api/v1/inventory/stock-movements/adjust', data);
 export const createTransfer = (transferData) => api.post('/api/v1/inventory/stock-movements/transfer', transferData);
+export const createReception = (receptionData) => api.post('/api/v1/inventory/stock-movements/reception', receptionData);
 export const createStockMovement = (movement) => api.post('/api/v1/inventory/stock-movements/', movement);
 
+// Jobs en segundo plano
+export const getJobKinds = () => api.get('/api/v1/jobs/kinds');
+export const createJob = (job) => api.post('/api/v1/jobs/', job);
+export const getJobs = (params) => api.get('/api/v1/jobs/', { params });
+export const getJob = (jobId) => api.get(`/api/v1/jobs/${jobId}`);
+export const cancelJob = (jobId) => api.post(`/api/v1/jobs/${jobId}/cancel`);
+export const getJobFileUrl = (jobId) => `${API_BASE_URL}/api/v1/jobs/${jobId}/file`;
+
+// Feed de cambios (Server-Sent Events, ver hooks/useChangeFeed.js)
+export const getChangeFeedUrl = (topics) => `${API_BASE_URL}/api/v1/changes/stream${topics ? `?topics=${topics}` : ''}`;
+
 // Purchasing
 export const getSuppliers = () => api.get('/api/v1/purchasing/suppliers/');
 export const createSupplier = (supplier) => api.post('/api/v1/purchasing/suppliers/', supplier);
@@ -70,6 +90,9 @@ export const receivePurchaseOrder = (orderId) => api.post(`/api/v1/purchasing/or
 export const getPurchaseInvoices = (params) => api.get('/api/v1/purchasing/invoices/', { params });
 export const createPurchaseInvoice = (invoice) => api.post('/api/v1/purchasing/invoices/', invoice);
 export const recordPurchasePayment = (invoiceId) => api.post(`/api/v1/purchasing/invoices/${invoiceId}/pay`);
+export const getReplenishment = (params) => api.get('/api/v1/purchasing/replenishment/', { params });
+export const getReplenishmentRun = () => api.get('/api/v1/purchasing/replenishment/run');
+export const runReplenishment = (params) => api.post('/api/v1/purchasing/replenishment/run', null, { params });
 
 // Sales
 export const getSalesOrders = (params) => api.get('/api/v1/sales/orders/', { params });
@@ -77,6 +100,11 @@ export const createSalesOrder = (order) => api.post('/api/v1/sales/orders/', ord
 export const getSalesInvoices = (params) => api.get('/api/v1/sales/invoices/', { params });
 export const createSalesInvoice = (invoice) => api.post('/api/v1/sales/invoices/', invoice);
 export const recordSalesPayment = (invoiceId) => api.post(`/api/v1/sales/invoices/${invoiceId}/pay`);
+export const getSalesQuotes = (params) => api.get('/api/v1/sales/quotes/', { params });
+export const getSalesQuote = (quoteId) => api.get(`/api/v1/sales/quotes/${quoteId}`);
+export const getSalesQuoteFill = (quoteId) => api.get(`/api/v1/sales/quotes/${quoteId}/fill`);
+export const createSalesQuote = (quote) => api.post('/api/v1/sales/quotes/', quote);
+export const cancelSalesQuote = (quoteId) => api.post(`/api/v1/sales/quotes/${quoteId}/cancel`);
 export const getCustomers = (page, limit, search) => {
     const params = { page, limit };
     if (search) {